@@ -4,11 +4,18 @@ from cryptography import x509
 from cryptography.hazmat import backends
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
 from cryptography.hazmat.primitives.asymmetric import rsa
 
+from concurrent import futures
 import datetime
 import argparse
+import json
+import os
 import sys
+import time
+
+KEY_TYPES = ('rsa', 'ecdsa')
 
 
 def get_args():
@@ -18,6 +25,24 @@ def get_args():
     parser.add_argument('-c', '--common-name', action='store',
                         default='localhost',
                         help='Set the common name for the server-side cert')
+    parser.add_argument('-o', '--output-dir', action='store',
+                        default='certs',
+                        help='Directory to write the certs to')
+    parser.add_argument('-n', '--clients', action='store', type=int,
+                        default=0,
+                        help='Number of additional client identities to '
+                             'generate in <output-dir>/clients, listed in '
+                             '<output-dir>/manifest.json')
+    parser.add_argument('-t', '--key-type', action='store',
+                        choices=KEY_TYPES, default='rsa',
+                        help='Key type of the additional client identities')
+    parser.add_argument('--server-key-type', action='store',
+                        choices=KEY_TYPES, default='rsa',
+                        help='Key type of the server cert')
+    parser.add_argument('-j', '--processes', action='store', type=int,
+                        default=os.cpu_count(),
+                        help='Number of processes generating the client '
+                             'identities')
     return parser.parse_args()
 
 
@@ -30,6 +55,23 @@ def create_rsa_private_key(key_size=2048, public_exponent=65537):
     return private_key
 
 
+def create_ecdsa_private_key(curve=ec.SECP256R1):
+    return ec.generate_private_key(curve(), backends.default_backend())
+
+
+def create_private_key(key_type):
+    if key_type == 'ecdsa':
+        return create_ecdsa_private_key()
+    return create_rsa_private_key()
+
+
+def describe_key(private_key):
+    if isinstance(private_key, ec.EllipticCurvePrivateKey):
+        return {'key_type': 'ecdsa', 'curve': private_key.curve.name,
+                'key_size': private_key.key_size}
+    return {'key_type': 'rsa', 'key_size': private_key.key_size}
+
+
 def create_self_signed_certificate(subject_name,
                                    private_key,
                                    days_valid=36500):
@@ -95,14 +137,87 @@ def create_certificate(subject_name,
     return certificate
 
 
-def main(common_name):
+def private_key_pem(private_key):
+    return private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption()
+    )
+
+
+def certificate_pem(certificate):
+    return certificate.public_bytes(serialization.Encoding.PEM)
+
+
+def write_identity(output_dir, prefix, certificate, private_key):
+    key_path = os.path.join(output_dir, prefix + '-key.pem')
+    cert_path = os.path.join(output_dir, prefix + '-cert.pem')
+    with open(key_path, 'wb') as f:
+        f.write(private_key_pem(private_key))
+    with open(cert_path, 'wb') as f:
+        f.write(certificate_pem(certificate))
+    return {'cert': cert_path, 'key': key_path}
+
+
+_signing = {}
+
+
+def _init_signer(ca_certificate_pem, ca_key_pem):
+    _signing['certificate'] = x509.load_pem_x509_certificate(
+        ca_certificate_pem, backends.default_backend())
+    _signing['key'] = serialization.load_pem_private_key(
+        ca_key_pem, None, backends.default_backend())
+
+
+def _create_client(args):
+    """Generate and write one client identity, in a pool process."""
+    output_dir, index, key_type = args
+    start = time.monotonic()
+    private_key = create_private_key(key_type)
+    common_name = u"Client {0:05d}".format(index)
+    certificate = create_certificate(
+        common_name,
+        private_key,
+        _signing['certificate'],
+        _signing['key'],
+        client_auth=True
+    )
+    entry = write_identity(output_dir, 'client-{0:05d}'.format(index),
+                           certificate, private_key)
+    entry.update(describe_key(private_key))
+    entry['common_name'] = common_name
+    entry['generation_seconds'] = time.monotonic() - start
+    return entry
+
+
+def create_clients(output_dir, count, key_type, root_certificate, root_key,
+                   processes=None):
+    """Generate ``count`` client identities signed by the root CA with a
+    pool of processes, return their manifest entries."""
+    clients_dir = os.path.join(output_dir, 'clients')
+    os.makedirs(clients_dir, exist_ok=True)
+    with futures.ProcessPoolExecutor(
+            max_workers=processes,
+            initializer=_init_signer,
+            initargs=(certificate_pem(root_certificate),
+                      private_key_pem(root_key))) as pool:
+        return list(pool.map(
+            _create_client,
+            [(clients_dir, index, key_type) for index in range(count)],
+            chunksize=max(1, count // (4 * (processes or os.cpu_count()))),
+        ))
+
+
+def main(common_name, output_dir='certs', clients=0, key_type='rsa',
+         server_key_type='rsa', processes=None):
+    os.makedirs(output_dir, exist_ok=True)
     root_key = create_rsa_private_key()
     root_certificate = create_self_signed_certificate(
         u"Root CA",
         root_key
     )
 
-    server_key = create_rsa_private_key()
+    server_key = create_private_key(server_key_type)
     server_certificate = create_certificate(
         common_name,
         server_key,
@@ -119,38 +234,37 @@ def main(common_name):
         client_auth=True
     )
 
-    with open("certs/kmip-ca.pem", "wb") as f:
-        f.write(
-            root_certificate.public_bytes(
-                serialization.Encoding.PEM
-            )
-        )
-    with open("certs/kmip-key.pem", "wb") as f:
-        f.write(server_key.private_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PrivateFormat.PKCS8,
-            encryption_algorithm=serialization.NoEncryption()
-        ))
-    with open("certs/kmip-cert.pem", "wb") as f:
-        f.write(
-            server_certificate.public_bytes(
-                serialization.Encoding.PEM
-            )
-        )
-    with open("certs/kmip-client-key.pem", "wb") as f:
-        f.write(john_doe_client_key.private_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PrivateFormat.PKCS8,
-            encryption_algorithm=serialization.NoEncryption()
-        ))
-    with open("certs/kmip-client-cert.pem", "wb") as f:
-        f.write(
-            john_doe_client_certificate.public_bytes(
-                serialization.Encoding.PEM
-            )
-        )
+    with open(os.path.join(output_dir, "kmip-ca.pem"), "wb") as f:
+        f.write(certificate_pem(root_certificate))
+    server = write_identity(output_dir, "kmip", server_certificate,
+                            server_key)
+    client = write_identity(output_dir, "kmip-client",
+                            john_doe_client_certificate,
+                            john_doe_client_key)
+    if not clients:
+        return
+
+    start = time.monotonic()
+    client_entries = create_clients(output_dir, clients, key_type,
+                                    root_certificate, root_key, processes)
+    server.update(describe_key(server_key), common_name=common_name)
+    client.update(describe_key(john_doe_client_key), common_name=u"John Doe")
+    # paths are relative to the manifest
+    for entry in [server, client] + client_entries:
+        for field in ('cert', 'key'):
+            entry[field] = os.path.relpath(entry[field], output_dir)
+    manifest = {
+        'ca': "kmip-ca.pem",
+        'server': server,
+        'client': client,
+        'clients': client_entries,
+        'generation_seconds': time.monotonic() - start,
+    }
+    with open(os.path.join(output_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
 
 
 if __name__ == '__main__':
     args = get_args()
-    main(args.common_name)
+    main(args.common_name, args.output_dir, args.clients, args.key_type,
+         args.server_key_type, args.processes)
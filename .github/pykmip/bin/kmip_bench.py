@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+"""Measure the encryption throughput of a PyKMIP server.
+
+Starts run_server.py locally, with certificates generated by
+create_certificates.py in a temporary directory, creates and activates an
+AES key, and runs Encrypt/Decrypt operations from a growing number of
+concurrent clients. Each client keeps one TLS connection open, as the
+pooled KMIP clients of cloudserver do; ``--reconnect`` opens a connection
+per operation instead, to measure the cost of the TLS handshakes.
+
+    pip install pykmip
+    python kmip_bench.py --concurrency 1,2,4,8,16 --duration 10
+
+``--server host:port --certs DIR`` benchmarks an already running server,
+e.g. the pykmip container of the CI, with the certificates of DIR.
+
+``--key-type rsa|ecdsa`` gives each client its own identity with a key of
+that type, generated in bulk by create_certificates.py and listed in its
+manifest.json; comparing both with ``--reconnect`` gives the handshake
+cost per key type.
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from kmip.core import enums
+from kmip.pie.client import ProxyKmipClient
+
+BIN_DIR = os.path.dirname(os.path.abspath(__file__))
+POLICY = os.path.join(BIN_DIR, os.pardir, 'policy.json')
+
+SERVER_CONF = """[server]
+hostname=127.0.0.1
+port={port}
+certificate_path={certs}/kmip-cert.pem
+key_path={certs}/kmip-key.pem
+ca_path={certs}/kmip-ca.pem
+auth_suite=TLS1.2
+policy_path={workdir}/policies
+enable_tls_client_auth=True
+database_path={workdir}/pykmip.db
+tls_cipher_suites=
+    TLS_RSA_WITH_AES_128_CBC_SHA256
+    TLS_RSA_WITH_AES_256_CBC_SHA256
+    TLS_ECDHE_ECDSA_WITH_AES_256_CBC_SHA384
+logging_level=INFO
+"""
+
+CRYPTOGRAPHIC_PARAMETERS = {
+    'cryptographic_algorithm': enums.CryptographicAlgorithm.AES,
+    'block_cipher_mode': enums.BlockCipherMode.CBC,
+    'padding_method': enums.PaddingMethod.PKCS5,
+}
+
+# size of a data key, the payload of the Encrypt operations of cloudserver
+DATA_KEY_SIZE = 32
+
+
+def free_port():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def wait_for_port(port, process, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('PyKMIP server exited with status {0}'.format(
+                process.returncode))
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('PyKMIP server did not start in {0}s'.format(timeout))
+
+
+def start_server(workdir, clients=0, key_type='rsa'):
+    """Generate certificates and start run_server.py, return
+    (process, port, certificates directory)."""
+    certs = os.path.join(workdir, 'certs')
+    # the default ciphers of the python ssl module all use ECDHE: of the
+    # suites of server.conf, only TLS_ECDHE_ECDSA_WITH_AES_256_CBC_SHA384
+    # is shared, which needs an ECDSA server key
+    subprocess.check_call(
+        [sys.executable, os.path.join(BIN_DIR, 'create_certificates.py'),
+         '--output-dir', certs, '--clients', str(clients),
+         '--key-type', key_type, '--server-key-type', 'ecdsa'])
+    os.makedirs(os.path.join(workdir, 'policies'))
+    shutil.copy(POLICY, os.path.join(workdir, 'policies'))
+    port = free_port()
+    conf = os.path.join(workdir, 'server.conf')
+    with open(conf, 'w') as f:
+        f.write(SERVER_CONF.format(port=port, certs=certs, workdir=workdir))
+    with open(os.path.join(workdir, 'server.log'), 'w') as log:
+        process = subprocess.Popen(
+            [sys.executable, os.path.join(BIN_DIR, 'run_server.py'),
+             '-f', conf, '-l', os.path.join(workdir, 'pykmip.log')],
+            stdout=log, stderr=subprocess.STDOUT)
+    try:
+        wait_for_port(port, process)
+    except RuntimeError:
+        process.kill()
+        raise
+    return process, port, certs
+
+
+def load_identities(certs):
+    """Client identities of the manifest of create_certificates.py, or the
+    default client identity when there is no manifest."""
+    default = {'cert': 'kmip-client-cert.pem', 'key': 'kmip-client-key.pem',
+               'key_type': 'rsa'}
+    try:
+        with open(os.path.join(certs, 'manifest.json')) as f:
+            manifest = json.load(f)
+    except IOError:
+        return [default]
+    return manifest['clients'] or [manifest.get('client', default)]
+
+
+def new_client(host, port, certs, identity=None):
+    identity = identity or {'cert': 'kmip-client-cert.pem',
+                            'key': 'kmip-client-key.pem'}
+    return ProxyKmipClient(
+        hostname=host, port=port,
+        cert=os.path.join(certs, identity['cert']),
+        key=os.path.join(certs, identity['key']),
+        ca=os.path.join(certs, 'kmip-ca.pem'),
+        config_file=os.devnull)
+
+
+def close_quietly(client):
+    try:
+        client.close()
+    except Exception:  # pylint: disable=broad-except
+        pass
+
+
+def create_key(host, port, certs, identity=None):
+    with new_client(host, port, certs, identity) as client:
+        uid = client.create(enums.CryptographicAlgorithm.AES, 256)
+        client.activate(uid)
+    return uid
+
+
+def encrypt_decrypt(client, uid, data):
+    encrypted, iv = client.encrypt(
+        data, uid=uid, cryptographic_parameters=CRYPTOGRAPHIC_PARAMETERS)
+    return client.decrypt(
+        encrypted, uid=uid, cryptographic_parameters=CRYPTOGRAPHIC_PARAMETERS,
+        iv_counter_nonce=iv)
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1,
+                             int(q * len(sorted_values)))]
+
+
+def run_level(args, uids, concurrency):
+    """Run encrypt/decrypt pairs from ``concurrency`` clients for
+    ``args.duration`` seconds."""
+    stop = threading.Event()
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    data = os.urandom(DATA_KEY_SIZE)
+
+    def worker(index):
+        identity = args.identities[index % len(args.identities)]
+        uid = uids[index % len(uids)]
+        client = None
+        try:
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    if client is None:
+                        client = new_client(args.host, args.port, args.certs,
+                                            identity)
+                        client.open()
+                    encrypt_decrypt(client, uid, data)
+                    latencies[index].append(time.perf_counter() - start)
+                except Exception:  # pylint: disable=broad-except
+                    errors[index] += 1
+                    if client is not None:
+                        close_quietly(client)
+                    client = None
+                if args.reconnect and client is not None:
+                    close_quietly(client)
+                    client = None
+        finally:
+            if client is not None:
+                close_quietly(client)
+
+    threads = [threading.Thread(target=worker, args=(i,))
+               for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    samples = sorted(s for worker_samples in latencies
+                     for s in worker_samples)
+    return {
+        'concurrency': concurrency,
+        # each sample is one Encrypt and one Decrypt
+        'operations': 2 * len(samples),
+        'errors': sum(errors),
+        'ops_per_s': 2 * len(samples) / elapsed,
+        'latency_s': {
+            'p50': percentile(samples, 0.5),
+            'p99': percentile(samples, 0.99),
+        },
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--concurrency', default='1,2,4,8,16',
+                        help='comma-separated numbers of concurrent '
+                             'clients (default: 1,2,4,8,16)')
+    parser.add_argument('--duration', type=float, default=10.0,
+                        help='seconds per concurrency level (default: 10)')
+    parser.add_argument('--reconnect', action='store_true',
+                        help='open a new connection for each operation')
+    parser.add_argument('--server', metavar='HOST:PORT',
+                        help='use a running server instead of starting one')
+    parser.add_argument('--certs',
+                        help='certificates directory of --server')
+    parser.add_argument('--key-type', choices=['rsa', 'ecdsa'],
+                        help='give each client its own identity with a key '
+                             'of this type (default: one shared RSA '
+                             'identity)')
+    parser.add_argument('--output', help='write JSON results to this file')
+    args = parser.parse_args(argv)
+    try:
+        args.concurrency = [int(c) for c in args.concurrency.split(',')]
+    except ValueError:
+        parser.error('--concurrency must be a comma-separated list of '
+                     'integers')
+    if args.server and not args.certs:
+        parser.error('--server needs --certs')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix='kmip-bench-')
+    process = None
+    try:
+        if args.server:
+            args.host, _, port = args.server.rpartition(':')
+            args.port = int(port)
+        else:
+            clients = max(args.concurrency) if args.key_type else 0
+            process, args.port, args.certs = start_server(
+                workdir, clients, args.key_type or 'rsa')
+            args.host = 'localhost'
+        args.identities = load_identities(args.certs)
+        # PyKMIP only lets the client that created a key use it
+        uids = [create_key(args.host, args.port, args.certs, identity)
+                for identity in args.identities]
+        levels = []
+        for concurrency in args.concurrency:
+            level = run_level(args, uids, concurrency)
+            print('{0:>4} clients: {1:>9.1f} ops/s, p50 {2}, p99 {3}, '
+                  '{4} errors'.format(
+                      concurrency, level['ops_per_s'],
+                      _ms(level['latency_s']['p50']),
+                      _ms(level['latency_s']['p99']), level['errors']),
+                  file=sys.stderr)
+            levels.append(level)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+    data = {'reconnect': args.reconnect, 'duration': args.duration,
+            'key_types': sorted(set(identity.get('key_type', 'rsa')
+                                    for identity in args.identities)),
+            'levels': levels}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+    else:
+        json.dump(data, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+    return 0
+
+
+def _ms(value):
+    return '-' if value is None else '{0:.1f}ms'.format(value * 1000)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -38,6 +38,9 @@ const constants = {
     // by the name of the final destination bucket for the object
     // once the multipart upload is complete.
     mpuBucketPrefix: 'mpuShadowBucket',
+    // Prefix of the shadow bucket holding the secondary indexes of the
+    // metadata search of a bucket, see lib/metadata/searchIndex.js
+    mdSearchIndexBucketPrefix: 'mdSearchIndex',
     blacklistedPrefixes: { bucket: [], object: [] },
     // GCP Object Tagging Prefix
     gcpTaggingPrefix: 'aws-tag-',
@@ -246,6 +249,12 @@ const constants = {
     // if requester is not bucket owner, bucket policy actions should be denied with
     // MethodNotAllowed error
     onlyOwnerAllowed: ['bucketDeletePolicy', 'bucketGetPolicy', 'bucketPutPolicy'],
+    // default buckets of s3_cloudserver_http_request_duration_seconds, for
+    // response times from 0.1ms to 500ms
+    httpRequestDurationBuckets: [0.0001, 0.005, 0.015, 0.05, 0.1, 0.2, 0.3, 0.4, 0.5],
+    // upper bound on the number of buckets of a configured histogram layout,
+    // as every bucket adds one series per label combination
+    maxHistogramBuckets: 64,
 };
 
 module.exports = constants;
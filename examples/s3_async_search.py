@@ -0,0 +1,292 @@
+"""Asyncio metadata search across many buckets.
+
+Runs the ``search=`` extension of GET Bucket (see docs/MD_SEARCH.rst)
+against many buckets at once. Pages of one bucket are necessarily
+requested in sequence, since each one starts from the marker returned by
+the previous one, but up to ``--concurrency`` buckets are listed in
+parallel over a shared keep-alive connection pool.
+
+Entries are yielded as soon as they are parsed from the response body and
+go through a bounded queue, so memory use does not depend on the size of
+the listings. Per-bucket latency and throughput are reported at the end.
+
+    pip install aiohttp
+    python3 s3_async_search.py --query 'x-amz-meta-color=blue' \\
+        --all-buckets --concurrency 64 > matches.jsonl
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import sys
+import time
+import xml.etree.ElementTree as ET
+from urllib.parse import urlsplit
+
+# pip install aiohttp
+import aiohttp
+from yarl import URL
+
+from s3_client import (
+    EMPTY_PAYLOAD_HASH,
+    S3_NS,
+    ListingPage,
+    S3Error,
+    SigV4Signer,
+    advance_listing,
+    canonical_query_string,
+    listing_params,
+    uri_encode,
+)
+
+# Sentinel put on the queue by each bucket task when it is done
+_DONE = object()
+
+
+class BucketStats(object):
+    """Latency and throughput of the listing of one bucket."""
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.pages = 0
+        self.entries = 0
+        self.bytes = 0
+        self.page_latencies = []
+        self.start = None
+        self.end = None
+        self.error = None
+
+    @property
+    def elapsed(self):
+        if self.start is None or self.end is None:
+            return 0.0
+        return self.end - self.start
+
+    def to_dict(self):
+        latencies = sorted(self.page_latencies)
+        elapsed = self.elapsed
+        return {
+            'bucket': self.bucket,
+            'pages': self.pages,
+            'entries': self.entries,
+            'bytes': self.bytes,
+            'elapsed_s': round(elapsed, 6),
+            'first_page_s': (round(self.page_latencies[0], 6)
+                             if latencies else None),
+            'max_page_s': round(latencies[-1], 6) if latencies else None,
+            'entries_per_s': (round(self.entries / elapsed, 1)
+                              if elapsed else None),
+            'error': str(self.error) if self.error else None,
+        }
+
+
+class AsyncS3Client(object):
+    """Asyncio S3 client sharing one aiohttp connection pool.
+
+    :param max_connections: size of the keep-alive connection pool
+    """
+
+    def __init__(self, endpoint, access_key, secret_key, region='us-east-1',
+                 max_connections=64, timeout=300):
+        parts = urlsplit(endpoint)
+        self.endpoint = '{0}://{1}'.format(parts.scheme, parts.netloc)
+        self.host = parts.netloc
+        self.signer = SigV4Signer(access_key, secret_key, region=region)
+        self._max_connections = max_connections
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self._max_connections)
+        self._session = aiohttp.ClientSession(
+            connector=connector, timeout=self._timeout,
+            auto_decompress=True, skip_auto_headers=('Content-Type',))
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._session.close()
+
+    def _signed_request(self, method, path, params=None, data=None):
+        query = canonical_query_string(params or {})
+        payload_hash = (hashlib.sha256(data).hexdigest() if data
+                        else EMPTY_PAYLOAD_HASH)
+        headers = self.signer.sign(method, self.host, path, query,
+                                   payload_hash=payload_hash)
+        url = self.endpoint + uri_encode(path, safe='/-_.~')
+        if query:
+            url += '?' + query
+        # the query string is already canonical: keep yarl from
+        # re-encoding it, which would break the signature
+        return self._session.request(
+            method, URL(url, encoded=True),
+            headers=headers, data=data)
+
+    @staticmethod
+    async def _raise_for_status(resp):
+        if resp.status < 300:
+            return
+        body = await resp.read()
+        code, message = None, resp.reason
+        try:
+            root = ET.fromstring(body)
+            code = root.findtext('Code')
+            message = root.findtext('Message') or message
+        except ET.ParseError:
+            pass
+        raise S3Error(resp.status, code, message)
+
+    async def list_buckets(self):
+        async with self._signed_request('GET', '/') as resp:
+            await self._raise_for_status(resp)
+            root = ET.fromstring(await resp.read())
+        return [elem.text for elem in root.iter(S3_NS + 'Name')]
+
+    async def list_objects(self, bucket, prefix=None, search=None,
+                           max_keys=None, marker=None, v2=False,
+                           stats=None, chunk_size=64 * 1024):
+        """Asynchronously iterate over the entries of a bucket listing.
+
+        Pages are followed through NextMarker / NextContinuationToken, and
+        entries are yielded while each page body is still being received.
+        """
+        params = listing_params(prefix, search, max_keys, marker, v2)
+        while True:
+            page = ListingPage()
+            page_start = time.monotonic()
+            async with self._signed_request(
+                    'GET', '/' + bucket, params=params) as resp:
+                await self._raise_for_status(resp)
+                async for chunk in resp.content.iter_chunked(chunk_size):
+                    if stats is not None:
+                        stats.bytes += len(chunk)
+                    for entry in page.feed(chunk):
+                        yield entry
+                for entry in page.close():
+                    yield entry
+            if stats is not None:
+                stats.pages += 1
+                stats.entries += page.count
+                stats.page_latencies.append(time.monotonic() - page_start)
+            if not advance_listing(params, page):
+                return
+
+    async def search(self, bucket, query, **kwargs):
+        async for entry in self.list_objects(bucket, search=query, **kwargs):
+            yield entry
+
+    async def search_buckets(self, buckets, query, concurrency=16,
+                             queue_size=10000, stats=None, **kwargs):
+        """Search many buckets at once, yielding ``(bucket, entry)`` pairs.
+
+        At most ``concurrency`` buckets are listed at any time. Entries go
+        through a queue of ``queue_size`` items: when the consumer falls
+        behind, producers stop reading from their sockets instead of
+        buffering the listings in memory.
+
+        :param stats: optional dict filled with one ``BucketStats`` per
+            bucket; errors are recorded there instead of being raised
+        """
+        if stats is None:
+            stats = {}
+        queue = asyncio.Queue(maxsize=queue_size)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run_one(bucket):
+            bucket_stats = stats[bucket] = BucketStats(bucket)
+            try:
+                async with semaphore:
+                    bucket_stats.start = time.monotonic()
+                    async for entry in self.search(
+                            bucket, query, stats=bucket_stats, **kwargs):
+                        await queue.put((bucket, entry))
+            except (aiohttp.ClientError, asyncio.TimeoutError,
+                    S3Error, ET.ParseError) as err:
+                bucket_stats.error = err
+            finally:
+                bucket_stats.end = time.monotonic()
+                await queue.put(_DONE)
+
+        tasks = [asyncio.ensure_future(run_one(bucket)) for bucket in buckets]
+        pending = len(tasks)
+        try:
+            while pending:
+                item = await queue.get()
+                if item is _DONE:
+                    pending -= 1
+                    continue
+                yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _print_report(stats, elapsed, out):
+    rows = [s.to_dict() for s in stats.values()]
+    entries = sum(r['entries'] for r in rows)
+    latencies = sorted(r['elapsed_s'] for r in rows if not r['error'])
+    errors = [r for r in rows if r['error']]
+    for row in sorted(rows, key=lambda r: -r['elapsed_s']):
+        print(json.dumps(row), file=out)
+    print('buckets: {0} ({1} errors), entries: {2}, elapsed: {3:.3f}s, '
+          'throughput: {4:.1f} entries/s'.format(
+              len(rows), len(errors), entries, elapsed,
+              entries / elapsed if elapsed else 0.0), file=out)
+    if latencies:
+        print('per-bucket latency: p50 {0:.3f}s, p99 {1:.3f}s, '
+              'max {2:.3f}s'.format(
+                  latencies[int(0.50 * (len(latencies) - 1))],
+                  latencies[int(0.99 * (len(latencies) - 1))],
+                  latencies[-1]), file=out)
+
+
+async def _main(args):
+    stats = {}
+    async with AsyncS3Client(args.endpoint, args.access_key,
+                             args.secret_key, region=args.region,
+                             max_connections=args.concurrency) as client:
+        buckets = list(args.bucket)
+        if args.bucket_file:
+            with open(args.bucket_file) as f:
+                buckets.extend(line.strip() for line in f if line.strip())
+        if args.all_buckets:
+            buckets.extend(await client.list_buckets())
+        start = time.monotonic()
+        async for bucket, entry in client.search_buckets(
+                buckets, args.query, concurrency=args.concurrency,
+                stats=stats, max_keys=args.max_keys):
+            if not args.quiet:
+                entry['Bucket'] = bucket
+                print(json.dumps(entry))
+        elapsed = time.monotonic() - start
+    _print_report(stats, elapsed, sys.stderr)
+    return 1 if any(s.error for s in stats.values()) else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Run a metadata search against many buckets')
+    parser.add_argument('--endpoint', default='http://localhost:8000')
+    parser.add_argument('--access-key', default='accessKey1')
+    parser.add_argument('--secret-key', default='verySecretKey1')
+    parser.add_argument('--region', default='us-east-1')
+    parser.add_argument('--query', required=True,
+                        help='search query, e.g. x-amz-meta-color=blue')
+    parser.add_argument('--bucket', action='append', default=[],
+                        help='bucket to search, can be repeated')
+    parser.add_argument('--bucket-file',
+                        help='file with one bucket name per line')
+    parser.add_argument('--all-buckets', action='store_true',
+                        help='search every bucket of the account')
+    parser.add_argument('--concurrency', type=int, default=16,
+                        help='buckets listed in parallel')
+    parser.add_argument('--max-keys', type=int,
+                        help='page size requested from the server')
+    parser.add_argument('--quiet', action='store_true',
+                        help='only print the report, not the entries')
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args)))
+
+
+if __name__ == '__main__':
+    main()
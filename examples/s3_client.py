@@ -0,0 +1,371 @@
+"""Minimal AWS Signature V4 client for CloudServer listings and metadata search.
+
+This grew out of python-md-search.py. Compared to the original script it:
+
+* caches derived signing keys per (date, region, service), so the four
+  chained HMACs of the key derivation run once per day instead of once per
+  request;
+* reuses keep-alive connections through a pooled ``requests.Session``;
+* parses GET Bucket and ``search=`` responses incrementally, yielding
+  ``Contents`` entries while the body is still being received, and follows
+  truncated listings page by page.
+
+Example::
+
+    from s3_client import S3Client
+
+    client = S3Client('http://localhost:8000', 'accessKey1', 'verySecretKey1')
+    for entry in client.search('bucketname', 'x-amz-meta-color=blue'):
+        print(entry['Key'])
+"""
+import datetime
+import hashlib
+import hmac
+import threading
+import xml.etree.ElementTree as ET
+from urllib.parse import quote, urlsplit
+
+try:
+    # pip install requests
+    import requests
+    from requests.adapters import HTTPAdapter
+except ImportError:  # only the signer and parser are usable without it
+    requests = None
+
+ALGORITHM = 'AWS4-HMAC-SHA256'
+EMPTY_PAYLOAD_HASH = hashlib.sha256(b'').hexdigest()
+S3_NS = '{http://s3.amazonaws.com/doc/2006-03-01/}'
+
+# Derived keys only depend on the day, so a handful of entries is enough to
+# cover day boundaries and a few regions/services.
+SIGNING_KEY_CACHE_SIZE = 16
+
+
+def _hmac(key, msg):
+    return hmac.new(key, msg.encode('utf-8'), hashlib.sha256).digest()
+
+
+def derive_signing_key(secret_key, date_stamp, region, service):
+    """Derive the SigV4 signing key from scratch.
+
+    See http://docs.aws.amazon.com/general/latest/gr/signature-v4-examples.html
+    """
+    k_date = _hmac(('AWS4' + secret_key).encode('utf-8'), date_stamp)
+    k_region = _hmac(k_date, region)
+    k_service = _hmac(k_region, service)
+    return _hmac(k_service, 'aws4_request')
+
+
+def uri_encode(value, safe='-_.~'):
+    """Percent-encode following the SigV4 canonical rules."""
+    return quote(value, safe=safe)
+
+
+def canonical_query_string(params):
+    """Build the sorted, encoded query string used both for signing and on
+    the wire, so that both are always byte-identical."""
+    pairs = []
+    for name, value in params.items():
+        if value is None:
+            continue
+        pairs.append((uri_encode(str(name)), uri_encode(str(value))))
+    pairs.sort()
+    return '&'.join('{0}={1}'.format(k, v) for k, v in pairs)
+
+
+class SigV4Signer(object):
+    """Sign requests with AWS Signature Version 4.
+
+    Signing keys are cached per (date, region, service); the cache is
+    thread-safe and bounded to ``SIGNING_KEY_CACHE_SIZE`` entries.
+    """
+
+    def __init__(self, access_key, secret_key, region='us-east-1',
+                 service='s3', cache_signing_keys=True):
+        self.access_key = access_key
+        self._secret_key = secret_key
+        self.region = region
+        self.service = service
+        self.cache_signing_keys = cache_signing_keys
+        self._keys = {}
+        self._lock = threading.Lock()
+        self.key_cache_hits = 0
+        self.key_cache_misses = 0
+
+    def signing_key(self, date_stamp, region=None, service=None):
+        region = region or self.region
+        service = service or self.service
+        if not self.cache_signing_keys:
+            return derive_signing_key(self._secret_key, date_stamp,
+                                      region, service)
+        cache_key = (date_stamp, region, service)
+        key = self._keys.get(cache_key)
+        if key is not None:
+            self.key_cache_hits += 1
+            return key
+        key = derive_signing_key(self._secret_key, date_stamp,
+                                 region, service)
+        with self._lock:
+            self.key_cache_misses += 1
+            if len(self._keys) >= SIGNING_KEY_CACHE_SIZE:
+                # evict the oldest date first
+                del self._keys[min(self._keys)]
+            self._keys[cache_key] = key
+        return key
+
+    def sign(self, method, host, path, query='', headers=None,
+             payload_hash=EMPTY_PAYLOAD_HASH, now=None):
+        """Return a copy of ``headers`` with the SigV4 headers added.
+
+        :param method: HTTP method
+        :param host: value of the Host header (``host[:port]``)
+        :param path: request path, not yet URI-encoded
+        :param query: canonical query string, see ``canonical_query_string``
+        :param headers: extra headers to sign
+        :param payload_hash: hex SHA256 of the body, or ``UNSIGNED-PAYLOAD``
+        :param now: ``datetime`` to sign with, defaults to current UTC time
+        """
+        now = now or datetime.datetime.utcnow()
+        amz_date = now.strftime('%Y%m%dT%H%M%SZ')
+        date_stamp = amz_date[:8]
+
+        signed = {
+            'host': host,
+            'x-amz-content-sha256': payload_hash,
+            'x-amz-date': amz_date,
+        }
+        for name, value in (headers or {}).items():
+            signed[name.lower()] = str(value).strip()
+        names = sorted(signed)
+        canonical_headers = ''.join(
+            '{0}:{1}\n'.format(name, signed[name]) for name in names)
+        signed_headers = ';'.join(names)
+
+        canonical_request = '\n'.join([
+            method, uri_encode(path, safe='/-_.~'), query,
+            canonical_headers, signed_headers, payload_hash])
+        credential_scope = '{0}/{1}/{2}/aws4_request'.format(
+            date_stamp, self.region, self.service)
+        string_to_sign = '\n'.join([
+            ALGORITHM, amz_date, credential_scope,
+            hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()])
+        signature = hmac.new(self.signing_key(date_stamp),
+                             string_to_sign.encode('utf-8'),
+                             hashlib.sha256).hexdigest()
+
+        result = dict(headers or {})
+        result['X-Amz-Content-Sha256'] = payload_hash
+        result['X-Amz-Date'] = amz_date
+        result['Authorization'] = (
+            '{0} Credential={1}/{2}, SignedHeaders={3}, Signature={4}'.format(
+                ALGORITHM, self.access_key, credential_scope, signed_headers,
+                signature))
+        return result
+
+
+class S3Error(Exception):
+    def __init__(self, status, code, message):
+        super(S3Error, self).__init__(
+            '{0} {1}: {2}'.format(status, code, message))
+        self.status = status
+        self.code = code
+        self.message = message
+
+
+def _error_from_response(resp):
+    code, message = None, resp.reason
+    try:
+        root = ET.fromstring(resp.content)
+        code = root.findtext('Code')
+        message = root.findtext('Message') or message
+    except ET.ParseError:
+        pass
+    return S3Error(resp.status_code, code, message)
+
+
+def _entry_from_element(elem):
+    entry = {}
+    for child in elem:
+        tag = child.tag.replace(S3_NS, '')
+        if len(child):
+            entry[tag] = {c.tag.replace(S3_NS, ''): c.text for c in child}
+        else:
+            entry[tag] = child.text
+    if 'Size' in entry:
+        entry['Size'] = int(entry['Size'])
+    return entry
+
+
+class ListingPage(object):
+    """Incremental parser for one ListBucketResult body.
+
+    Body chunks are passed to ``feed`` as they are received; it returns the
+    entries whose closing tag has been seen so far. Parsed elements are
+    dropped right away, so memory stays bounded by one entry rather than
+    the whole page. Pagination fields are recorded on the instance.
+    """
+
+    def __init__(self, entry_tags=('Contents',)):
+        self.is_truncated = False
+        self.next_marker = None
+        self.next_continuation_token = None
+        self.last_key = None
+        self.count = 0
+        self._wanted = set(S3_NS + tag for tag in entry_tags)
+        self._parser = ET.XMLPullParser(events=('start', 'end'))
+        self._root = None
+        self._depth = 0
+
+    def feed(self, chunk):
+        self._parser.feed(chunk)
+        return self._read_events()
+
+    def close(self):
+        self._parser.close()
+        return self._read_events()
+
+    def _read_events(self):
+        entries = []
+        for event, elem in self._parser.read_events():
+            if event == 'start':
+                if self._root is None:
+                    self._root = elem
+                self._depth += 1
+                continue
+            self._depth -= 1
+            if self._depth != 1:
+                continue
+            if elem.tag in self._wanted:
+                entry = _entry_from_element(elem)
+                self.count += 1
+                self.last_key = entry.get('Key', self.last_key)
+                entries.append(entry)
+            else:
+                tag = elem.tag.replace(S3_NS, '')
+                if tag == 'IsTruncated':
+                    self.is_truncated = elem.text == 'true'
+                elif tag == 'NextMarker':
+                    self.next_marker = elem.text
+                elif tag == 'NextContinuationToken':
+                    self.next_continuation_token = elem.text
+            self._root.clear()
+        return entries
+
+
+def listing_params(prefix=None, search=None, max_keys=None, marker=None,
+                   v2=False):
+    """Query parameters of the first page of a GET Bucket listing."""
+    params = {'prefix': prefix, 'search': search, 'max-keys': max_keys}
+    if v2:
+        params['list-type'] = 2
+        params['start-after'] = marker
+    else:
+        params['marker'] = marker
+    return params
+
+
+def advance_listing(params, page):
+    """Update ``params`` to request the page following ``page``.
+
+    Returns False when the listing is complete. V1 listings follow
+    NextMarker, or the last key returned when no delimiter is used; V2
+    listings follow NextContinuationToken.
+    """
+    if not page.is_truncated:
+        return False
+    if 'list-type' in params:
+        params['start-after'] = None
+        params['continuation-token'] = page.next_continuation_token
+    else:
+        params['marker'] = page.next_marker or page.last_key
+    return True
+
+
+class S3Client(object):
+    """Small S3 client built on a pooled, keep-alive ``requests.Session``.
+
+    :param endpoint: e.g. ``http://localhost:8000``
+    :param pool_maxsize: connections kept alive per host; size it to the
+        number of threads sharing the client
+    """
+
+    def __init__(self, endpoint, access_key, secret_key, region='us-east-1',
+                 pool_maxsize=10, timeout=60, session=None):
+        if requests is None:
+            raise ImportError('S3Client requires the requests package')
+        parts = urlsplit(endpoint)
+        self.endpoint = '{0}://{1}'.format(parts.scheme, parts.netloc)
+        self.host = parts.netloc
+        self.timeout = timeout
+        self.signer = SigV4Signer(access_key, secret_key, region=region)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1,
+                                  pool_maxsize=pool_maxsize)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def request(self, method, path, params=None, headers=None, data=None,
+                stream=False):
+        """Send a signed request and return the ``requests.Response``.
+
+        Non-2xx responses raise ``S3Error``.
+        """
+        query = canonical_query_string(params or {})
+        payload_hash = (hashlib.sha256(data).hexdigest() if data
+                        else EMPTY_PAYLOAD_HASH)
+        signed = self.signer.sign(method, self.host, path, query,
+                                  headers=headers, payload_hash=payload_hash)
+        url = self.endpoint + uri_encode(path, safe='/-_.~')
+        if query:
+            url += '?' + query
+        resp = self.session.request(method, url, headers=signed, data=data,
+                                    stream=stream, timeout=self.timeout)
+        if resp.status_code >= 300:
+            try:
+                raise _error_from_response(resp)
+            finally:
+                resp.close()
+        return resp
+
+    def _list_page(self, bucket, params, page, chunk_size=64 * 1024):
+        resp = self.request('GET', '/' + bucket, params=params, stream=True)
+        try:
+            for chunk in resp.iter_content(chunk_size):
+                for entry in page.feed(chunk):
+                    yield entry
+            for entry in page.close():
+                yield entry
+        finally:
+            resp.close()
+
+    def list_objects(self, bucket, prefix=None, search=None, max_keys=None,
+                     marker=None, v2=False):
+        """Iterate over all objects of a bucket (GET Bucket).
+
+        Pages are requested one after the other, following NextMarker (or
+        the last key returned) for V1 and NextContinuationToken for V2.
+        Entries are yielded as they are parsed.
+        """
+        params = listing_params(prefix, search, max_keys, marker, v2)
+        while True:
+            page = ListingPage()
+            for entry in self._list_page(bucket, params, page):
+                yield entry
+            if not advance_listing(params, page):
+                return
+
+    def search(self, bucket, query, **kwargs):
+        """Run a metadata search (see docs/MD_SEARCH.rst) and iterate over
+        every matching entry."""
+        return self.list_objects(bucket, search=query, **kwargs)
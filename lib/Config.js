@@ -595,6 +595,249 @@ function bucketNotifAssert(bucketNotifConfig) {
     return bucketNotifConfig;
 }
 
+/**
+ * Parse a histogram bucket layout, either an explicit list of upper bounds
+ * or a generated exponential or linear layout:
+ * - [0.005, 0.01, 0.1, 1]
+ * - { type: 'exponential', start: 0.001, factor: 2, count: 16 }
+ * - { type: 'linear', start: 0.1, width: 0.1, count: 10 }
+ * @param {number[]|object} buckets - bucket layout from the configuration
+ * @param {string} fieldName - name of the field, for error messages
+ * @return {number[]} sorted bucket upper bounds
+ */
+function parseHistogramBuckets(buckets, fieldName) {
+    let bounds;
+    if (Array.isArray(buckets)) {
+        bounds = buckets;
+    } else {
+        assert(typeof buckets === 'object' && buckets !== null,
+            `bad config: ${fieldName} must be an array or an object`);
+        const { type, start, factor, width, count } = buckets;
+        assert(Number.isInteger(count) && count > 0,
+            `bad config: ${fieldName}.count must be a positive integer`);
+        assert(typeof start === 'number' && start > 0,
+            `bad config: ${fieldName}.start must be a positive number`);
+        if (type === 'exponential') {
+            assert(typeof factor === 'number' && factor > 1,
+                `bad config: ${fieldName}.factor must be a number greater than 1`);
+            bounds = [...Array(count).keys()].map(i =>
+                Number((start * (factor ** i)).toPrecision(6)));
+        } else if (type === 'linear') {
+            assert(typeof width === 'number' && width > 0,
+                `bad config: ${fieldName}.width must be a positive number`);
+            bounds = [...Array(count).keys()].map(i =>
+                Number((start + width * i).toPrecision(6)));
+        } else {
+            assert(false, `bad config: ${fieldName}.type must be "exponential" or "linear"`);
+        }
+    }
+    assert(bounds.length > 0 && bounds.length <= constants.maxHistogramBuckets,
+        `bad config: ${fieldName} must have between 1 and ` +
+        `${constants.maxHistogramBuckets} buckets`);
+    assert(bounds.every(b => typeof b === 'number' && Number.isFinite(b) && b > 0),
+        `bad config: ${fieldName} buckets must be positive numbers`);
+    assert(bounds.every((b, i) => i === 0 || b > bounds[i - 1]),
+        `bad config: ${fieldName} buckets must be in increasing order`);
+    return bounds;
+}
+
+function parseMonitoringConfig(monitoringConfig) {
+    const monitoring = {
+        httpRequestDurationBuckets: constants.httpRequestDurationBuckets,
+        cacheRenderedMetrics: true,
+        bucketMetricsTopK: 20,
+        accountMetricsTopK: 20,
+        requestPhaseMetrics: true,
+    };
+    if (monitoringConfig === undefined) {
+        return monitoring;
+    }
+    assert(typeof monitoringConfig === 'object' && monitoringConfig !== null,
+        'bad config: monitoring must be an object');
+    if (monitoringConfig.httpRequestDurationBuckets !== undefined) {
+        monitoring.httpRequestDurationBuckets = parseHistogramBuckets(
+            monitoringConfig.httpRequestDurationBuckets,
+            'monitoring.httpRequestDurationBuckets');
+    }
+    if (monitoringConfig.cacheRenderedMetrics !== undefined) {
+        assert(typeof monitoringConfig.cacheRenderedMetrics === 'boolean',
+            'bad config: monitoring.cacheRenderedMetrics must be a boolean');
+        monitoring.cacheRenderedMetrics = monitoringConfig.cacheRenderedMetrics;
+    }
+    if (monitoringConfig.requestPhaseMetrics !== undefined) {
+        assert(typeof monitoringConfig.requestPhaseMetrics === 'boolean',
+            'bad config: monitoring.requestPhaseMetrics must be a boolean');
+        monitoring.requestPhaseMetrics = monitoringConfig.requestPhaseMetrics;
+    }
+    ['bucketMetricsTopK', 'accountMetricsTopK'].forEach(field => {
+        if (monitoringConfig[field] !== undefined) {
+            assert(Number.isInteger(monitoringConfig[field]) &&
+                monitoringConfig[field] >= 0,
+                `bad config: monitoring.${field} must be a positive integer or 0`);
+            monitoring[field] = monitoringConfig[field];
+        }
+    });
+    return monitoring;
+}
+
+function parseMetadataSearchIndexes(indexesConfig) {
+    if (indexesConfig === undefined) {
+        return {};
+    }
+    assert(typeof indexesConfig === 'object' && indexesConfig !== null &&
+        !Array.isArray(indexesConfig),
+        'bad config: metadataSearchIndexes must be an object');
+    const indexes = {};
+    Object.keys(indexesConfig).forEach(bucketName => {
+        const fields = indexesConfig[bucketName];
+        assert(Array.isArray(fields),
+            `bad config: metadataSearchIndexes.${bucketName} must be an ` +
+            'array of field names');
+        fields.forEach(field => {
+            assert(typeof field === 'string' &&
+                (/^x-amz-meta-.+/.test(field) || /^tags\..+/.test(field)),
+                `bad config: metadataSearchIndexes.${bucketName} fields must ` +
+                'be user metadata (x-amz-meta-*) or tags (tags.*)');
+        });
+        indexes[bucketName] = Array.from(new Set(fields));
+    });
+    return indexes;
+}
+
+function parseUtapiBatchingConfig(batchingConfig) {
+    const batching = {
+        enabled: false,
+        maxEvents: 1000,
+        flushInterval: 1000,
+        spillDir: null,
+    };
+    if (batchingConfig === undefined) {
+        return batching;
+    }
+    assert(typeof batchingConfig === 'object' && batchingConfig !== null,
+        'bad config: utapi.batching must be an object');
+    if (batchingConfig.enabled !== undefined) {
+        assert(typeof batchingConfig.enabled === 'boolean',
+            'bad config: utapi.batching.enabled must be a boolean');
+        batching.enabled = batchingConfig.enabled;
+    }
+    ['maxEvents', 'flushInterval'].forEach(field => {
+        if (batchingConfig[field] !== undefined) {
+            assert(Number.isInteger(batchingConfig[field]) &&
+                batchingConfig[field] > 0,
+                `bad config: utapi.batching.${field} must be a positive integer`);
+            batching[field] = batchingConfig[field];
+        }
+    });
+    if (batchingConfig.spillDir !== undefined) {
+        assert(typeof batchingConfig.spillDir === 'string',
+            'bad config: utapi.batching.spillDir must be a string');
+        batching.spillDir = batchingConfig.spillDir;
+    }
+    // the events that cannot be sent are kept on a persistent disk, not
+    // under a temporary directory cleared at reboot
+    assert(!batching.enabled || batching.spillDir !== null,
+        'bad config: utapi.batching.spillDir is required when batching ' +
+        'is enabled');
+    return batching;
+}
+
+function parseKmsCacheConfig(kmsCacheConfig) {
+    const kmsCache = {
+        // plaintext data keys stay in memory while cached: opt-in
+        enabled: false,
+        maxDataKeys: 10000,
+        dataKeyTTL: 300,
+        maxMasterKeys: 1000,
+        masterKeyTTL: 600,
+    };
+    if (kmsCacheConfig === undefined) {
+        return kmsCache;
+    }
+    assert(typeof kmsCacheConfig === 'object' && kmsCacheConfig !== null,
+        'bad config: kmsCache must be an object');
+    if (kmsCacheConfig.enabled !== undefined) {
+        assert(typeof kmsCacheConfig.enabled === 'boolean',
+            'bad config: kmsCache.enabled must be a boolean');
+        kmsCache.enabled = kmsCacheConfig.enabled;
+    }
+    ['maxDataKeys', 'maxMasterKeys'].forEach(field => {
+        if (kmsCacheConfig[field] !== undefined) {
+            assert(Number.isInteger(kmsCacheConfig[field]) &&
+                kmsCacheConfig[field] >= 0,
+                `bad config: kmsCache.${field} must be a positive integer or 0`);
+            kmsCache[field] = kmsCacheConfig[field];
+        }
+    });
+    ['dataKeyTTL', 'masterKeyTTL'].forEach(field => {
+        if (kmsCacheConfig[field] !== undefined) {
+            assert(typeof kmsCacheConfig[field] === 'number' &&
+                kmsCacheConfig[field] > 0,
+                `bad config: kmsCache.${field} must be a positive number of seconds`);
+            kmsCache[field] = kmsCacheConfig[field];
+        }
+    });
+    return kmsCache;
+}
+
+function parseDataDeleteConcurrencyConfig(concurrencyConfig) {
+    const concurrency = {
+        // errors halve the limit: keep a few deletes running
+        min: 4,
+        max: 64,
+        initial: 16,
+    };
+    if (concurrencyConfig === undefined) {
+        return concurrency;
+    }
+    assert(typeof concurrencyConfig === 'object' && concurrencyConfig !== null,
+        'bad config: dataDeleteConcurrency must be an object');
+    ['min', 'max', 'initial'].forEach(field => {
+        if (concurrencyConfig[field] !== undefined) {
+            assert(Number.isInteger(concurrencyConfig[field]) &&
+                concurrencyConfig[field] > 0,
+                `bad config: dataDeleteConcurrency.${field} must be a positive integer`);
+            concurrency[field] = concurrencyConfig[field];
+        }
+    });
+    assert(concurrency.min <= concurrency.initial &&
+        concurrency.initial <= concurrency.max,
+        'bad config: dataDeleteConcurrency must verify min <= initial <= max');
+    return concurrency;
+}
+
+function parseBucketCacheConfig(bucketCacheConfig) {
+    const bucketCache = {
+        // other hosts' bucket changes are seen after up to ttl: opt-in
+        enabled: false,
+        maxBuckets: 10000,
+        ttl: 2,
+    };
+    if (bucketCacheConfig === undefined) {
+        return bucketCache;
+    }
+    assert(typeof bucketCacheConfig === 'object' && bucketCacheConfig !== null,
+        'bad config: bucketCache must be an object');
+    if (bucketCacheConfig.enabled !== undefined) {
+        assert(typeof bucketCacheConfig.enabled === 'boolean',
+            'bad config: bucketCache.enabled must be a boolean');
+        bucketCache.enabled = bucketCacheConfig.enabled;
+    }
+    if (bucketCacheConfig.maxBuckets !== undefined) {
+        assert(Number.isInteger(bucketCacheConfig.maxBuckets) &&
+            bucketCacheConfig.maxBuckets > 0,
+            'bad config: bucketCache.maxBuckets must be a positive integer');
+        bucketCache.maxBuckets = bucketCacheConfig.maxBuckets;
+    }
+    if (bucketCacheConfig.ttl !== undefined) {
+        assert(typeof bucketCacheConfig.ttl === 'number' &&
+            bucketCacheConfig.ttl > 0,
+            'bad config: bucketCache.ttl must be a positive number of seconds');
+        bucketCache.ttl = bucketCacheConfig.ttl;
+    }
+    return bucketCache;
+}
+
 /**
  * Reads from a config file and returns the content as a config object
  */
@@ -819,6 +1062,7 @@ class Config extends EventEmitter {
         }
 
         this.metricsListenOn = this._parseEndpoints(config.metricsListenOn, 'metricsListenOn');
+        this.monitoring = parseMonitoringConfig(config.monitoring);
 
         if (config.replicationGroupId) {
             assert(typeof config.replicationGroupId === 'string',
@@ -1055,6 +1299,12 @@ class Config extends EventEmitter {
                 process.env.S3DATAPATH : `${__dirname}/../localData`;
             this.dataDaemon.noSync = process.env.S3DATA_NOSYNC === 'true';
             this.dataDaemon.noCache = process.env.S3DATA_NOCACHE === 'true';
+            /**
+             * Read the data files from dataPath instead of requesting
+             * them to the data server, when both run on the same host.
+             */
+            this.dataDaemon.localRead =
+                process.env.S3DATA_LOCAL_READ === 'true';
         }
 
         if (config.pfsDaemon) {
@@ -1105,6 +1355,30 @@ class Config extends EventEmitter {
             this.metadataDaemon.restPort = config.metadataDaemon.restPort;
         }
 
+        this.metadataSearchIndexes =
+            parseMetadataSearchIndexes(config.metadataSearchIndexes);
+
+        // number of parsed metadata search queries kept in memory
+        this.metadataSearchCacheSize = 1000;
+        if (config.metadataSearchCacheSize !== undefined) {
+            assert(Number.isInteger(config.metadataSearchCacheSize) &&
+                config.metadataSearchCacheSize >= 0,
+                'bad config: metadataSearchCacheSize must be a positive ' +
+                'integer or 0');
+            this.metadataSearchCacheSize = config.metadataSearchCacheSize;
+        }
+
+        // concurrent metadata deletes of a batch, e.g. of the parts of a
+        // multipart upload (see metadata.deleteObjectsMD)
+        this.metadataDeleteConcurrency = 20;
+        if (config.metadataDeleteConcurrency !== undefined) {
+            assert(Number.isInteger(config.metadataDeleteConcurrency) &&
+                config.metadataDeleteConcurrency > 0,
+                'bad config: metadataDeleteConcurrency must be a positive ' +
+                'integer');
+            this.metadataDeleteConcurrency = config.metadataDeleteConcurrency;
+        }
+
         this.recordLog = { enabled: false };
         if (config.recordLog) {
             this.recordLog.enabled = Boolean(config.recordLog.enabled);
@@ -1216,9 +1490,18 @@ class Config extends EventEmitter {
         assert(Number.isInteger(maxStaleness), 'bad config: maxStalenessMS must be an integer');
         const enableInflights = process.env.QUOTA_ENABLE_INFLIGHTS === 'true' ||
             config.quota?.enableInflights || false;
+        // freshness window of the utilization metrics cached by each
+        // process, 0 to fetch them for every request
+        const metricsCacheMS = Number(process.env.QUOTA_METRICS_CACHE_MS) ||
+            config.quota?.metricsCacheMS || 0;
+        assert(Number.isInteger(metricsCacheMS) && metricsCacheMS >= 0 &&
+            metricsCacheMS < maxStaleness,
+            'bad config: quota.metricsCacheMS must be a positive integer or 0, ' +
+            'lower than maxStalenessMS');
         this.quota = {
             maxStaleness,
             enableInflights,
+            metricsCacheMS,
         };
         if (config.utapi) {
             this.utapi = { component: 's3' };
@@ -1351,6 +1634,9 @@ class Config extends EventEmitter {
                 ));
                 this.utapi.filter = utapiResourceFilters;
             }
+            if (utapiVersion === 2) {
+                this.utapi.batching = parseUtapiBatchingConfig(config.utapi.batching);
+            }
         }
         if (Object.keys(this.locationConstraints).some(
         loc => this.locationConstraints[loc].sizeLimitGB)) {
@@ -1394,6 +1680,13 @@ class Config extends EventEmitter {
             }
         }
 
+        this.kmsCache = parseKmsCacheConfig(config.kmsCache);
+
+        this.bucketCache = parseBucketCacheConfig(config.bucketCache);
+
+        this.dataDeleteConcurrency =
+            parseDataDeleteConcurrencyConfig(config.dataDeleteConcurrency);
+
         this.kmip = {
             client: {
                 /* Enable this option if the KMIP Server supports
@@ -1422,6 +1715,12 @@ class Config extends EventEmitter {
                  * Note: 0 is not an appropriate value and will fall back to 1.
                  */
                 pipelineDepth: process.env.S3KMIP_PIPELINE_DEPTH || 8,
+                /* Number of persistent connections to the KMIP server.
+                 * Each connection pipelines up to pipelineDepth
+                 * requests, and encryption operations are sent to the
+                 * connection with the fewest requests in flight.
+                 */
+                poolSize: Number.parseInt(process.env.S3KMIP_POOL_SIZE, 10) || 1,
                 tls: {
                     port: process.env.S3KMIP_PORT || 5696,
                     /* TODO: HA is not implmented yet.
@@ -1465,6 +1764,14 @@ class Config extends EventEmitter {
                     this.kmip.transport.pipelineDepth =
                         config.kmip.transport.pipelineDepth;
                 }
+                if (config.kmip.transport.poolSize !== undefined) {
+                    assert(Number.isInteger(config.kmip.transport.poolSize) &&
+                           config.kmip.transport.poolSize > 0,
+                           'bad config: kmip.transport.poolSize must be a ' +
+                           'positive integer');
+                    this.kmip.transport.poolSize =
+                        config.kmip.transport.poolSize;
+                }
                 if (config.kmip.transport.tls) {
                     const { host, port, key, cert, ca } =
                           config.kmip.transport.tls;
@@ -1970,6 +2277,12 @@ class Config extends EventEmitter {
 module.exports = {
     parseSproxydConfig,
     parseRedisConfig,
+    parseMonitoringConfig,
+    parseKmsCacheConfig,
+    parseBucketCacheConfig,
+    parseDataDeleteConcurrencyConfig,
+    parseMetadataSearchIndexes,
+    parseUtapiBatchingConfig,
     locationConstraintAssert,
     ConfigObject: Config,
     config: new Config(),
@@ -74,6 +74,7 @@ const parseCopySource = require('./apiUtils/object/parseCopySource');
 const { tagConditionKeyAuth } = require('./apiUtils/authorization/tagConditionKeys');
 const { isRequesterASessionUser } = require('./apiUtils/authorization/permissionChecks');
 const checkHttpHeadersSize = require('./apiUtils/object/checkHttpHeadersSize');
+const { timedCallback } = require('../utilities/requestPhases');
 
 const monitoringMap = policies.actionMaps.actionMonitoringMapS3;
 
@@ -197,7 +198,7 @@ const api = {
 
         return async.waterfall([
             next => auth.server.doAuth(
-                request, log, (err, userInfo, authorizationResults, streamingV4Params, infos) => {
+                request, log, timedCallback('auth', (err, userInfo, authorizationResults, streamingV4Params, infos) => {
                     if (err) {
                         // VaultClient returns standard errors, but the route requires
                         // Arsenal errors
@@ -206,7 +207,7 @@ const api = {
                         return next(arsenalError);
                     }
                     return next(null, userInfo, authorizationResults, streamingV4Params, infos);
-                }, 's3', requestContexts),
+                }), 's3', requestContexts),
             (userInfo, authorizationResults, streamingV4Params, infos, next) => {
                 const authNames = { accountName: userInfo.getAccountDisplayName() };
                 if (userInfo.isRequesterAnIAMUser()) {
@@ -216,6 +217,9 @@ const api = {
                     authNames.sessionName = userInfo.getShortid().split(':')[1];
                 }
                 log.addDefaultFields(authNames);
+                // used to label the per-account metrics
+                // eslint-disable-next-line no-param-reassign
+                request.accountName = authNames.accountName;
                 if (apiMethod === 'objectPut' || apiMethod === 'objectPutPart') {
                     return next(null, userInfo, authorizationResults, streamingV4Params, infos);
                 }
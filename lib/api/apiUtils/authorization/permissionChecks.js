@@ -3,6 +3,8 @@ const { errors } = require('arsenal');
 const { parseCIDR, isValid } = require('ipaddr.js');
 const constants = require('../../../../constants');
 const { config } = require('../../../Config');
+const TTLCache = require('../../../utilities/ttlCache');
+const { cacheMetrics } = require('../../../utilities/monitoringHandler');
 
 const {
     allAuthedUsersId,
@@ -19,6 +21,25 @@ const {
 const publicReadBuckets = process.env.ALLOW_PUBLIC_READ_BUCKETS
     ? process.env.ALLOW_PUBLIC_READ_BUCKETS.split(',') : [];
 
+// compiled bucket policies, by policy object: bucket policies are read
+// from the cached bucket metadata, serialized only when their bucket was
+// read again
+const policiesByObject = new WeakMap();
+// compiled bucket policies, by their serialization
+const compiledPolicies = new TTLCache({
+    max: 1000,
+    ttl: Infinity,
+    metrics: cacheMetrics('bucket_policies'),
+});
+// statements of a compiled policy applying to a principal, action and
+// resource, whatever the conditions of the request
+const policyDecisions = new TTLCache({
+    max: 10000,
+    ttl: Infinity,
+    metrics: cacheMetrics('bucket_policy_decisions'),
+});
+let nextPolicyId = 0;
+
 function getServiceAccountProperties(canonicalID) {
     const canonicalIDArray = canonicalID.split('/');
     const serviceName = canonicalIDArray[canonicalIDArray.length - 1];
@@ -246,40 +267,6 @@ function checkObjectAcls(bucket, objectMD, requestType, canonicalID, requesterIs
     return false;
 }
 
-function _checkBucketPolicyActions(requestType, actions, log) {
-    const mappedAction = actionMaps.actionMapBP[requestType];
-    // Deny any action that isn't in list of controlled actions
-    if (!mappedAction) {
-        return false;
-    }
-    return evaluators.isActionApplicable(mappedAction, actions, log);
-}
-
-function _checkBucketPolicyResources(request, resource, log) {
-    if (!request || (Array.isArray(resource) && resource.length === 0)) {
-        return true;
-    }
-    // build request context from the request!
-    const requestContext = new RequestContext(request.headers, request.query,
-        request.bucketName, request.objectKey, null,
-        request.connection.encrypted, request.resourceType, 's3');
-    return evaluators.isResourceApplicable(requestContext, resource, log);
-}
-
-function _checkBucketPolicyConditions(request, conditions, log) {
-    const ip = request ? requestUtils.getClientIp(request, config) : undefined;
-    if (!conditions) {
-        return true;
-    }
-    // build request context from the request!
-    const requestContext = new RequestContext(request.headers, request.query,
-        request.bucketName, request.objectKey, ip,
-        request.connection.encrypted, request.resourceType, 's3', null, null,
-        null, null, null, null, null, null, null, null, null,
-        request.objectLockRetentionDays);
-    return evaluators.meetConditions(requestContext, conditions, log);
-}
-
 function _getAccountId(arn) {
     // account or user arn is of format 'arn:aws:iam::<12-digit-acct-id>:etc...
     return arn.substr(13, 12);
@@ -289,39 +276,198 @@ function _isAccountId(principal) {
     return (principal.length === 12 && /^\d+$/.test(principal));
 }
 
-function _checkPrincipal(requester, principal) {
+/**
+ * Compile the Principal of a statement into a function of the requester
+ * @param {string|object} principal - Principal of a statement
+ * @return {function} - (canonicalID, arn) returning whether the requester
+ * is a principal of the statement
+ */
+function _compilePrincipal(principal) {
     if (principal === '*') {
-        return true;
-    }
-    if (principal === requester) {
-        return true;
+        return () => true;
+    }
+    let principals;
+    let byArn;
+    if (principal && principal.CanonicalUser) {
+        principals = [].concat(principal.CanonicalUser);
+        byArn = false;
+    } else if (principal && principal.AWS) {
+        principals = [].concat(principal.AWS);
+        byArn = true;
+    } else {
+        return () => false;
+    }
+    const any = principals.includes('*');
+    const requesters = new Set(principals);
+    // account ids, as is or from account root arns
+    const accountIds = new Set();
+    principals.forEach(p => {
+        if (_isAccountId(p)) {
+            accountIds.add(p);
+        } else if (p.endsWith('root')) {
+            accountIds.add(_getAccountId(p));
+        }
+    });
+    return (canonicalID, arn) => {
+        const requester = byArn ? arn : canonicalID;
+        return any || requesters.has(requester) || (!!requester &&
+            accountIds.size > 0 && accountIds.has(_getAccountId(requester)));
+    };
+}
+
+/**
+ * Length of the resource of a request that the resources of a policy
+ * depend on: the resources made of a literal, possibly followed by a
+ * single trailing '*', only look at the literal length of it.
+ * @param {object[]} statements - statements of the policy
+ * @return {number} - length, Infinity if the whole resource matters
+ */
+function _resourceKeyLength(statements) {
+    let length = 0;
+    statements.forEach(s => {
+        [].concat(s.Resource).forEach(resource => {
+            if (resource === '*') {
+                return;
+            }
+            const wildcard = typeof resource === 'string' ?
+                resource.indexOf('*') : -2;
+            if (wildcard === -2 || wildcard < resource.length - 1 ||
+                resource.includes('?') || resource.includes('${')) {
+                length = Infinity;
+            } else {
+                length = Math.max(length,
+                    wildcard === -1 ? resource.length : wildcard);
+            }
+        });
+    });
+    return length;
+}
+
+/**
+ * Compile a bucket policy, once per version of the policy: principals
+ * become matchers, statements are grouped by action on first use and the
+ * outcome of the statements without conditions is memoized per
+ * requester, action and resource (see _getPolicyDecision).
+ * @param {object} policy - bucket policy, not modified once compiled
+ * @return {object} - compiled policy
+ */
+function _compilePolicy(policy) {
+    let compiled = policiesByObject.get(policy);
+    if (compiled) {
+        return compiled;
+    }
+    const key = JSON.stringify(policy);
+    compiled = compiledPolicies.get(key);
+    if (compiled) {
+        policiesByObject.set(policy, compiled);
+        return compiled;
+    }
+    const statements = Array.isArray(policy.Statement) ? policy.Statement : [];
+    compiled = {
+        id: nextPolicyId++,
+        statements: statements.map(s => ({
+            effect: s.Effect,
+            matchesPrincipal: _compilePrincipal(s.Principal),
+            actions: s.Action,
+            resources: s.Resource,
+            conditions: s.Condition,
+        })),
+        // request type -> statements applying to its action
+        byRequestType: new Map(),
+        resourceKeyLength: _resourceKeyLength(statements),
+    };
+    compiledPolicies.set(key, compiled);
+    policiesByObject.set(policy, compiled);
+    return compiled;
+}
+
+function _statementsForRequestType(compiled, requestType, log) {
+    let statements = compiled.byRequestType.get(requestType);
+    if (!statements) {
+        const mappedAction = actionMaps.actionMapBP[requestType];
+        // Deny any action that isn't in list of controlled actions
+        statements = mappedAction ? compiled.statements.filter(s =>
+            evaluators.isActionApplicable(mappedAction, s.actions, log)) : [];
+        compiled.byRequestType.set(requestType, statements);
     }
-    if (_isAccountId(principal)) {
-        return _getAccountId(requester) === principal;
+    return statements;
+}
+
+function _resourceKey(compiled, request) {
+    if (!request) {
+        return '';
     }
-    if (principal.endsWith('root')) {
-        return _getAccountId(requester) === _getAccountId(principal);
+    const { objectKey } = request;
+    const length = compiled.resourceKeyLength;
+    let keyPart = '';
+    if (objectKey !== undefined && objectKey !== null) {
+        keyPart = objectKey.length > length ?
+            `/${objectKey.slice(0, length)}+` : `/${objectKey}`;
     }
-    return false;
+    return `${request.resourceType}:${request.bucketName}${keyPart}`;
 }
 
-function _checkPrincipals(canonicalID, arn, principal) {
-    if (principal === '*') {
+function _checkBucketPolicyResources(requestContext, resource, log) {
+    if (!requestContext || (Array.isArray(resource) && resource.length === 0)) {
         return true;
     }
-    if (principal.CanonicalUser) {
-        if (Array.isArray(principal.CanonicalUser)) {
-            return principal.CanonicalUser.some(p => _checkPrincipal(canonicalID, p));
+    return evaluators.isResourceApplicable(requestContext, resource, log);
+}
+
+/**
+ * Statements of a policy applying to a requester, action and resource:
+ * whether a Deny or an Allow without conditions applies, and the
+ * statements with conditions, to check against each request
+ * @param {object} compiled - compiled policy
+ * @param {string} requestType - type of request
+ * @param {string} canonicalID - canonical id of the requester
+ * @param {string} arn - arn of the requester
+ * @param {object} request - http request object
+ * @param {RequestLogger} log - request logger
+ * @return {object} - { deny, allow, conditional }
+ */
+function _getPolicyDecision(compiled, requestType, canonicalID, arn, request, log) {
+    const key = [compiled.id, requestType, canonicalID, arn,
+        _resourceKey(compiled, request)].join('\0');
+    let decision = policyDecisions.get(key);
+    if (decision) {
+        return decision;
+    }
+    decision = { deny: false, allow: false, conditional: [] };
+    let requestContext = null;
+    _statementsForRequestType(compiled, requestType, log).forEach(s => {
+        if (!s.matchesPrincipal(canonicalID, arn)) {
+            return;
         }
-        return _checkPrincipal(canonicalID, principal.CanonicalUser);
-    }
-    if (principal.AWS) {
-        if (Array.isArray(principal.AWS)) {
-            return principal.AWS.some(p => _checkPrincipal(arn, p));
+        if (request && !requestContext) {
+            // build request context from the request!
+            requestContext = new RequestContext(request.headers, request.query,
+                request.bucketName, request.objectKey, null,
+                request.connection.encrypted, request.resourceType, 's3');
         }
-        return _checkPrincipal(arn, principal.AWS);
-    }
-    return false;
+        if (!_checkBucketPolicyResources(requestContext, s.resources, log)) {
+            return;
+        }
+        if (s.conditions) {
+            decision.conditional.push(s);
+        } else if (s.effect === 'Deny') {
+            decision.deny = true;
+        } else if (s.effect === 'Allow') {
+            decision.allow = true;
+        }
+    });
+    policyDecisions.set(key, decision);
+    return decision;
+}
+
+function _conditionsRequestContext(request) {
+    const ip = request ? requestUtils.getClientIp(request, config) : undefined;
+    // build request context from the request!
+    return new RequestContext(request.headers, request.query,
+        request.bucketName, request.objectKey, ip,
+        request.connection.encrypted, request.resourceType, 's3', null, null,
+        null, null, null, null, null, null, null, null, null,
+        request.objectLockRetentionDays);
 }
 
 function checkBucketPolicy(policy, requestType, canonicalID, arn, bucketOwner, log, request, actionImplicitDenies) {
@@ -331,24 +477,26 @@ function checkBucketPolicy(policy, requestType, canonicalID, arn, bucketOwner, l
     if (bucketOwner === canonicalID && actionImplicitDenies[requestType] === false) {
         permission = 'allow';
     }
-    let copiedStatement = JSON.parse(JSON.stringify(policy.Statement));
-    while (copiedStatement.length > 0) {
-        const s = copiedStatement[0];
-        const principalMatch = _checkPrincipals(canonicalID, arn, s.Principal);
-        const actionMatch = _checkBucketPolicyActions(requestType, s.Action, log);
-        const resourceMatch = _checkBucketPolicyResources(request, s.Resource, log);
-        const conditionsMatch = _checkBucketPolicyConditions(request, s.Condition, log);
-
-        if (principalMatch && actionMatch && resourceMatch && conditionsMatch && s.Effect === 'Deny') {
-            // explicit deny trumps any allows, so return immediately
-            return 'explicitDeny';
-        }
-        if (principalMatch && actionMatch && resourceMatch && conditionsMatch && s.Effect === 'Allow') {
-            permission = 'allow';
+    const decision = _getPolicyDecision(_compilePolicy(policy), requestType,
+        canonicalID, arn, request, log);
+    if (decision.deny) {
+        // explicit deny trumps any allows, so return immediately
+        return 'explicitDeny';
+    }
+    let allowed = decision.allow;
+    let requestContext = null;
+    for (const s of decision.conditional) {
+        if (s.effect === 'Deny' || (s.effect === 'Allow' && !allowed)) {
+            requestContext = requestContext || _conditionsRequestContext(request);
+            if (evaluators.meetConditions(requestContext, s.conditions, log)) {
+                if (s.effect === 'Deny') {
+                    return 'explicitDeny';
+                }
+                allowed = true;
+            }
         }
-        copiedStatement = copiedStatement.splice(1);
     }
-    return permission;
+    return allowed ? 'allow' : permission;
 }
 
 function processBucketPolicy(requestType, bucket, canonicalID, arn, bucketOwner, log,
@@ -8,6 +8,7 @@ const { pushMetric } = require('../../../utapi/utilities');
 const { splitter, oldSplitter, mpuBucketPrefix } =
     require('../../../../constants');
 const metadata = require('../../../metadata/wrapper');
+const searchIndex = require('../../../metadata/searchIndex');
 const kms = require('../../../kms/wrapper');
 const deleteUserBucketEntry = require('./deleteUserBucketEntry');
 
@@ -114,6 +115,10 @@ function deleteBucket(authInfo, bucketMD, bucketName, canonicalID, request, log,
                     return _deleteMPUbucket(bucketName, log, next);
                 });
         },
+        function deleteSearchIndexStep(next) {
+            log.trace('deleting metadata search index bucket');
+            return searchIndex.deleteIndexBucket(bucketName, log, next);
+        },
         function addDeleteFlagStep(next) {
             log.trace('adding deleted attribute to bucket attributes');
             // Remove transient flag if any so never have both transient
@@ -0,0 +1,59 @@
+const { errors } = require('arsenal');
+
+const { config } = require('../../../Config');
+const TTLCache = require('../../../utilities/ttlCache');
+const { cacheMetrics } = require('../../../utilities/monitoringHandler');
+const { compileFilter } = require('../../../metadata/searchIndex');
+const parseWhere = require('./parseWhere');
+const validateSearchParams = require('./validateSearch');
+
+// a parsed search only depends on its string: entries never expire
+const cache = new TTLCache({
+    max: config.metadataSearchCacheSize,
+    ttl: Infinity,
+    metrics: cacheMetrics('metadata_search_plans'),
+});
+
+/**
+ * Parse and validate the search query parameter of metadataSearch into
+ * the MongoDB-style filter of the listing, remembering the most recently
+ * used searches.
+ *
+ * The returned filter is shared by every request with the same search,
+ * along with its regular expressions and the predicate compiled from it
+ * (see searchIndex.compileFilter): it must not be modified.
+ *
+ * @param {string} search - value of the search query parameter
+ * @return {object} - { mongifiedSearch } or { error }
+ */
+function parseSearch(search) {
+    if (typeof search !== 'string') {
+        return { error: errors.InvalidArgument.customizeDescription(
+            'Invalid sql where clause sent as search query') };
+    }
+    // keyed on the search as sent: only the parser knows which characters
+    // of a search are significant
+    const cached = cache.get(search);
+    if (cached) {
+        return cached;
+    }
+    const validated = validateSearchParams(search);
+    if (validated.error) {
+        return validated;
+    }
+    let parsed;
+    try {
+        const mongifiedSearch = parseWhere(validated.ast);
+        compileFilter(mongifiedSearch);
+        parsed = { mongifiedSearch };
+    } catch (err) {
+        return { error: errors.InvalidArgument.customizeDescription(
+            'Invalid sql where clause sent as search query') };
+    }
+    cache.set(search, parsed);
+    return parsed;
+}
+
+module.exports = {
+    parseSearch,
+};
@@ -8,6 +8,7 @@ const {
 } = require('arsenal').policies;
 const { config } = require('../../../Config');
 const QuotaService = require('../../../quotas/quotas');
+const { timed } = require('../../../utilities/requestPhases');
 
 /**
  * Process the bytes to write based on the request and object metadata
@@ -310,5 +311,5 @@ function validateQuotas(request, bucket, account, apiNames, apiMethod, inflight,
 module.exports = {
     processBytesToWrite,
     isMetricStale,
-    validateQuotas,
+    validateQuotas: timed('quota', validateQuotas),
 };
@@ -1,11 +1,11 @@
 const { errors, versioning } = require('arsenal');
 const constants = require('../../constants');
 const services = require('../services');
+const searchIndex = require('../metadata/searchIndex');
 const { standardMetadataValidateBucket } = require('../metadata/metadataUtils');
 const collectCorsHeaders = require('../utilities/collectCorsHeaders');
 const { pushMetric } = require('../utapi/utilities');
-const validateSearchParams = require('../api/apiUtils/bucket/validateSearch');
-const parseWhere = require('../api/apiUtils/bucket/parseWhere');
+const { parseSearch } = require('../api/apiUtils/bucket/parseSearch');
 const versionIdUtils = versioning.VersionID;
 const monitoring = require('../utilities/monitoringHandler');
 const { decryptToken }
@@ -80,19 +80,16 @@ function metadataSearch(authInfo, request, log, callback) {
         delimiter: params.delimiter,
         prefix: params.prefix,
     };
-    try {
-        const validatedAst = validateSearchParams(params.search).ast;
-        listParams.mongifiedSearch = parseWhere(validatedAst);
-    } catch (err) {
-        log.debug(err.message, {
-            stack: err.stack,
-        });
+    const parsedSearch = parseSearch(params.search);
+    if (parsedSearch.error) {
+        log.debug('invalid search query', { error: parsedSearch.error });
         monitoring.promMetrics(
             'GET', bucketName, 400, 'metadataSearch');
         return callback(errors.InvalidArgument
             .customizeDescription('Invalid sql where clause ' +
                 'sent as search query'));
     }
+    listParams.mongifiedSearch = parsedSearch.mongifiedSearch;
     if (v2) {
         listParams.v2 = true;
         listParams.startAfter = params['start-after'];
@@ -129,16 +126,33 @@ function metadataSearch(authInfo, request, log, callback) {
             return handleResult(listParams, requestMaxKeys, encoding, authInfo,
                 bucketName, emptyList, corsHeaders, log, callback);
         }
-        return services.getObjectListing(bucketName, listParams, log,
-            (err, list) => {
+        const onListing = (err, list) => {
+            if (err) {
+                log.debug('error processing request', { error: err });
+                monitoring.promMetrics(
+                    'GET', bucketName, err.code, 'metadataSearch');
+                return callback(err, null, corsHeaders);
+            }
+            return handleResult(listParams, requestMaxKeys, encoding, authInfo,
+                bucketName, list, corsHeaders, log, callback);
+        };
+        // searches on indexed fields read the matching keys from the
+        // index instead of filtering a listing of the whole bucket
+        return searchIndex.getSearchPlan(bucket, listParams, log,
+            (err, plan) => {
                 if (err) {
-                    log.debug('error processing request', { error: err });
-                    monitoring.promMetrics(
-                        'GET', bucketName, err.code, 'metadataSearch');
-                    return callback(err, null, corsHeaders);
+                    // the listing scan does not need the index
+                    log.warn('cannot read metadata search index state', {
+                        error: err,
+                        bucketName,
+                    });
+                }
+                if (plan) {
+                    return searchIndex.searchObjects(bucketName, listParams,
+                        plan, log, onListing);
                 }
-                return handleResult(listParams, requestMaxKeys, encoding, authInfo,
-                    bucketName, list, corsHeaders, log, callback);
+                return services.getObjectListing(bucketName, listParams, log,
+                    onListing);
             });
     });
     return undefined;
@@ -29,7 +29,7 @@ const { _bucketRequiresOplogUpdate } = require('./apiUtils/object/deleteObject')
 const { overheadField } = require('../../constants');
 
 const versionIdUtils = versioning.VersionID;
-const { data } = require('../data/wrapper');
+const { data, batchDeleteQueue } = require('../data/wrapper');
 const logger = require('../utilities/logger');
 const { validateQuotas } = require('./apiUtils/quotas/quotaUtils');
 
@@ -425,21 +425,29 @@ function getObjMetadataAndDelete(authInfo, canonicalID, request,
                 // consistent state.
                 log.trace('deleting objects from data backend');
 
-                // Split the array into chunks
-                const chunks = [];
-                while (deleteFromStorage.length > 0) {
-                    chunks.push(deleteFromStorage.splice(0, config.multiObjectDeleteConcurrency));
-                }
-
-                return async.each(chunks, (chunk, done) => data.batchDelete(chunk, null, null,
-                    logger.newRequestLoggerFromSerializedUids(log.getSerializedUids()), done),
-                    err => {
-                        if (err) {
-                            log.error('error deleting objects from data backend', { error: err });
-                            return onDone(err);
-                        }
-                        return onDone();
-                    });
+                // Split the locations of each data backend into chunks,
+                // deleted through the queue of their backend
+                const backends = new Map();
+                deleteFromStorage.forEach(location => {
+                    const locations = backends.get(location.dataStoreName) || [];
+                    locations.push(location);
+                    backends.set(location.dataStoreName, locations);
+                });
+                return async.each(Array.from(backends.values()), (locations, next) => {
+                    const queue = batchDeleteQueue(locations);
+                    const chunks = [];
+                    while (locations.length > 0) {
+                        chunks.push(locations.splice(0, config.multiObjectDeleteConcurrency));
+                    }
+                    return queue.eachLimit(chunks, (chunk, done) => data.batchDelete(chunk, null, null,
+                        logger.newRequestLoggerFromSerializedUids(log.getSerializedUids()), done), next);
+                }, err => {
+                    if (err) {
+                        log.error('error deleting objects from data backend', { error: err });
+                        return onDone(err);
+                    }
+                    return onDone();
+                });
             }),
     ], (err, ...results) => {
         // if general error from metadata return error
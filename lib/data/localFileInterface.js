@@ -0,0 +1,77 @@
+const fs = require('fs');
+const { errors, storage } = require('arsenal');
+
+const { DataFileInterface, DataFileStore } = storage.data.file;
+
+// large reads: fewer chunks to push through the response stream
+const DEFAULT_READ_CHUNK_SIZE = 1024 * 1024;
+
+/**
+ * Client of the file data backend reading the data files directly.
+ *
+ * With the file backend, object data goes from the data file to the data
+ * server (dataserver.js), then over HTTP to cloudserver and finally to the
+ * S3 client. When cloudserver runs on the host of the data server, data
+ * can be read from the data files instead, skipping the data server and
+ * its HTTP hop. Reads, ranged or not, open the data file and stream it,
+ * by chunks of `readChunkSize` bytes; writes and deletes still go through
+ * the data server.
+ */
+class LocalDataFileInterface extends DataFileInterface {
+    /**
+     * @param {object} config - cloudserver configuration, with the
+     * dataClient and dataDaemon sections
+     * @param {number} [readChunkSize] - size of the chunks read, in bytes
+     */
+    constructor(config, readChunkSize) {
+        super(config);
+        this.localStore = new DataFileStore({
+            dataPath: config.dataDaemon.dataPath,
+            log: config.log,
+            noSync: config.dataDaemon.noSync,
+            noCache: config.dataDaemon.noCache,
+        });
+        this.readChunkSize = readChunkSize || DEFAULT_READ_CHUNK_SIZE;
+    }
+
+    /**
+     * Same as DataFileInterface.get
+     * @param {object|string} objectGetInfo - data location, or its key
+     * @param {number[]|null} range - [start, end] bytes to read, inclusive
+     * @param {string} reqUids - request ids
+     * @param {function} callback - callback(err, readable)
+     * @return {undefined}
+     */
+    get(objectGetInfo, range, reqUids, callback) {
+        const key = objectGetInfo.key ? objectGetInfo.key : objectGetInfo;
+        if (typeof key !== 'string' || key.includes('/')) {
+            return super.get(objectGetInfo, range, reqUids, callback);
+        }
+        const options = { highWaterMark: this.readChunkSize };
+        if (range) {
+            options.start = range[0];
+            options.end = range[1];
+        }
+        let opened = false;
+        const readable = fs.createReadStream(
+            this.localStore.getFilePath(key), options);
+        // errors once opened are for the consumer of the stream
+        readable.once('error', err => {
+            if (opened) {
+                return undefined;
+            }
+            if (err.code === 'ENOENT') {
+                return callback(errors.ObjNSK);
+            }
+            return callback(errors.InternalError.customizeDescription(
+                `error opening data file: ${err.message}`));
+        });
+        readable.once('open', () => {
+            opened = true;
+            callback(null, readable);
+        });
+        return undefined;
+    }
+}
+
+module.exports = LocalDataFileInterface;
@@ -6,6 +6,10 @@ const metadata = require('../metadata/wrapper');
 const vault = require('../auth/vault');
 const locationStorageCheck =
     require('../api/apiUtils/object/locationStorageCheck');
+const { instrument } = require('../utilities/requestPhases');
+const LocalDataFileInterface = require('./localFileInterface');
+const AdaptiveConcurrency = require('../utilities/adaptiveConcurrency');
+const { deleteQueueMetrics } = require('../utilities/monitoringHandler');
 const { DataWrapper, MultipleBackendGateway, parseLC } = storage.data;
 const { DataFileInterface } = storage.data.file;
 const inMemory = storage.data.inMemory.datastore.backend;
@@ -25,7 +29,9 @@ if (config.backends.data === 'mem') {
     client = inMemory;
     implName = 'mem';
 } else if (config.backends.data === 'file') {
-    client = new DataFileInterface(config);
+    // cloudserver on the host of the data server: read the data files
+    client = config.dataDaemon && config.dataDaemon.localRead ?
+        new LocalDataFileInterface(config) : new DataFileInterface(config);
     implName = 'file';
 } else if (config.backends.data === 'multiple') {
     const clients = parseLC(config, vault);
@@ -46,16 +52,58 @@ if (config.backends.data === 'mem') {
     implName = 'cdmi';
 }
 
+// objectGet streams data straight from the client (see
+// routesUtils.responseStreamData in arsenal), not through the wrapper
+instrument(client, 'data', ['get']);
 const data = new DataWrapper(
     client, implName, config, kms, metadata, locationStorageCheck, vault);
+instrument(data, 'data');
 
 config.on('location-constraints-update', () => {
     if (implName === 'multipleBackends') {
         const clients = parseLC(config, vault);
-        client = new MultipleBackendGateway(
-            clients, metadata, locationStorageCheck);
+        client = instrument(new MultipleBackendGateway(
+            clients, metadata, locationStorageCheck), 'data', ['get']);
         data.switch(client);
     }
 });
 
-module.exports = { data, client, implName };
+// data deletes of the process, location by location ('delete' queues) or
+// by data.batchDelete calls ('batch_delete' queues), with one queue per
+// data backend: the concurrency of each queue adapts to the latency and
+// errors of its own backend
+const deleteQueues = new Map();
+
+function getDeleteQueue(queue, locations) {
+    // the locations of an object, or of a batch, are in one data backend
+    const location = locations && locations[0];
+    const backend = (location && location.dataStoreName) || implName;
+    const name = `${queue}:${backend}`;
+    let deleteQueue = deleteQueues.get(name);
+    if (!deleteQueue) {
+        deleteQueue = new AdaptiveConcurrency(Object.assign({
+            metrics: deleteQueueMetrics(queue, backend),
+        }, config.dataDeleteConcurrency));
+        deleteQueues.set(name, deleteQueue);
+    }
+    return deleteQueue;
+}
+
+/**
+ * @param {object[]} locations - data locations to delete one by one
+ * @return {AdaptiveConcurrency} - delete queue of their data backend
+ */
+function deleteQueue(locations) {
+    return getDeleteQueue('delete', locations);
+}
+
+/**
+ * @param {object[]} locations - data locations to delete with
+ * data.batchDelete
+ * @return {AdaptiveConcurrency} - batch delete queue of their data backend
+ */
+function batchDeleteQueue(locations) {
+    return getDeleteQueue('batch_delete', locations);
+}
+
+module.exports = { data, client, implName, deleteQueue, batchDeleteQueue };
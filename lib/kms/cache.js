@@ -0,0 +1,101 @@
+const TTLCache = require('../utilities/ttlCache');
+
+// master key ids may contain '/' (e.g. AWS KMS ARNs), but no NUL
+const SEPARATOR = '\0';
+
+function dataKeyId(cryptoScheme, masterKeyId, cipheredDataKey) {
+    const ciphered = Buffer.isBuffer(cipheredDataKey) ?
+        cipheredDataKey.toString('base64') : String(cipheredDataKey);
+    return [masterKeyId, cryptoScheme, ciphered].join(SEPARATOR);
+}
+
+/**
+ * Cache of the KMS results on the path of encrypted requests: the
+ * plaintext of ciphered data keys, so that reading an object does not
+ * call the KMS to decipher its data key, and the default master key id
+ * of accounts, retrieved from Vault.
+ *
+ * Data keys are only cached to decipher: a data key is never reused to
+ * encrypt another object, as the IVs of the CTR mode are derived from the
+ * key only. Cached keys are copies, zeroed when evicted, and callers get
+ * their own copy, which they are expected to zero after use.
+ */
+class KMSCache {
+    /**
+     * @param {object} params - see Config.kmsCache, TTLs in seconds
+     * @param {function} [metricsFactory] - returns the observers of a cache
+     * from its name, see monitoringHandler.cacheMetrics
+     * @param {function} [now] - clock, in milliseconds
+     */
+    constructor(params, metricsFactory, now) {
+        this._dataKeys = new TTLCache({
+            max: params.maxDataKeys,
+            ttl: params.dataKeyTTL * 1000,
+            onEvict: (key, plainTextDataKey) => plainTextDataKey.fill(0),
+            metrics: metricsFactory ? metricsFactory('kms_data_keys') : null,
+            now,
+        });
+        this._masterKeys = new TTLCache({
+            max: params.maxMasterKeys,
+            ttl: params.masterKeyTTL * 1000,
+            metrics: metricsFactory ? metricsFactory('kms_master_keys') : null,
+            now,
+        });
+    }
+
+    /**
+     * @param {number} cryptoScheme - crypto scheme of the data key
+     * @param {string} masterKeyId - id of the master key ciphering it
+     * @param {Buffer|string} cipheredDataKey - ciphered data key
+     * @return {Buffer|null} - copy of the plaintext data key, if cached
+     */
+    getDataKey(cryptoScheme, masterKeyId, cipheredDataKey) {
+        const plainTextDataKey = this._dataKeys.get(
+            dataKeyId(cryptoScheme, masterKeyId, cipheredDataKey));
+        return plainTextDataKey ? Buffer.from(plainTextDataKey) : null;
+    }
+
+    /**
+     * @param {number} cryptoScheme - crypto scheme of the data key
+     * @param {string} masterKeyId - id of the master key ciphering it
+     * @param {Buffer|string} cipheredDataKey - ciphered data key
+     * @param {Buffer} plainTextDataKey - plaintext data key, copied
+     * @return {undefined}
+     */
+    setDataKey(cryptoScheme, masterKeyId, cipheredDataKey, plainTextDataKey) {
+        this._dataKeys.set(
+            dataKeyId(cryptoScheme, masterKeyId, cipheredDataKey),
+            Buffer.from(plainTextDataKey));
+    }
+
+    /**
+     * @param {string} owner - canonical id of the account
+     * @return {string|undefined} - default master key id of the account
+     */
+    getAccountMasterKeyId(owner) {
+        return this._masterKeys.get(owner);
+    }
+
+    /**
+     * @param {string} owner - canonical id of the account
+     * @param {string} masterKeyId - default master key id of the account
+     * @return {undefined}
+     */
+    setAccountMasterKeyId(owner, masterKeyId) {
+        this._masterKeys.set(owner, masterKeyId);
+    }
+
+    /**
+     * Forget everything related to a master key, when it is destroyed.
+     * @param {string} masterKeyId - id of the master key
+     * @return {undefined}
+     */
+    forgetMasterKey(masterKeyId) {
+        const prefix = masterKeyId + SEPARATOR;
+        this._dataKeys.deleteMatching(key => key.startsWith(prefix));
+        this._masterKeys.deleteMatching(
+            (owner, value) => value === masterKeyId);
+    }
+}
+
+module.exports = KMSCache;
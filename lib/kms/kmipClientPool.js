@@ -0,0 +1,80 @@
+/**
+ * KMS client methods forwarded by the pool, when the clients have them.
+ */
+const METHODS = [
+    'createBucketKey',
+    'destroyBucketKey',
+    'cipherDataKey',
+    'decipherDataKey',
+    'generateDataKey',
+    'healthcheck',
+];
+
+/**
+ * Pool of KMIP clients, each of them keeping its own persistent mutual-TLS
+ * connection to the KMIP server.
+ *
+ * A KMIP client pipelines at most `kmip.transport.pipelineDepth` requests
+ * on its connection, and the server handles the requests of a connection
+ * one after the other: under load, the encryption operations of all the
+ * requests served by a process queue behind each other. The pool spreads
+ * the operations over several connections, sending each one to the client
+ * with the fewest operations in flight.
+ */
+class KMIPClientPool {
+    /**
+     * @param {number} size - number of clients
+     * @param {function} createClient - returns a new KMIP client
+     */
+    constructor(size, createClient) {
+        this._clients = [];
+        for (let i = 0; i < size; ++i) {
+            this._clients.push({ client: createClient(), inFlight: 0 });
+        }
+        const { client } = this._clients[0];
+        METHODS.forEach(method => {
+            if (typeof client[method] === 'function') {
+                this[method] = (...args) => this._call(method, args);
+            }
+        });
+    }
+
+    get size() {
+        return this._clients.length;
+    }
+
+    get supportsDefaultKeyPerAccount() {
+        return this._clients[0].client.supportsDefaultKeyPerAccount;
+    }
+
+    /**
+     * @return {number[]} - operations in flight on each client
+     */
+    inFlight() {
+        return this._clients.map(entry => entry.inFlight);
+    }
+
+    _pick() {
+        let best = this._clients[0];
+        for (let i = 1; i < this._clients.length; ++i) {
+            if (this._clients[i].inFlight < best.inFlight) {
+                best = this._clients[i];
+            }
+        }
+        return best;
+    }
+
+    _call(method, args) {
+        const entry = this._pick();
+        const cb = args[args.length - 1];
+        entry.inFlight += 1;
+        const callArgs = args.slice(0, -1);
+        callArgs.push((...results) => {
+            entry.inFlight -= 1;
+            return cb(...results);
+        });
+        return entry.client[method](...callArgs);
+    }
+}
+
+module.exports = KMIPClientPool;
@@ -9,7 +9,11 @@ const file = require('./file/backend');
 const KMIPClient = require('arsenal').network.kmipClient;
 const { KmsAWSClient } = require('arsenal').network;
 const Common = require('./common');
+const KMSCache = require('./cache');
+const KMIPClientPool = require('./kmipClientPool');
 const vault = require('../auth/vault');
+const { instrument } = require('../utilities/requestPhases');
+const { cacheMetrics } = require('../utilities/monitoringHandler');
 let scalityKMS;
 let scalityKMSImpl;
 try {
@@ -42,7 +46,10 @@ if (config.backends.kms === 'mem') {
     if (!kmipConfig.kmip) {
         throw new Error('KMIP KMS driver configuration is missing.');
     }
-    client = new KMIPClient(kmipConfig);
+    const { poolSize } = config.kmip.transport;
+    client = poolSize > 1 ?
+        new KMIPClientPool(poolSize, () => new KMIPClient(kmipConfig)) :
+        new KMIPClient(kmipConfig);
     implName = 'kmip';
 } else if (config.backends.kms === 'aws') {
     const awsConfig = { kmsAWS: config.kmsAWS };
@@ -52,6 +59,9 @@ if (config.backends.kms === 'mem') {
     throw new Error(`KMS backend is not configured: ${config.backends.kms}`);
 }
 
+const cache = config.kmsCache.enabled ?
+    new KMSCache(config.kmsCache, cacheMetrics) : null;
+
 class KMS {
      /**
       * Create a new bucket encryption key.
@@ -74,6 +84,15 @@ class KMS {
         // If so, retrieve or create the encryption key for the account from Vault.
         // Later its id will be stored at the bucket metadata level.
         if (client.supportsDefaultKeyPerAccount && config.defaultEncryptionKeyPerAccount) {
+            const cachedKeyId = cache && cache.getAccountMasterKeyId(bucket.getOwner());
+            if (cachedKeyId) {
+                log.trace('default encryption key of the account found in cache',
+                    { implName, encryptionKeyId: cachedKeyId });
+                return process.nextTick(() => cb(null, {
+                    masterKeyId: cachedKeyId,
+                    isAccountEncryptionEnabled: true,
+                }));
+            }
             return vault.getOrCreateEncryptionKeyId(bucket.getOwner(), log, (err, data) => {
                 if (err) {
                     log.debug('error retrieving or creating the default encryption key at the account level from vault',
@@ -84,6 +103,9 @@ class KMS {
                 const { encryptionKeyId, action } = data;
                 log.trace('default encryption key retrieved or created at the account level from vault',
                     { implName, encryptionKeyId, action });
+                if (cache) {
+                    cache.setAccountMasterKeyId(bucket.getOwner(), encryptionKeyId);
+                }
                 return cb(null, { masterKeyId: encryptionKeyId, isAccountEncryptionEnabled: true });
             });
         }
@@ -161,6 +183,9 @@ class KMS {
      */
     static destroyBucketKey(bucketKeyId, log, cb) {
         log.debug('deleting bucket key', { bucketKeyId });
+        if (cache) {
+            cache.forgetMasterKey(bucketKeyId);
+        }
         client.destroyBucketKey(bucketKeyId, log, err => {
             if (err) {
                 log.debug('error from kms', { implName, error: err });
@@ -253,6 +278,12 @@ class KMS {
                 log.debug('creating a cipher');
                 cipherBundle.cipheredDataKey =
                     cipheredDataKey.toString('base64');
+                if (cache) {
+                    // only cached to decipher the object when it is read
+                    cache.setDataKey(cipherBundle.cryptoScheme,
+                        cipherBundle.masterKeyId, cipheredDataKey,
+                        plainTextDataKey);
+                }
                 return Common.createCipher(cipherBundle.cryptoScheme,
                     plainTextDataKey, 0, log, (err, cipher) => {
                         plainTextDataKey.fill(0);
@@ -311,6 +342,14 @@ class KMS {
         };
         return async.waterfall([
             function decipherDataKey(next) {
+                const cachedDataKey = cache && cache.getDataKey(
+                    decipherBundle.cryptoScheme,
+                    serverSideEncryptionInfo.masterKeyId,
+                    serverSideEncryptionInfo.cipheredDataKey);
+                if (cachedDataKey) {
+                    log.trace('data key found in cache');
+                    return next(null, cachedDataKey);
+                }
                 return client.decipherDataKey(
                     decipherBundle.cryptoScheme,
                     serverSideEncryptionInfo.masterKeyId,
@@ -323,6 +362,12 @@ class KMS {
                             return next(err);
                         }
                         log.trace('data key deciphered by the kms');
+                        if (cache) {
+                            cache.setDataKey(decipherBundle.cryptoScheme,
+                                serverSideEncryptionInfo.masterKeyId,
+                                serverSideEncryptionInfo.cipheredDataKey,
+                                plainTextDataKey);
+                        }
                         return next(null, plainTextDataKey);
                     });
             },
@@ -378,4 +423,12 @@ class KMS {
     }
 }
 
+instrument(KMS, 'kms', [
+    'createBucketKey',
+    'bucketLevelEncryption',
+    'destroyBucketKey',
+    'createCipherBundle',
+    'createDecipherBundle',
+]);
+
 module.exports = KMS;
@@ -0,0 +1,207 @@
+const cluster = require('cluster');
+
+const { config } = require('../Config');
+const TTLCache = require('../utilities/ttlCache');
+const {
+    cacheMetrics,
+    bucketCacheHitAge,
+    bucketCacheInvalidations,
+} = require('../utilities/monitoringHandler');
+
+const INVALIDATE_MESSAGE = 'cloudserver:bucketCacheInvalidate';
+
+// API methods changing the metadata of the bucket of the request
+const BUCKET_WRITE_METHOD = /^bucket(Put|Delete|Update)/;
+
+// metadata wrapper methods changing the metadata of a bucket, all taking
+// the bucket name first and the callback last
+const BUCKET_WRITES = [
+    'createBucket',
+    'updateBucket',
+    'deleteBucket',
+    'updateBucketCapabilities',
+    'deleteBucketCapabilities',
+];
+
+/**
+ * Cache of the bucket metadata read by the requests, per bucket name.
+ *
+ * Every request validates its bucket, which costs a metadata round trip
+ * to reload the same BucketInfo. Buckets are kept for `ttl` seconds, as
+ * their serialization: each request deserializes its own BucketInfo, that
+ * it may modify.
+ *
+ * The bucket writes of this worker, whatever the API doing them, invalidate
+ * the bucket they change, and are relayed to the other workers of the host
+ * (see invalidateOnWrites and setupClusterRelay). Each invalidation
+ * increments a generation: a read started before an invalidation does not
+ * fill the cache when it ends, as it may have returned the former metadata. Changes made on other hosts,
+ * or outside of the S3 API, are seen after at most `ttl` seconds.
+ */
+class BucketInfoCache {
+    /**
+     * @param {object} params - see Config.bucketCache, ttl in seconds
+     * @param {object} [metrics] - observers: cache, see
+     * monitoringHandler.cacheMetrics, hitAge(seconds) and
+     * invalidation(origin)
+     * @param {function} [now] - clock, in milliseconds
+     */
+    constructor(params, metrics, now) {
+        this._metrics = metrics || {};
+        this._now = now || Date.now;
+        this._buckets = new TTLCache({
+            max: params.maxBuckets,
+            ttl: params.ttl * 1000,
+            metrics: this._metrics.cache,
+            now: this._now,
+        });
+        this._generation = 0;
+    }
+
+    /**
+     * @return {number} - generation to pass to set, taken before reading
+     * the bucket metadata
+     */
+    generation() {
+        return this._generation;
+    }
+
+    /**
+     * @param {string} bucketName - bucket name
+     * @return {string|undefined} - serialized BucketInfo, if cached
+     */
+    get(bucketName) {
+        const entry = this._buckets.get(bucketName);
+        if (entry === undefined) {
+            return undefined;
+        }
+        if (this._metrics.hitAge) {
+            this._metrics.hitAge((this._now() - entry.fetchedAt) / 1000);
+        }
+        return entry.serialized;
+    }
+
+    /**
+     * @param {string} bucketName - bucket name
+     * @param {string} serialized - serialized BucketInfo
+     * @param {number} generation - generation before it was read
+     * @return {boolean} - whether it was cached
+     */
+    set(bucketName, serialized, generation) {
+        if (generation !== this._generation) {
+            return false;
+        }
+        this._buckets.set(bucketName,
+            { serialized, fetchedAt: this._now() });
+        return true;
+    }
+
+    /**
+     * @param {string} bucketName - bucket name
+     * @param {string} [origin] - 'local' or 'remote'
+     * @return {undefined}
+     */
+    invalidate(bucketName, origin) {
+        this._generation += 1;
+        this._buckets.delete(bucketName);
+        if (this._metrics.invalidation) {
+            this._metrics.invalidation(origin || 'local');
+        }
+    }
+}
+
+// used while config.bucketCache.enabled
+const bucketCache = new BucketInfoCache(config.bucketCache, {
+    cache: cacheMetrics('bucket_info'),
+    hitAge: age => bucketCacheHitAge.observe(age),
+    invalidation: origin => bucketCacheInvalidations.inc({ origin }),
+});
+
+if (config.bucketCache.enabled && cluster.isWorker) {
+    process.on('message', message => {
+        if (message && message.type === INVALIDATE_MESSAGE) {
+            bucketCache.invalidate(message.bucketName, 'remote');
+        }
+    });
+}
+
+/**
+ * Invalidate a bucket in the cache of this worker and of the other
+ * workers of the host
+ * @param {string} bucketName - bucket name
+ * @return {undefined}
+ */
+function invalidateBucket(bucketName) {
+    if (!config.bucketCache.enabled) {
+        return;
+    }
+    bucketCache.invalidate(bucketName, 'local');
+    if (cluster.isWorker && process.send) {
+        process.send({ type: INVALIDATE_MESSAGE, bucketName });
+    }
+}
+
+/**
+ * Relay the invalidations of each worker to the others, in the primary
+ * @param {object} clusterModule - node cluster module
+ * @return {undefined}
+ */
+function setupClusterRelay(clusterModule) {
+    if (!config.bucketCache.enabled) {
+        return;
+    }
+    clusterModule.on('message', (worker, message) => {
+        if (!message || message.type !== INVALIDATE_MESSAGE) {
+            return;
+        }
+        Object.values(clusterModule.workers).forEach(other => {
+            if (other && other !== worker && other.isConnected()) {
+                other.send(message);
+            }
+        });
+    });
+}
+
+/**
+ * Whether the request may read its bucket from the cache: requests
+ * changing their bucket read it from metadata, not to write back the
+ * changes of another host they have not seen yet.
+ * @param {string|string[]} requestType - request types of the request
+ * @return {boolean} - true if the cache can be used
+ */
+function canUseCache(requestType) {
+    return config.bucketCache.enabled &&
+        ![].concat(requestType).some(type => BUCKET_WRITE_METHOD.test(type));
+}
+
+/**
+ * Invalidate the buckets changed through the metadata wrapper once their
+ * write is done, successful or not, as it may have been partially applied
+ * @param {object} wrapper - metadata wrapper
+ * @return {undefined}
+ */
+function invalidateOnWrites(wrapper) {
+    BUCKET_WRITES.forEach(method => {
+        const write = wrapper[method];
+        if (typeof write !== 'function') {
+            return;
+        }
+        // eslint-disable-next-line no-param-reassign
+        wrapper[method] = function invalidatingWrite(bucketName, ...args) {
+            const cb = args.pop();
+            return write.call(this, bucketName, ...args, (...results) => {
+                invalidateBucket(bucketName);
+                return cb(...results);
+            });
+        };
+    });
+}
+
+module.exports = {
+    BucketInfoCache,
+    bucketCache,
+    canUseCache,
+    invalidateBucket,
+    setupClusterRelay,
+    invalidateOnWrites,
+};
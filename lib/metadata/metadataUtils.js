@@ -2,6 +2,7 @@ const async = require('async');
 const { errors } = require('arsenal');
 
 const metadata = require('./wrapper');
+const { bucketCache, canUseCache } = require('./bucketCache');
 const BucketInfo = require('arsenal').models.BucketInfo;
 const { isBucketAuthorized, isObjAuthorized } =
     require('../api/apiUtils/authorization/permissionChecks');
@@ -169,6 +170,88 @@ function validateBucket(bucket, params, log, actionImplicitDenies = {}) {
     }
     return null;
 }
+/**
+ * Whether the bucket of a validation may come from the bucket cache
+ * @param {object} params - parameters of the validation
+ * @return {boolean} - true if the cache can be used
+ */
+function useBucketCache(params) {
+    const apiMethod = params.request && params.request.apiMethod;
+    return canUseCache(apiMethod ?
+        [].concat(params.requestType, apiMethod) : params.requestType);
+}
+
+/** getBucketAndObjectMD - retrieve bucket and object md from metadata,
+ * the bucket from the bucket cache when possible
+ * @param {object} params - parameters of the validation
+ * @param {object} getOptions - options of the object md read
+ * @param {RequestLogger} log - request logger
+ * @param {function} cb - callback(err, { bucket, obj }), bucket being the
+ * serialized BucketInfo and obj the object md, both undefined if absent
+ * @return {undefined}
+ */
+function getBucketAndObjectMD(params, getOptions, log, cb) {
+    const { bucketName, objectKey } = params;
+    if (!useBucketCache(params)) {
+        return metadata.getBucketAndObjectMD(bucketName, objectKey, getOptions, log, (err, getResult) => {
+            if (err) {
+                return cb(err);
+            }
+            return cb(null, {
+                bucket: getResult.bucket,
+                obj: getResult.obj ? JSON.parse(getResult.obj) : undefined,
+            });
+        });
+    }
+    const cachedBucket = bucketCache.get(bucketName);
+    if (cachedBucket) {
+        return metadata.getObjectMD(bucketName, objectKey, getOptions, log, (err, objMD) => {
+            if (err && !(err.is && err.is.NoSuchKey)) {
+                return cb(err);
+            }
+            return cb(null, { bucket: cachedBucket, obj: err ? undefined : objMD });
+        });
+    }
+    const generation = bucketCache.generation();
+    return metadata.getBucketAndObjectMD(bucketName, objectKey, getOptions, log, (err, getResult) => {
+        if (err) {
+            return cb(err);
+        }
+        if (getResult.bucket) {
+            bucketCache.set(bucketName, getResult.bucket, generation);
+        }
+        return cb(null, {
+            bucket: getResult.bucket,
+            obj: getResult.obj ? JSON.parse(getResult.obj) : undefined,
+        });
+    });
+}
+
+/** getBucket - retrieve bucket md from metadata, or from the bucket cache
+ * when possible
+ * @param {object} params - parameters of the validation
+ * @param {RequestLogger} log - request logger
+ * @param {function} cb - callback(err, bucket)
+ * @return {undefined}
+ */
+function getBucket(params, log, cb) {
+    const { bucketName } = params;
+    if (!useBucketCache(params)) {
+        return metadata.getBucket(bucketName, log, cb);
+    }
+    const cachedBucket = bucketCache.get(bucketName);
+    if (cachedBucket) {
+        return process.nextTick(cb, null, BucketInfo.deSerialize(cachedBucket));
+    }
+    const generation = bucketCache.generation();
+    return metadata.getBucket(bucketName, log, (err, bucket) => {
+        if (!err && bucket) {
+            bucketCache.set(bucketName, bucket.serialize(), generation);
+        }
+        return cb(err, bucket);
+    });
+}
+
 /** standardMetadataValidateBucketAndObj - retrieve bucket and object md from metadata
  * and check if user is authorized to access them.
  * @param {object} params - function parameters
@@ -196,7 +279,7 @@ function standardMetadataValidateBucketAndObj(params, actionImplicitDenies, log,
             if (getDeleteMarker) {
                 getOptions.getDeleteMarker = true;
             }
-            return metadata.getBucketAndObjectMD(bucketName, objectKey, getOptions, log, (err, getResult) => {
+            return getBucketAndObjectMD(params, getOptions, log, (err, getResult) => {
                 if (err) {
                     // if some implicit iamAuthzResults, return AccessDenied
                     // before leaking any state information
@@ -222,7 +305,7 @@ function standardMetadataValidateBucketAndObj(params, actionImplicitDenies, log,
             if (validationError) {
                 return next(validationError, bucket);
             }
-            const objMD = getResult.obj ? JSON.parse(getResult.obj) : undefined;
+            const objMD = getResult.obj;
             if (!objMD && versionId === 'null') {
                 return getNullVersionFromMaster(bucketName, objectKey, log,
                      (err, nullVer) => next(err, bucket, nullVer));
@@ -274,8 +357,7 @@ function standardMetadataValidateBucketAndObj(params, actionImplicitDenies, log,
  * @return {undefined} - and call callback with params err, bucket md
  */
 function standardMetadataValidateBucket(params, actionImplicitDenies, log, callback) {
-    const { bucketName } = params;
-    return metadata.getBucket(bucketName, log, (err, bucket) => {
+    return getBucket(params, log, (err, bucket) => {
         if (err) {
             // if some implicit actionImplicitDenies, return AccessDenied before
             // leaking any state information
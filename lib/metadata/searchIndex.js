@@ -0,0 +1,817 @@
+const async = require('async');
+const { errors, models } = require('arsenal');
+
+const { config } = require('../Config');
+const constants = require('../../constants');
+const logger = require('../utilities/logger');
+const metadata = require('./wrapper');
+
+const { BucketInfo } = models;
+
+/*
+ * Secondary indexes of metadata search.
+ *
+ * The user metadata and tag fields declared for a bucket in
+ * `metadataSearchIndexes` are indexed in a hidden shadow bucket, like the
+ * MPU shadow bucket, holding:
+ *
+ * - one entry `f/<field>/<value>/<object key>` per indexed field of the
+ *   master version of each object, field and value being URI-encoded so
+ *   that listing the `f/<field>/<value>/` prefix returns the keys of the
+ *   objects having this value, in key order;
+ * - one entry `o/<object key>` per object, listing the entries of the
+ *   object, to remove them when the object changes;
+ * - the state entry `s/state`, recording the fields whose index was built
+ *   for every object of the bucket, see buildIndex.
+ *
+ * The entries of an object are updated from its master version by every
+ * write of its metadata, before the write calls back (see indexWrites), so
+ * that every request changing objects, S3 or backbeat, keeps the index up
+ * to date. The objects written before a field was indexed are indexed by
+ * a build, started by the first search of the bucket on that field: the
+ * index is only used for the fields whose build completed.
+ *
+ * Searches whose filter requires an indexed field to be equal to a value
+ * read the matching keys from the index instead of walking the bucket
+ * listing, and check the current metadata of each of them against the
+ * whole filter, so that entries left by concurrent updates are never
+ * returned.
+ */
+
+const FIELD_PREFIX = 'f/';
+const OBJECT_PREFIX = 'o/';
+const STATE_KEY = 's/state';
+// index entries read per listing of the index bucket, objects indexed per
+// page of a build
+const INDEX_PAGE_SIZE = 1000;
+// concurrent object metadata reads of a search
+const FETCH_CONCURRENCY = 10;
+// a build not completed after this long is assumed to have stopped with
+// its process, and is started again
+const BUILD_TIMEOUT_MS = 60 * 60 * 1000;
+// times the entries of an object are written, when it keeps changing
+// while they are
+const UPDATE_ATTEMPTS = 3;
+
+// index buckets known to exist
+const existingIndexBuckets = new Set();
+// index bucket name -> { bucketCreationDate, fields } of the builds known
+// to be complete
+const completeBuilds = new Map();
+// buckets whose index is being built by this process
+const runningBuilds = new Set();
+// `<bucket>/<key>` -> callbacks of the updates waiting for the update of
+// the object running
+const runningUpdates = new Map();
+
+function indexBucketName(bucketName) {
+    return `${constants.mdSearchIndexBucketPrefix}${bucketName}`;
+}
+
+function indexedFields(bucketName) {
+    return config.metadataSearchIndexes[bucketName] || [];
+}
+
+function fieldPrefix(field, value) {
+    return `${FIELD_PREFIX}${encodeURIComponent(field)}/` +
+        `${encodeURIComponent(value)}/`;
+}
+
+/**
+ * Value of a searchable field in object metadata, see validateSearch
+ * @param {object} objMD - object metadata
+ * @param {string} field - field name, e.g. x-amz-meta-color or tags.color
+ * @return {*} - value of the field, undefined if absent
+ */
+function fieldValue(objMD, field) {
+    // user metadata names may contain dots: only tags and replicationInfo
+    // are nested
+    const nested = ['tags', 'replicationInfo'].find(
+        name => field.startsWith(`${name}.`));
+    if (nested) {
+        const parent = objMD[nested];
+        return parent ? parent[field.slice(nested.length + 1)] : undefined;
+    }
+    return objMD[field];
+}
+
+/**
+ * Index entries of the master version of an object
+ * @param {string[]} fields - indexed fields
+ * @param {string} objectKey - object key
+ * @param {object|null} objMD - master version metadata, null if none
+ * @return {string[]} - sorted keys of the entries
+ */
+function objectEntries(fields, objectKey, objMD) {
+    if (!objMD || objMD.isDeleteMarker) {
+        return [];
+    }
+    return fields
+        .map(field => [field, fieldValue(objMD, field)])
+        .filter(([, value]) => typeof value === 'string')
+        .map(([field, value]) => `${fieldPrefix(field, value)}${objectKey}`)
+        .sort();
+}
+
+const comparators = {
+    $eq: (a, b) => a === b,
+    $ne: (a, b) => a !== b,
+    $gt: (a, b) => typeof a === typeof b && a > b,
+    $lt: (a, b) => typeof a === typeof b && a < b,
+    $gte: (a, b) => typeof a === typeof b && a >= b,
+    $lte: (a, b) => typeof a === typeof b && a <= b,
+};
+
+// predicates of the filters, kept as long as their filter, e.g. in the
+// cache of parsed searches
+const compiledFilters = new WeakMap();
+
+function compileCondition(field, condition) {
+    if (condition.$regex !== undefined) {
+        const source = condition.$regex instanceof RegExp ?
+            condition.$regex.source : condition.$regex;
+        // stateless: no global or sticky matching
+        const flags = (condition.$options || '').replace(/[gy]/g, '');
+        const regex = new RegExp(source, flags);
+        return objMD => {
+            const value = fieldValue(objMD, field);
+            return typeof value === 'string' && regex.test(value);
+        };
+    }
+    const tests = Object.keys(condition).map(op => {
+        const comparator = comparators[op];
+        const operand = condition[op];
+        return comparator ? value => comparator(value, operand) : () => false;
+    });
+    return objMD => {
+        const value = fieldValue(objMD, field);
+        return tests.every(test => test(value));
+    };
+}
+
+/**
+ * Compile a filter built by parseWhere into a predicate on object metadata,
+ * regular expressions included: compiling a filter again returns the same
+ * predicate
+ * @param {object} filter - MongoDB-style filter on `value.<field>`
+ * @return {function} - objMD => whether the object matches
+ */
+function compileFilter(filter) {
+    let predicate = compiledFilters.get(filter);
+    if (predicate) {
+        return predicate;
+    }
+    if (filter.$and) {
+        const terms = filter.$and.map(compileFilter);
+        predicate = objMD => terms.every(term => term(objMD));
+    } else if (filter.$or) {
+        const terms = filter.$or.map(compileFilter);
+        predicate = objMD => terms.some(term => term(objMD));
+    } else {
+        const conditions = Object.keys(filter).map(path =>
+            compileCondition(path.slice('value.'.length), filter[path]));
+        predicate = objMD => conditions.every(condition => condition(objMD));
+    }
+    compiledFilters.set(filter, predicate);
+    return predicate;
+}
+
+/**
+ * Check object metadata against a filter built by parseWhere
+ * @param {object} filter - MongoDB-style filter on `value.<field>`
+ * @param {object} objMD - object metadata
+ * @return {boolean} - whether the object matches
+ */
+function matchesFilter(filter, objMD) {
+    return compileFilter(filter)(objMD);
+}
+
+/**
+ * Index lookups returning a superset of the objects matching a filter
+ * @param {string[]} fields - indexed fields
+ * @param {object} filter - MongoDB-style filter built by parseWhere
+ * @return {object[]|null} - lookups as { field, value }, whose results
+ * are to be merged, or null if the index cannot be used
+ */
+function planSearch(fields, filter) {
+    if (filter.$and) {
+        // any term is enough, prefer the one with the fewest lookups
+        return filter.$and
+            .map(f => planSearch(fields, f))
+            .filter(plan => plan !== null)
+            .reduce((best, plan) =>
+                (best === null || plan.length < best.length ? plan : best),
+                null);
+    }
+    if (filter.$or) {
+        const plans = filter.$or.map(f => planSearch(fields, f));
+        return plans.includes(null) ? null : [].concat(...plans);
+    }
+    const paths = Object.keys(filter);
+    if (paths.length !== 1) {
+        return null;
+    }
+    const field = paths[0].slice('value.'.length);
+    const value = filter[paths[0]].$eq;
+    if (!fields.includes(field) || typeof value !== 'string') {
+        return null;
+    }
+    return [{ field, value }];
+}
+
+function getOrCreateIndexBucket(bucketName, log, cb) {
+    const name = indexBucketName(bucketName);
+    if (existingIndexBuckets.has(name)) {
+        return process.nextTick(cb);
+    }
+    return metadata.getBucket(name, log, err => {
+        if (!err) {
+            existingIndexBuckets.add(name);
+            return cb();
+        }
+        if (!err.is.NoSuchBucket) {
+            return cb(err);
+        }
+        return metadata.getBucket(bucketName, log, (err, bucket) => {
+            if (err) {
+                return cb(err);
+            }
+            // like the MPU shadow bucket, the index bucket is not added to
+            // the bucket list of the owner, so that it stays hidden
+            const indexBucket = new BucketInfo(name, bucket.getOwner(),
+                bucket.getOwnerDisplayName(), new Date().toJSON(),
+                BucketInfo.currentModelVersion());
+            return metadata.createBucket(name, indexBucket, log, err => {
+                if (err && !err.is.BucketAlreadyExists) {
+                    return cb(err);
+                }
+                existingIndexBuckets.add(name);
+                return cb();
+            });
+        });
+    });
+}
+
+/**
+ * Write the index entries of an object, from its master version
+ * @param {string} bucketName - bucket name
+ * @param {string} objectKey - object key
+ * @param {string[]} fields - indexed fields
+ * @param {RequestLogger} log - request logger
+ * @param {function} cb - callback(err, written), written being false when
+ * the entries were already up to date
+ * @return {undefined}
+ */
+function writeEntries(bucketName, objectKey, fields, log, cb) {
+    const indexBucket = indexBucketName(bucketName);
+    const objectEntry = `${OBJECT_PREFIX}${objectKey}`;
+    return async.waterfall([
+        next => metadata.getObjectMD(bucketName, objectKey, {}, log,
+            (err, objMD) => {
+                if (err && !err.is.NoSuchKey) {
+                    return next(err);
+                }
+                return next(null, objectEntries(fields, objectKey, objMD || null));
+            }),
+        (entries, next) => metadata.getObjectMD(indexBucket, objectEntry, {},
+            log, (err, indexed) => {
+                if (err && !err.is.NoSuchKey) {
+                    return next(err);
+                }
+                return next(null, entries, (indexed && indexed.entries) || []);
+            }),
+        (entries, previous, next) => {
+            const added = entries.filter(entry => !previous.includes(entry));
+            const removed = previous.filter(entry => !entries.includes(entry));
+            if (added.length === 0 && removed.length === 0) {
+                return next(null, false);
+            }
+            return async.series([
+                done => async.eachLimit(added, FETCH_CONCURRENCY,
+                    (entry, cb) => metadata.putObjectMD(indexBucket, entry,
+                        { key: objectKey }, {}, log, err => cb(err)), done),
+                done => (entries.length > 0 ?
+                    metadata.putObjectMD(indexBucket, objectEntry,
+                        { key: objectKey, entries }, {}, log, err => done(err)) :
+                    metadata.deleteObjectMD(indexBucket, objectEntry, {}, log,
+                        err => done(err && !err.is.NoSuchKey ? err : null))),
+                done => async.eachLimit(removed, FETCH_CONCURRENCY,
+                    (entry, cb) => metadata.deleteObjectMD(indexBucket, entry,
+                        {}, log, err => cb(err && !err.is.NoSuchKey ? err : null)),
+                    done),
+            ], err => next(err, true));
+        },
+    ], cb);
+}
+
+/**
+ * Update the index entries of an object from its master version.
+ *
+ * The updates of an object run one at a time in a process: the calls made
+ * while an update runs wait for it, then share a single update reading
+ * the object again. Updates from other processes (cluster workers) may
+ * still interleave with it, and leave entries computed from a version
+ * older than the one read by the last of them: after writing entries,
+ * the update reads the object and its entries again and rewrites them
+ * until they match, up to UPDATE_ATTEMPTS times, the last version being
+ * indexed by the update of its own write otherwise.
+ * @param {string} bucketName - bucket name
+ * @param {string} objectKey - object key
+ * @param {RequestLogger} log - request logger
+ * @param {function} cb - callback(err)
+ * @return {undefined}
+ */
+function updateObject(bucketName, objectKey, log, cb) {
+    const fields = indexedFields(bucketName);
+    if (fields.length === 0) {
+        return process.nextTick(cb);
+    }
+    const id = `${bucketName}/${objectKey}`;
+    const waiting = runningUpdates.get(id);
+    if (waiting) {
+        waiting.push(cb);
+        return undefined;
+    }
+    runningUpdates.set(id, []);
+    const indexBucket = indexBucketName(bucketName);
+    const done = err => {
+        if (err && err.is.NoSuchBucket) {
+            // the index bucket was deleted with its bucket, by this process
+            // or another one: create it again on the next update
+            existingIndexBuckets.delete(indexBucket);
+        }
+        const next = runningUpdates.get(id);
+        runningUpdates.delete(id);
+        if (next.length > 0) {
+            // the object may have changed after the update read it
+            updateObject(bucketName, objectKey, log,
+                nextErr => next.forEach(waiter => waiter(nextErr)));
+        }
+        return cb(err);
+    };
+    let attempts = 0;
+    const attempt = () => writeEntries(bucketName, objectKey, fields, log,
+        (err, written) => {
+            attempts += 1;
+            if (err || !written || attempts === UPDATE_ATTEMPTS) {
+                return done(err);
+            }
+            return attempt();
+        });
+    return getOrCreateIndexBucket(bucketName, log, err => {
+        if (err) {
+            return done(err);
+        }
+        return attempt();
+    });
+}
+
+/**
+ * Update the index entries of several objects
+ * @param {string} bucketName - bucket name
+ * @param {string[]} objectKeys - object keys
+ * @param {RequestLogger} log - request logger
+ * @param {function} cb - callback(err)
+ * @return {undefined}
+ */
+function updateObjects(bucketName, objectKeys, log, cb) {
+    if (indexedFields(bucketName).length === 0) {
+        return process.nextTick(cb);
+    }
+    return async.eachLimit(objectKeys, FETCH_CONCURRENCY,
+        (objectKey, next) => updateObject(bucketName, objectKey, log, next),
+        err => cb(err));
+}
+
+/**
+ * Callback of an object write updating the index entries of the objects
+ * written once the write succeeded
+ * @param {string} bucketName - bucket name
+ * @param {string[]} objectKeys - keys of the objects written
+ * @param {RequestLogger} log - request logger
+ * @param {function} cb - callback of the write
+ * @return {function} - callback to pass to the write instead of cb
+ */
+function afterWrite(bucketName, objectKeys, log, cb) {
+    if (indexedFields(bucketName).length === 0) {
+        return cb;
+    }
+    return (err, ...results) => {
+        if (err) {
+            return cb(err, ...results);
+        }
+        return updateObjects(bucketName, objectKeys, log, indexErr => {
+            if (indexErr) {
+                log.error('error updating metadata search index', {
+                    error: indexErr,
+                    bucketName,
+                    objectKeys: objectKeys.slice(0, 10),
+                });
+                return cb(indexErr);
+            }
+            return cb(null, ...results);
+        });
+    };
+}
+
+/**
+ * Make the object metadata writes of a metadata wrapper update the index
+ * entries of the objects written, for the buckets with indexed fields.
+ * A write calls back once the index is updated, with the error of the
+ * index update if any: the object changed, and the request writing it
+ * fails so that it is retried, which updates the index again.
+ * @param {object} wrapper - metadata wrapper, see ./wrapper
+ * @return {undefined}
+ */
+function indexWrites(wrapper) {
+    const { putObjectMD, deleteObjectMD } = wrapper;
+    /* eslint-disable no-param-reassign */
+    wrapper.putObjectMD = function indexedPutObjectMD(bucketName, objName,
+        objVal, params, log, cb, ...args) {
+        return putObjectMD.call(this, bucketName, objName, objVal, params,
+            log, afterWrite(bucketName, [objName], log, cb), ...args);
+    };
+    wrapper.deleteObjectMD = function indexedDeleteObjectMD(bucketName,
+        objName, params, log, cb, ...args) {
+        return deleteObjectMD.call(this, bucketName, objName, params, log,
+            afterWrite(bucketName, [objName], log, cb), ...args);
+    };
+    /* eslint-enable no-param-reassign */
+}
+
+function putState(bucketName, state, log, cb) {
+    return metadata.putObjectMD(indexBucketName(bucketName), STATE_KEY,
+        Object.assign({ key: STATE_KEY }, state), {}, log, err => cb(err));
+}
+
+function getState(bucketName, log, cb) {
+    return metadata.getObjectMD(indexBucketName(bucketName), STATE_KEY, {},
+        log, (err, state) => {
+            if (err && (err.is.NoSuchKey || err.is.NoSuchBucket)) {
+                return cb(null, null);
+            }
+            return cb(err, state);
+        });
+}
+
+/**
+ * Index every object of a bucket for its indexed fields, then record that
+ * the index of these fields is complete. The objects written during the
+ * build update their entries themselves (see indexWrites), so that no
+ * object is missed.
+ * @param {BucketInfo} bucket - bucket
+ * @param {RequestLogger} log - request logger
+ * @param {function} cb - callback(err)
+ * @return {undefined}
+ */
+function buildIndex(bucket, log, cb) {
+    const bucketName = bucket.getName();
+    const state = {
+        bucketCreationDate: bucket.getCreationDate(),
+        fields: indexedFields(bucketName),
+    };
+    let marker;
+    let listed = false;
+    return async.series([
+        next => getOrCreateIndexBucket(bucketName, log, next),
+        next => putState(bucketName, Object.assign({
+            buildStarted: new Date().toJSON(),
+        }, state), log, next),
+        next => async.doWhilst(page => metadata.listObject(bucketName, {
+            listingType: 'DelimiterMaster',
+            maxKeys: INDEX_PAGE_SIZE,
+            marker,
+        }, log, (err, list) => {
+            if (err) {
+                return page(err);
+            }
+            const keys = list.Contents.map(entry => entry.key);
+            listed = !list.IsTruncated || keys.length === 0;
+            marker = keys[keys.length - 1];
+            return updateObjects(bucketName, keys, log, page);
+        }), () => !listed, next),
+        next => putState(bucketName, Object.assign({ complete: true }, state),
+            log, next),
+    ], err => {
+        if (!err) {
+            completeBuilds.set(indexBucketName(bucketName), state);
+        }
+        return cb(err);
+    });
+}
+
+/**
+ * Build the index of a bucket in the background, unless this process or
+ * another one is already building it
+ * @param {BucketInfo} bucket - bucket
+ * @param {object} state - state entry of the index, null if none
+ * @return {undefined}
+ */
+function startBuild(bucket, state) {
+    const bucketName = bucket.getName();
+    if (runningBuilds.has(bucketName) || (state && !state.complete &&
+        state.bucketCreationDate === bucket.getCreationDate() &&
+        Date.now() - Date.parse(state.buildStarted) < BUILD_TIMEOUT_MS)) {
+        return;
+    }
+    runningBuilds.add(bucketName);
+    const log = logger.newRequestLogger();
+    log.info('building metadata search index', {
+        bucketName,
+        fields: indexedFields(bucketName),
+    });
+    buildIndex(bucket, log, err => {
+        runningBuilds.delete(bucketName);
+        if (err) {
+            log.error('error building metadata search index', {
+                error: err,
+                bucketName,
+            });
+            return;
+        }
+        log.info('metadata search index built', { bucketName });
+    });
+}
+
+/**
+ * Indexed fields of a bucket whose index is complete, building the index
+ * of the others in the background
+ * @param {BucketInfo} bucket - bucket
+ * @param {string[]} fields - indexed fields
+ * @param {RequestLogger} log - request logger
+ * @param {function} cb - callback(err, builtFields)
+ * @return {undefined}
+ */
+function getBuiltFields(bucket, fields, log, cb) {
+    const built = completeBuilds.get(indexBucketName(bucket.getName()));
+    // a bucket deleted and created again has a new creation date, and an
+    // index to build again
+    if (built && built.bucketCreationDate === bucket.getCreationDate() &&
+        fields.every(field => built.fields.includes(field))) {
+        return process.nextTick(cb, null, fields);
+    }
+    return getState(bucket.getName(), log, (err, state) => {
+        if (err) {
+            return cb(err);
+        }
+        const current = state && state.complete &&
+            state.bucketCreationDate === bucket.getCreationDate();
+        const builtFields = current ?
+            fields.filter(field => state.fields.includes(field)) : [];
+        if (current) {
+            completeBuilds.set(indexBucketName(bucket.getName()), {
+                bucketCreationDate: state.bucketCreationDate,
+                fields: state.fields,
+            });
+        }
+        if (builtFields.length < fields.length) {
+            startBuild(bucket, state);
+        }
+        return cb(null, builtFields);
+    });
+}
+
+/**
+ * Whether a metadata search can be answered from the index, which requires
+ * the index of the fields searched to be built
+ * @param {BucketInfo} bucket - bucket searched
+ * @param {object} listParams - listing parameters of metadataSearch
+ * @param {RequestLogger} log - request logger
+ * @param {function} cb - callback(err, plan), plan being the index
+ * lookups, null if the index cannot be used
+ * @return {undefined}
+ */
+function getSearchPlan(bucket, listParams, log, cb) {
+    const fields = indexedFields(bucket.getName());
+    if (fields.length === 0 || listParams.delimiter ||
+        listParams.listingType !== 'DelimiterMaster') {
+        return process.nextTick(cb, null, null);
+    }
+    return getBuiltFields(bucket, fields, log, (err, builtFields) => {
+        if (err) {
+            return cb(err);
+        }
+        return cb(null, builtFields.length > 0 ?
+            planSearch(builtFields, listParams.mongifiedSearch) : null);
+    });
+}
+
+/**
+ * Listing entry of an object, as returned by metadata listings
+ * @param {string} objectKey - object key
+ * @param {object} objMD - object metadata
+ * @return {object} - listing entry
+ */
+function listingEntry(objectKey, objMD) {
+    return {
+        key: objectKey,
+        value: {
+            IsDeleteMarker: !!objMD.isDeleteMarker,
+            isDeleteMarker: !!objMD.isDeleteMarker,
+            LastModified: objMD['last-modified'],
+            ETag: objMD['content-md5'],
+            Size: objMD['content-length'],
+            StorageClass: objMD['x-amz-storage-class'],
+            Owner: {
+                ID: objMD['owner-id'],
+                DisplayName: objMD['owner-display-name'],
+            },
+            VersionId: objMD.versionId,
+        },
+    };
+}
+
+/**
+ * Read the next page of object keys of an index lookup
+ * @param {string} bucketName - bucket name
+ * @param {object} lookup - index lookup, with the cursor of the previous
+ * page
+ * @param {string} objectPrefix - prefix of the object keys
+ * @param {RequestLogger} log - request logger
+ * @param {function} cb - callback(err)
+ * @return {undefined}
+ */
+function readLookupPage(bucketName, lookup, objectPrefix, log, cb) {
+    const prefix = fieldPrefix(lookup.field, lookup.value);
+    const params = {
+        listingType: 'Delimiter',
+        prefix: `${prefix}${objectPrefix}`,
+        maxKeys: INDEX_PAGE_SIZE,
+    };
+    if (lookup.after !== undefined) {
+        params.marker = `${prefix}${lookup.after}`;
+    }
+    return metadata.listObject(indexBucketName(bucketName), params, log,
+        (err, list) => {
+            if (err && err.is.NoSuchBucket) {
+                // nothing indexed yet
+                Object.assign(lookup, { keys: [], done: true });
+                return cb();
+            }
+            if (err) {
+                return cb(err);
+            }
+            const keys = list.Contents.map(entry => entry.key.slice(prefix.length));
+            Object.assign(lookup, {
+                keys,
+                done: !list.IsTruncated,
+                after: keys.length > 0 ? keys[keys.length - 1] : lookup.after,
+            });
+            return cb();
+        });
+}
+
+/**
+ * Answer a metadata search from the index, see getSearchPlan
+ * @param {string} bucketName - bucket name
+ * @param {object} listParams - listing parameters of metadataSearch
+ * @param {object[]} plan - index lookups
+ * @param {RequestLogger} log - request logger
+ * @param {function} cb - callback(err, list), list being formatted like
+ * a DelimiterMaster listing
+ * @return {undefined}
+ */
+function searchObjects(bucketName, listParams, plan, log, cb) {
+    const start = listParams.v2 ?
+        (listParams.continuationToken || listParams.startAfter) :
+        listParams.marker;
+    let matches;
+    try {
+        matches = compileFilter(listParams.mongifiedSearch);
+    } catch (err) {
+        // invalid regular expression options
+        return process.nextTick(cb, errors.InvalidArgument
+            .customizeDescription('Invalid sql where clause ' +
+                'sent as search query'));
+    }
+    const lookups = plan.map(({ field, value }) => ({
+        field, value, after: start, keys: [], done: false,
+    }));
+    const contents = [];
+    let isTruncated = false;
+
+    function nextRound(done) {
+        const pending = lookups.filter(lookup => !lookup.done);
+        lookups.forEach(lookup => {
+            // eslint-disable-next-line no-param-reassign
+            lookup.keys = [];
+        });
+        async.each(pending,
+            (lookup, next) => readLookupPage(bucketName, lookup,
+                listParams.prefix || '', log, next),
+            err => {
+                if (err) {
+                    return done(err);
+                }
+                // all the matching keys up to the smallest last key read
+                // by the unfinished lookups are known: the keys after it
+                // are read again by the next round
+                const bound = lookups.filter(lookup => !lookup.done)
+                    .map(lookup => lookup.after)
+                    .reduce((a, b) => (a === undefined || b < a ? b : a),
+                        undefined);
+                const candidates = [];
+                lookups.forEach(lookup => {
+                    lookup.keys.forEach(key => {
+                        if (bound === undefined || key <= bound) {
+                            candidates.push(key);
+                        }
+                    });
+                    if (bound !== undefined && (!lookup.done ||
+                        lookup.keys.some(key => key > bound))) {
+                        /* eslint-disable no-param-reassign */
+                        lookup.done = false;
+                        lookup.after = bound;
+                        /* eslint-enable no-param-reassign */
+                    }
+                });
+                const keys = Array.from(new Set(candidates)).sort();
+                return async.mapLimit(keys, FETCH_CONCURRENCY,
+                    (key, next) => metadata.getObjectMD(bucketName, key, {},
+                        log, (err, objMD) => {
+                            if (err && err.is.NoSuchKey) {
+                                return next(null, null);
+                            }
+                            return next(err, objMD && !objMD.isDeleteMarker &&
+                                matches(objMD) ?
+                                listingEntry(key, objMD) : null);
+                        }),
+                    (err, entries) => {
+                        if (err) {
+                            return done(err);
+                        }
+                        const matching = entries.filter(entry => entry !== null);
+                        const room = listParams.maxKeys - contents.length;
+                        contents.push(...matching.slice(0, room));
+                        const finished = lookups.every(lookup => lookup.done);
+                        if (matching.length > room ||
+                            (contents.length === listParams.maxKeys && !finished)) {
+                            isTruncated = true;
+                            return done();
+                        }
+                        return finished ? done() : nextRound(done);
+                    });
+            });
+    }
+
+    return nextRound(err => {
+        if (err) {
+            return cb(err);
+        }
+        const list = {
+            CommonPrefixes: [],
+            Contents: contents,
+            IsTruncated: isTruncated,
+        };
+        if (isTruncated && contents.length > 0) {
+            const lastKey = contents[contents.length - 1].key;
+            if (listParams.v2) {
+                list.NextContinuationToken = lastKey;
+            } else {
+                list.NextMarker = lastKey;
+            }
+        }
+        return cb(null, list);
+    });
+}
+
+/**
+ * Delete the index bucket of a bucket being deleted
+ * @param {string} bucketName - bucket name
+ * @param {RequestLogger} log - request logger
+ * @param {function} cb - callback(err)
+ * @return {undefined}
+ */
+function deleteIndexBucket(bucketName, log, cb) {
+    if (indexedFields(bucketName).length === 0) {
+        return process.nextTick(cb);
+    }
+    const name = indexBucketName(bucketName);
+    existingIndexBuckets.delete(name);
+    completeBuilds.delete(name);
+    return metadata.deleteBucket(name, log, err => {
+        // nothing was ever indexed, see _deleteMPUbucket about `.is`
+        if (err && err.NoSuchBucket) {
+            return cb();
+        }
+        return cb(err);
+    });
+}
+
+indexWrites(metadata);
+
+module.exports = {
+    indexBucketName,
+    fieldValue,
+    objectEntries,
+    compileFilter,
+    matchesFilter,
+    planSearch,
+    updateObject,
+    updateObjects,
+    indexWrites,
+    buildIndex,
+    getSearchPlan,
+    searchObjects,
+    deleteIndexBucket,
+};
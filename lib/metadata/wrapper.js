@@ -1,8 +1,11 @@
+const async = require('async');
 const MetadataWrapper = require('arsenal').storage.metadata.MetadataWrapper;
 const { config } = require('../Config');
 const logger = require('../utilities/logger');
 const constants = require('../../constants');
 const bucketclient = require('bucketclient');
+const { instrument } = require('../utilities/requestPhases');
+const { invalidateOnWrites } = require('./bucketCache');
 
 const clientName = config.backends.metadata;
 let params;
@@ -40,4 +43,27 @@ if (clientName === 'mem') {
 
 const metadata = new MetadataWrapper(config.backends.metadata, params,
     bucketclient, logger);
+
+/**
+ * Delete objects of a bucket, e.g. the parts of a completed or aborted
+ * multipart upload, config.metadataDeleteConcurrency at a time
+ * @param {string} bucketName - bucket name
+ * @param {string[]} objNames - keys of the objects to delete
+ * @param {object} params - delete parameters, as for deleteObjectMD
+ * @param {RequestLogger} log - request logger
+ * @param {function} cb - callback(err)
+ * @return {undefined}
+ */
+metadata.deleteObjectsMD = function deleteObjectsMD(bucketName, objNames, params, log, cb) {
+    return async.eachLimit(objNames, config.metadataDeleteConcurrency,
+        (objName, done) => this.deleteObjectMD(bucketName, objName, params, log, done),
+        err => cb(err));
+};
+
+invalidateOnWrites(metadata);
+instrument(metadata, 'metadata');
 module.exports = metadata;
+
+// makes the object writes update the metadata search indexes, once the
+// wrapper is exported: the index module requires it
+require('./searchIndex');
@@ -0,0 +1,173 @@
+/**
+ * Cache of the utilization metrics of the quota service, per resource.
+ *
+ * Every write to a bucket with a quota needs the utilization metrics of
+ * the bucket and of its account: on a hot bucket, each request would send
+ * its own request to the quota service. Instead, the metrics of a resource
+ * are fetched at most once per freshness window:
+ * - requests arriving while the metrics are fresh are answered from the
+ *   cache;
+ * - requests arriving while they are being fetched wait for that fetch;
+ * - the inflight bytes of the requests, when inflights are enabled, are
+ *   accounted locally and added to the cached bytesTotal, then sent to
+ *   the quota service with the next fetch, summed. A fetch is scheduled at
+ *   the end of the window when inflight bytes are waiting, so that they
+ *   always reach the quota service.
+ */
+class UtilizationMetricsCache {
+    /**
+     * @param {object} params - cache parameters
+     * @param {function} params.fetch - (metricsClass, resourceName, options,
+     * body, cb) fetching the metrics from the quota service
+     * @param {number} params.freshness - freshness window, in milliseconds
+     * @param {object} [params.metrics] - hit/miss/eviction/size observers,
+     * see monitoringHandler.cacheMetrics
+     * @param {function} [params.now] - clock, in milliseconds
+     */
+    constructor(params) {
+        this._fetch = params.fetch;
+        this._freshness = params.freshness;
+        this._metrics = params.metrics || null;
+        this._now = params.now || Date.now;
+        // `${metricsClass}:${resourceName}` -> entry
+        this._entries = new Map();
+        this._sweepTimer = setInterval(() => this._sweep(),
+            Math.max(this._freshness * 10, 1000));
+        this._sweepTimer.unref();
+    }
+
+    get size() {
+        return this._entries.size;
+    }
+
+    _sweep() {
+        const now = this._now();
+        this._entries.forEach((entry, key) => {
+            if (!entry.waiters && entry.pending === 0 &&
+                entry.fetchedAt + this._freshness <= now) {
+                this._entries.delete(key);
+                if (this._metrics) {
+                    this._metrics.eviction('expired');
+                }
+            }
+        });
+        if (this._metrics) {
+            this._metrics.size(this._entries.size);
+        }
+    }
+
+    _view(entry) {
+        if (entry.pending === 0) {
+            return entry.data;
+        }
+        return Object.assign({}, entry.data, {
+            bytesTotal: entry.data.bytesTotal + entry.pending,
+        });
+    }
+
+    _refresh(entry, action) {
+        /* eslint-disable no-param-reassign */
+        const sent = entry.pending;
+        entry.pending = 0;
+        entry.waiters = entry.waiters || [];
+        if (entry.flushTimer) {
+            clearTimeout(entry.flushTimer);
+            entry.flushTimer = null;
+        }
+        const body = { action };
+        if (entry.withInflights) {
+            body.inflight = sent;
+        }
+        this._fetch(entry.metricsClass, entry.resourceName, null, body,
+            (err, data) => {
+                const { waiters } = entry;
+                entry.waiters = null;
+                entry.attemptedAt = this._now();
+                if (err) {
+                    // the quota service did not record them: send them again
+                    entry.pending += sent;
+                } else {
+                    entry.data = data;
+                    entry.fetchedAt = this._now();
+                }
+                waiters.forEach(cb => cb(err, err ? undefined : this._view(entry)));
+                this._scheduleFlush(entry, action);
+            });
+        /* eslint-enable no-param-reassign */
+    }
+
+    _scheduleFlush(entry, action) {
+        if (entry.pending === 0 || entry.waiters || entry.flushTimer) {
+            return;
+        }
+        // at most one fetch per window, failed ones included
+        const delay = Math.max(
+            entry.attemptedAt + this._freshness - this._now(), 0);
+        // eslint-disable-next-line no-param-reassign
+        entry.flushTimer = setTimeout(() => {
+            // eslint-disable-next-line no-param-reassign
+            entry.flushTimer = null;
+            if (!entry.waiters && entry.pending !== 0) {
+                this._refresh(entry, action);
+            }
+        }, delay);
+        entry.flushTimer.unref();
+    }
+
+    /**
+     * Same as ScubaClientImpl.getUtilizationMetrics
+     * @param {string} metricsClass - 'bucket' or 'account'
+     * @param {string} resourceName - resource name
+     * @param {object} options - request options, unused
+     * @param {object} body - { action, inflight }, inflight being undefined
+     * when inflights are disabled
+     * @param {function} callback - callback(err, metrics)
+     * @return {undefined}
+     */
+    getUtilizationMetrics(metricsClass, resourceName, options, body, callback) {
+        const key = `${metricsClass}:${resourceName}`;
+        let entry = this._entries.get(key);
+        if (!entry) {
+            entry = {
+                metricsClass,
+                resourceName,
+                data: null,
+                fetchedAt: null,
+                attemptedAt: 0,
+                // inflight bytes not sent to the quota service yet
+                pending: 0,
+                withInflights: false,
+                // callbacks waiting for the fetch in progress, if any
+                waiters: null,
+                flushTimer: null,
+            };
+            this._entries.set(key, entry);
+            if (this._metrics) {
+                this._metrics.size(this._entries.size);
+            }
+        }
+        if (typeof body.inflight === 'number') {
+            entry.withInflights = true;
+            entry.pending += body.inflight;
+        }
+        const fresh = entry.data !== null &&
+            entry.fetchedAt + this._freshness > this._now();
+        if (this._metrics) {
+            this._metrics.lookup(fresh);
+        }
+        if (fresh) {
+            const view = this._view(entry);
+            this._scheduleFlush(entry, body.action);
+            return process.nextTick(callback, null, view);
+        }
+        if (entry.waiters) {
+            entry.waiters.push(callback);
+            return undefined;
+        }
+        entry.waiters = [callback];
+        this._refresh(entry, body.action);
+        return undefined;
+    }
+}
+
+module.exports = UtilizationMetricsCache;
@@ -2,6 +2,7 @@ const util = require('util');
 const { default: ScubaClient } = require('scubaclient');
 const { externalBackendHealthCheckInterval } = require('../../../constants');
 const monitoring = require('../../utilities/monitoringHandler');
+const UtilizationMetricsCache = require('./metricsCache');
 
 class ScubaClientImpl extends ScubaClient {
     constructor(config) {
@@ -11,6 +12,14 @@ class ScubaClientImpl extends ScubaClient {
         this._healthCheckTimer = null;
         this._log = null;
         this._getLatestMetricsCallback = util.callbackify(this.getLatestMetrics);
+        this._metricsCache = null;
+        if (config.quota.metricsCacheMS > 0) {
+            this._metricsCache = new UtilizationMetricsCache({
+                fetch: this._fetchUtilizationMetrics.bind(this),
+                freshness: config.quota.metricsCacheMS,
+                metrics: monitoring.cacheMetrics('quota_utilization_metrics'),
+            });
+        }
 
         if (config.scuba) {
             this.enabled = true;
@@ -63,6 +72,15 @@ class ScubaClientImpl extends ScubaClient {
     }
 
     getUtilizationMetrics(metricsClass, resourceName, options, body, callback) {
+        if (this._metricsCache) {
+            return this._metricsCache.getUtilizationMetrics(metricsClass,
+                resourceName, options, body, callback);
+        }
+        return this._fetchUtilizationMetrics(metricsClass, resourceName,
+            options, body, callback);
+    }
+
+    _fetchUtilizationMetrics(metricsClass, resourceName, options, body, callback) {
         const requestStartTime = process.hrtime.bigint();
         return this._getLatestMetricsCallback(metricsClass, resourceName, options, body, (err, data) => {
             const responseTimeInNs = Number(process.hrtime.bigint() - requestStartTime);
@@ -608,7 +608,7 @@ function putMetadata(request, response, bucketInfo, objMd, log, callback) {
                         bucketName,
                         objectKey,
                     });
-                    async.eachLimit(objMd.location, 5,
+                    dataWrapper.deleteQueue(objMd.location).eachLimit(objMd.location,
                     (loc, next) => dataWrapper.data.delete(loc, log, err => {
                         if (err) {
                             log.warn('error removing old data location key', {
@@ -1150,7 +1150,7 @@ function batchDelete(request, response, userInfo, log, callback) {
                 request, response, locations, log, callback);
         }
         log.trace('batch delete locations', { locations });
-        return async.eachLimit(locations, 5, (loc, next) => {
+        return dataWrapper.deleteQueue(locations).eachLimit(locations, (loc, next) => {
             const _loc = Object.assign({}, loc);
             if (_loc.dataStoreVersionId !== undefined) {
                 // required by cloud backends
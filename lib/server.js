@@ -5,6 +5,7 @@ const { series } = require('async');
 const arsenal = require('arsenal');
 const { RedisClient, StatsClient } = arsenal.metrics;
 const monitoringClient = require('./utilities/monitoringHandler');
+const { PhaseTimer, runWithPhaseTimer, instrument } = require('./utilities/requestPhases');
 
 const logger = require('./utilities/logger');
 const { internalHandlers } = require('./utilities/internalHandlers');
@@ -18,6 +19,7 @@ const locationStorageCheck =
     require('./api/apiUtils/object/locationStorageCheck');
 const vault = require('./auth/vault');
 const metadata = require('./metadata/wrapper');
+const { setupClusterRelay } = require('./metadata/bucketCache');
 const { initManagement } = require('./management');
 const {
     initManagementClient,
@@ -41,8 +43,8 @@ updateAllEndpoints();
 _config.on('location-constraints-update', () => {
     if (implName === 'multipleBackends') {
         const clients = parseLC(_config, vault);
-        client = new MultipleBackendGateway(
-            clients, metadata, locationStorageCheck);
+        client = instrument(new MultipleBackendGateway(
+            clients, metadata, locationStorageCheck), 'data', ['get']);
     }
 });
 
@@ -102,6 +104,8 @@ class S3Server {
     routeRequest(req, res) {
         monitoringClient.httpActiveRequests.inc();
         const requestStartTime = process.hrtime.bigint();
+        const phaseTimer = _config.monitoring.requestPhaseMetrics ?
+            new PhaseTimer() : null;
 
         // disable nagle algorithm
         req.socket.setNoDelay();
@@ -125,6 +129,24 @@ class S3Server {
                 .labels(labels)
                 .observe(responseTimeInNs / 1e9);
             monitoringClient.httpActiveRequests.dec();
+            if (phaseTimer && req.apiMethod) {
+                const total = responseTimeInNs / 1e9;
+                let accounted = 0;
+                Object.entries(phaseTimer.durations).forEach(([phase, seconds]) => {
+                    accounted += seconds;
+                    monitoringClient.httpRequestPhaseDurationSeconds
+                        .labels(req.apiMethod, phase).observe(seconds);
+                });
+                // request parsing, body transfer, response streaming...
+                monitoringClient.httpRequestPhaseDurationSeconds
+                    .labels(req.apiMethod, 'other')
+                    .observe(Math.max(0, total - accounted));
+            }
+            monitoringClient.promBucketAndAccountMetrics(
+                req.bucketName, req.accountName, res.statusCode,
+                responseTimeInNs / 1e9,
+                Number.parseInt(req.headers['content-length'], 10) || 0,
+                Number.parseInt(res.getHeader('content-length'), 10) || 0);
         };
         res.on('close', monitorEndOfRequest);
 
@@ -151,7 +173,11 @@ class S3Server {
                 vault,
             },
         };
-        routes(req, res, params, logger, _config);
+        if (phaseTimer) {
+            runWithPhaseTimer(phaseTimer, () => routes(req, res, params, logger, _config));
+        } else {
+            routes(req, res, params, logger, _config);
+        }
     }
 
     /**
@@ -376,6 +402,7 @@ function main() {
                 }
             }
         }, 1000);
+        setupClusterRelay(cluster);
         cluster.on('disconnect', worker => {
             logger.error('worker disconnected. making sure exits', {
                 workerId: worker.id,
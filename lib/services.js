@@ -911,12 +911,9 @@ const services = {
     },
 
     batchDeleteObjectMetadata(mpuBucketName, keysToDelete, log, cb) {
-        // If have efficient way to batch delete metadata, should so this
-        // all at once in production implementation
         assert.strictEqual(typeof mpuBucketName, 'string');
-        async.eachLimit(keysToDelete, 5, (key, callback) => {
-            metadata.deleteObjectMD(mpuBucketName, key, { overheadField: constants.overheadField }, log, callback);
-        }, err => cb(err));
+        metadata.deleteObjectsMD(mpuBucketName, keysToDelete,
+            { overheadField: constants.overheadField }, log, cb);
     },
 };
 
@@ -0,0 +1,275 @@
+const crypto = require('crypto');
+const fs = require('fs');
+const http = require('http');
+const https = require('https');
+const path = require('path');
+
+const SPILL_FILE = /^utapi-spill-.*\.jsonl$/;
+
+/**
+ * Returns a function sending utapi v2 events to the ingestion route of a
+ * utapi server, several events per request.
+ * @param {object} params - server parameters
+ * @param {string} [params.host] - utapi host
+ * @param {number} [params.port] - utapi port
+ * @param {object} [params.tls] - TLS options (key, cert, ca), https if set
+ * @return {function} - (events, cb) sending the events
+ */
+function createIngestSender(params) {
+    const transport = params.tls ? https : http;
+    const agent = new transport.Agent({ keepAlive: true });
+    return (events, cb) => {
+        const body = JSON.stringify(events);
+        const request = transport.request(Object.assign({
+            host: params.host || 'localhost',
+            port: params.port || 8100,
+            method: 'POST',
+            path: '/v2/ingest',
+            agent,
+            headers: {
+                'content-type': 'application/json',
+                'content-length': Buffer.byteLength(body),
+            },
+        }, params.tls || {}), response => {
+            response.resume();
+            response.on('end', () => cb(response.statusCode === 200 ? null :
+                new Error(`utapi returned HTTP ${response.statusCode}`)));
+        });
+        request.on('error', cb);
+        request.end(body);
+    };
+}
+
+/**
+ * Buffer of utapi v2 events, sent in batches.
+ *
+ * Every S3 operation produces an event: instead of one request to utapi
+ * per event, events are buffered and sent together when `maxEvents` are
+ * waiting or every `flushInterval` milliseconds. Events keep their own
+ * timestamp and uuid, so utapi counts them exactly as if they had been
+ * sent one by one.
+ *
+ * Batches that cannot be sent, and the events still buffered when the
+ * process exits, are appended to a spill file of `spillDir`. Spill files,
+ * of this process or of crashed ones, are sent again periodically, each
+ * one being claimed by renaming it so that processes sharing the directory
+ * do not send it twice. Only the events buffered when a process is killed
+ * without exiting are lost, at most `flushInterval` milliseconds of them.
+ */
+class UtapiMetricsBatcher {
+    /**
+     * @param {object} params - batcher parameters
+     * @param {function} params.send - (events, cb) sending a batch
+     * @param {number} params.maxEvents - events per batch
+     * @param {number} params.flushInterval - milliseconds between flushes
+     * @param {string|null} params.spillDir - directory of the spill files,
+     * null to drop the batches that cannot be sent
+     * @param {number} [params.replayInterval] - milliseconds between
+     * replays of the spill files
+     * @param {object} [params.logger] - werelogs logger
+     */
+    constructor(params) {
+        this._send = params.send;
+        this._maxEvents = params.maxEvents;
+        this._flushInterval = params.flushInterval;
+        this._spillDir = params.spillDir;
+        this._replayInterval = params.replayInterval || 60000;
+        this._logger = params.logger || null;
+        this._spillFile = this._spillDir ? path.join(this._spillDir,
+            `utapi-spill-${process.pid}-${Date.now()}.jsonl`) : null;
+        this._events = [];
+        this._timers = [];
+        this._replaying = false;
+        this.stats = {
+            events: 0,
+            batches: 0,
+            failedBatches: 0,
+            spilledEvents: 0,
+            replayedEvents: 0,
+        };
+    }
+
+    /**
+     * Start the periodic flushes and replays, and the spill of the buffered
+     * events at exit.
+     * @return {undefined}
+     */
+    start() {
+        this._timers.push(setInterval(() => this.flush(),
+            this._flushInterval));
+        if (this._spillDir) {
+            fs.mkdirSync(this._spillDir, { recursive: true });
+            this._timers.push(setInterval(() => this.replaySpilled(),
+                this._replayInterval));
+            this.replaySpilled();
+        }
+        this._timers.forEach(timer => timer.unref());
+        this._onExit = () => this._spillSync();
+        process.on('exit', this._onExit);
+    }
+
+    stop() {
+        this._timers.forEach(timer => clearInterval(timer));
+        this._timers = [];
+        if (this._onExit) {
+            process.removeListener('exit', this._onExit);
+            this._onExit = null;
+        }
+    }
+
+    /**
+     * @param {object} event - utapi v2 event
+     * @return {undefined}
+     */
+    add(event) {
+        /* eslint-disable no-param-reassign */
+        event.timestamp = event.timestamp || Date.now();
+        event.uuid = event.uuid || crypto.randomUUID();
+        /* eslint-enable no-param-reassign */
+        this._events.push(event);
+        this.stats.events += 1;
+        if (this._events.length >= this._maxEvents) {
+            this.flush();
+        }
+    }
+
+    /**
+     * Send the buffered events
+     * @param {function} [cb] - callback(), once sent or spilled
+     * @return {undefined}
+     */
+    flush(cb) {
+        const done = cb || (() => {});
+        if (this._events.length === 0) {
+            return process.nextTick(done);
+        }
+        const batch = this._events;
+        this._events = [];
+        return this._sendBatch(batch, done);
+    }
+
+    _sendBatch(batch, cb) {
+        this.stats.batches += 1;
+        this._send(batch, err => {
+            if (!err) {
+                return cb();
+            }
+            this.stats.failedBatches += 1;
+            if (this._logger) {
+                this._logger.error('unable to push metrics to utapi', {
+                    error: err.message,
+                    events: batch.length,
+                    spilled: !!this._spillFile,
+                });
+            }
+            return this._spill(batch, cb);
+        });
+    }
+
+    _serialize(events) {
+        return events.map(event => `${JSON.stringify(event)}\n`).join('');
+    }
+
+    _spill(events, cb) {
+        if (!this._spillFile) {
+            return process.nextTick(cb);
+        }
+        return fs.appendFile(this._spillFile, this._serialize(events), err => {
+            if (err && this._logger) {
+                this._logger.error('unable to spill utapi metrics', {
+                    error: err.message,
+                    events: events.length,
+                });
+            } else if (!err) {
+                this.stats.spilledEvents += events.length;
+            }
+            return cb();
+        });
+    }
+
+    _spillSync() {
+        if (!this._spillFile || this._events.length === 0) {
+            return;
+        }
+        const events = this._events;
+        this._events = [];
+        try {
+            fs.appendFileSync(this._spillFile, this._serialize(events));
+            this.stats.spilledEvents += events.length;
+        } catch (err) {
+            // exiting: nothing else can be done with them
+        }
+    }
+
+    /**
+     * Send again the events of the spill files of the directory
+     * @param {function} [cb] - callback(), once every file is processed
+     * @return {undefined}
+     */
+    replaySpilled(cb) {
+        const done = cb || (() => {});
+        if (!this._spillDir || this._replaying) {
+            return process.nextTick(done);
+        }
+        this._replaying = true;
+        const finish = () => {
+            this._replaying = false;
+            done();
+        };
+        return fs.readdir(this._spillDir, (err, files) => {
+            if (err) {
+                return finish();
+            }
+            const spilled = files.filter(file => SPILL_FILE.test(file));
+            const next = () => {
+                if (spilled.length === 0) {
+                    return finish();
+                }
+                return this._replayFile(path.join(this._spillDir,
+                    spilled.shift()), next);
+            };
+            return next();
+        });
+    }
+
+    _replayFile(file, cb) {
+        const claimed = `${file}.replay-${process.pid}`;
+        // the spill file of this process is appended to: rename it, later
+        // spills create it again
+        return fs.rename(file, claimed, err => {
+            if (err) {
+                // claimed by another process
+                return cb();
+            }
+            return fs.readFile(claimed, 'utf8', (err, data) => {
+                if (err) {
+                    return cb();
+                }
+                const events = [];
+                data.split('\n').forEach(line => {
+                    try {
+                        if (line) {
+                            events.push(JSON.parse(line));
+                        }
+                    } catch (err) {
+                        // line truncated by a crash while spilling
+                    }
+                });
+                const sendNext = () => {
+                    if (events.length === 0) {
+                        return fs.unlink(claimed, () => cb());
+                    }
+                    const batch = events.splice(0, this._maxEvents);
+                    this.stats.replayedEvents += batch.length;
+                    return this._sendBatch(batch, sendNext);
+                };
+                return sendNext();
+            });
+        });
+    }
+}
+
+module.exports = {
+    createIngestSender,
+    UtapiMetricsBatcher,
+};
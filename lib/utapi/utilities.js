@@ -6,6 +6,7 @@ const { UtapiClient, utapiVersion } = require('utapi');
 const logger = require('../utilities/logger');
 const _config = require('../Config').config;
 const { suppressedUtapiEventFields: suppressedEventFields } = require('../../constants');
+const { createIngestSender, UtapiMetricsBatcher } = require('./metricsBatcher');
 // setup utapi client
 let utapiConfig;
 
@@ -24,6 +25,59 @@ if (utapiVersion === 1 && _config.utapi) {
 
 const utapi = new UtapiClient(utapiConfig);
 
+// utapi v2 events sent in batches instead of one request per operation
+let batcher = null;
+if (utapiVersion === 2 && _config.utapi && _config.utapi.batching.enabled) {
+    const { maxEvents, flushInterval, spillDir } = _config.utapi.batching;
+    batcher = new UtapiMetricsBatcher({
+        // same server and TLS settings as the client
+        send: createIngestSender({
+            host: utapiConfig.host,
+            port: utapiConfig.port,
+            tls: utapiConfig.tls,
+        }),
+        maxEvents,
+        flushInterval,
+        spillDir,
+        logger,
+    });
+    batcher.start();
+}
+
+/**
+ * Whether a utapi v2 event passes the utapi.filter of the configuration,
+ * as checked by the utapi client for the events it sends itself
+ * @param {object} event - utapi v2 event
+ * @return {boolean} - true if the event is to be pushed
+ */
+function _isEventAllowed(event) {
+    const filter = _config.utapi.filter || {};
+    return Object.keys(filter).every(field => {
+        const { allow, deny } = filter[field];
+        if (allow) {
+            return allow.has(event[field]);
+        }
+        return !deny.has(event[field]);
+    });
+}
+
+/**
+ * Buffer a utapi v2 event, with the fields suppressed by the utapi client
+ * removed
+ * @param {object} event - utapi v2 event
+ * @return {undefined}
+ */
+function _batchEvent(event) {
+    if (!_isEventAllowed(event)) {
+        return;
+    }
+    suppressedEventFields.forEach(field => {
+        // eslint-disable-next-line no-param-reassign
+        delete event[field];
+    });
+    batcher.add(event);
+}
+
 const bucketOwnerMetrics = [
     'completeMultipartUpload',
     'multiObjectDelete',
@@ -254,7 +308,7 @@ function listMetrics(metricType) {
  * @param {boolean} [metricObject.isDelete] - (optional) Indicates whether this
  * is a delete operation
  * @return {function | undefined} - `utapi.pushMetric` or undefined if the action is
- * filtered out and not pushed to utapi.
+ * filtered out, or batched (see utapi.batching), and not pushed to utapi.
  */
 function pushMetric(action, log, metricObj) {
     const {
@@ -325,6 +379,9 @@ function pushMetric(action, log, metricObj) {
 
         utapiObj.account = authInfo ? evalAuthInfo(authInfo, canonicalID, action).accountId : canonicalID;
         utapiObj.user = authInfo ? evalAuthInfo(authInfo, canonicalID, action).userId : undefined;
+        if (batcher) {
+            return _batchEvent(utapiObj);
+        }
         return utapi.pushMetric(utapiObj);
     }
     const utapiObj = {
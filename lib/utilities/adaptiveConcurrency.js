@@ -0,0 +1,218 @@
+// errors telling that there was nothing to do, not that the backend suffers
+function isBackendError(err) {
+    return !!err && !(err.is && (err.is.ObjNotFound || err.is.NoSuchKey));
+}
+
+/**
+ * Queue of asynchronous tasks whose concurrency adapts to the backend they
+ * call, by additive increase and multiplicative decrease (AIMD).
+ *
+ * The concurrency limit grows by one every `limit` tasks completed without
+ * congestion, and is halved on congestion, at most once per task latency
+ * so that the tasks started before the decrease do not decrease it again.
+ * A task signals congestion when it fails, or when the smoothed latency of
+ * the tasks exceeds `tolerance` times the baseline latency: a slower
+ * average of the latencies of the tasks completed without congestion, which
+ * stands for the latency of the backend when it is not overloaded, and is
+ * measured again every `baselineWindow` milliseconds to follow lasting
+ * changes of the backend. The limit stays between `min` and `max`.
+ *
+ * The queue is shared by the requests of the process, each pushing a job
+ * of one or more tasks (see eachLimit). Jobs are served in turn, one task
+ * at a time, so that a request with many tasks, or whose tasks are slow,
+ * delays the tasks of the other requests by at most one task of its own
+ * per free slot instead of running all of its tasks first. It still takes
+ * its share of the concurrency limit of the backend.
+ *
+ * Tasks completing synchronously do not nest calls: the tasks they let
+ * start are started by the loop already running.
+ */
+class AdaptiveConcurrency {
+    /**
+     * @param {object} params - queue parameters
+     * @param {number} params.min - minimum concurrency
+     * @param {number} params.max - maximum concurrency
+     * @param {number} params.initial - initial concurrency
+     * @param {number} [params.tolerance] - latency increase over the
+     * baseline considered as congestion
+     * @param {number} [params.baselineWindow] - milliseconds after which
+     * the baseline latency is measured again
+     * @param {object} [params.metrics] - limit(n), inflight(n), queued(n)
+     * and task(seconds, result) observers, see
+     * monitoringHandler.deleteQueueMetrics
+     * @param {function} [params.now] - clock, in milliseconds
+     */
+    constructor(params) {
+        this._min = params.min;
+        this._max = params.max;
+        this._limit = Math.min(Math.max(params.initial, params.min), params.max);
+        this._tolerance = params.tolerance || 2;
+        this._baselineWindow = params.baselineWindow || 10000;
+        this._metrics = params.metrics || null;
+        this._now = params.now || (() => performance.now());
+        this._inflight = 0;
+        // jobs with tasks waiting to run, as { tasks }, served in turn
+        this._queue = [];
+        this._queued = 0;
+        this._latency = null;
+        this._samples = 0;
+        this._baseline = null;
+        this._baselineSince = this._now();
+        this._lastDecrease = -Infinity;
+        this._draining = false;
+        this._report();
+    }
+
+    /**
+     * @return {number} - current concurrency limit
+     */
+    get limit() {
+        return Math.floor(this._limit);
+    }
+
+    get inflight() {
+        return this._inflight;
+    }
+
+    get queued() {
+        return this._queued;
+    }
+
+    _report() {
+        if (this._metrics) {
+            this._metrics.limit(this.limit);
+            this._metrics.inflight(this._inflight);
+            this._metrics.queued(this._queued);
+        }
+    }
+
+    _observe(latency, err) {
+        const now = this._now();
+        this._samples += 1;
+        this._latency = this._latency === null ? latency :
+            this._latency * 0.8 + latency * 0.2;
+        // a few samples are needed before trusting the smoothed latency
+        const warm = this._samples >= 10;
+        if (warm && (this._baseline === null ||
+            now - this._baselineSince > this._baselineWindow)) {
+            this._baseline = this._latency;
+            this._baselineSince = now;
+        }
+        const slow = warm && this._latency > this._baseline * this._tolerance;
+        if (warm && !slow) {
+            this._baseline = this._baseline * 0.99 + latency * 0.01;
+        }
+        if (isBackendError(err) || slow) {
+            if (now - this._lastDecrease > this._latency) {
+                this._limit = Math.max(this._min, this._limit / 2);
+                this._lastDecrease = now;
+            }
+        } else {
+            this._limit = Math.min(this._max, this._limit + 1 / this._limit);
+        }
+    }
+
+    _next() {
+        if (this._draining) {
+            // called by a task completing synchronously: the running loop
+            // starts the next tasks
+            return;
+        }
+        this._draining = true;
+        while (this._inflight < this.limit && this._queue.length > 0) {
+            const job = this._queue.shift();
+            const { task, cb } = job.tasks.shift();
+            this._queued -= 1;
+            if (job.tasks.length > 0) {
+                this._queue.push(job);
+            }
+            const start = this._now();
+            this._inflight += 1;
+            let called = false;
+            task((err, ...results) => {
+                if (called) {
+                    return;
+                }
+                called = true;
+                const latency = this._now() - start;
+                this._inflight -= 1;
+                this._observe(latency, err);
+                if (this._metrics) {
+                    this._metrics.task(latency / 1000,
+                        isBackendError(err) ? 'error' : 'success');
+                }
+                // a failed job drops its tasks before the next ones start
+                cb(err, ...results);
+                this._next();
+            });
+        }
+        this._draining = false;
+        this._report();
+    }
+
+    _push(job) {
+        this._queue.push(job);
+        this._queued += job.tasks.length;
+        this._next();
+    }
+
+    _drop(job) {
+        const index = this._queue.indexOf(job);
+        if (index !== -1) {
+            this._queue.splice(index, 1);
+            this._queued -= job.tasks.length;
+        }
+        // eslint-disable-next-line no-param-reassign
+        job.tasks = [];
+        this._report();
+    }
+
+    /**
+     * Run a task once the concurrency allows it
+     * @param {function} task - task(done), done(err, ...results)
+     * @param {function} cb - callback(err, ...results) of the task
+     * @return {undefined}
+     */
+    push(task, cb) {
+        this._push({ tasks: [{ task, cb }] });
+    }
+
+    /**
+     * Same as async.eachLimit, the concurrency being the one of the queue,
+     * shared with the other users of the queue: on the first error, the
+     * callback is called with it and the items not started yet are
+     * skipped, those in progress completing in the background.
+     * @param {Array} items - items to iterate on
+     * @param {function} iterator - iterator(item, done)
+     * @param {function} cb - callback(err), once every item is processed
+     * or on the first error
+     * @return {undefined}
+     */
+    eachLimit(items, iterator, cb) {
+        let remaining = items.length;
+        let failed = false;
+        if (remaining === 0) {
+            return process.nextTick(cb, null);
+        }
+        const job = {};
+        job.tasks = items.map(item => ({
+            task: done => iterator(item, done),
+            cb: err => {
+                if (failed) {
+                    return undefined;
+                }
+                if (err) {
+                    failed = true;
+                    this._drop(job);
+                    return cb(err);
+                }
+                remaining -= 1;
+                return remaining === 0 ? cb(null) : undefined;
+            },
+        }));
+        this._push(job);
+        return undefined;
+    }
+}
+
+module.exports = AdaptiveConcurrency;
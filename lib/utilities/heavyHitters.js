@@ -0,0 +1,232 @@
+/**
+ * Label value of the series aggregating every key not in the top-K. It is
+ * not a valid bucket name, so it cannot be mistaken for one.
+ */
+const OTHER = '__other__';
+
+/**
+ * Space-Saving heavy-hitters sketch (Metwally et al.).
+ *
+ * At most `capacity` keys are monitored. A key that is not monitored
+ * replaces the one with the smallest count and inherits that count as its
+ * overestimation error, so that any key seen more than N / capacity times
+ * out of N is guaranteed to be monitored.
+ */
+class SpaceSaving {
+    /**
+     * @param {number} capacity - maximum number of monitored keys
+     */
+    constructor(capacity) {
+        this._capacity = capacity;
+        // min-heap of entries on count, entries know their heap index
+        this._heap = [];
+        this._entries = new Map();
+    }
+
+    get size() {
+        return this._heap.length;
+    }
+
+    _swap(i, j) {
+        const heap = this._heap;
+        [heap[i], heap[j]] = [heap[j], heap[i]];
+        heap[i].index = i;
+        heap[j].index = j;
+    }
+
+    _siftUp(index) {
+        let i = index;
+        while (i > 0) {
+            const parent = (i - 1) >> 1;
+            if (this._heap[parent].count <= this._heap[i].count) {
+                break;
+            }
+            this._swap(i, parent);
+            i = parent;
+        }
+    }
+
+    _siftDown(index) {
+        const heap = this._heap;
+        let i = index;
+        for (;;) {
+            const left = 2 * i + 1;
+            const right = left + 1;
+            let smallest = i;
+            if (left < heap.length && heap[left].count < heap[smallest].count) {
+                smallest = left;
+            }
+            if (right < heap.length && heap[right].count < heap[smallest].count) {
+                smallest = right;
+            }
+            if (smallest === i) {
+                return;
+            }
+            this._swap(i, smallest);
+            i = smallest;
+        }
+    }
+
+    /**
+     * Count an occurrence of a key.
+     * @param {string} key - key seen
+     * @param {number} [weight=1] - number of occurrences
+     * @return {string|null} - key no longer monitored, if any
+     */
+    offer(key, weight = 1) {
+        const entry = this._entries.get(key);
+        if (entry) {
+            entry.count += weight;
+            this._siftDown(entry.index);
+            return null;
+        }
+        if (this._heap.length < this._capacity) {
+            const added = { key, count: weight, error: 0, index: this._heap.length };
+            this._heap.push(added);
+            this._entries.set(key, added);
+            this._siftUp(added.index);
+            return null;
+        }
+        const min = this._heap[0];
+        const evicted = min.key;
+        this._entries.delete(evicted);
+        min.key = key;
+        min.error = min.count;
+        min.count += weight;
+        this._entries.set(key, min);
+        this._siftDown(0);
+        return evicted;
+    }
+
+    /**
+     * @param {string} key - key
+     * @return {number} - upper bound of the number of occurrences of the
+     * key, 0 if it is not monitored
+     */
+    count(key) {
+        const entry = this._entries.get(key);
+        return entry ? entry.count : 0;
+    }
+
+    /**
+     * @param {string} key - key
+     * @return {number} - lower bound of the number of occurrences of the
+     * key, 0 if it is not monitored
+     */
+    guaranteed(key) {
+        const entry = this._entries.get(key);
+        return entry ? entry.count - entry.error : 0;
+    }
+
+    /**
+     * @param {number} n - number of keys to return
+     * @return {object[]} - `{ key, count, error }` of the n monitored keys
+     * with the highest counts, by decreasing count
+     */
+    top(n) {
+        return this._heap
+            .map(({ key, count, error }) => ({ key, count, error }))
+            .sort((a, b) => b.count - a.count)
+            .slice(0, n);
+    }
+}
+
+/**
+ * Maps keys (bucket names, accounts...) to metric label values with a
+ * bounded cardinality: the `size` most frequent keys keep their own label
+ * value, every other key is folded into OTHER.
+ *
+ * A key replaces the least frequent exported one only once its guaranteed
+ * count exceeds that key's estimated count, so that keys with similar
+ * frequencies do not keep swapping. `onEvict` is called with the keys that
+ * stop being exported, to remove their series.
+ */
+class TopKLabels {
+    /**
+     * @param {number} size - maximum number of exported keys
+     * @param {object} [options] - options
+     * @param {number} [options.capacity] - number of keys monitored by the
+     * sketch, defaults to 10 times `size`
+     * @param {function} [options.onEvict] - called with each key that stops
+     * being exported
+     */
+    constructor(size, options = {}) {
+        this._size = size;
+        this._sketch = new SpaceSaving(options.capacity || size * 10);
+        this._onEvict = options.onEvict || (() => {});
+        this._exported = new Set();
+        // lower bound of the smallest count of the exported keys
+        this._threshold = 0;
+    }
+
+    _demote(key) {
+        this._exported.delete(key);
+        this._onEvict(key);
+    }
+
+    _promote(key) {
+        this._exported.add(key);
+        this._threshold = Math.min(this._threshold, this._sketch.count(key));
+    }
+
+    _leastExported() {
+        let least = null;
+        let leastCount = Infinity;
+        this._exported.forEach(key => {
+            const count = this._sketch.count(key);
+            if (count < leastCount) {
+                least = key;
+                leastCount = count;
+            }
+        });
+        this._threshold = leastCount;
+        return least;
+    }
+
+    /**
+     * Count an occurrence of a key and return its label value.
+     * @param {string} key - key seen
+     * @param {number} [weight=1] - number of occurrences
+     * @return {string} - the key if it is exported, OTHER otherwise
+     */
+    label(key, weight = 1) {
+        const evicted = this._sketch.offer(key, weight);
+        if (evicted !== null && this._exported.has(evicted)) {
+            this._demote(evicted);
+        }
+        if (this._exported.has(key)) {
+            return key;
+        }
+        if (this._exported.size < this._size) {
+            this._promote(key);
+            return key;
+        }
+        // counts of exported keys only grow, the cached threshold is
+        // only refreshed when it may be exceeded
+        const guaranteed = this._sketch.guaranteed(key);
+        if (guaranteed <= this._threshold) {
+            return OTHER;
+        }
+        const least = this._leastExported();
+        if (guaranteed <= this._threshold) {
+            return OTHER;
+        }
+        this._demote(least);
+        this._promote(key);
+        this._leastExported();
+        return key;
+    }
+
+    /**
+     * @return {string[]} - keys currently exported
+     */
+    exported() {
+        return [...this._exported];
+    }
+}
+
+module.exports = {
+    OTHER,
+    SpaceSaving,
+    TopKLabels,
+};
@@ -0,0 +1,114 @@
+/**
+ * Incremental rendering of the Prometheus exposition served on /metrics.
+ *
+ * prom-client re-serializes every series of every metric on each scrape,
+ * which costs event-loop time proportional to the number of label
+ * combinations. This cache keeps the rendered text of each metric and only
+ * re-renders the metrics whose values changed since the previous scrape.
+ *
+ * Change detection reads the per-series state that prom-client 14 keeps in
+ * `metric.hashMap` (prom-client is pinned in package.json). Metrics without
+ * it, or with a `collect` callback (default process metrics, gauges
+ * computed at scrape time), are rendered on every scrape.
+ */
+class MetricsRenderCache {
+    /**
+     * @param {Registry} registry - prom-client registry to render
+     */
+    constructor(registry) {
+        this._registry = registry;
+        // metric name -> { text, snapshot }
+        this._entries = new Map();
+        this._pending = null;
+        this.lastRendered = 0;
+        this.lastReused = 0;
+    }
+
+    /**
+     * Snapshot of the series and values of a metric, compared between
+     * scrapes to detect changes; null when changes cannot be detected.
+     * Series keys are included: a series may be removed (e.g. evicted from
+     * the top-K labels) and another one added with the same values.
+     * @param {object} metric - prom-client metric
+     * @return {Array<string|number>|null} - snapshot
+     */
+    static _snapshot(metric) {
+        if (typeof metric.collect === 'function' || !metric.hashMap) {
+            return null;
+        }
+        const snapshot = [];
+        Object.keys(metric.hashMap).sort().forEach(key => {
+            const entry = metric.hashMap[key];
+            snapshot.push(key);
+            if (entry.count !== undefined) {
+                // histogram or summary: buckets and quantiles only change
+                // on observe, which always bumps count and sum
+                snapshot.push(entry.count, entry.sum);
+            } else {
+                snapshot.push(entry.value);
+            }
+        });
+        return snapshot;
+    }
+
+    static _sameSnapshot(a, b) {
+        if (a === null || b === null || a.length !== b.length) {
+            return false;
+        }
+        for (let i = 0; i < a.length; ++i) {
+            if (a[i] !== b[i]) {
+                return false;
+            }
+        }
+        return true;
+    }
+
+    async _renderMetric(metric) {
+        const name = metric.name;
+        const snapshot = MetricsRenderCache._snapshot(metric);
+        const cached = this._entries.get(name);
+        if (cached && MetricsRenderCache._sameSnapshot(cached.snapshot, snapshot)) {
+            this.lastReused += 1;
+            return cached.text;
+        }
+        const text = await this._registry.getSingleMetricAsString(name);
+        this._entries.set(name, { text, snapshot });
+        this.lastRendered += 1;
+        return text;
+    }
+
+    async _render() {
+        this.lastRendered = 0;
+        this.lastReused = 0;
+        const metrics = this._registry.getMetricsAsArray();
+        const texts = await Promise.all(metrics.map(metric => this._renderMetric(metric)));
+        // forget metrics removed from the registry
+        if (this._entries.size > metrics.length) {
+            const names = new Set(metrics.map(metric => metric.name));
+            [...this._entries.keys()]
+                .filter(name => !names.has(name))
+                .forEach(name => this._entries.delete(name));
+        }
+        // same layout as Registry.metrics()
+        return `${texts.join('\n\n')}\n`;
+    }
+
+    /**
+     * Render the exposition text. Concurrent scrapes share one rendering.
+     * @return {Promise<string>} - exposition text
+     */
+    metrics() {
+        if (!this._pending) {
+            this._pending = this._render().finally(() => {
+                this._pending = null;
+            });
+        }
+        return this._pending;
+    }
+
+    clear() {
+        this._entries.clear();
+    }
+}
+
+module.exports = MetricsRenderCache;
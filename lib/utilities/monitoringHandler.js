@@ -1,6 +1,8 @@
 const { errors } = require('arsenal');
 const client = require('prom-client');
 const { config } = require('../Config');
+const MetricsRenderCache = require('./metricsRenderCache');
+const { OTHER, TopKLabels } = require('./heavyHitters');
 
 const collectDefaultMetrics = client.collectDefaultMetrics;
 const numberOfBuckets = new client.Gauge({
@@ -46,7 +48,15 @@ const httpRequestDurationSeconds = new client.Histogram({
     name: 's3_cloudserver_http_request_duration_seconds',
     help: 'Duration of HTTP requests in seconds',
     labelNames,
-    buckets: [0.0001, 0.005, 0.015, 0.05, 0.1, 0.2, 0.3, 0.4, 0.5], // buckets for response time from 0.1ms to 500ms
+    // see monitoring.httpRequestDurationBuckets in config.json
+    buckets: config.monitoring.httpRequestDurationBuckets,
+});
+const httpRequestPhaseDurationSeconds = new client.Histogram({
+    name: 's3_cloudserver_http_request_phase_duration_seconds',
+    help: 'Time spent by HTTP requests in each phase (auth, metadata, ' +
+        'quota, kms, data, other) in seconds',
+    labelNames: ['action', 'phase'],
+    buckets: config.monitoring.httpRequestDurationBuckets,
 });
 const httpActiveRequests = new client.Gauge({
     name: 's3_cloudserver_http_active_requests',
@@ -65,6 +75,186 @@ const httpResponseSizeBytes = new client.Summary({
     help: 'Cloudserver HTTP response sizes in bytes',
 });
 
+/**
+ * Request count, latency and bytes by bucket or by account. Only the
+ * `size` most active buckets (accounts) get their own series, the others
+ * are aggregated in the OTHER series.
+ * @param {string} dimension - 'bucket' or 'account', used as label name
+ * @param {number} size - number of buckets (accounts) with their own series
+ * @return {function} - observe(key, code, seconds, requestBytes,
+ * responseBytes)
+ */
+function topKRequestMetrics(dimension, size) {
+    const requests = new client.Counter({
+        name: `s3_cloudserver_${dimension}_http_requests_total`,
+        help: `Total number of cloudserver HTTP requests by ${dimension}`,
+        labelNames: [dimension, 'code'],
+    });
+    const duration = new client.Histogram({
+        name: `s3_cloudserver_${dimension}_http_request_duration_seconds`,
+        help: `Duration of HTTP requests in seconds by ${dimension}`,
+        labelNames: [dimension],
+        buckets: config.monitoring.httpRequestDurationBuckets,
+    });
+    const requestBytes = new client.Counter({
+        name: `s3_cloudserver_${dimension}_http_request_bytes_total`,
+        help: `Total size of HTTP request bodies in bytes by ${dimension}`,
+        labelNames: [dimension],
+    });
+    const responseBytes = new client.Counter({
+        name: `s3_cloudserver_${dimension}_http_response_bytes_total`,
+        help: `Total size of HTTP response bodies in bytes by ${dimension}`,
+        labelNames: [dimension],
+    });
+    // codes seen for each exported key, to remove their series
+    const codes = new Map();
+    const topK = new TopKLabels(size, {
+        onEvict: key => {
+            const labels = { [dimension]: key };
+            (codes.get(key) || []).forEach(code => requests.remove({ ...labels, code }));
+            codes.delete(key);
+            duration.remove(labels);
+            requestBytes.remove(labels);
+            responseBytes.remove(labels);
+        },
+    });
+    return (key, code, seconds, reqBytes, resBytes) => {
+        const value = topK.label(key);
+        if (value !== OTHER) {
+            if (!codes.has(value)) {
+                codes.set(value, new Set());
+            }
+            codes.get(value).add(code);
+        }
+        const labels = { [dimension]: value };
+        requests.inc({ ...labels, code });
+        duration.observe(labels, seconds);
+        requestBytes.inc(labels, reqBytes);
+        responseBytes.inc(labels, resBytes);
+    };
+}
+
+const observeByBucket = config.monitoring.bucketMetricsTopK > 0 ?
+    topKRequestMetrics('bucket', config.monitoring.bucketMetricsTopK) : null;
+const observeByAccount = config.monitoring.accountMetricsTopK > 0 ?
+    topKRequestMetrics('account', config.monitoring.accountMetricsTopK) : null;
+
+/**
+ * Record a completed S3 request in the per-bucket and per-account metrics.
+ * @param {string|undefined} bucketName - bucket of the request, if any
+ * @param {string|undefined} accountName - requester account, if known
+ * @param {number} code - HTTP status code of the response
+ * @param {number} seconds - duration of the request
+ * @param {number} requestBytes - size of the request body
+ * @param {number} responseBytes - size of the response body
+ * @return {undefined}
+ */
+function promBucketAndAccountMetrics(bucketName, accountName, code, seconds,
+    requestBytes, responseBytes) {
+    if (observeByBucket && bucketName) {
+        observeByBucket(bucketName, code, seconds, requestBytes, responseBytes);
+    }
+    if (observeByAccount && accountName) {
+        observeByAccount(accountName, code, seconds, requestBytes, responseBytes);
+    }
+}
+
+const metricsRenderDuration = new client.Histogram({
+    name: 's3_cloudserver_metrics_render_duration_seconds',
+    help: 'Duration of the rendering of the metrics exposition on /metrics',
+    buckets: [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5],
+});
+
+const metricsRenderCache = config.monitoring.cacheRenderedMetrics ?
+    new MetricsRenderCache(client.register) : null;
+
+const cacheLookups = new client.Counter({
+    name: 's3_cloudserver_cache_lookups_total',
+    help: 'Total number of lookups in the in-memory caches, by result (hit or miss)',
+    labelNames: ['cache', 'result'],
+});
+
+const cacheEvictions = new client.Counter({
+    name: 's3_cloudserver_cache_evictions_total',
+    help: 'Total number of entries evicted from the in-memory caches, by reason ' +
+        '(expired or capacity)',
+    labelNames: ['cache', 'reason'],
+});
+
+const cacheEntries = new client.Gauge({
+    name: 's3_cloudserver_cache_entries',
+    help: 'Number of entries of the in-memory caches',
+    labelNames: ['cache'],
+});
+
+/**
+ * Observers exporting the metrics of an in-memory cache, see TTLCache.
+ * @param {string} cache - name of the cache, value of the `cache` label
+ * @return {object} - observers
+ */
+function cacheMetrics(cache) {
+    return {
+        lookup: hit => cacheLookups.inc({ cache, result: hit ? 'hit' : 'miss' }),
+        eviction: reason => cacheEvictions.inc({ cache, reason }),
+        size: entries => cacheEntries.set({ cache }, entries),
+    };
+}
+
+const deleteQueueLimit = new client.Gauge({
+    name: 's3_cloudserver_data_delete_queue_concurrency_limit',
+    help: 'Concurrency limit of the data delete queues',
+    labelNames: ['queue', 'backend'],
+});
+
+const deleteQueueInflight = new client.Gauge({
+    name: 's3_cloudserver_data_delete_queue_inflight',
+    help: 'Number of data deletes in progress, by delete queue',
+    labelNames: ['queue', 'backend'],
+});
+
+const deleteQueueQueued = new client.Gauge({
+    name: 's3_cloudserver_data_delete_queue_queued',
+    help: 'Number of data deletes waiting for the concurrency limit, by delete queue',
+    labelNames: ['queue', 'backend'],
+});
+
+const deleteQueueDuration = new client.Histogram({
+    name: 's3_cloudserver_data_delete_queue_task_duration_seconds',
+    help: 'Duration of the data deletes of the delete queues, by result (success or error)',
+    labelNames: ['queue', 'backend', 'result'],
+    buckets: [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5],
+});
+
+/**
+ * Observers exporting the metrics of a data delete queue, see
+ * AdaptiveConcurrency.
+ * @param {string} queue - kind of the queue, value of the `queue` label
+ * @param {string} backend - data backend of the queue, value of the
+ * `backend` label
+ * @return {object} - observers
+ */
+function deleteQueueMetrics(queue, backend) {
+    return {
+        limit: n => deleteQueueLimit.set({ queue, backend }, n),
+        inflight: n => deleteQueueInflight.set({ queue, backend }, n),
+        queued: n => deleteQueueQueued.set({ queue, backend }, n),
+        task: (seconds, result) => deleteQueueDuration.observe({ queue, backend, result }, seconds),
+    };
+}
+
+const bucketCacheHitAge = new client.Histogram({
+    name: 's3_cloudserver_bucket_cache_hit_age_seconds',
+    help: 'Age of the bucket metadata served from the bucket cache',
+    buckets: [0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30],
+});
+
+const bucketCacheInvalidations = new client.Counter({
+    name: 's3_cloudserver_bucket_cache_invalidations_total',
+    help: 'Total number of invalidations of the bucket cache, by origin ' +
+        '(local for the writes of this worker, remote for other workers)',
+    labelNames: ['origin'],
+});
+
 let quotaEvaluationDuration;
 let utilizationMetricsRetrievalDuration;
 let utilizationServiceAvailable;
@@ -220,7 +410,10 @@ async function routeHandler(req, res, cb) {
     if (req.method !== 'GET') {
         return cb(errors.BadRequest, []);
     }
-    const promMetrics = await client.register.metrics();
+    const endRender = metricsRenderDuration.startTimer();
+    const promMetrics = await (metricsRenderCache ?
+        metricsRenderCache.metrics() : client.register.metrics());
+    endRender();
     const contentLen = Buffer.byteLength(promMetrics, 'utf8');
     res.writeHead(200, {
         'Content-Length': contentLen,
@@ -263,10 +456,16 @@ module.exports = {
     client,
     collectDefaultMetrics,
     promMetrics,
+    promBucketAndAccountMetrics,
     crrCacheToProm,
     httpRequestDurationSeconds,
     httpRequestsTotal,
+    httpRequestPhaseDurationSeconds,
     httpActiveRequests,
+    cacheMetrics,
+    deleteQueueMetrics,
+    bucketCacheHitAge,
+    bucketCacheInvalidations,
     lifecycleDuration,
     quotaEvaluationDuration,
     utilizationMetricsRetrievalDuration,
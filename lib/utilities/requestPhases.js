@@ -0,0 +1,158 @@
+/**
+ * Breakdown of the duration of S3 requests by phase (auth, metadata, quota,
+ * kms, data).
+ *
+ * Each request runs with its own PhaseTimer in an AsyncLocalStorage
+ * context (see S3Server.routeRequest), and the calls to the auth, metadata,
+ * quota, KMS and data layers are wrapped with `timed()` to accumulate their
+ * duration in the timer of the calling request. The time of a phase is the
+ * wall-clock time during which at least one call of that phase is in
+ * flight, so that concurrent calls are not counted twice. Phases may
+ * overlap: data calls include the KMS calls they make.
+ */
+const { AsyncLocalStorage, AsyncResource } = require('async_hooks');
+
+const storage = new AsyncLocalStorage();
+
+class PhaseTimer {
+    constructor() {
+        // phase -> seconds
+        this.durations = {};
+        this._inFlight = {};
+        this._since = {};
+    }
+
+    start(phase) {
+        if (!this._inFlight[phase]) {
+            this._inFlight[phase] = 0;
+            this._since[phase] = process.hrtime.bigint();
+        }
+        this._inFlight[phase] += 1;
+    }
+
+    end(phase) {
+        this._inFlight[phase] -= 1;
+        if (this._inFlight[phase] === 0) {
+            const elapsed = Number(process.hrtime.bigint() - this._since[phase]) / 1e9;
+            this.durations[phase] = (this.durations[phase] || 0) + elapsed;
+        }
+    }
+}
+
+/**
+ * Run fn in the context of a request timer.
+ * @param {PhaseTimer} timer - timer of the request
+ * @param {function} fn - function to run
+ * @return {*} - return value of fn
+ */
+function runWithPhaseTimer(timer, fn) {
+    return storage.run(timer, fn);
+}
+
+/**
+ * Start timing a phase of the current request.
+ * @param {string} phase - phase name
+ * @return {function} - to call once the phase is over, does nothing
+ * outside of a request
+ */
+function startPhase(phase) {
+    const timer = storage.getStore();
+    if (!timer) {
+        return () => {};
+    }
+    timer.start(phase);
+    let ended = false;
+    return () => {
+        if (!ended) {
+            ended = true;
+            timer.end(phase);
+        }
+    };
+}
+
+/**
+ * Time a phase of the current request until a callback is called.
+ * @param {string} phase - phase name
+ * @param {function} cb - callback ending the phase
+ * @return {function} - callback to pass instead of cb, which also runs cb
+ * back in the request context, so that calls made from it are still
+ * attributed to the request when the client calling it loses the
+ * asynchronous context
+ */
+function timedCallback(phase, cb) {
+    if (!storage.getStore()) {
+        return cb;
+    }
+    const end = startPhase(phase);
+    return AsyncResource.bind((...results) => {
+        end();
+        return cb(...results);
+    });
+}
+
+/**
+ * Wrap an asynchronous function, taking a callback as last argument or
+ * returning a promise, so that its calls are timed as a phase of the
+ * calling request.
+ * @param {string} phase - phase name
+ * @param {function} fn - function to wrap
+ * @return {function} - wrapped function
+ */
+function timed(phase, fn) {
+    return function timedPhase(...args) {
+        const timer = storage.getStore();
+        if (!timer) {
+            return fn.apply(this, args);
+        }
+        const cbIndex = args.length - 1;
+        const cb = args[cbIndex];
+        if (typeof cb !== 'function') {
+            const result = fn.apply(this, args);
+            // synchronous calls are not timed
+            if (result && typeof result.then === 'function') {
+                return result.finally(startPhase(phase));
+            }
+            return result;
+        }
+        // eslint-disable-next-line no-param-reassign
+        args[cbIndex] = timedCallback(phase, cb);
+        return fn.apply(this, args);
+    };
+}
+
+/**
+ * Replace methods of an object with timed() wrappers.
+ * @param {object} object - object to instrument
+ * @param {string} phase - phase name
+ * @param {string[]} [methods] - names of the methods to wrap, defaults to
+ * all public methods of the object and its prototype
+ * @return {object} - the object
+ */
+function instrument(object, phase, methods) {
+    if (!object) {
+        return object;
+    }
+    const names = methods || [
+        ...Object.keys(object),
+        ...Object.getOwnPropertyNames(Object.getPrototypeOf(object)),
+    ].filter(name => name !== 'constructor' && !name.startsWith('_'));
+    new Set(names).forEach(name => {
+        const method = object[name];
+        if (typeof method === 'function' && !method.timedPhase) {
+            // eslint-disable-next-line no-param-reassign
+            object[name] = timed(phase, method);
+            // eslint-disable-next-line no-param-reassign
+            object[name].timedPhase = phase;
+        }
+    });
+    return object;
+}
+
+module.exports = {
+    PhaseTimer,
+    runWithPhaseTimer,
+    startPhase,
+    timedCallback,
+    timed,
+    instrument,
+};
@@ -0,0 +1,135 @@
+/**
+ * Bounded in-memory cache, evicting the least recently used entries and
+ * the ones older than a time to live.
+ *
+ * Entries live in a Map, which iterates in insertion order: a hit
+ * re-inserts its entry, so the first key of the map is always the least
+ * recently used one and making room is O(1). Expired entries are dropped
+ * when they are read or when they reach the head of the map.
+ */
+class TTLCache {
+    /**
+     * @param {object} params - cache parameters
+     * @param {number} params.max - maximum number of entries
+     * @param {number} params.ttl - time to live of the entries, in
+     * milliseconds
+     * @param {function} [params.onEvict] - called with (key, value, reason)
+     * when an entry leaves the cache, reason being 'expired', 'capacity'
+     * or 'deleted'
+     * @param {object} [params.metrics] - hit/miss/eviction/size
+     * observers, see monitoringHandler.cacheMetrics
+     * @param {function} [params.now] - clock, in milliseconds
+     */
+    constructor(params) {
+        this._max = params.max;
+        this._ttl = params.ttl;
+        this._onEvict = params.onEvict || null;
+        this._metrics = params.metrics || null;
+        this._now = params.now || Date.now;
+        // key -> { value, expires }
+        this._entries = new Map();
+    }
+
+    get size() {
+        return this._entries.size;
+    }
+
+    _remove(key, entry, reason) {
+        this._entries.delete(key);
+        if (this._metrics && reason !== 'deleted') {
+            this._metrics.eviction(reason);
+        }
+        if (this._onEvict) {
+            this._onEvict(key, entry.value, reason);
+        }
+    }
+
+    _updateSize() {
+        if (this._metrics) {
+            this._metrics.size(this._entries.size);
+        }
+    }
+
+    /**
+     * @param {string} key - key of the entry
+     * @return {*} - value of the entry, undefined if absent or expired
+     */
+    get(key) {
+        const entry = this._entries.get(key);
+        let value;
+        if (entry !== undefined && entry.expires <= this._now()) {
+            this._remove(key, entry, 'expired');
+            this._updateSize();
+        } else if (entry !== undefined) {
+            this._entries.delete(key);
+            this._entries.set(key, entry);
+            value = entry.value;
+        }
+        if (this._metrics) {
+            this._metrics.lookup(value !== undefined);
+        }
+        return value;
+    }
+
+    /**
+     * @param {string} key - key of the entry
+     * @param {*} value - value of the entry, must not be undefined
+     * @return {undefined}
+     */
+    set(key, value) {
+        if (this._max <= 0) {
+            return;
+        }
+        const previous = this._entries.get(key);
+        if (previous !== undefined) {
+            this._remove(key, previous, 'deleted');
+        }
+        const now = this._now();
+        while (this._entries.size >= this._max) {
+            const [oldestKey, oldest] = this._entries.entries().next().value;
+            this._remove(oldestKey, oldest,
+                oldest.expires <= now ? 'expired' : 'capacity');
+        }
+        this._entries.set(key, { value, expires: now + this._ttl });
+        this._updateSize();
+    }
+
+    /**
+     * @param {string} key - key of the entry
+     * @return {boolean} - whether an entry was removed
+     */
+    delete(key) {
+        const entry = this._entries.get(key);
+        if (entry === undefined) {
+            return false;
+        }
+        this._remove(key, entry, 'deleted');
+        this._updateSize();
+        return true;
+    }
+
+    /**
+     * Remove every entry for which `predicate(key, value)` is true.
+     * @param {function} predicate - selects the entries to remove
+     * @return {number} - number of entries removed
+     */
+    deleteMatching(predicate) {
+        let removed = 0;
+        this._entries.forEach((entry, key) => {
+            if (predicate(key, entry.value)) {
+                this._remove(key, entry, 'deleted');
+                removed += 1;
+            }
+        });
+        if (removed > 0) {
+            this._updateSize();
+        }
+        return removed;
+    }
+
+    clear() {
+        this.deleteMatching(() => true);
+    }
+}
+
+module.exports = TTLCache;
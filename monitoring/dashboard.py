@@ -1,3 +1,21 @@
+"""Grafana dashboards of cloudserver.
+
+Dashboards are built by ``build_dashboard(variant, layout_name, recorded)``:
+``VARIANTS`` lists the rows of each dashboard (the overview, and deep-dives
+into latency and quotas), ``promql.LAYOUTS`` how the series are labelled in
+each kind of deployment. The module-level ``dashboard`` is the overview for
+Zenko deployments, published as dashboard.json.
+
+To render other variants and layouts::
+
+    python dashboard.py --variant latency --layout service \\
+        --output-dir build/
+"""
+import argparse
+import json
+import os
+import sys
+
 from grafanalib.core import (
     ConstantInput,
     DataSourceInput,
@@ -23,182 +41,201 @@ from scalgrafanalib import (
     TimeSeries
 )
 
-up = Stat(
-    title="Up",
-    dataSource="${DS_PROMETHEUS}",
-    reduceCalc="last",
-    targets=[Target(
-        expr='sum(up{namespace="${namespace}", job=~"$job"})',
-    )],
-    thresholds=[
-        Threshold("red", 0, 0.0),
-        Threshold("green", 1, 1.0),
-    ],
-)
+# the generators load this file by path, without its directory in sys.path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from promql import LAYOUTS, Queries  # noqa: E402
 
-httpRequests = Stat(
-    title="Http requests rate",
-    dataSource="${DS_PROMETHEUS}",
-    format=UNITS.OPS_PER_SEC,
-    noValue="0",
-    reduceCalc="mean",
-    targets=[Target(
-        expr='sum(rate(s3_cloudserver_http_requests_total{namespace="${namespace}", job=~"$job"}[$__rate_interval]))',  # noqa: E501
-    )],
-    thresholds=[
-        Threshold("green", 0, 0.0),
-    ],
-)
 
-successRate = GaugePanel(
-    title="Success rate",
-    dataSource="${DS_PROMETHEUS}",
-    calc="mean",
-    format=UNITS.PERCENT_FORMAT,
-    min=0,
-    max=100,
-    noValue="-",
-    targets=[Target(
-        expr="\n".join([
-            'sum(rate(s3_cloudserver_http_requests_total{namespace="${namespace}", job=~"$job", code=~"2.."}[$__rate_interval])) * 100',  # noqa: E501
-            "   /",
-            'sum(rate(s3_cloudserver_http_requests_total{namespace="${namespace}", job=~"$job"}[$__rate_interval]) > 0)',  # noqa: E501
-        ]),
-        legendFormat="Success rate",
-    )],
-    thresholds=[
-        Threshold("#808080", 0, 0.0),
-        Threshold("red",     1, 0.0),
-        Threshold("orange",  2, 80.0),
-        Threshold("green",   3, 90.0),
-    ],
-)
+def up(q):
+    # type: (Queries) -> Stat
+    return Stat(
+        title="Up",
+        dataSource="${DS_PROMETHEUS}",
+        reduceCalc="last",
+        targets=[Target(
+            expr='sum(up{' + q.selector() + '})',
+        )],
+        thresholds=[
+            Threshold("red", 0, 0.0),
+            Threshold("green", 1, 1.0),
+        ],
+    )
 
-dataIngestionRate = Stat(
-    title="Injection Data Rate",
-    description=(
-        "Rate of data ingested : cumulative amount of data created (>0) or "
-        "deleted (<0) per second."
-    ),
-    dataSource="${DS_PROMETHEUS}",
-    colorMode="background",
-    decimals=1,
-    format="binBps",
-    reduceCalc="mean",
-    targets=[Target(
-        expr='-sum(deriv(s3_cloudserver_disk_available_bytes{namespace="${namespace}", job=~"$job"}[$__rate_interval]))',  # noqa: E501
-    )],
-    thresholds=[
-        Threshold("dark-purple", 0, 0.0),
-    ],
-)
 
-objectIngestionRate = Stat(
-    title="Injection Rate",
-    description=(
-        "Rate of object ingestion : cumulative count of object created (>0) "
-        "or deleted (<0) per second."
-    ),
-    dataSource="${DS_PROMETHEUS}",
-    colorMode="background",
-    decimals=1,
-    format="O/s",
-    reduceCalc="mean",
-    targets=[Target(
-        expr='sum(deriv(s3_cloudserver_objects_count{namespace="${namespace}", job=~"$job"}[$__rate_interval]))',  # noqa: E501
-    )],
-    thresholds=[
-        Threshold("dark-purple", 0, 0.0),
-    ],
-)
+def http_requests(q):
+    # type: (Queries) -> Stat
+    return Stat(
+        title="Http requests rate",
+        dataSource="${DS_PROMETHEUS}",
+        format=UNITS.OPS_PER_SEC,
+        noValue="0",
+        reduceCalc="mean",
+        targets=[Target(
+            expr=q.request_rate(),
+        )],
+        thresholds=[
+            Threshold("green", 0, 0.0),
+        ],
+    )
 
-bucketsCounter = Stat(
-    title="Buckets",
-    description=(
-        "Number of S3 buckets available in the cluster.\n"
-        "This value is computed asynchronously, and update "
-        "may be delayed up to 1h."
-    ),
-    dataSource="${DS_PROMETHEUS}",
-    colorMode="value",
-    format=UNITS.SHORT,
-    noValue="-",
-    reduceCalc="lastNotNull",
-    targets=[Target(
-        expr='sum(s3_cloudserver_buckets_count{namespace="${namespace}", job="${reportJob}"})',  # noqa: E501
-    )],
-    thresholds=[
-        Threshold("#808080", 0, 0.0),
-        Threshold("blue", 1, 0.0),
-    ],
-)
 
-objectsCounter = Stat(
-    title="Objects",
-    description=(
-        "Number of S3 objects available in the cluster.\n"
-        "This value is computed asynchronously, and update "
-        "may be delayed up to 1h."
-    ),
-    dataSource="${DS_PROMETHEUS}",
-    colorMode="value",
-    format=UNITS.SHORT,
-    noValue="-",
-    reduceCalc="lastNotNull",
-    targets=[Target(
-        expr='sum(s3_cloudserver_objects_count{namespace="${namespace}", job="${reportJob}"})',  # noqa: E501
-    )],
-    thresholds=[
-        Threshold("#808080", 0, 0.0),
-        Threshold("blue", 1, 0.0),
-    ],
-)
+def success_rate(q):
+    # type: (Queries) -> GaugePanel
+    return GaugePanel(
+        title="Success rate",
+        dataSource="${DS_PROMETHEUS}",
+        calc="mean",
+        format=UNITS.PERCENT_FORMAT,
+        min=0,
+        max=100,
+        noValue="-",
+        targets=[Target(
+            expr=q.success_rate(),
+            legendFormat="Success rate",
+        )],
+        thresholds=[
+            Threshold("#808080", 0, 0.0),
+            Threshold("red",     1, 0.0),
+            Threshold("orange",  2, 80.0),
+            Threshold("green",   3, 90.0),
+        ],
+    )
 
-reporterUp = Stat(
-    title="Reporter",
-    description="Status of the reports-handler pod.",
-    dataSource="${DS_PROMETHEUS}",
-    reduceCalc="last",
-    targets=[Target(
-        expr='sum(up{namespace="${namespace}", job="${reportJob}"})',
-    )],
-    thresholds=[
-        Threshold("red", 0, 0.0),
-        Threshold("green", 1, 1.0),
-    ],
-)
 
-lastReport = Stat(
-    title="Last Report",
-    description=(
-        "Time elapsed since the last report, when object/bucket count was "
-        "updated."
-    ),
-    dataSource="${DS_PROMETHEUS}",
-    format=UNITS.SECONDS,
-    noValue="-",
-    reduceCalc="last",
-    targets=[Target(
-        expr="\n".join([
-            'time()',
-            '- max(s3_cloudserver_last_report_timestamp{namespace="${namespace}", job="${reportJob}"})',  # noqa: E501
-            '+ (max(s3_cloudserver_last_report_timestamp{namespace="${namespace}", job="${reportJob}"})',  # noqa: E501
-            '   - max(kube_cronjob_status_last_schedule_time{namespace="${namespace}", cronjob="${countItemsJob}"})',  # noqa: E501
-            '   > 0 or vector(0))',
-        ])
-    )],
-    thresholds=[
-        Threshold("#808080", 0, 0.0),
-        Threshold("green", 1, 0.0),
-        Threshold("super-light-yellow", 2, 1800.),
-        Threshold("orange", 3, 3600.),
-        Threshold("red", 4, 3700.),
-    ],
-)
+def data_ingestion_rate(q):
+    # type: (Queries) -> Stat
+    return Stat(
+        title="Injection Data Rate",
+        description=(
+            "Rate of data ingested : cumulative amount of data created (>0) "
+            "or deleted (<0) per second."
+        ),
+        dataSource="${DS_PROMETHEUS}",
+        colorMode="background",
+        decimals=1,
+        format="binBps",
+        reduceCalc="mean",
+        targets=[Target(
+            expr='-sum(deriv(s3_cloudserver_disk_available_bytes{' + q.selector() + '}[$__rate_interval]))',  # noqa: E501
+        )],
+        thresholds=[
+            Threshold("dark-purple", 0, 0.0),
+        ],
+    )
+
+
+def object_ingestion_rate(q):
+    # type: (Queries) -> Stat
+    return Stat(
+        title="Injection Rate",
+        description=(
+            "Rate of object ingestion : cumulative count of object created "
+            "(>0) or deleted (<0) per second."
+        ),
+        dataSource="${DS_PROMETHEUS}",
+        colorMode="background",
+        decimals=1,
+        format="O/s",
+        reduceCalc="mean",
+        targets=[Target(
+            expr='sum(deriv(s3_cloudserver_objects_count{' + q.selector() + '}[$__rate_interval]))',  # noqa: E501
+        )],
+        thresholds=[
+            Threshold("dark-purple", 0, 0.0),
+        ],
+    )
+
+
+def report_counter(q, title, description, expr):
+    # type: (Queries, str, str, str) -> Stat
+    return Stat(
+        title=title,
+        description=(
+            description + "\n"
+            "This value is computed asynchronously, and update "
+            "may be delayed up to 1h."
+        ),
+        dataSource="${DS_PROMETHEUS}",
+        colorMode="value",
+        format=UNITS.SHORT,
+        noValue="-",
+        reduceCalc="lastNotNull",
+        targets=[Target(
+            expr=expr,
+        )],
+        thresholds=[
+            Threshold("#808080", 0, 0.0),
+            Threshold("blue", 1, 0.0),
+        ],
+    )
+
+
+def buckets_counter(q):
+    # type: (Queries) -> Stat
+    return report_counter(
+        q, "Buckets", "Number of S3 buckets available in the cluster.",
+        'sum(s3_cloudserver_buckets_count{' + q.report_selector() + '})')
+
+
+def objects_counter(q):
+    # type: (Queries) -> Stat
+    return report_counter(
+        q, "Objects", "Number of S3 objects available in the cluster.",
+        'sum(s3_cloudserver_objects_count{' + q.report_selector() + '})')
+
+
+def reporter_up(q):
+    # type: (Queries) -> Stat
+    return Stat(
+        title="Reporter",
+        description="Status of the reports-handler pod.",
+        dataSource="${DS_PROMETHEUS}",
+        reduceCalc="last",
+        targets=[Target(
+            expr='sum(up{' + q.report_selector() + '})',
+        )],
+        thresholds=[
+            Threshold("red", 0, 0.0),
+            Threshold("green", 1, 1.0),
+        ],
+    )
+
+
+def last_report(q):
+    # type: (Queries) -> Stat
+    last = ('max(s3_cloudserver_last_report_timestamp{'
+            + q.report_selector() + '})')
+    return Stat(
+        title="Last Report",
+        description=(
+            "Time elapsed since the last report, when object/bucket count "
+            "was updated."
+        ),
+        dataSource="${DS_PROMETHEUS}",
+        format=UNITS.SECONDS,
+        noValue="-",
+        reduceCalc="last",
+        targets=[Target(
+            expr="\n".join([
+                'time()',
+                '- ' + last,
+                '+ (' + last,
+                '   - max(kube_cronjob_status_last_schedule_time{namespace="${namespace}", cronjob="${countItemsJob}"})',  # noqa: E501
+                '   > 0 or vector(0))',
+            ])
+        )],
+        thresholds=[
+            Threshold("#808080", 0, 0.0),
+            Threshold("green", 1, 0.0),
+            Threshold("super-light-yellow", 2, 1800.),
+            Threshold("orange", 3, 3600.),
+            Threshold("red", 4, 3700.),
+        ],
+    )
 
 
-def http_status_panel(title, code):
-    # type: (str, str) -> Stat
+def http_status_panel(q, title, code):
+    # type: (Queries, str, str) -> Stat
     return Stat(
         title=title,
         dataSource="${DS_PROMETHEUS}",
@@ -207,85 +244,84 @@ def http_status_panel(title, code):
         noValue="0",
         reduceCalc="mean",
         targets=[Target(
-            expr='sum(rate(s3_cloudserver_http_requests_total{namespace="${namespace}", job=~"$job",code=' + code + "}[$__rate_interval]))",  # noqa: E501
+            expr=q.request_rate(code=code),
         )],
         thresholds=[Threshold("semi-dark-blue", 0, 0.)],
     )
 
 
-status200 = http_status_panel(title="Status 200", code='"200"')
-status403 = http_status_panel(title="Status 4xx", code='~"4.."')
-status5xx = http_status_panel(title="Status 5xx", code='~"5.."')
+def active_requests(q):
+    # type: (Queries) -> Stat
+    return Stat(
+        title="Active requests",
+        dataSource="${DS_PROMETHEUS}",
+        reduceCalc="lastNotNull",
+        targets=[Target(
+            expr='sum(s3_cloudserver_http_active_requests{' + q.selector() + '})',  # noqa: E501
+        )],
+        thresholds=[
+            Threshold("green", 0, 0.0),
+            Threshold("red", 1, 80.0),
+        ],
+    )
 
-activeRequests = Stat(
-    title="Active requests",
-    dataSource="${DS_PROMETHEUS}",
-    reduceCalc="lastNotNull",
-    targets=[Target(
-        expr='sum(s3_cloudserver_http_active_requests{namespace="${namespace}", job=~"$job"})',  # noqa: E501
-    )],
-    thresholds=[
-        Threshold("green", 0, 0.0),
-        Threshold("red", 1, 80.0),
-    ],
-)
 
-oobDataIngestionRate = Stat(
-    title="OOB Inject. Data Rate",
-    description=(
-        "Rate of data ingested out-of-band (OOB) : cumulative amount of OOB "
-        "data created (>0) or deleted (<0) per second."
-    ),
-    dataSource="${DS_PROMETHEUS}",
-    colorMode="background",
-    decimals=1,
-    format="binBps",
-    reduceCalc="mean",
-    targets=[Target(
-        expr='sum(deriv(s3_cloudserver_ingested_bytes{namespace="${namespace}", job=~"$job"}[$__rate_interval]))',  # noqa: E501
-    )],
-    thresholds=[
-        Threshold("purple", 0, 0.0),
-    ],
-)
+def oob_data_ingestion_rate(q):
+    # type: (Queries) -> Stat
+    return Stat(
+        title="OOB Inject. Data Rate",
+        description=(
+            "Rate of data ingested out-of-band (OOB) : cumulative amount of "
+            "OOB data created (>0) or deleted (<0) per second."
+        ),
+        dataSource="${DS_PROMETHEUS}",
+        colorMode="background",
+        decimals=1,
+        format="binBps",
+        reduceCalc="mean",
+        targets=[Target(
+            expr='sum(deriv(s3_cloudserver_ingested_bytes{' + q.selector() + '}[$__rate_interval]))',  # noqa: E501
+        )],
+        thresholds=[
+            Threshold("purple", 0, 0.0),
+        ],
+    )
 
-oobObjectIngestionRate = Stat(
-    title="OOB Inject. Rate",
-    description=(
-        "Rate of object ingested out-of-band (OOB) : cumulative count of OOB "
-        "object created (>0) or deleted (<0) per second."
-    ),
-    dataSource="${DS_PROMETHEUS}",
-    colorMode="background",
-    decimals=1,
-    format="O/s",
-    reduceCalc="mean",
-    targets=[Target(
-        expr='sum(deriv(s3_cloudserver_ingested_objects_count{namespace="${namespace}", job=~"$job"}[$__rate_interval]))',  # noqa: E501
-    )],
-    thresholds=[
-        Threshold("purple", 0, 0.0),
-    ],
-)
 
-httpStatusCodes = TimeSeries(
-    title="Http status code over time",
-    dataSource="${DS_PROMETHEUS}",
-    fillOpacity=30,
-    lineInterpolation="smooth",
-    unit=UNITS.OPS_PER_SEC,
-    targets=[Target(
-        expr='sum by (code) (rate(s3_cloudserver_http_requests_total{namespace="${namespace}", job=~"$job"}[$__rate_interval]))',  # noqa: E501
-        legendFormat="{{code}}",
-    )],
-)
+def oob_object_ingestion_rate(q):
+    # type: (Queries) -> Stat
+    return Stat(
+        title="OOB Inject. Rate",
+        description=(
+            "Rate of object ingested out-of-band (OOB) : cumulative count of "
+            "OOB object created (>0) or deleted (<0) per second."
+        ),
+        dataSource="${DS_PROMETHEUS}",
+        colorMode="background",
+        decimals=1,
+        format="O/s",
+        reduceCalc="mean",
+        targets=[Target(
+            expr='sum(deriv(s3_cloudserver_ingested_objects_count{' + q.selector() + '}[$__rate_interval]))',  # noqa: E501
+        )],
+        thresholds=[
+            Threshold("purple", 0, 0.0),
+        ],
+    )
 
 
-def http_aggregated_request_target(title, code):
-    # type: (str, str) -> Target
-    return Target(
-        expr='sum(rate(s3_cloudserver_http_requests_total{namespace="${namespace}", job=~"$job", code=' + code + "}[$__rate_interval]))",  # noqa: E501
-        legendFormat=title,
+def http_status_codes(q):
+    # type: (Queries) -> TimeSeries
+    return TimeSeries(
+        title="Http status code over time",
+        dataSource="${DS_PROMETHEUS}",
+        fillOpacity=30,
+        lineInterpolation="smooth",
+        unit=UNITS.OPS_PER_SEC,
+        targets=[Target(
+            expr=q.request_rate(by=["code"]),
+            legendFormat="{{code}}",
+        )],
     )
 
 
@@ -300,142 +336,240 @@ def color_override(name, color):
     }
 
 
-httpAggregatedStatus = TimeSeries(
-    title="Aggregated status over time",
-    dataSource="${DS_PROMETHEUS}",
-    fillOpacity=39,
-    lineInterpolation="smooth",
-    unit=UNITS.OPS_PER_SEC,
-    scaleDistributionType="log",
-    stacking={"mode": "normal", "group": "A"},
-    targets=[
-        http_aggregated_request_target(title="Success", code='~"2.."'),
-        http_aggregated_request_target(title="User errors", code='~"4.."'),
-        http_aggregated_request_target(title="System errors", code='~"5.."'),
-    ],
-    overrides=[
-        color_override("Success", "dark-blue"),
-        color_override("User errors", "semi-dark-orange"),
-        color_override("System errors", "semi-dark-red"),
-    ],
-)
+def http_aggregated_status(q):
+    # type: (Queries) -> TimeSeries
+    return TimeSeries(
+        title="Aggregated status over time",
+        dataSource="${DS_PROMETHEUS}",
+        fillOpacity=39,
+        lineInterpolation="smooth",
+        unit=UNITS.OPS_PER_SEC,
+        scaleDistributionType="log",
+        stacking={"mode": "normal", "group": "A"},
+        targets=[
+            Target(expr=q.request_rate(code=code), legendFormat=title)
+            for title, code in [
+                ("Success", '~"2.."'),
+                ("User errors", '~"4.."'),
+                ("System errors", '~"5.."'),
+            ]
+        ],
+        overrides=[
+            color_override("Success", "dark-blue"),
+            color_override("User errors", "semi-dark-orange"),
+            color_override("System errors", "semi-dark-red"),
+        ],
+    )
 
 
-requestsByAction = TimeSeries(
-    title="Request rate per S3 action",
-    dataSource="${DS_PROMETHEUS}",
-    legendDisplayMode="table",
-    legendPlacement="right",
-    legendValues=["min", "mean", "max"],
-    lineInterpolation="smooth",
-    unit=UNITS.OPS_PER_SEC,
-    targets=[
-        Target(
-            expr='sum(rate(s3_cloudserver_http_requests_total{namespace="${namespace}", job=~"$job"}[$__rate_interval])) by(action)',  # noqa: E501
-            legendFormat="{{action}}",
-        )
-    ]
-)
+def requests_by_action(q):
+    # type: (Queries) -> TimeSeries
+    return TimeSeries(
+        title="Request rate per S3 action",
+        dataSource="${DS_PROMETHEUS}",
+        legendDisplayMode="table",
+        legendPlacement="right",
+        legendValues=["min", "mean", "max"],
+        lineInterpolation="smooth",
+        unit=UNITS.OPS_PER_SEC,
+        targets=[
+            Target(
+                expr=q.request_rate(by=["action"]),
+                legendFormat="{{action}}",
+            )
+        ]
+    )
 
-requestsByMethod = PieChart(
-    title="HTTP Method breakdown",
-    dataSource="${DS_PROMETHEUS}",
-    displayLabels=['name', 'percent'],
-    reduceOptionsCalcs=['sum'],
-    unit=UNITS.SHORT,
-    targets=[
-        Target(
-            expr='sum(round(increase(s3_cloudserver_http_requests_total{namespace="${namespace}", job=~"$job"}[$__rate_interval]))) by(method)',  # noqa: E501
-            legendFormat="{{method}}",
-        ),
-    ],
-)
 
+def requests_by_method(q):
+    # type: (Queries) -> PieChart
+    return PieChart(
+        title="HTTP Method breakdown",
+        dataSource="${DS_PROMETHEUS}",
+        displayLabels=['name', 'percent'],
+        reduceOptionsCalcs=['sum'],
+        unit=UNITS.SHORT,
+        targets=[
+            Target(
+                expr='round(' + q.request_rate(by=["method"],
+                                               func="increase") + ')',
+                legendFormat="{{method}}",
+            ),
+        ],
+    )
 
-def average_latency_target(title, action="", by=""):
-    # type: (str, str, str) -> Target
-    extra = ', action=' + action if action else ""
-    by = " by (" + by + ")" if by else ""
-    return Target(
-        expr="\n".join([
-            'sum(rate(s3_cloudserver_http_request_duration_seconds_sum{namespace="${namespace}", job=~"$job"' + extra + "}[$__rate_interval]))" + by,  # noqa: E501
-            "   /",
-            'sum(rate(s3_cloudserver_http_request_duration_seconds_count{namespace="${namespace}", job=~"$job"' + extra + "}[$__rate_interval]))" + by,  # noqa: E501,
-        ]),
-        legendFormat=title,
-    )
-
-
-def average_quota_latency_target(code="", by=""):
-    # type: (str, str) -> Target
-    extra = ', code=' + code if code else ""
-    by = " by (" + by + ")" if by else ""
-    return "\n".join([
-        'sum(rate(s3_cloudserver_quota_evaluation_duration_seconds_sum{namespace="${namespace}", job="${job}"' + extra + "}[$__rate_interval]))" + by,  # noqa: E501
-        "   /",
-        'sum(rate(s3_cloudserver_quota_evaluation_duration_seconds_count{namespace="${namespace}", job="${job}"' + extra + "}[$__rate_interval]))" + by,  # noqa: E501,
-    ])
+
+def average_latencies(q):
+    # type: (Queries) -> TimeSeries
+    return TimeSeries(
+        title="Average latencies",
+        dataSource="${DS_PROMETHEUS}",
+        lineInterpolation="smooth",
+        spanNulls=3*60*1000,
+        unit=UNITS.SECONDS,
+        targets=[
+            Target(expr=q.average_latency(action=action), legendFormat=title)
+            for title, action in [
+                ("Overall", None),
+                ("Upload",
+                 '~"objectPut|objectPutPart|objectCopy|objectPutCopyPart"'),
+                ("Delete", '"objectDelete"'),
+                ("Download", '"objectGet"'),
+                ("Multi-delete", '~"multiObjectDelete|multipartDelete"'),
+            ]
+        ],
+    )
 
 
-def average_quota_retrieval_latency(code="", by=""):
-    # type: (str, str) -> Target
-    extra = ', code=' + code if code else ""
-    by = " by (" + by + ")" if by else ""
-    return "\n".join([
-        'sum(rate(s3_cloudserver_quota_metrics_retrieval_duration_seconds_sum{namespace="${namespace}", job="${job}"' + extra + "}[$__rate_interval]))" + by,  # noqa: E501
-        "   /",
-        'sum(rate(s3_cloudserver_quota_metrics_retrieval_duration_seconds_count{namespace="${namespace}", job="${job}"' + extra + "}[$__rate_interval]))" + by,  # noqa: E501,
-    ])
+def latencies_by_action(q):
+    # type: (Queries) -> TimeSeries
+    return TimeSeries(
+        title="Latencies per S3 action",
+        dataSource="${DS_PROMETHEUS}",
+        legendDisplayMode="table",
+        legendPlacement="right",
+        legendValues=["max", "mean"],
+        lineInterpolation="smooth",
+        spanNulls=3*60*1000,
+        unit=UNITS.SECONDS,
+        targets=[
+            Target(
+                expr=q.average_latency(by=["action"]),
+                legendFormat="{{action}}",
+            ),
+        ]
+    )
 
 
-averageLatencies = TimeSeries(
-    title="Average latencies",
-    dataSource="${DS_PROMETHEUS}",
-    lineInterpolation="smooth",
-    spanNulls=3*60*1000,
-    unit=UNITS.SECONDS,
-    targets=[
-        average_latency_target(title="Overall"),
-        average_latency_target(
-            title="Upload",
-            action='~"objectPut|objectPutPart|objectCopy|objectPutCopyPart"'
+def latency_quantiles_by_action(q):
+    # type: (Queries) -> TimeSeries
+    return TimeSeries(
+        title="99th percentile latency per S3 action",
+        dataSource="${DS_PROMETHEUS}",
+        legendDisplayMode="table",
+        legendPlacement="right",
+        legendValues=["max", "mean"],
+        lineInterpolation="smooth",
+        spanNulls=3*60*1000,
+        unit=UNITS.SECONDS,
+        targets=[
+            Target(
+                expr=q.latency_quantile(0.99, by=["action"],
+                                        action='~"$action"'),
+                legendFormat="{{action}}",
+            ),
+        ]
+    )
+
+
+def request_time(q, title, description=None, **extra):
+    # type: (Queries, str, str, str) -> Heatmap
+    return Heatmap(
+        title=title,
+        description=description,
+        dataSource="${DS_PROMETHEUS}",
+        dataFormat="tsbuckets",
+        maxDataPoints=25,
+        tooltip=Tooltip(show=True, showHistogram=True),
+        yAxis=YAxis(format=UNITS.SECONDS),
+        color=HeatmapColor(mode="opacity"),
+        targets=[Target(
+            expr=q.latency_histogram(**extra),
+            format="heatmap",
+            legendFormat="{{ le }}",
+        )],
+    )
+
+
+def request_time_all(q):
+    # type: (Queries) -> Heatmap
+    return request_time(q, "Request duration")
+
+
+def request_time_by_action(q):
+    # type: (Queries) -> Heatmap
+    return request_time(
+        q, "Request duration per S3 action",
+        description=(
+            "Distribution of the duration of the selected S3 actions. The "
+            "resolution depends on the bucket layout configured with "
+            "monitoring.httpRequestDurationBuckets: requests slower than the "
+            "largest bucket are all counted in the top (+Inf) cell."
         ),
-        average_latency_target(title="Delete", action='"objectDelete"'),
-        average_latency_target(title="Download", action='"objectGet"'),
-        average_latency_target(
-            title="Multi-delete", action='~"multiObjectDelete|multipartDelete"'
+        action='~"$action"',
+    )
+
+
+PHASES = ["auth", "metadata", "quota", "kms", "data", "other"]
+
+
+def latency_breakdown(q):
+    # type: (Queries) -> TimeSeries
+    return TimeSeries(
+        title="Average time per request by phase",
+        description=(
+            "Time spent on average by the selected S3 actions in each phase "
+            "of the request. \"other\" is the time not spent in any of the "
+            "instrumented layers: request parsing, body transfer, response "
+            "streaming... Phases may overlap, e.g. data includes the KMS "
+            "calls made by the data layer."
         ),
-    ],
-)
+        dataSource="${DS_PROMETHEUS}",
+        fillOpacity=50,
+        legendDisplayMode="table",
+        legendPlacement="right",
+        legendValues=["mean", "max"],
+        lineInterpolation="smooth",
+        stacking={"mode": "normal", "group": "A"},
+        unit=UNITS.SECONDS,
+        targets=[Target(
+            expr=q.phase_time_per_request(action='~"$action"'),
+            legendFormat="{{phase}}",
+        )],
+        overrides=[
+            color_override(phase, color) for phase, color in zip(PHASES, [
+                "purple", "blue", "yellow", "orange", "green", "#808080",
+            ])
+        ],
+    )
 
-latenciesByAction = TimeSeries(
-    title="Latencies per S3 action",
-    dataSource="${DS_PROMETHEUS}",
-    legendDisplayMode="table",
-    legendPlacement="right",
-    legendValues=["max", "mean"],
-    lineInterpolation="smooth",
-    spanNulls=3*60*1000,
-    unit=UNITS.SECONDS,
-    targets=[
-        average_latency_target(title="{{action}}", by="action"),
-    ]
-)
 
-requestTime = Heatmap(
-    title="Request duration",
-    dataSource="${DS_PROMETHEUS}",
-    dataFormat="tsbuckets",
-    maxDataPoints=25,
-    tooltip=Tooltip(show=True, showHistogram=True),
-    yAxis=YAxis(format=UNITS.SECONDS),
-    color=HeatmapColor(mode="opacity"),
-    targets=[Target(
-        expr='sum by(le) (increase(s3_cloudserver_http_request_duration_seconds_bucket{namespace="${namespace}", job="${job}"}[$__rate_interval]))',  # noqa: E501
-        format="heatmap",
-        legendFormat="{{ le }}",
-    )],
-)
+def latency_breakdown_p99(q):
+    # type: (Queries) -> TimeSeries
+    return TimeSeries(
+        title="99th percentile by phase",
+        dataSource="${DS_PROMETHEUS}",
+        legendDisplayMode="table",
+        legendPlacement="right",
+        legendValues=["mean", "max"],
+        lineInterpolation="smooth",
+        unit=UNITS.SECONDS,
+        targets=[Target(
+            expr=q.phase_quantile(0.99, action='~"$action"'),
+            legendFormat="{{phase}}",
+        )],
+    )
+
+
+def latency_breakdown_by_action(q):
+    # type: (Queries) -> BarGauge
+    return BarGauge(
+        title="Average time per request by action and phase",
+        dataSource="${DS_PROMETHEUS}",
+        calc="lastNotNull",
+        displayMode="gradient",
+        format=UNITS.SECONDS,
+        max=None,
+        min=None,
+        noValue="-",
+        orientation="horizontal",
+        targets=[Target(
+            expr=q.over("$__range").phase_time_per_request(
+                by=["action"], action='~"$action"'),
+            instant=True,
+            legendFormat="{{action}} {{phase}}",
+        )],
+    )
 
 
 def axisPlacement_override(name, mode):
@@ -449,397 +583,583 @@ def axisPlacement_override(name, mode):
     }
 
 
-bandWidth = TimeSeries(
-    title="Bandwidth",
-    dataSource="${DS_PROMETHEUS}",
-    unit="binBps",
-    targets=[
-        Target(
-            expr='sum(rate(s3_cloudserver_http_response_size_bytes_sum{namespace="${namespace}", job="${job}"}[$__rate_interval]))',  # noqa: E501
-            legendFormat="Out"
-        ),
-        Target(
-            expr='sum(rate(s3_cloudserver_http_request_size_bytes_sum{namespace="${namespace}", job="${job}"}[$__rate_interval]))',  # noqa: E501
-            legendFormat="In"
-        )
-    ],
-    thresholds=[
-        Threshold("green", 0, 0.0),
-        Threshold("red",   1, 80.0),
-    ],
-    overrides=[
-        axisPlacement_override("Out", "right"),
-    ],
-)
+def bandwidth(q):
+    # type: (Queries) -> TimeSeries
+    return TimeSeries(
+        title="Bandwidth",
+        dataSource="${DS_PROMETHEUS}",
+        unit="binBps",
+        targets=[
+            Target(
+                expr='sum(rate(s3_cloudserver_http_response_size_bytes_sum{' + q.selector() + '}[$__rate_interval]))',  # noqa: E501
+                legendFormat="Out"
+            ),
+            Target(
+                expr='sum(rate(s3_cloudserver_http_request_size_bytes_sum{' + q.selector() + '}[$__rate_interval]))',  # noqa: E501
+                legendFormat="In"
+            )
+        ],
+        thresholds=[
+            Threshold("green", 0, 0.0),
+            Threshold("red",   1, 80.0),
+        ],
+        overrides=[
+            axisPlacement_override("Out", "right"),
+        ],
+    )
 
-uploadChunkSize = BarGauge(
-    title="Avg upload chunk size by φ-quantile",
-    dataSource="${DS_PROMETHEUS}",
-    calc="lastNotNull",
-    displayMode="gradient",
-    format="bytes",
-    max=None,
-    min=None,
-    noValue="-",
-    orientation="vertical",
-    targets=[Target(
-        expr='avg(s3_cloudserver_http_request_size_bytes{namespace="${namespace}", job=~"$job"}) by (quantile)',  # noqa: E501
-        legendFormat='{{ quantile }}',
-    )],
-    thresholds=[
-        Threshold("#808080", 0, 0.0),
-        Threshold("green", 1, 0.0),
-    ]
-)
 
-downloadChunkSize = BarGauge(
-    title="Avg download chunk size by φ-quantile",
-    dataSource="${DS_PROMETHEUS}",
-    calc="lastNotNull",
-    displayMode="gradient",
-    format="bytes",
-    max=None,
-    min=None,
-    noValue="-",
-    orientation="vertical",
-    targets=[Target(
-        expr='avg(s3_cloudserver_http_response_size_bytes{namespace="${namespace}", job=~"$job"}) by (quantile)',  # noqa: E501
-        legendFormat='{{ quantile }}',
-    )],
-    thresholds=[
-        Threshold("#808080", 0, 0.0),
-        Threshold("green", 1, 0.0),
-    ]
-)
+def chunk_size(q, title, metric):
+    # type: (Queries, str, str) -> BarGauge
+    return BarGauge(
+        title=title,
+        dataSource="${DS_PROMETHEUS}",
+        calc="lastNotNull",
+        displayMode="gradient",
+        format="bytes",
+        max=None,
+        min=None,
+        noValue="-",
+        orientation="vertical",
+        targets=[Target(
+            expr='avg(' + metric + '{' + q.selector() + '}) by (quantile)',
+            legendFormat='{{ quantile }}',
+        )],
+        thresholds=[
+            Threshold("#808080", 0, 0.0),
+            Threshold("green", 1, 0.0),
+        ]
+    )
+
+
+def upload_chunk_size(q):
+    # type: (Queries) -> BarGauge
+    return chunk_size(q, "Avg upload chunk size by φ-quantile",
+                      "s3_cloudserver_http_request_size_bytes")
+
+
+def download_chunk_size(q):
+    # type: (Queries) -> BarGauge
+    return chunk_size(q, "Avg download chunk size by φ-quantile",
+                      "s3_cloudserver_http_response_size_bytes")
 
 
-def top10_errors_by_bucket(title, code):
-    # type: (str, str) -> PieChart
+def top10_selector(q, dimension, **extra):
+    # type: (Queries, str, str) -> str
+    # Buckets and accounts outside of the top-K tracked by cloudserver are
+    # aggregated in the "__other__" series, which is not shown.
+    extra[dimension] = '!="__other__"'
+    return q.selector(**extra)
+
+
+def top10_by(q, dimension, title, code=None):
+    # type: (Queries, str, str, str) -> PieChart
     return PieChart(
         title=title,
-        dataSource="${DS_LOKI}",
+        dataSource="${DS_PROMETHEUS}",
         displayLabels=['name'],
         legendDisplayMode='table',
         legendPlacement='right',
         legendValues=['value'],
         pieType='donut',
+        reduceOptionsCalcs=['lastNotNull'],
         unit=UNITS.SHORT,
         targets=[Target(
             expr="\n".join([
-                "topk(10, sum by(bucketName) (",
-                '    count_over_time({namespace="${namespace}", pod=~"$pod"}',  # noqa: E501
-                '                    | json | bucketName!="" and httpCode=' + code,  # noqa: E501
-                "                    [$__interval])",
+                "topk(10, sum by(" + dimension + ") (",
+                "    round(increase(s3_cloudserver_" + dimension + "_http_requests_total{",  # noqa: E501
+                "        " + top10_selector(q, dimension, code=code),
+                "    }[$__range]))",
                 "))",
             ]),
-            legendFormat='{{bucketName}}',
+            instant=True,
+            legendFormat='{{' + dimension + '}}',
         )],
     )
 
 
-top10Error404ByBucket = top10_errors_by_bucket(
-    title="404 : Top10 by Bucket", code='"404"'
-)
-top10Error500ByBucket = top10_errors_by_bucket(
-    title="500 : Top10 by Bucket", code='"500"'
-)
-top10Error5xxByBucket = top10_errors_by_bucket(
-    title="5xx : Top10 by Bucket", code='~"5.."'
-)
-
-
-quotaHealth = TimeSeries(
-    title="Quota service uptime",
-    legendDisplayMode="hidden",
-    dataSource="${DS_PROMETHEUS}",
-    lineInterpolation="stepAfter",
-    fillOpacity=30,
-    unit=UNITS.PERCENT_FORMAT,
-    targets=[Target(
-        expr='avg(avg_over_time(s3_cloudserver_quota_utilization_service_available{namespace="${namespace}",job="${job}"}[$__rate_interval])) * 100',  # noqa: E501
-    )],
-    thresholds=[
-        Threshold("green", 0, 95.0),
-        Threshold("orange", 1, 90.0),
-        Threshold("red", 2, 0.0),
-    ],
-)
-
+def top10_latency_by(q, dimension):
+    # type: (Queries, str) -> TimeSeries
+    return TimeSeries(
+        title="Top10 " + dimension + "s by 99th percentile latency",
+        dataSource="${DS_PROMETHEUS}",
+        legendDisplayMode="table",
+        legendPlacement="right",
+        legendValues=["mean", "max"],
+        lineInterpolation="smooth",
+        unit=UNITS.SECONDS,
+        targets=[Target(
+            expr="\n".join([
+                "topk(10, histogram_quantile(0.99, sum by(" + dimension + ", le) (",  # noqa: E501
+                "    rate(s3_cloudserver_" + dimension + "_http_request_duration_seconds_bucket{" + top10_selector(q, dimension) + "}[$__rate_interval])",  # noqa: E501
+                ")))",
+            ]),
+            legendFormat="{{" + dimension + "}}",
+        )],
+    )
 
-quotaStatusCode = TimeSeries(
-    title="Quota evaluation status code over time",
-    dataSource="${DS_PROMETHEUS}",
-    fillOpacity=30,
-    lineInterpolation="smooth",
-    unit=UNITS.OPS_PER_SEC,
-    targets=[Target(
-        expr='sum(rate(s3_cloudserver_quota_evaluation_duration_seconds_count{namespace="${namespace}", code=~"2..", job="${job}"}[$__rate_interval]))',  # noqa: E501
-        legendFormat="Success",
-    ), Target(
-        expr='sum(rate(s3_cloudserver_quota_evaluation_duration_seconds_count{namespace="${namespace}", code="429", job="${job}"}[$__rate_interval]))',  # noqa: E501
-        legendFormat="Quota Exceeded",
-    )],
-)
 
-quotaByAction = TimeSeries(
-    title="Quota evaluaton rate per S3 action",
-    dataSource="${DS_PROMETHEUS}",
-    legendDisplayMode="table",
-    legendPlacement="right",
-    legendValues=["min", "mean", "max"],
-    lineInterpolation="smooth",
-    unit=UNITS.OPS_PER_SEC,
-    targets=[
-        Target(
-            expr='sum(rate(s3_cloudserver_quota_evaluation_duration_seconds_count{namespace="${namespace}", job="${job}"}[$__rate_interval])) by(action)',  # noqa: E501
-            legendFormat="{{action}}",
+def top10_bandwidth_by(q, dimension):
+    # type: (Queries, str) -> TimeSeries
+    def target(direction, legend):
+        return Target(
+            expr="\n".join([
+                "topk(10, sum by(" + dimension + ") (",
+                "    rate(s3_cloudserver_" + dimension + "_http_" + direction + "_bytes_total{" + top10_selector(q, dimension) + "}[$__rate_interval])",  # noqa: E501
+                "))",
+            ]),
+            legendFormat=legend + ": {{" + dimension + "}}",
         )
-    ]
-)
-
 
-averageQuotaDuration = Heatmap(
-    title="Quota evaluation duration",
-    dataSource="${DS_PROMETHEUS}",
-    dataFormat="tsbuckets",
-    maxDataPoints=25,
-    tooltip=Tooltip(show=True, showHistogram=True),
-    yAxis=YAxis(format=UNITS.SECONDS),
-    color=HeatmapColor(mode="opacity"),
-    targets=[Target(
-        expr='sum by(le) (increase(s3_cloudserver_quota_evaluation_duration_seconds_bucket{namespace="${namespace}", job="${job}"}[$__rate_interval]))',  # noqa: E501
-        format="heatmap",
-        legendFormat="{{ le }}",
-    )],
-)
+    return TimeSeries(
+        title="Top10 " + dimension + "s by bandwidth",
+        dataSource="${DS_PROMETHEUS}",
+        legendDisplayMode="table",
+        legendPlacement="right",
+        legendValues=["mean", "max"],
+        lineInterpolation="smooth",
+        unit="binBps",
+        targets=[target("request", "in"), target("response", "out")],
+    )
 
 
-operationsWithUnavailableMetrics = TimeSeries(
-    title="Operations with unavailable metrics",
-    dataSource="${DS_PROMETHEUS}",
-    fillOpacity=30,
-    lineInterpolation="smooth",
-    unit=UNITS.OPS_PER_SEC,
-    legendDisplayMode="hidden",
-    targets=[Target(
-        expr='sum(rate(s3_cloudserver_quota_unavailable_count{namespace="${namespace}", job="${job}"}[$__rate_interval]))',  # noqa: E501
-    )],
-)
+def quota_health(q):
+    # type: (Queries) -> TimeSeries
+    return TimeSeries(
+        title="Quota service uptime",
+        legendDisplayMode="hidden",
+        dataSource="${DS_PROMETHEUS}",
+        lineInterpolation="stepAfter",
+        fillOpacity=30,
+        unit=UNITS.PERCENT_FORMAT,
+        targets=[Target(
+            expr='avg(avg_over_time(s3_cloudserver_quota_utilization_service_available{' + q.selector() + '}[$__rate_interval])) * 100',  # noqa: E501
+        )],
+        thresholds=[
+            Threshold("green", 0, 95.0),
+            Threshold("orange", 1, 90.0),
+            Threshold("red", 2, 0.0),
+        ],
+    )
 
 
-averageQuotaLatencies = TimeSeries(
-    title="Average quota evaluation latencies",
-    dataSource="${DS_PROMETHEUS}",
-    lineInterpolation="smooth",
-    spanNulls=3*60*1000,
-    legendDisplayMode="table",
-    legendPlacement="right",
-    legendValues=["min", "mean", "max"],
-    unit=UNITS.SECONDS,
-    targets=[
-        Target(
-            expr=average_quota_latency_target(code='~"2.."', by='type'),
-            legendFormat='{{ type }} (success)',
-        ),
-        Target(
-            expr=average_quota_latency_target(code='"429"', by='type'),
-            legendFormat='{{ type }} (exceeded)',
-        ),
-    ],
-)
+def quota_status_code(q):
+    # type: (Queries) -> TimeSeries
+    return TimeSeries(
+        title="Quota evaluation status code over time",
+        dataSource="${DS_PROMETHEUS}",
+        fillOpacity=30,
+        lineInterpolation="smooth",
+        unit=UNITS.OPS_PER_SEC,
+        targets=[Target(
+            expr=q.quota_rate(code='~"2.."'),
+            legendFormat="Success",
+        ), Target(
+            expr=q.quota_rate(code='"429"'),
+            legendFormat="Quota Exceeded",
+        )],
+    )
 
 
-averageMetricsRetrievalLatencies = TimeSeries(
-    title="Average utilization metrics retrieval latencies",
-    dataSource="${DS_PROMETHEUS}",
-    lineInterpolation="smooth",
-    spanNulls=3*60*1000,
-    unit=UNITS.SECONDS,
-    targets=[
-        Target(
-            expr=average_quota_retrieval_latency(code='~"2.."', by='class'),
-            legendFormat='{{ class }} (success)',
-        ),
-        Target(
-            expr=average_quota_retrieval_latency(
-                code='~"4..|5.."',
-                by='class'
-            ),
-            legendFormat='{{ class }} (error)',
-        ),
-    ],
-)
+def quota_by_action(q):
+    # type: (Queries) -> TimeSeries
+    return TimeSeries(
+        title="Quota evaluaton rate per S3 action",
+        dataSource="${DS_PROMETHEUS}",
+        legendDisplayMode="table",
+        legendPlacement="right",
+        legendValues=["min", "mean", "max"],
+        lineInterpolation="smooth",
+        unit=UNITS.OPS_PER_SEC,
+        targets=[
+            Target(
+                expr=q.quota_rate(by=["action"]),
+                legendFormat="{{action}}",
+            )
+        ]
+    )
 
 
-bucketQuotaCounter = Stat(
-    title="Buckets with quota",
-    description=(
-        "Number of S3 buckets with quota enabled in the cluster.\n"
-        "This value is computed asynchronously, and update "
-        "may be delayed up to 1h."
-    ),
-    dataSource="${DS_PROMETHEUS}",
-    colorMode="value",
-    format=UNITS.SHORT,
-    noValue="-",
-    reduceCalc="lastNotNull",
-    targets=[Target(
-        expr='max(s3_cloudserver_quota_buckets_count{namespace="${namespace}", job=~"${reportJob}"})',  # noqa: E501
-    )],
-    thresholds=[
-        Threshold("#808080", 0, 0.0),
-        Threshold("blue", 1, 0.0),
-    ],
-)
+def average_quota_duration(q):
+    # type: (Queries) -> Heatmap
+    return Heatmap(
+        title="Quota evaluation duration",
+        dataSource="${DS_PROMETHEUS}",
+        dataFormat="tsbuckets",
+        maxDataPoints=25,
+        tooltip=Tooltip(show=True, showHistogram=True),
+        yAxis=YAxis(format=UNITS.SECONDS),
+        color=HeatmapColor(mode="opacity"),
+        targets=[Target(
+            expr=q.quota_histogram(),
+            format="heatmap",
+            legendFormat="{{ le }}",
+        )],
+    )
 
 
-accountQuotaCounter = Stat(
-    title="Accounts with quota",
-    description=(
-        "Number of accounts with quota enabled in the cluster.\n"
-        "This value is computed asynchronously, and update "
-        "may be delayed up to 1h."
-    ),
-    dataSource="${DS_PROMETHEUS}",
-    colorMode="value",
-    format=UNITS.SHORT,
-    noValue="-",
-    reduceCalc="lastNotNull",
-    targets=[Target(
-        expr='max(s3_cloudserver_quota_accounts_count{namespace="${namespace}", job=~"${reportJob}"})',  # noqa: E501
-    )],
-    thresholds=[
-        Threshold("#808080", 0, 0.0),
-        Threshold("blue", 1, 0.0),
-    ],
-)
+def operations_with_unavailable_metrics(q):
+    # type: (Queries) -> TimeSeries
+    return TimeSeries(
+        title="Operations with unavailable metrics",
+        dataSource="${DS_PROMETHEUS}",
+        fillOpacity=30,
+        lineInterpolation="smooth",
+        unit=UNITS.OPS_PER_SEC,
+        legendDisplayMode="hidden",
+        targets=[Target(
+            expr='sum(rate(s3_cloudserver_quota_unavailable_count{' + q.selector() + '}[$__rate_interval]))',  # noqa: E501
+        )],
+    )
 
 
-dashboard = (
-    Dashboard(
-        title="S3 service",
-        editable=True,
-        refresh="30s",
-        tags=["CloudServer"],
-        timezone="",
-        inputs=[
-            DataSourceInput(
-                name="DS_PROMETHEUS",
-                label="Prometheus",
-                pluginId="prometheus",
-                pluginName="Prometheus",
-            ),
-            DataSourceInput(
-                name="DS_LOKI",
-                label="Loki",
-                pluginId="loki",
-                pluginName="Loki"
-            ),
-            ConstantInput(
-                name="namespace",
-                label="namespace",
-                description="Namespace associated with the Zenko instance",
-                value="zenko",
+def average_quota_latencies(q):
+    # type: (Queries) -> TimeSeries
+    return TimeSeries(
+        title="Average quota evaluation latencies",
+        dataSource="${DS_PROMETHEUS}",
+        lineInterpolation="smooth",
+        spanNulls=3*60*1000,
+        legendDisplayMode="table",
+        legendPlacement="right",
+        legendValues=["min", "mean", "max"],
+        unit=UNITS.SECONDS,
+        targets=[
+            Target(
+                expr=q.average_quota_latency(by=['type'], code='~"2.."'),
+                legendFormat='{{ type }} (success)',
             ),
-            ConstantInput(
-                name="zenkoName",
-                label="instance",
-                description="Name of the Zenko instance",
-                value="artesca-data",
+            Target(
+                expr=q.average_quota_latency(by=['type'], code='"429"'),
+                legendFormat='{{ type }} (exceeded)',
             ),
-            ConstantInput(
-                name="container",
-                label="container",
-                description="Name of the Cloudserver container, used to "
-                            "filter only the Cloudserver services.",
-                value="connector-cloudserver",
+        ],
+    )
+
+
+def average_metrics_retrieval_latencies(q):
+    # type: (Queries) -> TimeSeries
+    return TimeSeries(
+        title="Average utilization metrics retrieval latencies",
+        dataSource="${DS_PROMETHEUS}",
+        lineInterpolation="smooth",
+        spanNulls=3*60*1000,
+        unit=UNITS.SECONDS,
+        targets=[
+            Target(
+                expr=q.average_quota_retrieval_latency(
+                    by=['class'], code='~"2.."'),
+                legendFormat='{{ class }} (success)',
             ),
-            ConstantInput(
-                name="reportJob",
-                label="report job",
-                description="Name of the Cloudserver Report job, used to "
-                            "filter only the Report Handler instances.",
-                value="artesca-data-ops-report-handler",
+            Target(
+                expr=q.average_quota_retrieval_latency(
+                    by=['class'], code='~"4..|5.."'),
+                legendFormat='{{ class }} (error)',
             ),
-            ConstantInput(
-                name="countItemsJob",
-                label="count-items job",
-                description="Name of the Count-Items cronjob, used to filter "
-                            "only the Count-Items instances.",
-                value="artesca-data-ops-count-items",
-            )
         ],
-        templating=Templating([
-            Template(
-                dataSource='${DS_PROMETHEUS}',
-                label='Group',
-                multi=True,
-                name='job',
-                query='label_values(s3_cloudserver_http_active_requests{namespace="${namespace}", container="${container}"}, job)',  # noqa: E501
-                regex='/(?<value>${zenkoName}-(?<text>\\w*).*)/',
-            ),
-            Template(
-                dataSource='${DS_PROMETHEUS}',
-                hide=HIDE_VARIABLE,
-                label='pod',
-                name='pod',
-                query='label_values(s3_cloudserver_http_active_requests{namespace="${namespace}", container="${container}", job=~"$job"}, pod)',  # noqa: E501
-            )
-        ]),
-        panels=layout.column([
-            layout.row(
-                [up, httpRequests, successRate, dataIngestionRate,
-                 objectIngestionRate]
-                + layout.resize([bucketsCounter], width=7)
-                + layout.resize([reporterUp], width=2),
-                height=4),
-            layout.row(
-                [status200]
-                + layout.resize([status403, status5xx, activeRequests],
-                                width=2)
-                + [oobDataIngestionRate, oobObjectIngestionRate]
-                + layout.resize([objectsCounter], width=7)
-                + layout.resize([lastReport], width=2),
-                height=4),
-            RowPanel(title="Response codes"),
-            layout.row([httpStatusCodes, httpAggregatedStatus], height=8),
-            RowPanel(title="Operations"),
-            layout.row([
-                requestsByAction, layout.resize([requestsByMethod], width=6)
-            ], height=10),
-            RowPanel(title="Latency"),
-            layout.row([averageLatencies, requestTime], height=8),
-            layout.row([latenciesByAction], height=10),
-            RowPanel(title="Data rate"),
-            layout.row(layout.resize([bandWidth], width=12)
-                       + [uploadChunkSize, downloadChunkSize],
-                       height=8),
-            RowPanel(title="Errors"),
-            layout.row([
-                top10Error404ByBucket,
-                top10Error500ByBucket,
-                top10Error5xxByBucket
-            ], height=8),
-            RowPanel(title="Quotas"),
-            layout.row([
-                layout.column([
-                    layout.resize([bucketQuotaCounter], width=6, height=4),
-                    layout.resize([accountQuotaCounter], width=6, height=4),
-                ], height=8),
-                layout.resize([operationsWithUnavailableMetrics], width=6),
-                quotaByAction,
-            ], height=8),
-            layout.row([
-                layout.resize([quotaHealth], width=6),
-                layout.resize([quotaStatusCode], width=6),
-                averageQuotaLatencies,
-            ], height=8),
-            layout.row([
-                layout.resize([averageQuotaDuration], width=6),
-                averageMetricsRetrievalLatencies,
+    )
+
+
+def bucket_quota_counter(q):
+    # type: (Queries) -> Stat
+    return report_counter(
+        q, "Buckets with quota",
+        "Number of S3 buckets with quota enabled in the cluster.",
+        'max(s3_cloudserver_quota_buckets_count{' + q.report_selector() + '})')  # noqa: E501
+
+
+def account_quota_counter(q):
+    # type: (Queries) -> Stat
+    return report_counter(
+        q, "Accounts with quota",
+        "Number of accounts with quota enabled in the cluster.",
+        'max(s3_cloudserver_quota_accounts_count{' + q.report_selector() + '})')  # noqa: E501
+
+
+def summary_rows(q):
+    return [
+        layout.row(
+            [up(q), http_requests(q), success_rate(q),
+             data_ingestion_rate(q), object_ingestion_rate(q)]
+            + layout.resize([buckets_counter(q)], width=7)
+            + layout.resize([reporter_up(q)], width=2),
+            height=4),
+        layout.row(
+            [http_status_panel(q, title="Status 200", code='"200"')]
+            + layout.resize([
+                http_status_panel(q, title="Status 4xx", code='~"4.."'),
+                http_status_panel(q, title="Status 5xx", code='~"5.."'),
+                active_requests(q),
+            ], width=2)
+            + [oob_data_ingestion_rate(q), oob_object_ingestion_rate(q)]
+            + layout.resize([objects_counter(q)], width=7)
+            + layout.resize([last_report(q)], width=2),
+            height=4),
+    ]
+
+
+def response_codes_rows(q):
+    return [
+        RowPanel(title="Response codes"),
+        layout.row([http_status_codes(q), http_aggregated_status(q)],
+                   height=8),
+    ]
+
+
+def operations_rows(q):
+    return [
+        RowPanel(title="Operations"),
+        layout.row([
+            requests_by_action(q),
+            layout.resize([requests_by_method(q)], width=6),
+        ], height=10),
+    ]
+
+
+def latency_rows(q):
+    return [
+        RowPanel(title="Latency"),
+        layout.row([average_latencies(q), request_time_all(q)], height=8),
+        layout.row([latencies_by_action(q)], height=10),
+        layout.row([request_time_by_action(q)], height=8),
+    ]
+
+
+def latency_quantile_rows(q):
+    return [
+        layout.row([latency_quantiles_by_action(q)], height=10),
+    ]
+
+
+def latency_breakdown_rows(q):
+    return [
+        RowPanel(title="Latency breakdown"),
+        layout.row([latency_breakdown(q), latency_breakdown_p99(q)],
+                   height=8),
+        layout.row([latency_breakdown_by_action(q)], height=10),
+    ]
+
+
+def data_rate_rows(q):
+    return [
+        RowPanel(title="Data rate"),
+        layout.row(layout.resize([bandwidth(q)], width=12)
+                   + [upload_chunk_size(q), download_chunk_size(q)],
+                   height=8),
+    ]
+
+
+def errors_rows(q):
+    return [
+        RowPanel(title="Errors"),
+        layout.row([
+            top10_by(q, "bucket", title="404 : Top10 by Bucket",
+                     code='"404"'),
+            top10_by(q, "bucket", title="500 : Top10 by Bucket",
+                     code='"500"'),
+            top10_by(q, "bucket", title="5xx : Top10 by Bucket",
+                     code='~"5.."'),
+        ], height=8),
+    ]
+
+
+def buckets_and_accounts_rows(q):
+    return [RowPanel(title="Buckets and accounts")] + [
+        layout.row([
+            layout.resize([
+                top10_by(q, dimension,
+                         title="Requests : Top10 by " + dimension.title()),
+            ], width=6),
+            top10_latency_by(q, dimension),
+            top10_bandwidth_by(q, dimension),
+        ], height=8)
+        for dimension in ["bucket", "account"]
+    ]
+
+
+def quotas_rows(q):
+    return [
+        RowPanel(title="Quotas"),
+        layout.row([
+            layout.column([
+                layout.resize([bucket_quota_counter(q)], width=6, height=4),
+                layout.resize([account_quota_counter(q)], width=6, height=4),
             ], height=8),
-        ]),
+            layout.resize([operations_with_unavailable_metrics(q)], width=6),
+            quota_by_action(q),
+        ], height=8),
+        layout.row([
+            layout.resize([quota_health(q)], width=6),
+            layout.resize([quota_status_code(q)], width=6),
+            average_quota_latencies(q),
+        ], height=8),
+        layout.row([
+            layout.resize([average_quota_duration(q)], width=6),
+            average_metrics_retrieval_latencies(q),
+        ], height=8),
+    ]
+
+
+# variant -> (title, rows)
+VARIANTS = {
+    "overview": ("S3 service", [
+        summary_rows,
+        response_codes_rows,
+        operations_rows,
+        latency_rows,
+        latency_breakdown_rows,
+        data_rate_rows,
+        errors_rows,
+        buckets_and_accounts_rows,
+        quotas_rows,
+    ]),
+    "latency": ("S3 service latency", [
+        latency_rows,
+        latency_quantile_rows,
+        latency_breakdown_rows,
+        buckets_and_accounts_rows,
+    ]),
+    "quota": ("S3 service quotas", [
+        quotas_rows,
+    ]),
+}
+
+
+def inputs():
+    return [
+        DataSourceInput(
+            name="DS_PROMETHEUS",
+            label="Prometheus",
+            pluginId="prometheus",
+            pluginName="Prometheus",
+        ),
+        ConstantInput(
+            name="namespace",
+            label="namespace",
+            description="Namespace associated with the Zenko instance",
+            value="zenko",
+        ),
+        ConstantInput(
+            name="zenkoName",
+            label="instance",
+            description="Name of the Zenko instance",
+            value="artesca-data",
+        ),
+        ConstantInput(
+            name="container",
+            label="container",
+            description="Name of the Cloudserver container, used to "
+                        "filter only the Cloudserver services.",
+            value="connector-cloudserver",
+        ),
+        ConstantInput(
+            name="reportJob",
+            label="report job",
+            description="Name of the Cloudserver Report job, used to "
+                        "filter only the Report Handler instances.",
+            value="artesca-data-ops-report-handler",
+        ),
+        ConstantInput(
+            name="countItemsJob",
+            label="count-items job",
+            description="Name of the Count-Items cronjob, used to filter "
+                        "only the Count-Items instances.",
+            value="artesca-data-ops-count-items",
+        )
+    ]
+
+
+def templating(q):
+    # type: (Queries) -> Templating
+    group = q.layout.group_label
+    return Templating([
+        Template(
+            dataSource='${DS_PROMETHEUS}',
+            label='Group',
+            multi=True,
+            name=group,
+            query='label_values(s3_cloudserver_http_active_requests{namespace="${namespace}", container="${container}"}, ' + group + ')',  # noqa: E501
+            regex=q.layout.group_regex,
+        ),
+        Template(
+            dataSource='${DS_PROMETHEUS}',
+            hide=HIDE_VARIABLE,
+            label='pod',
+            name='pod',
+            query='label_values(s3_cloudserver_http_active_requests{' + q.selector(container='"${container}"') + '}, pod)',  # noqa: E501
+        ),
+        Template(
+            dataSource='${DS_PROMETHEUS}',
+            label='Action',
+            multi=True,
+            includeAll=True,
+            default='objectGet',
+            name='action',
+            query='label_values(s3_cloudserver_http_request_duration_seconds_count{' + q.selector() + '}, action)',  # noqa: E501
+        ),
+    ])
+
+
+def build_dashboard(variant="overview", layout_name="zenko", recorded=False):
+    # type: (str, str, bool) -> Dashboard
+    """Build a dashboard variant for a deployment layout.
+
+    The panels query the raw series, like the alerts of alerts.yaml. With
+    ``recorded``, they query the series of the recording rules of
+    rules.yaml (see rules.py) instead, which is cheaper but requires the
+    rules to be deployed.
+    """
+    q = Queries(LAYOUTS[layout_name], recorded=recorded)
+    title, rows = VARIANTS[variant]
+    return (
+        Dashboard(
+            title=title,
+            editable=True,
+            refresh="30s",
+            tags=["CloudServer"],
+            timezone="",
+            inputs=inputs(),
+            templating=templating(q),
+            panels=layout.column([
+                panel for row in rows for panel in row(q)
+            ]),
+        )
+        .auto_panel_ids()
+        .verify_datasources()
     )
-    .auto_panel_ids()
-    .verify_datasources()
-)
+
+
+dashboard = build_dashboard()
+
+
+def main(argv=None):
+    from grafanalib._gen import DashboardEncoder
+
+    parser = argparse.ArgumentParser(description="Render the dashboards.")
+    parser.add_argument("--variant", action="append",
+                        choices=sorted(VARIANTS),
+                        help="variant to render, may be repeated "
+                             "(default: all)")
+    parser.add_argument("--layout", action="append", choices=sorted(LAYOUTS),
+                        help="deployment layout, may be repeated "
+                             "(default: all)")
+    parser.add_argument("--recorded", action="store_true",
+                        help="query the series of the recording rules "
+                             "rather than the raw ones")
+    parser.add_argument("--output-dir", default=".")
+    args = parser.parse_args(argv)
+
+    for variant in args.variant or sorted(VARIANTS):
+        for layout_name in args.layout or sorted(LAYOUTS):
+            path = os.path.join(args.output_dir, "dashboard-{0}-{1}.json"
+                                .format(variant, layout_name))
+            data = build_dashboard(variant, layout_name, args.recorded)
+            with open(path, "w") as f:
+                json.dump(data.to_json_data(), f, cls=DashboardEncoder,
+                          indent=2, sort_keys=True)
+                f.write("\n")
+            print(path)
+
+
+if __name__ == "__main__":
+    main()
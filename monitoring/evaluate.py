@@ -0,0 +1,455 @@
+"""Check the alerts and dashboard queries of cloudserver offline.
+
+The alerts are rendered with the values of their x-inputs, then evaluated
+with the recording rules against synthetic or captured series, with the
+built-in evaluator of promeval.py or with a local promtool:
+
+    # render alerts.yaml, as the alerts test action does
+    python evaluate.py render alerts.yaml --value replicas:3
+
+    # run the promtool unit tests
+    python evaluate.py test alerts.test.yaml --value replicas:3
+    python evaluate.py test alerts.test.yaml --value replicas:3 \\
+        --promtool /usr/local/bin/promtool
+
+    # capture the series of a load test from a Prometheus...
+    python evaluate.py capture --prometheus http://localhost:9090 \\
+        --start 2024-05-01T10:00:00Z --end 2024-05-01T11:00:00Z \\
+        --output loadtest.json
+    # ...and replay them through the rules, listing when alerts fire
+    python evaluate.py replay loadtest.json --value replicas:3 \\
+        --value namespace:zenko --expect SystemErrorsWarning
+
+    # evaluate the queries of a dashboard on the captured series
+    python evaluate.py query loadtest.json --dashboard latency \\
+        --var job=artesca-data-connector-s3api-metrics
+"""
+import argparse
+import datetime
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import urllib.parse
+import urllib.request
+
+import yaml
+
+import promeval
+from promql import grafana_variables, substitute
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ALERTS = os.path.join(HERE, "alerts.yaml")
+RULES = os.path.join(HERE, "rules.yaml")
+
+
+def parse_values(values):
+    # type: (list) -> dict
+    """Parse ``name:value`` pairs, as given to gen-alert."""
+    result = {}
+    for item in values or []:
+        name, sep, value = item.partition(":")
+        if not sep:
+            raise argparse.ArgumentTypeError(
+                "invalid value {0!r}, expected name:value".format(item))
+        result[name] = value
+    return result
+
+
+def render(path, values):
+    # type: (str, dict) -> dict
+    """Render a rules file with x-inputs, return the rule groups."""
+    with open(path) as f:
+        text = f.read()
+    inputs = yaml.safe_load(text).get("x-inputs", [])
+    resolved = {}
+    for item in inputs:
+        name = item["name"]
+        if name in values:
+            resolved[name] = values[name]
+        elif item.get("value") is not None:
+            resolved[name] = item["value"]
+        else:
+            raise ValueError("no value for input {0!r} of {1}, use --value "
+                             "{0}:<value>".format(name, path))
+    data = yaml.safe_load(substitute(text, resolved))
+    data.pop("x-inputs", None)
+    return data
+
+
+def load_rule_file(path, values):
+    # type: (str, dict) -> list
+    """Rule groups of a file. ``<name>.rendered.yaml`` files, produced by
+    the alerts test action, are rendered from ``<name>.yaml``."""
+    if not os.path.exists(path) and path.endswith(".rendered.yaml"):
+        data = render(path[:-len(".rendered.yaml")] + ".yaml", values)
+    else:
+        with open(path) as f:
+            data = yaml.safe_load(f)
+    return [promeval.RuleGroup.from_dict(g) for g in data["groups"]]
+
+
+def ordered_groups(groups, order):
+    if not order:
+        return groups
+    rank = {name: i for i, name in enumerate(order)}
+    return sorted(groups, key=lambda g: rank.get(g.name, len(rank)))
+
+
+def alert_set(alerts):
+    return sorted(
+        (sorted(a.labels.items()), sorted(a.annotations.items()))
+        for a in alerts
+    )
+
+
+def run_test_group(test, rule_files, order, interval, values):
+    # type: (dict, list, list, float, dict) -> list
+    """Run a test group of a promtool test file, return the failures."""
+    storage = promeval.Storage()
+    series_interval = promeval.parse_duration(test.get("interval", interval))
+    promeval.load_series(storage, test.get("input_series", []),
+                         series_interval)
+    groups = ordered_groups(
+        [g for path in rule_files for g in load_rule_file(path, values)],
+        order)
+    ev = promeval.Evaluator(storage)
+    alert_tests = sorted(test.get("alert_rule_test", []),
+                         key=lambda a: promeval.parse_duration(a["eval_time"]))
+    expr_tests = test.get("promql_expr_test", [])
+    end = max([promeval.parse_duration(a["eval_time"])
+               for a in alert_tests + expr_tests] or [0])
+    failures = []
+    name = test.get("name", "")
+    t = 0.0
+    while t <= end:
+        for group in groups:
+            group.eval(ev, t)
+        for alert_test in alert_tests:
+            eval_time = promeval.parse_duration(alert_test["eval_time"])
+            if not t - interval < eval_time <= t:
+                continue
+            alertname = alert_test["alertname"]
+            got = [a for g in groups for r in g.alerting_rules()
+                   if r.name == alertname for a in r.firing()]
+            for alert in got:
+                alert.labels = {k: v for k, v in alert.labels.items()
+                                if k != "alertname"}
+            expected = [promeval.Alert(
+                alertname,
+                {k: str(v) for k, v in e.get("exp_labels", {}).items()},
+                {k: str(v) for k, v in e.get("exp_annotations", {}).items()},
+                0, 0) for e in alert_test.get("exp_alerts") or []]
+            if alert_set(got) != alert_set(expected):
+                failures.append(
+                    "{0}: alertname: {1}, time: {2}\n"
+                    "    exp: {3}\n    got: {4}".format(
+                        name, alertname, alert_test["eval_time"],
+                        alert_set(expected), alert_set(got)))
+        t += interval
+    for expr_test in expr_tests:
+        eval_time = promeval.parse_duration(expr_test["eval_time"])
+        result = ev.query(expr_test["expr"], eval_time)
+        if not isinstance(result, list):
+            result = [({}, result)]
+        got = sorted((sorted(labels.items()), value)
+                     for labels, value in result)
+        expected = sorted(
+            (sorted(promeval.parse_series(s["labels"]).items())
+             if s.get("labels") else [], float(s["value"]))
+            for s in expr_test.get("exp_samples") or [])
+        if not samples_equal(got, expected):
+            failures.append("{0}: expr: {1}, time: {2}\n"
+                            "    exp: {3}\n    got: {4}".format(
+                                name, expr_test["expr"],
+                                expr_test["eval_time"], expected, got))
+    return failures
+
+
+def samples_equal(got, expected):
+    if len(got) != len(expected):
+        return False
+    for (got_labels, got_value), (exp_labels, exp_value) in zip(got,
+                                                                 expected):
+        if got_labels != exp_labels:
+            return False
+        if not (math.isclose(got_value, exp_value, rel_tol=1e-9)
+                or (math.isnan(got_value) and math.isnan(exp_value))):
+            return False
+    return True
+
+
+def run_tests(path, values):
+    # type: (str, dict) -> list
+    with open(path) as f:
+        spec = yaml.safe_load(f)
+    directory = os.path.dirname(os.path.abspath(path))
+    rule_files = [os.path.join(directory, p) for p in spec["rule_files"]]
+    interval = promeval.parse_duration(spec.get("evaluation_interval", "1m"))
+    failures = []
+    for test in spec.get("tests", []):
+        failures += run_test_group(test, rule_files,
+                                   spec.get("group_eval_order"),
+                                   interval, values)
+    return failures
+
+
+def run_promtool(promtool, path, values):
+    # type: (str, str, dict) -> int
+    """Run a test file with promtool, in a copy of its directory where the
+    rendered rule files are generated."""
+    directory = os.path.dirname(os.path.abspath(path))
+    with open(path) as f:
+        spec = yaml.safe_load(f)
+    workdir = tempfile.mkdtemp()
+    try:
+        for rule_file in spec["rule_files"]:
+            source = os.path.join(directory, rule_file)
+            target = os.path.join(workdir, rule_file)
+            if os.path.exists(source):
+                shutil.copy(source, target)
+            else:
+                with open(target, "w") as f:
+                    yaml.safe_dump(
+                        render(source[:-len(".rendered.yaml")] + ".yaml",
+                               values), f, sort_keys=False)
+        shutil.copy(path, os.path.join(workdir, os.path.basename(path)))
+        return subprocess.call([promtool, "test", "rules",
+                                os.path.basename(path)], cwd=workdir)
+    finally:
+        shutil.rmtree(workdir)
+
+
+def load_storage(paths, interval):
+    """Series of JSON range query results or promtool-style YAML files."""
+    storage = promeval.Storage()
+    for path in paths:
+        with open(path) as f:
+            data = (json.load(f) if path.endswith(".json")
+                    else yaml.safe_load(f))
+        if "input_series" in data:
+            promeval.load_series(storage, data["input_series"], interval)
+        else:
+            promeval.load_matrix(storage, data)
+    return storage
+
+
+def replay(storage, groups, interval):
+    """Evaluate rules over the time range of the series, return the
+    (alertname, labels, start, end) intervals during which alerts fired."""
+    start, end = storage.time_range()
+    ev = promeval.Evaluator(storage)
+    firing = {}
+    intervals = []
+    t = start
+    while t <= end:
+        current = set()
+        for group in groups:
+            group.eval(ev, t)
+            for rule in group.alerting_rules():
+                for alert in rule.firing():
+                    key = (alert.name, tuple(sorted(alert.labels.items())))
+                    current.add(key)
+                    firing.setdefault(key, t)
+        for key in list(firing):
+            if key not in current:
+                intervals.append(key + (firing.pop(key), t))
+        t += interval
+    intervals += [key + (since, None) for key, since in firing.items()]
+    return sorted(intervals, key=lambda i: (i[2], i[0]))
+
+
+def format_time(t, origin):
+    if t is None:
+        return "end"
+    if origin > 1e9:
+        return datetime.datetime.fromtimestamp(
+            t, datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    return "{0:g}s".format(t)
+
+
+def dashboard_queries(variant, layout_name, recorded):
+    from dashboard import build_dashboard
+
+    dashboard = build_dashboard(variant, layout_name, recorded)
+    for panel in dashboard.panels:
+        for target in getattr(panel, "targets", None) or []:
+            if getattr(target, "expr", None):
+                yield panel.title, target.expr
+
+
+def capture(prometheus, start, end, step, match):
+    # type: (str, float, float, float, str) -> dict
+    """Range query of the raw series, the format replayed by load_matrix."""
+    params = urllib.parse.urlencode({
+        "query": match, "start": start, "end": end, "step": step,
+    })
+    url = prometheus.rstrip("/") + "/api/v1/query_range?" + params
+    with urllib.request.urlopen(url) as response:
+        return json.load(response)
+
+
+def parse_time(value):
+    # type: (str) -> float
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.datetime.fromisoformat(
+            value.replace("Z", "+00:00")).timestamp()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Check the alerts and dashboard queries offline.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_values(command):
+        command.add_argument("--value", action="append", default=[],
+                             help="value of an x-input, as name:value")
+
+    render_cmd = commands.add_parser("render", help="render an alerts file")
+    render_cmd.add_argument("alerts", nargs="?", default=ALERTS)
+    render_cmd.add_argument("--output", "-o")
+    add_values(render_cmd)
+
+    test_cmd = commands.add_parser("test", help="run promtool unit tests")
+    test_cmd.add_argument("tests", nargs="+")
+    test_cmd.add_argument("--promtool",
+                          help="run the tests with this promtool binary "
+                               "rather than the built-in evaluator")
+    add_values(test_cmd)
+
+    capture_cmd = commands.add_parser(
+        "capture", help="save series from a Prometheus")
+    capture_cmd.add_argument("--prometheus", default="http://localhost:9090")
+    capture_cmd.add_argument("--start", required=True, type=parse_time)
+    capture_cmd.add_argument("--end", required=True, type=parse_time)
+    capture_cmd.add_argument("--step", default="15s")
+    capture_cmd.add_argument(
+        "--match", default='{__name__=~"s3_cloudserver_.*|up"}')
+    capture_cmd.add_argument("--output", "-o", required=True)
+
+    replay_cmd = commands.add_parser(
+        "replay", help="evaluate the alerts on captured series")
+    replay_cmd.add_argument("series", nargs="+",
+                            help="JSON range query results, or YAML files "
+                                 "with promtool input_series")
+    replay_cmd.add_argument("--alerts", default=ALERTS)
+    replay_cmd.add_argument("--rules", default=RULES)
+    replay_cmd.add_argument("--interval", default="15s",
+                            help="rule evaluation interval, and interval "
+                                 "of input_series")
+    replay_cmd.add_argument("--expect", action="append", default=[],
+                            help="fail unless this alert fires")
+    replay_cmd.add_argument("--expect-not", action="append", default=[],
+                            help="fail if this alert fires")
+    add_values(replay_cmd)
+
+    query_cmd = commands.add_parser(
+        "query", help="evaluate queries on captured series")
+    query_cmd.add_argument("series", nargs="+")
+    query_cmd.add_argument("--expr", action="append", default=[])
+    query_cmd.add_argument("--dashboard", metavar="VARIANT",
+                           help="evaluate the queries of a dashboard")
+    query_cmd.add_argument("--layout", default="zenko")
+    query_cmd.add_argument("--raw", action="store_true",
+                           help="dashboard queries on the raw series")
+    query_cmd.add_argument("--rules", default=RULES,
+                           help="recording rules to evaluate first")
+    query_cmd.add_argument("--interval", default="15s")
+    query_cmd.add_argument("--var", action="append", default=[],
+                           help="dashboard variable, as name=value")
+
+    args = parser.parse_args(argv)
+    values = parse_values(getattr(args, "value", []))
+
+    if args.command == "render":
+        output = open(args.output, "w") if args.output else sys.stdout
+        yaml.safe_dump(render(args.alerts, values), output, sort_keys=False)
+        return 0
+
+    if args.command == "test":
+        status = 0
+        for path in args.tests:
+            if args.promtool:
+                status |= run_promtool(args.promtool, path, values)
+                continue
+            failures = run_tests(path, values)
+            for failure in failures:
+                print("FAILED: " + failure)
+            print("{0}: {1}".format(path, "FAILED" if failures else "SUCCESS"))
+            status |= bool(failures)
+        return status
+
+    if args.command == "capture":
+        data = capture(args.prometheus, args.start, args.end,
+                       promeval.parse_duration(args.step), args.match)
+        with open(args.output, "w") as f:
+            json.dump(data, f)
+        print("{0}: {1} series".format(args.output,
+                                       len(data["data"]["result"])))
+        return 0
+
+    interval = promeval.parse_duration(args.interval)
+    storage = load_storage(args.series, interval)
+
+    if args.command == "replay":
+        groups = load_rule_file(args.rules, values) + [
+            g for g in render_groups(args.alerts, values)]
+        intervals = replay(storage, groups, interval)
+        origin = storage.time_range()[0]
+        for name, labels, start, end in intervals:
+            print("{0} {1} firing from {2} to {3}".format(
+                name, dict(labels), format_time(start, origin),
+                format_time(end, origin)))
+        fired = set(i[0] for i in intervals)
+        missing = [name for name in args.expect if name not in fired]
+        unexpected = [name for name in args.expect_not if name in fired]
+        for name in missing:
+            print("FAILED: {0} did not fire".format(name))
+        for name in unexpected:
+            print("FAILED: {0} fired".format(name))
+        return 1 if missing or unexpected else 0
+
+    # query: evaluate the recording rules over the series first
+    start, end = storage.time_range()
+    ev = promeval.Evaluator(storage)
+    if args.rules:
+        groups = load_rule_file(args.rules, values)
+        t = start
+        while t <= end:
+            for group in groups:
+                group.eval(ev, t)
+            t += interval
+    variables = dict(v.split("=", 1) for v in args.var)
+    variables.update(grafana_variables(end - start, interval))
+    queries = [("", expr) for expr in args.expr]
+    if args.dashboard:
+        queries += list(dashboard_queries(args.dashboard, args.layout,
+                                          not args.raw))
+    status = 0
+    for title, expr in queries:
+        try:
+            result = ev.query(substitute(expr, variables), end)
+        except promeval.PromQLError as exc:
+            print("ERROR {0}: {1}".format(title or expr, exc))
+            status = 1
+            continue
+        if not isinstance(result, list):
+            result = [({}, result)]
+        print("{0}: {1} series".format(title or expr, len(result)))
+        for labels, value in sorted(result, key=lambda r: sorted(r[0].items())):
+            print("    {0} {1:g}".format(labels, value))
+    return status
+
+
+def render_groups(path, values):
+    return [promeval.RuleGroup.from_dict(g)
+            for g in render(path, values)["groups"]]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
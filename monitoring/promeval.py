@@ -0,0 +1,932 @@
+"""Offline evaluation of PromQL expressions and Prometheus rules.
+
+A small PromQL evaluator covering what the cloudserver dashboards, alerts
+and recording rules use: selectors, range functions (rate, increase,
+deriv, *_over_time...), aggregations, vector matching and
+histogram_quantile. It follows the semantics of Prometheus 2.x (closed
+range windows, 5m lookback, rate extrapolation), so that rules can be
+checked against synthetic or captured series without a Prometheus server.
+
+    storage = Storage()
+    storage.add({"__name__": "up", "pod": "a"}, 0, 1)
+    Evaluator(storage).query('sum(up)', 60)
+"""
+import bisect
+import math
+import re
+
+LOOKBACK = 300.0
+STALE = object()
+
+_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, "d": 86400,
+          "w": 7 * 86400, "y": 365 * 86400}
+_DURATION = re.compile(r"(\d+)(ms|[smhdwy])")
+
+
+class PromQLError(Exception):
+    pass
+
+
+def parse_duration(text):
+    # type: (str) -> float
+    """Parse a Prometheus duration, e.g. ``1m`` or ``1h30m``, in seconds."""
+    text = str(text).strip()
+    if re.match(r"^\d+(\.\d+)?$", text):
+        return float(text)
+    parts = _DURATION.findall(text)
+    if not parts or "".join(n + u for n, u in parts) != text:
+        raise PromQLError("invalid duration: " + text)
+    return float(sum(int(n) * _UNITS[u] for n, u in parts))
+
+
+def labels_key(labels):
+    # type: (dict) -> tuple
+    return tuple(sorted(labels.items()))
+
+
+def without_name(labels):
+    # type: (dict) -> dict
+    return {k: v for k, v in labels.items() if k != "__name__"}
+
+
+class Storage(object):
+    """Series indexed by their labels, samples sorted by time."""
+
+    def __init__(self):
+        self.series = {}
+
+    def add(self, labels, t, value):
+        # type: (dict, float, float) -> None
+        key = labels_key(labels)
+        if key not in self.series:
+            self.series[key] = (dict(labels), [], [])
+        _, times, values = self.series[key]
+        index = bisect.bisect_right(times, t)
+        if index and times[index - 1] == t:
+            values[index - 1] = value
+            return
+        times.insert(index, t)
+        values.insert(index, value)
+
+    def select(self, matchers):
+        """Yield (labels, times, values) of the series matching."""
+        for labels, times, values in self.series.values():
+            if all(m.matches(labels.get(m.name, "")) for m in matchers):
+                yield labels, times, values
+
+    def time_range(self):
+        times = [t for _, ts, _ in self.series.values() for t in ts]
+        return (min(times), max(times)) if times else (0, 0)
+
+
+# Expression tree ###########################################################
+
+
+class Matcher(object):
+    def __init__(self, name, op, value):
+        self.name = name
+        self.op = op
+        self.value = value
+        if op in ("=~", "!~"):
+            self.regex = re.compile("^(?:" + value + ")$")
+
+    def matches(self, value):
+        if self.op == "=":
+            return value == self.value
+        if self.op == "!=":
+            return value != self.value
+        if self.op == "=~":
+            return bool(self.regex.match(value))
+        return not self.regex.match(value)
+
+
+class Node(object):
+    def eval(self, ev, t):
+        raise NotImplementedError
+
+
+class Number(Node):
+    def __init__(self, value):
+        self.value = value
+
+    def eval(self, ev, t):
+        return self.value
+
+
+class String(Node):
+    def __init__(self, value):
+        self.value = value
+
+    def eval(self, ev, t):
+        return self.value
+
+
+class Selector(Node):
+    def __init__(self, matchers, offset=0.0):
+        self.matchers = matchers
+        self.offset = offset
+
+    def eval(self, ev, t):
+        t -= self.offset
+        result = []
+        for labels, times, values in ev.storage.select(self.matchers):
+            index = bisect.bisect_right(times, t) - 1
+            if index < 0 or times[index] < t - ev.lookback:
+                continue
+            if values[index] is STALE:
+                continue
+            result.append((labels, values[index]))
+        return result
+
+
+class RangeSelector(Node):
+    def __init__(self, selector, duration):
+        self.selector = selector
+        self.duration = duration
+
+    def eval(self, ev, t):
+        t -= self.selector.offset
+        result = []
+        for labels, times, values in ev.storage.select(self.selector.matchers):
+            start = bisect.bisect_left(times, t - self.duration)
+            end = bisect.bisect_right(times, t)
+            samples = [(times[i], values[i]) for i in range(start, end)
+                       if values[i] is not STALE]
+            if samples:
+                result.append((labels, samples))
+        return result
+
+
+class Unary(Node):
+    def __init__(self, operand):
+        self.operand = operand
+
+    def eval(self, ev, t):
+        value = self.operand.eval(ev, t)
+        if isinstance(value, list):
+            return [(without_name(labels), -v) for labels, v in value]
+        return -value
+
+
+class Aggregation(Node):
+    def __init__(self, op, expr, grouping=(), without=False, param=None):
+        self.op = op
+        self.expr = expr
+        self.grouping = grouping
+        self.without = without
+        self.param = param
+
+    def group(self, labels):
+        if self.without:
+            return {k: v for k, v in labels.items()
+                    if k not in self.grouping and k != "__name__"}
+        return {k: labels[k] for k in self.grouping if k in labels}
+
+    def eval(self, ev, t):
+        vector = self.expr.eval(ev, t)
+        groups = {}
+        for labels, value in vector:
+            key_labels = self.group(labels)
+            groups.setdefault(labels_key(key_labels), (key_labels, []))[1] \
+                .append((labels, value))
+        if self.op in ("topk", "bottomk"):
+            k = int(self.param.eval(ev, t))
+            result = []
+            for _, members in groups.values():
+                members = sorted(members, key=lambda m: m[1],
+                                 reverse=self.op == "topk")
+                result.extend(members[:k])
+            return result
+        result = []
+        for key_labels, members in groups.values():
+            values = [v for _, v in members]
+            if self.op == "sum":
+                value = sum(values)
+            elif self.op == "avg":
+                value = sum(values) / len(values)
+            elif self.op == "min":
+                value = min(values)
+            elif self.op == "max":
+                value = max(values)
+            elif self.op == "count":
+                value = float(len(values))
+            elif self.op == "group":
+                value = 1.0
+            else:
+                raise PromQLError("unsupported aggregation: " + self.op)
+            result.append((key_labels, value))
+        return result
+
+
+_ARITHMETIC = {
+    "+": lambda a, b: a + b,
+    "-": lambda a, b: a - b,
+    "*": lambda a, b: a * b,
+    "/": lambda a, b: a / b if b else (math.nan if a == 0 or math.isnan(a)
+                                       else math.copysign(math.inf, a) *
+                                       math.copysign(1, b)),
+    "%": lambda a, b: math.fmod(a, b) if b else math.nan,
+    "^": lambda a, b: a ** b,
+}
+_COMPARISON = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    ">": lambda a, b: a > b,
+    "<": lambda a, b: a < b,
+    ">=": lambda a, b: a >= b,
+    "<=": lambda a, b: a <= b,
+}
+
+
+class Binary(Node):
+    def __init__(self, op, left, right, return_bool=False, on=None,
+                 ignoring=(), group=None, include=()):
+        self.op = op
+        self.left = left
+        self.right = right
+        self.return_bool = return_bool
+        self.on = on
+        self.ignoring = ignoring
+        self.group = group
+        self.include = include
+
+    def signature(self, labels):
+        if self.on is not None:
+            return tuple((k, labels.get(k, "")) for k in sorted(self.on))
+        return labels_key({k: v for k, v in labels.items()
+                           if k not in self.ignoring and k != "__name__"})
+
+    def apply(self, a, b):
+        if self.op in _ARITHMETIC:
+            return _ARITHMETIC[self.op](a, b), True
+        keep = _COMPARISON[self.op](a, b)
+        if self.return_bool:
+            return float(keep), True
+        return a, keep
+
+    def result_labels(self, labels, other):
+        if self.op in _ARITHMETIC or self.return_bool:
+            labels = without_name(labels)
+        if self.group is None:
+            if self.on is not None:
+                return {k: v for k, v in labels.items() if k in self.on}
+            return {k: v for k, v in labels.items()
+                    if k not in self.ignoring}
+        labels = dict(labels)
+        for name in self.include:
+            if name in other:
+                labels[name] = other[name]
+            else:
+                labels.pop(name, None)
+        return labels
+
+    def eval(self, ev, t):
+        left = self.left.eval(ev, t)
+        right = self.right.eval(ev, t)
+        left_vector = isinstance(left, list)
+        right_vector = isinstance(right, list)
+        if self.op in ("and", "or", "unless"):
+            return self.set_operation(left, right)
+        if not left_vector and not right_vector:
+            value, _ = self.apply(left, right)
+            return value
+        if not right_vector:
+            return self.with_scalar(left, lambda v: self.apply(v, right))
+        if not left_vector:
+            return self.with_scalar(right, lambda v: self.apply(left, v),
+                                    value_from_vector=True)
+        return self.vector_matching(left, right)
+
+    def with_scalar(self, vector, apply, value_from_vector=False):
+        result = []
+        for labels, value in vector:
+            new_value, keep = apply(value)
+            if not keep:
+                continue
+            if value_from_vector and self.op in _COMPARISON \
+                    and not self.return_bool:
+                new_value = value
+            if self.op in _ARITHMETIC or self.return_bool:
+                labels = without_name(labels)
+            result.append((labels, new_value))
+        return result
+
+    def set_operation(self, left, right):
+        right_signatures = set(self.signature(l) for l, _ in right)
+        if self.op == "and":
+            return [(l, v) for l, v in left
+                    if self.signature(l) in right_signatures]
+        if self.op == "unless":
+            return [(l, v) for l, v in left
+                    if self.signature(l) not in right_signatures]
+        left_signatures = set(self.signature(l) for l, _ in left)
+        return left + [(l, v) for l, v in right
+                       if self.signature(l) not in left_signatures]
+
+    def vector_matching(self, left, right):
+        swap = self.group == "right"
+        many, one = (right, left) if swap else (left, right)
+        ones = {}
+        for labels, value in one:
+            signature = self.signature(labels)
+            if signature in ones:
+                raise PromQLError(
+                    "many-to-many matching not allowed: duplicate series "
+                    "for the match group " + repr(signature))
+            ones[signature] = (labels, value)
+        seen = set()
+        result = []
+        for labels, value in many:
+            signature = self.signature(labels)
+            if signature not in ones:
+                continue
+            if self.group is None:
+                if signature in seen:
+                    raise PromQLError(
+                        "many-to-one matching requires group_left or "
+                        "group_right")
+                seen.add(signature)
+            other_labels, other_value = ones[signature]
+            if swap:
+                new_value, keep = self.apply(other_value, value)
+            else:
+                new_value, keep = self.apply(value, other_value)
+            if keep:
+                result.append((self.result_labels(labels, other_labels),
+                               new_value))
+        return result
+
+
+def extrapolated_rate(samples, t, duration, is_counter, is_rate):
+    # type: (list, float, float, bool, bool) -> float
+    """Port of Prometheus' extrapolatedRate."""
+    if len(samples) < 2:
+        return None
+    first_t, first_v = samples[0]
+    last_t, last_v = samples[-1]
+    result = last_v - first_v
+    if is_counter:
+        previous = first_v
+        for _, value in samples[1:]:
+            if value < previous:
+                result += previous
+            previous = value
+    duration_to_start = first_t - (t - duration)
+    duration_to_end = t - last_t
+    sampled = last_t - first_t
+    average = sampled / (len(samples) - 1)
+    if is_counter and result > 0 and first_v >= 0:
+        duration_to_zero = sampled * (first_v / result)
+        duration_to_start = min(duration_to_start, duration_to_zero)
+    threshold = average * 1.1
+    extrapolate_to = sampled
+    extrapolate_to += (duration_to_start if duration_to_start < threshold
+                       else average / 2)
+    extrapolate_to += (duration_to_end if duration_to_end < threshold
+                       else average / 2)
+    result *= extrapolate_to / sampled
+    if is_rate:
+        result /= duration
+    return result
+
+
+def deriv(samples):
+    if len(samples) < 2:
+        return None
+    # least squares, relative to the first sample for precision
+    t0 = samples[0][0]
+    n = float(len(samples))
+    sum_x = sum(s[0] - t0 for s in samples)
+    sum_y = sum(s[1] for s in samples)
+    sum_xy = sum((s[0] - t0) * s[1] for s in samples)
+    sum_x2 = sum((s[0] - t0) ** 2 for s in samples)
+    denominator = n * sum_x2 - sum_x ** 2
+    if denominator == 0:
+        return None
+    return (n * sum_xy - sum_x * sum_y) / denominator
+
+
+def irate(samples):
+    if len(samples) < 2:
+        return None
+    (t1, v1), (t2, v2) = samples[-2:]
+    delta = v2 - v1 if v2 >= v1 else v2
+    return delta / (t2 - t1)
+
+
+def histogram_quantile(quantile, buckets):
+    # type: (float, list) -> float
+    """Port of Prometheus' bucketQuantile, buckets are (le, count)."""
+    if quantile < 0:
+        return -math.inf
+    if quantile > 1:
+        return math.inf
+    buckets = sorted(buckets)
+    if len(buckets) < 2 or not math.isinf(buckets[-1][0]):
+        return math.nan
+    # counts must be monotonic, as in Prometheus
+    for i in range(1, len(buckets)):
+        if buckets[i][1] < buckets[i - 1][1]:
+            buckets[i] = (buckets[i][0], buckets[i - 1][1])
+    total = buckets[-1][1]
+    if total == 0:
+        return math.nan
+    rank = quantile * total
+    index = next(i for i, (_, count) in enumerate(buckets) if count >= rank)
+    if index == len(buckets) - 1:
+        return buckets[-2][0]
+    if index == 0 and buckets[0][0] <= 0:
+        return buckets[0][0]
+    start, count = 0.0, buckets[index][1]
+    if index > 0:
+        start = buckets[index - 1][0]
+        count -= buckets[index - 1][1]
+        rank -= buckets[index - 1][1]
+    return start + (buckets[index][0] - start) * (rank / count)
+
+
+def _range_function(compute):
+    def evaluate(ev, t, args):
+        matrix = args[0].eval(ev, t)
+        result = []
+        for labels, samples in matrix:
+            value = compute(samples, t, args[0].duration)
+            if value is not None:
+                result.append((without_name(labels), value))
+        return result
+    return evaluate
+
+
+def _instant_function(compute):
+    def evaluate(ev, t, args):
+        extra = [arg.eval(ev, t) for arg in args[1:]]
+        return [(without_name(labels), compute(value, *extra))
+                for labels, value in args[0].eval(ev, t)]
+    return evaluate
+
+
+def _histogram_quantile(ev, t, args):
+    quantile = args[0].eval(ev, t)
+    groups = {}
+    for labels, value in args[1].eval(ev, t):
+        if "le" not in labels:
+            continue
+        group = {k: v for k, v in without_name(labels).items() if k != "le"}
+        groups.setdefault(labels_key(group), (group, []))[1].append(
+            (float(labels["le"]), value))
+    return [(group, histogram_quantile(quantile, buckets))
+            for group, buckets in groups.values()]
+
+
+def _vector(ev, t, args):
+    return [({}, args[0].eval(ev, t))]
+
+
+def _scalar(ev, t, args):
+    vector = args[0].eval(ev, t)
+    return vector[0][1] if len(vector) == 1 else math.nan
+
+
+def _round(value, to_nearest=1.0):
+    return math.floor(value / to_nearest + 0.5) * to_nearest
+
+
+def _absent(ev, t, args):
+    if args[0].eval(ev, t):
+        return []
+    labels = {}
+    if isinstance(args[0], Selector):
+        labels = {m.name: m.value for m in args[0].matchers
+                  if m.op == "=" and m.name != "__name__"}
+    return [(labels, 1.0)]
+
+
+FUNCTIONS = {
+    "rate": _range_function(
+        lambda s, t, d: extrapolated_rate(s, t, d, True, True)),
+    "increase": _range_function(
+        lambda s, t, d: extrapolated_rate(s, t, d, True, False)),
+    "delta": _range_function(
+        lambda s, t, d: extrapolated_rate(s, t, d, False, False)),
+    "irate": _range_function(lambda s, t, d: irate(s)),
+    "deriv": _range_function(lambda s, t, d: deriv(s)),
+    "avg_over_time": _range_function(
+        lambda s, t, d: sum(v for _, v in s) / len(s)),
+    "sum_over_time": _range_function(lambda s, t, d: sum(v for _, v in s)),
+    "min_over_time": _range_function(lambda s, t, d: min(v for _, v in s)),
+    "max_over_time": _range_function(lambda s, t, d: max(v for _, v in s)),
+    "count_over_time": _range_function(lambda s, t, d: float(len(s))),
+    "last_over_time": _range_function(lambda s, t, d: s[-1][1]),
+    "abs": _instant_function(abs),
+    "ceil": _instant_function(math.ceil),
+    "floor": _instant_function(math.floor),
+    "round": _instant_function(_round),
+    "clamp_min": _instant_function(max),
+    "clamp_max": _instant_function(min),
+    "histogram_quantile": _histogram_quantile,
+    "vector": _vector,
+    "scalar": _scalar,
+    "time": lambda ev, t, args: float(t),
+    "absent": _absent,
+}
+
+AGGREGATIONS = ("sum", "avg", "min", "max", "count", "group", "topk",
+                "bottomk")
+
+
+class Call(Node):
+    def __init__(self, name, args):
+        if name not in FUNCTIONS:
+            raise PromQLError("unsupported function: " + name)
+        self.name = name
+        self.args = args
+
+    def eval(self, ev, t):
+        return FUNCTIONS[self.name](ev, t, self.args)
+
+
+# Parser ####################################################################
+
+_TOKEN = re.compile(r"""
+    (?P<space>\s+|\#[^\n]*)
+  | (?P<duration>(?:\d+(?:ms|[smhdwy]))+(?![\w:]))
+  | (?P<number>0[xX][0-9a-fA-F]+|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<ident>[a-zA-Z_:][a-zA-Z0-9_:]*)
+  | (?P<op>=~|!~|!=|==|>=|<=|[-+*/%^<>=(){}\[\],])
+""", re.VERBOSE)
+
+_BINARY_PRECEDENCE = [
+    ("or",),
+    ("and", "unless"),
+    ("==", "!=", ">", "<", ">=", "<="),
+    ("+", "-"),
+    ("*", "/", "%"),
+]
+
+
+def _tokenize(text):
+    tokens = []
+    position = 0
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if not match:
+            raise PromQLError("unexpected character at {0}: {1!r}".format(
+                position, text[position:position + 20]))
+        position = match.end()
+        kind = match.lastgroup
+        if kind != "space":
+            tokens.append((kind, match.group(kind)))
+    tokens.append(("end", None))
+    return tokens
+
+
+def _unquote(text):
+    body = text[1:-1]
+    return re.sub(r"\\(.)", lambda m: {"n": "\n", "t": "\t"}.get(
+        m.group(1), m.group(1)), body)
+
+
+class Parser(object):
+    def __init__(self, text):
+        self.text = text
+        self.tokens = _tokenize(text)
+        self.position = 0
+
+    def peek(self, offset=0):
+        return self.tokens[self.position + offset]
+
+    def next(self):
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def accept(self, value):
+        if self.peek()[1] == value and self.peek()[0] in ("op", "ident"):
+            self.position += 1
+            return True
+        return False
+
+    def expect(self, value):
+        token = self.next()
+        if token[1] != value:
+            raise PromQLError("expected {0!r}, got {1!r} in {2}".format(
+                value, token[1], self.text))
+
+    def parse(self):
+        node = self.binary(0)
+        if self.peek()[0] != "end":
+            raise PromQLError("unexpected {0!r} in {1}".format(
+                self.peek()[1], self.text))
+        return node
+
+    def label_list(self):
+        self.expect("(")
+        labels = []
+        while not self.accept(")"):
+            labels.append(self.next()[1])
+            self.accept(",")
+        return tuple(labels)
+
+    def binary(self, level):
+        if level == len(_BINARY_PRECEDENCE):
+            return self.unary()
+        left = self.binary(level + 1)
+        while self.peek()[1] in _BINARY_PRECEDENCE[level] \
+                and self.peek()[0] in ("op", "ident"):
+            op = self.next()[1]
+            kwargs = {"return_bool": self.accept("bool")}
+            if self.accept("on"):
+                kwargs["on"] = self.label_list()
+            elif self.accept("ignoring"):
+                kwargs["ignoring"] = self.label_list()
+            for side in ("left", "right"):
+                if self.accept("group_" + side):
+                    kwargs["group"] = side
+                    if self.peek()[1] == "(":
+                        kwargs["include"] = self.label_list()
+            right = self.binary(level + 1)
+            left = Binary(op, left, right, **kwargs)
+        return left
+
+    def unary(self):
+        # as in Prometheus, unary operators bind like * and /, less tightly
+        # than ^: -2 ^ 2 is -(2 ^ 2)
+        if self.accept("-"):
+            operand = self.unary()
+            if isinstance(operand, Number):
+                return Number(-operand.value)
+            return Unary(operand)
+        if self.accept("+"):
+            return self.unary()
+        return self.power()
+
+    def power(self):
+        # right-associative, its right operand may be signed: 2 ^ -1
+        left = self.postfix()
+        if self.accept("^"):
+            return Binary("^", left, self.unary())
+        return left
+
+    def postfix(self):
+        node = self.primary()
+        if self.accept("["):
+            kind, value = self.next()
+            if kind not in ("duration", "number"):
+                raise PromQLError("invalid range in " + self.text)
+            self.expect("]")
+            if not isinstance(node, Selector):
+                raise PromQLError("subqueries are not supported")
+            node = RangeSelector(node, parse_duration(value))
+        if self.accept("offset"):
+            offset = parse_duration(self.next()[1])
+            selector = node.selector if isinstance(node, RangeSelector) \
+                else node
+            selector.offset = offset
+        return node
+
+    def primary(self):
+        kind, value = self.peek()
+        if kind == "number":
+            self.next()
+            return Number(float(int(value, 16)) if value[:2].lower() == "0x"
+                          else float(value))
+        if kind == "string":
+            self.next()
+            return String(_unquote(value))
+        if value == "(":
+            self.next()
+            node = self.binary(0)
+            self.expect(")")
+            return node
+        if value == "{":
+            return self.selector(None)
+        if kind == "ident":
+            self.next()
+            if value in ("Inf", "inf"):
+                return Number(math.inf)
+            if value in ("NaN", "nan"):
+                return Number(math.nan)
+            if value in AGGREGATIONS and self.peek()[1] in ("(", "by",
+                                                            "without"):
+                return self.aggregation(value)
+            if self.peek()[1] == "(":
+                return Call(value, self.arguments())
+            return self.selector(value)
+        raise PromQLError("unexpected {0!r} in {1}".format(value, self.text))
+
+    def arguments(self):
+        self.expect("(")
+        args = []
+        while not self.accept(")"):
+            args.append(self.binary(0))
+            self.accept(",")
+        return args
+
+    def aggregation(self, op):
+        grouping, without = (), False
+        if self.peek()[1] in ("by", "without"):
+            without = self.next()[1] == "without"
+            grouping = self.label_list()
+        args = self.arguments()
+        if self.peek()[1] in ("by", "without"):
+            without = self.next()[1] == "without"
+            grouping = self.label_list()
+        param = args[0] if len(args) == 2 else None
+        return Aggregation(op, args[-1], grouping, without, param)
+
+    def selector(self, name):
+        matchers = []
+        if name is not None:
+            matchers.append(Matcher("__name__", "=", name))
+        if self.accept("{"):
+            while not self.accept("}"):
+                label = self.next()[1]
+                op = self.next()[1]
+                if op not in ("=", "!=", "=~", "!~"):
+                    raise PromQLError("invalid matcher in " + self.text)
+                kind, value = self.next()
+                if kind != "string":
+                    raise PromQLError("invalid matcher in " + self.text)
+                matchers.append(Matcher(label, op, _unquote(value)))
+                self.accept(",")
+        return Selector(matchers)
+
+
+def parse(text):
+    # type: (str) -> Node
+    return Parser(text).parse()
+
+
+def parse_series(text):
+    # type: (str) -> dict
+    """Labels of a series written as a selector, e.g. ``up{pod="a"}``."""
+    node = parse(text)
+    if not isinstance(node, Selector) \
+            or any(m.op != "=" for m in node.matchers):
+        raise PromQLError("invalid series: " + text)
+    return {m.name: m.value for m in node.matchers}
+
+
+def expand_values(text):
+    # type: (str) -> list
+    """Expand promtool's series notation, e.g. ``1+1x3 _ stale``, into a
+    list of values where None is a missing sample."""
+    values = []
+    for token in str(text).split():
+        match = re.match(
+            r"^(_|stale|[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?|[-+]?Inf"
+            r"|NaN)(?:([-+])(\d+\.?\d*(?:[eE][-+]?\d+)?))?(?:x(\d+))?$",
+            token)
+        if not match:
+            raise PromQLError("invalid series values: " + token)
+        start, sign, step, count = match.groups()
+        if start in ("_", "stale"):
+            value = None if start == "_" else STALE
+            values.extend([value] * (int(count) if count else 1))
+            continue
+        start = float(start)
+        if count is None:
+            values.append(start)
+            continue
+        step = float(step or 0) * (-1 if sign == "-" else 1)
+        values.extend(start + i * step for i in range(int(count) + 1))
+    return values
+
+
+# Evaluation ################################################################
+
+
+class Evaluator(object):
+    def __init__(self, storage, lookback=LOOKBACK):
+        self.storage = storage
+        self.lookback = lookback
+        self._parsed = {}
+
+    def query(self, expr, t):
+        """Evaluate an expression at time t: a float for scalars, a list
+        of (labels, value) for vectors."""
+        if expr not in self._parsed:
+            self._parsed[expr] = parse(expr)
+        return self._parsed[expr].eval(self, t)
+
+    def query_range(self, expr, start, end, step):
+        """Yield (t, result) from start to end."""
+        t = start
+        while t <= end:
+            yield t, self.query(expr, t)
+            t += step
+
+
+class RecordingRule(object):
+    def __init__(self, record, expr, labels=None):
+        self.record = record
+        self.expr = expr
+        self.labels = labels or {}
+
+    def eval(self, ev, t):
+        for labels, value in ev.query(self.expr, t):
+            labels = dict(labels, __name__=self.record, **self.labels)
+            ev.storage.add(labels, t, value)
+
+
+class Alert(object):
+    def __init__(self, name, labels, annotations, active_at, value):
+        self.name = name
+        self.labels = labels
+        self.annotations = annotations
+        self.active_at = active_at
+        self.value = value
+        self.firing = False
+
+
+def _template(text, labels, value):
+    def replace(match):
+        expr = match.group(1).strip()
+        if expr == "$value":
+            return "{0:g}".format(value)
+        if expr.startswith("$labels."):
+            return labels.get(expr[len("$labels."):], "")
+        return match.group(0)
+    return re.sub(r"\{\{(.*?)\}\}", replace, str(text))
+
+
+class AlertingRule(object):
+    def __init__(self, name, expr, duration=0.0, labels=None,
+                 annotations=None):
+        self.name = name
+        self.expr = expr
+        self.duration = duration
+        self.labels = labels or {}
+        self.annotations = annotations or {}
+        # labels key -> Alert
+        self.active = {}
+
+    def eval(self, ev, t):
+        current = {}
+        for labels, value in ev.query(self.expr, t):
+            labels = dict(without_name(labels), **self.labels)
+            key = labels_key(labels)
+            alert = self.active.get(key) or Alert(
+                self.name, labels, {}, t, value)
+            alert.value = value
+            alert.annotations = {
+                name: _template(text, labels, value)
+                for name, text in self.annotations.items()
+            }
+            alert.firing = t - alert.active_at >= self.duration
+            current[key] = alert
+        self.active = current
+
+    def firing(self):
+        return [alert for alert in self.active.values() if alert.firing]
+
+
+class RuleGroup(object):
+    def __init__(self, name, rules, interval=None):
+        self.name = name
+        self.rules = rules
+        self.interval = interval
+
+    @classmethod
+    def from_dict(cls, data):
+        rules = []
+        for rule in data.get("rules", []):
+            if "record" in rule:
+                rules.append(RecordingRule(
+                    rule["record"], rule["expr"], rule.get("labels")))
+            else:
+                rules.append(AlertingRule(
+                    rule["alert"], rule["expr"],
+                    parse_duration(rule.get("for", 0)),
+                    {k: str(v) for k, v in rule.get("labels", {}).items()},
+                    rule.get("annotations")))
+        interval = data.get("interval")
+        return cls(data["name"], rules,
+                   parse_duration(interval) if interval else None)
+
+    def eval(self, ev, t):
+        for rule in self.rules:
+            rule.eval(ev, t)
+
+    def alerting_rules(self):
+        return [r for r in self.rules if isinstance(r, AlertingRule)]
+
+
+def load_series(storage, input_series, interval, start=0.0):
+    """Add promtool-style ``input_series`` to a storage."""
+    for series in input_series:
+        labels = parse_series(series["series"])
+        for i, value in enumerate(expand_values(series["values"])):
+            if value is not None:
+                storage.add(labels, start + i * interval, value)
+
+
+def load_matrix(storage, data):
+    """Add the result of a Prometheus range query (the JSON response of
+    /api/v1/query_range) to a storage."""
+    if "data" in data:
+        data = data["data"]
+    for series in data["result"]:
+        for t, value in series["values"]:
+            storage.add(series["metric"], float(t), float(value))
@@ -0,0 +1,281 @@
+"""PromQL expressions of the cloudserver dashboards.
+
+Deployments label the cloudserver series differently (e.g. by ``job`` or
+by ``service``): a ``Layout`` describes how to select them, and ``Queries``
+builds the expressions of the panels for a layout. With ``recorded=True``
+the expensive ratios and histograms are read from the series precomputed
+by the recording rules of ``RULES`` instead of aggregating the raw
+per-pod series on each refresh.
+"""
+import re
+
+
+class Selector(object):
+    """Label matchers selecting a set of series.
+
+    Matchers are given as ``name=value`` pairs, where the value includes
+    the quotes and what follows ``=`` in the PromQL operator: ``'"zenko"'``
+    or ``'~"$job"'``. Negative matchers include the whole operator:
+    ``'!="__other__"'``.
+    """
+
+    def __init__(self, *matchers, **kwargs):
+        self.matchers = list(matchers) + [
+            (name, value) for name, value in sorted(kwargs.items())
+        ]
+
+    @property
+    def labels(self):
+        return [name for name, _ in self.matchers]
+
+    def __call__(self, **extra):
+        """Return the matchers, with ``extra`` ones, as a PromQL string."""
+        matchers = self.matchers + [
+            (name, value) for name, value in sorted(extra.items()) if value
+        ]
+        return ", ".join(
+            name + value if value.startswith("!") else name + "=" + value
+            for name, value in matchers
+        )
+
+
+class Layout(object):
+    """How the series of a cloudserver deployment are labelled.
+
+    ``group_label`` is the label distinguishing the cloudserver groups of
+    the deployment, selected with the ``$<group_label>`` dashboard
+    variable.
+    """
+
+    def __init__(self, name, group_label="job", group_regex=None,
+                 scope_labels=("namespace",)):
+        self.name = name
+        self.group_label = group_label
+        self.group_regex = group_regex
+        self.scope_labels = tuple(scope_labels)
+        self.selector = Selector(*(
+            [(label, '"${' + label + '}"') for label in self.scope_labels]
+            + [(group_label, '~"$' + group_label + '"')]
+        ))
+        self.report_selector = Selector(*(
+            [(label, '"${' + label + '}"') for label in self.scope_labels]
+            + [("job", '"${reportJob}"')]
+        ))
+
+    @property
+    def labels(self):
+        """Labels identifying a cloudserver group, kept by the rules."""
+        return self.scope_labels + (self.group_label,)
+
+
+LAYOUTS = {
+    # Zenko deployments: one job per cloudserver group, named after the
+    # Zenko instance
+    "zenko": Layout(
+        "zenko",
+        group_label="job",
+        group_regex="/(?<value>${zenkoName}-(?<text>\\w*).*)/",
+    ),
+    # deployments exposing cloudserver through a metrics service
+    "service": Layout("service", group_label="service"),
+}
+
+
+def _by(labels):
+    return " by(" + ", ".join(labels) + ")" if labels else ""
+
+
+# Labels kept by the recording rules, so that their series can be selected
+# with any of the layouts.
+RULE_LABELS = tuple(dict.fromkeys(
+    label for name in sorted(LAYOUTS) for label in LAYOUTS[name].labels
+))
+
+
+class Rule(object):
+    """A recording rule: ``record`` is the 1m rate of ``metric`` aggregated
+    by ``by`` and the labels identifying a cloudserver group."""
+
+    def __init__(self, metric, by, record=None, func="rate"):
+        self.metric = metric
+        self.by = tuple(by)
+        self.func = func
+        self.record = record or "s3_cloudserver:{0}:{1}1m".format(
+            metric[len("s3_cloudserver_"):], func)
+
+    def expr(self, labels=RULE_LABELS):
+        return "sum{0} ({1}({2}[1m]))".format(
+            _by(tuple(labels) + self.by), self.func, self.metric)
+
+
+HTTP_REQUESTS = Rule(
+    "s3_cloudserver_http_requests_total", ("method", "action", "code"),
+    record="s3_cloudserver:http_requests:rate1m")
+HTTP_DURATION_SUM = Rule(
+    "s3_cloudserver_http_request_duration_seconds_sum", ("action",))
+HTTP_DURATION_COUNT = Rule(
+    "s3_cloudserver_http_request_duration_seconds_count", ("action",))
+HTTP_DURATION_BUCKET = Rule(
+    "s3_cloudserver_http_request_duration_seconds_bucket", ("action", "le"))
+PHASE_DURATION_SUM = Rule(
+    "s3_cloudserver_http_request_phase_duration_seconds_sum",
+    ("action", "phase"))
+PHASE_DURATION_BUCKET = Rule(
+    "s3_cloudserver_http_request_phase_duration_seconds_bucket",
+    ("action", "phase", "le"))
+QUOTA_DURATION_SUM = Rule(
+    "s3_cloudserver_quota_evaluation_duration_seconds_sum",
+    ("action", "code", "type"))
+QUOTA_DURATION_COUNT = Rule(
+    "s3_cloudserver_quota_evaluation_duration_seconds_count",
+    ("action", "code", "type"))
+QUOTA_DURATION_BUCKET = Rule(
+    "s3_cloudserver_quota_evaluation_duration_seconds_bucket", ("le",))
+QUOTA_RETRIEVAL_SUM = Rule(
+    "s3_cloudserver_quota_metrics_retrieval_duration_seconds_sum",
+    ("code", "class"))
+QUOTA_RETRIEVAL_COUNT = Rule(
+    "s3_cloudserver_quota_metrics_retrieval_duration_seconds_count",
+    ("code", "class"))
+
+RULES = [
+    HTTP_REQUESTS,
+    HTTP_DURATION_SUM,
+    HTTP_DURATION_COUNT,
+    HTTP_DURATION_BUCKET,
+    PHASE_DURATION_SUM,
+    PHASE_DURATION_BUCKET,
+    QUOTA_DURATION_SUM,
+    QUOTA_DURATION_COUNT,
+    QUOTA_DURATION_BUCKET,
+    QUOTA_RETRIEVAL_SUM,
+    QUOTA_RETRIEVAL_COUNT,
+]
+
+
+class Queries(object):
+    """Expressions of the dashboard panels for a layout.
+
+    Label filters are passed as keyword arguments in ``Selector`` form,
+    e.g. ``code='~"5.."'``, and ``by`` is a list of labels to aggregate
+    by.
+    """
+
+    def __init__(self, layout, recorded=False, interval="$__rate_interval"):
+        self.layout = layout
+        self.recorded = recorded
+        self.interval = interval
+
+    def over(self, interval):
+        """Queries aggregating over another interval, e.g. ``$__range``
+        for instant queries covering the whole time range."""
+        return Queries(self.layout, self.recorded, interval)
+
+    def selector(self, **extra):
+        return self.layout.selector(**extra)
+
+    def report_selector(self, **extra):
+        return self.layout.report_selector(**extra)
+
+    def rate(self, rule, by=(), func="rate", **extra):
+        """Aggregated rate (or increase) of the metric of a rule."""
+        selector = self.selector(**extra)
+        if self.recorded:
+            expr = "{0}{{{1}}}".format(rule.record, selector)
+            if self.interval != "$__rate_interval":
+                expr = "avg_over_time({0}[{1}])".format(expr, self.interval)
+            if func == "increase":
+                # recorded rates are per second
+                expr = expr + " * $__interval_ms / 1000"
+            return "sum{0} ({1})".format(_by(by), expr)
+        return "sum{0} ({1}({2}{{{3}}}[{4}]))".format(
+            _by(by), func, rule.metric, selector, self.interval)
+
+    def request_rate(self, by=(), func="rate", **extra):
+        return self.rate(HTTP_REQUESTS, by, func, **extra)
+
+    def success_rate(self):
+        return "\n".join([
+            self.request_rate(code='~"2.."') + " * 100",
+            "   /",
+            "(" + self.request_rate() + " > 0)",
+        ])
+
+    def ratio(self, numerator, denominator, by=(), **extra):
+        return "\n".join([
+            self.rate(numerator, by, **extra),
+            "   /",
+            self.rate(denominator, by, **extra),
+        ])
+
+    def average_latency(self, by=(), action=None):
+        return self.ratio(HTTP_DURATION_SUM, HTTP_DURATION_COUNT, by,
+                          action=action)
+
+    def latency_histogram(self, by=("le",), **extra):
+        return self.rate(HTTP_DURATION_BUCKET, by, func="increase", **extra)
+
+    def latency_quantile(self, quantile, by=(), **extra):
+        return "histogram_quantile({0}, {1})".format(
+            quantile, self.rate(HTTP_DURATION_BUCKET, tuple(by) + ("le",),
+                                **extra))
+
+    def phase_time_per_request(self, by=(), **extra):
+        """Average time spent per request in each phase."""
+        return "\n".join([
+            self.rate(PHASE_DURATION_SUM, tuple(by) + ("phase",), **extra),
+            "    / ignoring(phase) group_left" if not by else
+            "    / on(" + ", ".join(by) + ") group_left",
+            self.rate(HTTP_DURATION_COUNT, by, **extra),
+        ])
+
+    def phase_quantile(self, quantile, **extra):
+        return "histogram_quantile({0}, {1})".format(
+            quantile, self.rate(PHASE_DURATION_BUCKET, ("phase", "le"),
+                                **extra))
+
+    def quota_rate(self, by=(), **extra):
+        return self.rate(QUOTA_DURATION_COUNT, by, **extra)
+
+    def quota_histogram(self):
+        return self.rate(QUOTA_DURATION_BUCKET, ("le",), func="increase")
+
+    def average_quota_latency(self, by=(), code=None):
+        return self.ratio(QUOTA_DURATION_SUM, QUOTA_DURATION_COUNT, by,
+                          code=code)
+
+    def average_quota_retrieval_latency(self, by=(), code=None):
+        return self.ratio(QUOTA_RETRIEVAL_SUM, QUOTA_RETRIEVAL_COUNT, by,
+                          code=code)
+
+
+_VARIABLE = re.compile(r"\$\{(\w+)\}|\$(\w+)")
+
+
+def substitute(expr, values):
+    """Replace ``${name}`` and ``$name`` variables by their value.
+
+    Unknown variables are left untouched.
+    """
+    def replace(match):
+        name = match.group(1) or match.group(2)
+        if name in values:
+            return str(values[name])
+        return match.group(0)
+    return _VARIABLE.sub(replace, expr)
+
+
+def grafana_variables(range_seconds, step):
+    # type: (float, float) -> dict
+    """Values of the Grafana global variables for a time range and step.
+
+    ``$__rate_interval`` is at least 4 times the scrape interval, assumed
+    to be 15s.
+    """
+    return {
+        "__range": "{0}s".format(int(range_seconds)),
+        "__range_s": int(range_seconds),
+        "__rate_interval": "{0}s".format(int(max(step, 60))),
+        "__interval": "{0}s".format(int(step)),
+        "__interval_ms": int(step * 1000),
+    }
@@ -0,0 +1,128 @@
+"""Measure the time Prometheus takes to render the dashboard panels.
+
+Each query of a dashboard variant is run as a range query, like Grafana
+does on refresh, with the raw expressions and with the ones reading the
+series of the recording rules, and the per-panel and total durations are
+reported. Dashboard variables are replaced by the values given with
+``--var name=value``; ``$__rate_interval`` and friends are derived from
+the range and step.
+
+    python query_bench.py --prometheus http://localhost:9090 \\
+        --variant latency --layout zenko --var namespace=zenko \\
+        --var job=artesca-data-connector-s3api-metrics --range 6h
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+import urllib.parse
+import urllib.request
+
+from dashboard import VARIANTS, build_dashboard
+from promql import LAYOUTS, grafana_variables, substitute
+
+
+def parse_duration(value):
+    # type: (str) -> int
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    if value[-1] in units:
+        return int(value[:-1]) * units[value[-1]]
+    return int(value)
+
+
+def panel_queries(dashboard):
+    """Yield (panel title, expr, instant) of every target of a dashboard."""
+    for panel in dashboard.panels:
+        for target in getattr(panel, "targets", None) or []:
+            expr = getattr(target, "expr", None)
+            if expr:
+                yield (panel.title, expr, getattr(target, "instant", False))
+
+
+def run_query(prometheus, expr, end, range_seconds, step, instant, timeout):
+    # type: (str, str, float, int, int, bool, float) -> tuple
+    """Run a query, return (seconds, number of series, error)."""
+    if instant:
+        path = "/api/v1/query"
+        params = {"query": expr, "time": end}
+    else:
+        path = "/api/v1/query_range"
+        params = {"query": expr, "start": end - range_seconds, "end": end,
+                  "step": step}
+    url = prometheus.rstrip("/") + path + "?" + urllib.parse.urlencode(params)
+    start = time.monotonic()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            body = json.load(response)
+    except Exception as exc:  # pylint: disable=broad-except
+        return time.monotonic() - start, 0, str(exc)
+    elapsed = time.monotonic() - start
+    if body.get("status") != "success":
+        return elapsed, 0, body.get("error", "unknown error")
+    return elapsed, len(body["data"]["result"]), None
+
+
+def bench(args, recorded):
+    dashboard = build_dashboard(args.variant, args.layout, recorded)
+    variables = dict(args.var)
+    variables.update(grafana_variables(args.range, args.step))
+    end = time.time()
+    panels = {}
+    for title, expr, instant in panel_queries(dashboard):
+        expr = substitute(expr, variables)
+        samples = []
+        for _ in range(args.repeat):
+            elapsed, series, error = run_query(
+                args.prometheus, expr, end, args.range, args.step, instant,
+                args.timeout)
+            if error:
+                print("{0}: {1}".format(title, error), file=sys.stderr)
+            samples.append(elapsed)
+        # the panels of a dashboard are rendered concurrently, each of them
+        # as fast as its slowest query
+        panel = panels.setdefault(title, {"queries": 0, "seconds": 0.0})
+        panel["queries"] += 1
+        panel["seconds"] = max(panel["seconds"], statistics.median(samples))
+        panel["series"] = panel.get("series", 0) + series
+    return {
+        "panels": panels,
+        "queries": sum(p["queries"] for p in panels.values()),
+        "total_seconds": sum(p["seconds"] for p in panels.values()),
+        "slowest_panel_seconds": max(
+            [p["seconds"] for p in panels.values()] or [0]),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--prometheus", default="http://localhost:9090")
+    parser.add_argument("--variant", default="overview",
+                        choices=sorted(VARIANTS))
+    parser.add_argument("--layout", default="zenko", choices=sorted(LAYOUTS))
+    parser.add_argument("--var", action="append", default=[],
+                        type=lambda v: tuple(v.split("=", 1)),
+                        help="dashboard variable, as name=value")
+    parser.add_argument("--range", default="1h", type=parse_duration,
+                        help="time range of the dashboard (default: 1h)")
+    parser.add_argument("--step", default=30, type=int,
+                        help="query resolution in seconds (default: 30)")
+    parser.add_argument("--repeat", default=3, type=int,
+                        help="runs of each query, the median is reported")
+    parser.add_argument("--timeout", default=60, type=float)
+    parser.add_argument("--mode", choices=["raw", "recorded", "both"],
+                        default="both")
+    args = parser.parse_args(argv)
+
+    modes = ["raw", "recorded"] if args.mode == "both" else [args.mode]
+    results = {mode: bench(args, mode == "recorded") for mode in modes}
+    json.dump(results, sys.stdout, indent=2, sort_keys=True)
+    print()
+    for mode, result in results.items():
+        print("{0}: {1} queries, {2:.3f}s total, slowest panel {3:.3f}s"
+              .format(mode, result["queries"], result["total_seconds"],
+                      result["slowest_panel_seconds"]), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Prometheus recording rules of cloudserver.
+
+The rules precompute the rates queried by the dashboards (request rates,
+latency sums, counts and histograms...), see ``promql.RULES``. The
+published dashboards and the alerts of alerts.yaml query the raw series,
+so that they can be deployed without the rules; dashboards rendered with
+``python dashboard.py --recorded`` use them. Render them into rules.yaml
+with::
+
+    python rules.py > rules.yaml
+"""
+import json
+import sys
+
+from promql import RULES
+
+GROUP = "CloudServerRecordingRules"
+
+
+def render(rules=RULES):
+    # type: (list) -> str
+    # strings are emitted as JSON, which YAML parses as quoted scalars
+    lines = [
+        "# Generated by rules.py, do not edit.",
+        "groups:",
+        "- name: " + GROUP,
+        "  rules:",
+    ]
+    for rule in rules:
+        lines += [
+            "  - record: " + rule.record,
+            "    expr: " + json.dumps(rule.expr()),
+        ]
+    return "\n".join(lines) + "\n"
+
+
+if __name__ == "__main__":
+    sys.stdout.write(render())
@@ -0,0 +1,118 @@
+"""Offline runner of the promtool alert tests."""
+import math
+import os
+import sys
+
+import pytest
+
+HERE = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, HERE)
+
+import evaluate  # noqa: E402
+
+RULES = """
+x-inputs:
+  - name: namespace
+    type: constant
+    value: zenko
+  - name: threshold
+    type: config
+groups:
+- name: Test
+  rules:
+  - alert: HighErrorRate
+    expr: |
+      sum(rate(errors_total{namespace="${namespace}"}[1m]))
+        / sum(rate(requests_total{namespace="${namespace}"}[1m]))
+        >= ${threshold}
+    for: 2m
+    labels:
+      severity: warning
+    annotations:
+      description: "error rate is {{ $value }}"
+"""
+
+
+@pytest.fixture
+def rule_file(tmp_path):
+    path = tmp_path / 'rules.yaml'
+    path.write_text(RULES)
+    return str(path)
+
+
+def test_render_substitutes_inputs(rule_file):
+    groups = evaluate.render(rule_file, {'threshold': '0.5'})['groups']
+    expr = groups[0]['rules'][0]['expr']
+    assert 'namespace="zenko"' in expr
+    assert '>= 0.5' in expr
+
+
+def test_render_requires_inputs_without_default(rule_file):
+    with pytest.raises(ValueError, match='threshold'):
+        evaluate.render(rule_file, {})
+
+
+def error_test(alerts):
+    return {
+        'name': 'errors',
+        'interval': '1m',
+        'input_series': [
+            {'series': 'requests_total{namespace="zenko"}',
+             'values': '0+60x10'},
+            # an error for every request after 3m
+            {'series': 'errors_total{namespace="zenko"}',
+             'values': '0x3 0+60x7'},
+        ],
+        'alert_rule_test': alerts,
+    }
+
+
+def test_run_test_group(rule_file):
+    test = error_test([
+        {'eval_time': '4m', 'alertname': 'HighErrorRate'},
+        {'eval_time': '7m', 'alertname': 'HighErrorRate', 'exp_alerts': [{
+            'exp_labels': {'severity': 'warning'},
+            'exp_annotations': {'description': 'error rate is 1'},
+        }]},
+    ])
+    rendered = rule_file[:-len('.yaml')] + '.rendered.yaml'
+    assert evaluate.run_test_group(test, [rendered], None, 60.0,
+                                   {'threshold': '0.5'}) == []
+
+
+def test_run_test_group_reports_failures(rule_file):
+    test = error_test([{'eval_time': '4m', 'alertname': 'HighErrorRate',
+                        'exp_alerts': [{'exp_labels': {}}]}])
+    rendered = rule_file[:-len('.yaml')] + '.rendered.yaml'
+    failures = evaluate.run_test_group(test, [rendered], None, 60.0,
+                                       {'threshold': '0.5'})
+    assert len(failures) == 1
+    assert 'alertname: HighErrorRate, time: 4m' in failures[0]
+
+
+def test_promql_expr_test():
+    test = {
+        'interval': '1m',
+        'input_series': [{'series': 'up{pod="a"}', 'values': '1 1 0'}],
+        'promql_expr_test': [{
+            'expr': 'sum by (pod) (up)', 'eval_time': '2m',
+            'exp_samples': [{'labels': '{pod="a"}', 'value': 0}],
+        }, {
+            'expr': '-2 ^ 2', 'eval_time': '0m',
+            'exp_samples': [{'value': -4}],
+        }],
+    }
+    assert evaluate.run_test_group(test, [], None, 60.0, {}) == []
+
+
+def test_samples_equal():
+    assert evaluate.samples_equal([([], math.nan)], [([], math.nan)])
+    assert evaluate.samples_equal([([], 0.1 + 0.2)], [([], 0.3)])
+    assert not evaluate.samples_equal([([], 1.0)], [([], 2.0)])
+    assert not evaluate.samples_equal([], [([], 1.0)])
+
+
+@pytest.mark.parametrize('path', ['alerts.test.yaml', 'alerts.10s.test.yaml'])
+def test_alert_tests(path):
+    assert evaluate.run_tests(os.path.join(HERE, path),
+                              {'replicas': '3'}) == []
@@ -0,0 +1,250 @@
+"""promeval against the results of Prometheus on the same series.
+
+Most cases are taken from the PromQL test data of Prometheus
+(promql/testdata/*.test), where the expected values come from.
+"""
+import math
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import promeval  # noqa: E402
+
+
+def storage_of(series, interval='5m'):
+    """Storage of promtool-style series, given as {selector: values}."""
+    storage = promeval.Storage()
+    promeval.load_series(
+        storage, [{'series': s, 'values': v} for s, v in series.items()],
+        promeval.parse_duration(interval))
+    return storage
+
+
+def query(storage, expr, t):
+    """Result of an instant query, vectors as {labels tuple: value}."""
+    t = promeval.parse_duration(t)
+    result = promeval.Evaluator(storage).query(expr, t)
+    if not isinstance(result, list):
+        return result
+    return {tuple(sorted(labels.items())): value for labels, value in result}
+
+
+def labels(**kwargs):
+    return tuple(sorted(kwargs.items()))
+
+
+# operators.test
+HTTP_REQUESTS = storage_of({
+    'http_requests{job="api-server", instance="0", group="production"}':
+        '0+10x10',
+    'http_requests{job="api-server", instance="1", group="production"}':
+        '0+20x10',
+    'http_requests{job="api-server", instance="0", group="canary"}':
+        '0+30x10',
+    'http_requests{job="api-server", instance="1", group="canary"}':
+        '0+40x10',
+    'http_requests{job="app-server", instance="0", group="production"}':
+        '0+50x10',
+    'http_requests{job="app-server", instance="1", group="production"}':
+        '0+60x10',
+    'http_requests{job="app-server", instance="0", group="canary"}':
+        '0+70x10',
+    'http_requests{job="app-server", instance="1", group="canary"}':
+        '0+80x10',
+})
+
+
+@pytest.mark.parametrize('expr,expected', [
+    ('1 + 2 * 3', 7),
+    ('(1 + 2) * 3', 9),
+    ('1 - 2 - 3', -4),
+    ('2 ^ 3 ^ 2', 512),
+    ('(2 ^ 3) ^ 2', 64),
+    # unary minus binds like * and /, less tightly than ^
+    ('-2 ^ 2', -4),
+    ('(-2) ^ 2', 4),
+    ('2 * -3 ^ 2', -18),
+    ('2 ^ -1', 0.5),
+    ('-1 - 2', -3),
+    ('- -2', 2),
+    ('10 % 3 ^ 2', 1),
+    ('1 + 1 == bool 2', 1),
+    ('1 > bool 2', 0),
+    ('2 * 3 > bool 5', 1),
+])
+def test_scalar_precedence(expr, expected):
+    assert query(promeval.Storage(), expr, 0) == expected
+
+
+@pytest.mark.parametrize('expr,expected', [
+    ('sum(http_requests) by (job) - count(http_requests) by (job)',
+     {labels(job='api-server'): 996, labels(job='app-server'): 2596}),
+    ('2 - sum(http_requests) by (job)',
+     {labels(job='api-server'): -998, labels(job='app-server'): -2598}),
+    ('1000 / sum(http_requests) by (job)',
+     {labels(job='api-server'): 1,
+      labels(job='app-server'): 0.38461538461538464}),
+    ('sum(http_requests) by (job) ^ 2',
+     {labels(job='api-server'): 1000000, labels(job='app-server'): 6760000}),
+    ('sum(http_requests) by (job) % 3 ^ 2',
+     {labels(job='api-server'): 1, labels(job='app-server'): 8}),
+    ('sum(http_requests) by (job) % 2 ^ 3 ^ 2',
+     {labels(job='api-server'): 488, labels(job='app-server'): 40}),
+    ('sum(http_requests) by (job) % 2 ^ 3 ^ 2 ^ 2',
+     {labels(job='api-server'): 1000, labels(job='app-server'): 2600}),
+    ('-http_requests{job="api-server",instance="0",group="production"}',
+     {labels(job='api-server', instance='0', group='production'): -100}),
+    ('- - http_requests{job="api-server",instance="0",group="production"}',
+     {labels(job='api-server', instance='0', group='production'): 100}),
+    ('sum(http_requests) by (job) > bool 1000',
+     {labels(job='api-server'): 0, labels(job='app-server'): 1}),
+])
+def test_vector_arithmetic(expr, expected):
+    assert query(HTTP_REQUESTS, expr, '50m') == pytest.approx(expected)
+
+
+# functions.test
+COUNTERS = storage_of({
+    'http_requests{path="/foo"}': '0+10x10',
+    'http_requests{path="/bar"}': '0+10x5 0+10x5',
+})
+
+
+def test_increase_over_the_whole_series():
+    assert query(COUNTERS, 'increase(http_requests[50m])', '50m') == \
+        pytest.approx({labels(path='/foo'): 100, labels(path='/bar'): 90})
+
+
+def test_rate_with_counter_reset():
+    assert query(COUNTERS, 'rate(http_requests[50m])', '50m') == \
+        pytest.approx({labels(path='/foo'): 100 / 3000,
+                       labels(path='/bar'): 90 / 3000})
+
+
+@pytest.mark.parametrize('expr,t,expected', [
+    # samples at 1m..5m (20..60) in (30s, 5m30s]: the 40 increase over 4m
+    # is extrapolated by 30s on each side, the average interval being 1m
+    ('increase(x[5m])', '5m30s', 50),
+    ('rate(x[5m])', '5m30s', 50 / 300.0),
+    ('delta(x[5m])', '5m30s', 50),
+    # the window starts too long before the first sample: extrapolated by
+    # half an interval on that side
+    ('delta(x[10m])', '5m30s', 50 * (300 + 30 + 30) / 300.0),
+    # ...but a counter is only extrapolated down to zero, here 1m before
+    # its first sample (10 at 0s, increasing by 10 per minute)
+    ('increase(x[10m])', '5m30s', 50 * (300 + 60 + 30) / 300.0),
+])
+def test_rate_extrapolation(expr, t, expected):
+    storage = storage_of({'x': '10+10x10'}, '1m')
+    assert query(storage, expr, t) == pytest.approx({(): expected})
+
+
+def test_increase_extrapolation_stops_at_zero():
+    # the counter would reach zero 30s before its first sample (1m): the
+    # extrapolation to the window start (0s) is cut there
+    storage = storage_of({'x': '_ 5+10x4'}, '1m')
+    assert query(storage, 'increase(x[5m])', '5m') == \
+        pytest.approx({(): 40 * 270 / 240.0})
+
+
+def test_rate_needs_two_samples():
+    storage = storage_of({'x': '_ _ _ _ 1'}, '1m')
+    assert query(storage, 'rate(x[5m])', '5m') == {}
+
+
+# operators.test
+ROLES = storage_of({
+    'node_var{instance="abc",job="node"}': '2',
+    'node_role{instance="abc",job="node",role="prometheus"}': '1',
+    'node_cpu{instance="abc",job="node",mode="idle"}': '3',
+    'node_cpu{instance="abc",job="node",mode="user"}': '1',
+    'node_cpu{instance="def",job="node",mode="idle"}': '8',
+    'node_cpu{instance="def",job="node",mode="user"}': '2',
+    'random{foo="bar"}': '1',
+    'threshold{instance="abc",job="node",target="a@b.com"}': '0',
+})
+
+
+@pytest.mark.parametrize('expr,expected', [
+    ('node_role * on (instance) group_right (role) node_var',
+     {labels(instance='abc', job='node', role='prometheus'): 2}),
+    ('node_var * on (instance) group_left (role) node_role',
+     {labels(instance='abc', job='node', role='prometheus'): 2}),
+    ('node_var * ignoring (role) group_left (role) node_role',
+     {labels(instance='abc', job='node', role='prometheus'): 2}),
+    ('node_role * ignoring (role) group_right (role) node_var',
+     {labels(instance='abc', job='node', role='prometheus'): 2}),
+    ('node_cpu * ignoring (role, mode) group_left (role) node_role',
+     {labels(instance='abc', job='node', mode='idle', role='prometheus'): 3,
+      labels(instance='abc', job='node', mode='user', role='prometheus'): 1}),
+    ('node_cpu * on (instance) group_left (role) node_role',
+     {labels(instance='abc', job='node', mode='idle', role='prometheus'): 3,
+      labels(instance='abc', job='node', mode='user', role='prometheus'): 1}),
+    ('node_cpu / on (instance) group_left sum by (instance,job)(node_cpu)',
+     {labels(instance='abc', job='node', mode='idle'): .75,
+      labels(instance='abc', job='node', mode='user'): .25,
+      labels(instance='def', job='node', mode='idle'): .80,
+      labels(instance='def', job='node', mode='user'): .20}),
+    ('node_cpu > on(job, instance) group_left(target) threshold',
+     {labels(__name__='node_cpu', instance='abc', job='node', mode='idle',
+             target='a@b.com'): 3,
+      labels(__name__='node_cpu', instance='abc', job='node', mode='user',
+             target='a@b.com'): 1}),
+])
+def test_group_left_and_right(expr, expected):
+    assert query(ROLES, expr, '5m') == pytest.approx(expected)
+
+
+def test_many_to_one_requires_grouping():
+    with pytest.raises(promeval.PromQLError):
+        query(ROLES, 'node_cpu * on (instance) node_role', '5m')
+
+
+# histograms.test
+HISTOGRAM = storage_of({
+    'testhistogram_bucket{le="0.1", start="positive"}': '0+5x10',
+    'testhistogram_bucket{le=".2", start="positive"}': '0+7x10',
+    'testhistogram_bucket{le="1e0", start="positive"}': '0+11x10',
+    'testhistogram_bucket{le="+Inf", start="positive"}': '0+12x10',
+    'testhistogram_bucket{le="-.2", start="negative"}': '0+1x10',
+    'testhistogram_bucket{le="-0.1", start="negative"}': '0+2x10',
+    'testhistogram_bucket{le="0.3", start="negative"}': '0+2x10',
+    'testhistogram_bucket{le="+Inf", start="negative"}': '0+3x10',
+})
+
+
+@pytest.mark.parametrize('q,positive,negative', [
+    (0, 0, -0.2),
+    (0.2, 0.048, -0.2),
+    (0.5, 0.15, -0.15),
+    (0.8, 0.72, 0.3),
+    (1, 1, 0.3),
+    (-0.1, -math.inf, -math.inf),
+    (1.01, math.inf, math.inf),
+])
+def test_histogram_quantile(q, positive, negative):
+    assert query(HISTOGRAM, 'histogram_quantile({0}, testhistogram_bucket)'
+                 .format(q), '50m') == pytest.approx(
+        {labels(start='positive'): positive,
+         labels(start='negative'): negative})
+
+
+def test_histogram_quantile_of_rates():
+    assert query(HISTOGRAM, 'histogram_quantile(0.5, sum by (le) '
+                 '(rate(testhistogram_bucket{start="positive"}[5m])))',
+                 '50m') == pytest.approx({(): 0.15})
+
+
+def test_histogram_quantile_without_inf_bucket():
+    storage = storage_of({'h_bucket{le="1"}': '1', 'h_bucket{le="2"}': '2'})
+    result = query(storage, 'histogram_quantile(0.5, h_bucket)', '0s')
+    assert math.isnan(result[()])
+
+
+def test_histogram_quantile_without_observations():
+    storage = storage_of({'h_bucket{le="1"}': '0', 'h_bucket{le="+Inf"}': '0'})
+    result = query(storage, 'histogram_quantile(0.5, h_bucket)', '0s')
+    assert math.isnan(result[()])
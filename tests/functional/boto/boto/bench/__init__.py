@@ -0,0 +1,4 @@
+"""S3 load generation and benchmark suite for cloudserver, built on boto.
+
+Run ``python -m bench --help`` from tests/functional/boto/boto.
+"""
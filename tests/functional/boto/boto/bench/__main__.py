@@ -0,0 +1,298 @@
+"""Command-line entry point: ``python -m bench``."""
+import argparse
+import datetime
+import json
+import os
+import sys
+
+from . import promscrape
+from . import results as results_mod
+from .connection import connect
+from .driver import find_saturation, run_processes
+from .scrape_impact import run_scrape_impact
+from .slo import parse_rates, parse_slos, run_ramp, slos_from_alerts
+from .workload import PRESETS, load_workload
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m bench',
+        description='Run a reproducible S3 workload against cloudserver')
+    parser.add_argument('--host', help='defaults to $IP or localhost')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--access-key', default='accessKey1')
+    parser.add_argument('--secret-key', default='verySecretKey1')
+    parser.add_argument('--bucket', default='bench',
+                        help='bucket to use, created if needed')
+    parser.add_argument('--workload', default='mixed',
+                        help='preset name ({0}) or JSON workload file'.format(
+                            ', '.join(sorted(PRESETS))))
+    parser.add_argument('--duration', type=float,
+                        help='seconds of measured load (default: 30, '
+                             'unless --ops is given)')
+    parser.add_argument('--ops', type=int,
+                        help='stop after this many operations')
+    parser.add_argument('--threads', type=int, default=1,
+                        help='concurrent workers per process, one '
+                             'connection each')
+    parser.add_argument('--processes', default='1',
+                        help='worker processes; a comma-separated list '
+                             '(e.g. 1,2,4,8) runs one step per value and '
+                             'reports where throughput saturates')
+    ramp = parser.add_argument_group(
+        'latency-SLO ramp',
+        'raise the request rate step by step until an operation misses '
+        'its p99 latency SLO')
+    ramp.add_argument('--ramp', metavar='START:STEP:MAX',
+                      help='target rates in ops/s, or a comma-separated '
+                           'list; enables the ramp mode')
+    ramp.add_argument('--step-duration', type=float, default=30.0,
+                      help='seconds per rate step (default: 30)')
+    ramp.add_argument('--slo', action='append', default=[],
+                      metavar='OP=SECONDS',
+                      help='p99 latency SLO of an operation, or *=SECONDS '
+                           'for all; can be repeated')
+    ramp.add_argument('--alerts', metavar='ALERTS_YAML',
+                      help='take default SLOs from the warning thresholds '
+                           'of monitoring/alerts.yaml')
+    parser.add_argument('--metrics-url', action='append', default=[],
+                        help='cloudserver /metrics endpoint (default: '
+                             'http://<host>:8002/metrics); can be repeated '
+                             'to sum the metrics of several instances, '
+                             '"none" disables scraping')
+    scrape = parser.add_argument_group(
+        'scrape impact',
+        'compare latencies without and with /metrics being scraped')
+    scrape.add_argument('--scrape-impact', action='store_true',
+                        help='run the workload twice, the second time '
+                             'while scraping --metrics-url')
+    scrape.add_argument('--scrape-interval', type=float, default=1.0,
+                        help='seconds between scrapes (default: 1)')
+    parser.add_argument('--output', help='write JSON results to this file')
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='JSON results to check for regressions against')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='allowed regression ratio (default: 0.1)')
+    parser.add_argument('--cleanup', action='store_true',
+                        help='delete the objects written by the run')
+    args = parser.parse_args(argv)
+    if args.duration is None and args.ops is None:
+        args.duration = 30.0
+    try:
+        args.processes = [int(p) for p in args.processes.split(',')]
+    except ValueError:
+        parser.error('--processes must be a comma-separated list of '
+                     'integers')
+    return args
+
+
+def conn_kwargs(args):
+    return {'host': args.host, 'port': args.port,
+            'access_key': args.access_key, 'secret_key': args.secret_key}
+
+
+def ensure_bucket(args):
+    conn = connect(**conn_kwargs(args))
+    if conn.lookup(args.bucket) is None:
+        conn.create_bucket(args.bucket)
+
+
+def report(data, out=sys.stderr):
+    row = '{0:<12} {1:>9} {2:>7} {3:>11} {4:>12} {5:>9} {6:>9} {7:>9}'
+    print(row.format('operation', 'count', 'errors', 'ops/s', 'MiB/s',
+                     'p50 ms', 'p99 ms', 'p999 ms'), file=out)
+    items = list(data['operations'].items()) + [('total', data['total'])]
+    for name, op in items:
+        latency = op['latency_s']
+
+        def ms(key):
+            value = latency.get(key)
+            return '-' if value is None else '{0:.2f}'.format(value * 1000)
+
+        print(row.format(name, op['count'], op['errors'],
+                         '{0:.1f}'.format(op['ops_per_s']),
+                         '{0:.2f}'.format(op['bytes_per_s'] / 2 ** 20),
+                         ms('p50'), ms('p99'), ms('p999')), file=out)
+
+
+def report_caches(caches, out=sys.stderr):
+    for name, cache in sorted(caches.items()):
+        ratio = cache['hit_ratio']
+        print('cache {0}: {1:.0f} lookups, hit ratio {2}'.format(
+            name, cache['lookups'],
+            '-' if ratio is None else '{0:.1%}'.format(ratio)), file=out)
+
+
+def check_regressions(data, args):
+    if not args.compare:
+        return 0
+    regressions = results_mod.compare(
+        data, results_mod.load(args.compare), args.tolerance)
+    for line in regressions:
+        print('REGRESSION ' + line, file=sys.stderr)
+    return 1 if regressions else 0
+
+
+def scrape_or_none(urls):
+    try:
+        return promscrape.scrape(urls) if urls else None
+    except (IOError, OSError) as exc:
+        print('cannot scrape metrics: {0}'.format(exc), file=sys.stderr)
+        return None
+
+
+def run_step(workload, args, processes):
+    started_at = datetime.datetime.utcnow().isoformat() + 'Z'
+    # encrypted workloads report the hit ratio of the KMS caches
+    urls = metrics_urls(args) if workload.sse else []
+    before = scrape_or_none(urls)
+    results = run_processes(workload, args.bucket, conn_kwargs(args),
+                            processes=processes, threads=args.threads,
+                            duration=args.duration, max_ops=args.ops,
+                            cleanup=args.cleanup)
+    data = results.to_dict()
+    data['workload'] = workload.to_dict()
+    data['config'] = {
+        'host': args.host, 'port': args.port, 'bucket': args.bucket,
+        'processes': processes, 'threads': args.threads,
+        'duration': args.duration, 'ops': args.ops,
+        'started_at': started_at,
+    }
+    after = scrape_or_none(urls) if before is not None else None
+    if after is not None:
+        data['caches'] = promscrape.cache_summary(before, after)
+    return data
+
+
+def write_output(data, args):
+    if args.output:
+        results_mod.dump(data, args.output)
+    else:
+        json.dump(data, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+
+
+def report_saturation(saturation, out=sys.stderr):
+    print('saturation point per operation:', file=out)
+    for op, point in sorted(saturation.items()):
+        print('  {0:<12} {1:>10.1f} ops/s at {2} process(es){3}'.format(
+            op, point['ops_per_s'], point['processes'],
+            '' if point['saturated'] else ' (not saturated)'), file=out)
+
+
+def report_step(step, out=sys.stderr):
+    print('== target {0:.1f} ops/s, achieved {1:.1f} ops/s{2}'.format(
+        step['target_rate'], step['achieved_rate'],
+        ', SLO violated by ' + ', '.join(step['violations'])
+        if step['violations'] else ''), file=out)
+    for op, info in step['operations'].items():
+        server = info['server_latency_s'] or {}
+        server_p99 = server.get('p99')
+        print('  {0:<12} {1:>9.1f} ops/s  client p99 {2}  server p99 {3}'
+              '  slo {4}'.format(
+                  op, info['ops_per_s'],
+                  _ms(info['client_latency_s'].get('p99')),
+                  _ms(server_p99) + ('+' if server.get('p99_overflow')
+                                     else ''),
+                  _ms(info['slo_s'])), file=out)
+
+
+def _ms(value):
+    return '-' if value is None else '{0:.1f}ms'.format(value * 1000)
+
+
+def metrics_urls(args):
+    urls = args.metrics_url or ['http://{0}:8002/metrics'.format(
+        args.host or os.getenv('IP', 'localhost'))]
+    return [url for url in urls if url != 'none']
+
+
+def main_scrape_impact(args, workload):
+    urls = metrics_urls(args)
+    if not urls:
+        print('--scrape-impact needs a metrics URL', file=sys.stderr)
+        return 2
+    data = run_scrape_impact(workload, args.bucket, conn_kwargs(args),
+                             urls[0], interval=args.scrape_interval,
+                             processes=args.processes[-1],
+                             threads=args.threads, duration=args.duration)
+    print('== without scraping', file=sys.stderr)
+    report(data['baseline'])
+    print('== scraping every {0}s'.format(args.scrape_interval),
+          file=sys.stderr)
+    report(data['with_scraping'])
+    scraper = data['scraper']
+    print('scrapes: {0} ({1} errors), exposition: {2} bytes, '
+          'scrape p50 {3}, p99 {4}'.format(
+              scraper['scrapes'], scraper['errors'],
+              scraper['exposition_bytes'],
+              _ms(scraper['latency_s'].get('p50')),
+              _ms(scraper['latency_s'].get('p99'))), file=sys.stderr)
+    for op, delta in sorted(data['latency_impact_s'].items()):
+        print('  {0:<12} p50 {1:+.2f}ms  p99 {2:+.2f}ms'.format(
+            op, (delta['p50'] or 0) * 1000, (delta['p99'] or 0) * 1000),
+            file=sys.stderr)
+    data['workload'] = workload.to_dict()
+    return data
+
+
+def main_ramp(args, workload):
+    slos = slos_from_alerts(args.alerts) if args.alerts else {}
+    slos.update(parse_slos(args.slo))
+    if not slos:
+        print('no SLO given, use --slo or --alerts', file=sys.stderr)
+        return 2
+    urls = metrics_urls(args)
+    data = run_ramp(workload, args.bucket, conn_kwargs(args),
+                    parse_rates(args.ramp), slos,
+                    step_duration=args.step_duration,
+                    processes=args.processes[-1], threads=args.threads,
+                    metrics_urls=urls, log=report_step)
+    print('maximum sustainable throughput within SLO:', file=sys.stderr)
+    for op, best in sorted(data['max_sustainable'].items()):
+        print('  {0:<12} {1}'.format(
+            op, 'none (SLO missed at the first step)' if best is None else
+            '{0:.1f} ops/s (p99 {1}, slo {2})'.format(
+                best['ops_per_s'], _ms(best['p99']), _ms(best['slo_s']))),
+            file=sys.stderr)
+    data['workload'] = workload.to_dict()
+    data['config'] = {'host': args.host, 'port': args.port,
+                      'bucket': args.bucket, 'threads': args.threads,
+                      'processes': args.processes[-1],
+                      'step_duration': args.step_duration, 'slos': slos}
+    return data
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workload = load_workload(args.workload)
+    ensure_bucket(args)
+    if args.ramp or args.scrape_impact:
+        data = (main_ramp(args, workload) if args.ramp
+                else main_scrape_impact(args, workload))
+        if not isinstance(data, dict):
+            return data
+        write_output(data, args)
+        return 0
+    steps = []
+    for processes in args.processes:
+        print('== {0} process(es) x {1} thread(s)'.format(
+            processes, args.threads), file=sys.stderr)
+        data = run_step(workload, args, processes)
+        report(data)
+        report_caches(data.get('caches', {}))
+        steps.append((processes, data))
+    if len(steps) == 1:
+        data = steps[0][1]
+    else:
+        saturation = find_saturation(steps)
+        report_saturation(saturation)
+        data = {'steps': [d for _, d in steps], 'saturation': saturation}
+    write_output(data, args)
+    if len(steps) > 1:
+        return 0
+    return check_regressions(data, args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,21 @@
+import os
+
+from boto.s3.connection import S3Connection, OrdinaryCallingFormat
+
+# Boto: see http://docs.pythonboto.org/en/latest/
+
+
+def connect(host=None, port=8000, access_key='accessKey1',
+            secret_key='verySecretKey1', is_secure=False):
+    """Return an S3Connection to a local cloudserver.
+
+    Same setup as tests/test_boto.py. Connections keep their HTTP
+    connections alive but are not thread-safe: use one per thread.
+    """
+    # OrdinaryCallingFormat ==> tell boto not to use DNS for bucket
+    return S3Connection(aws_access_key_id=access_key,
+                        aws_secret_access_key=secret_key,
+                        is_secure=is_secure,
+                        port=port,
+                        calling_format=OrdinaryCallingFormat(),
+                        host=host or os.getenv('IP', 'localhost'))
@@ -0,0 +1,108 @@
+"""Spread one workload over a pool of processes.
+
+A single Python process is limited by the GIL to roughly one core of
+client-side work, which is not enough to saturate a cloudserver running
+several node workers (``clusters`` in config.json). The driver starts
+``processes`` processes, each running ``threads`` workers with their own
+connections, and merges the latency histograms they send back into one
+``Results``.
+"""
+import multiprocessing
+
+from .results import Results
+from .runner import run_threads, split_evenly
+from .workload import Workload
+
+
+def _process_main(queue, barrier, index, spec, bucket_name, conn_kwargs,
+                  threads, duration, max_ops, cleanup, rate):
+    try:
+        # workloads hold samplers that do not pickle: rebuild from the spec
+        workload = Workload(spec)
+        results = run_threads(workload, bucket_name, conn_kwargs,
+                              threads=threads, duration=duration,
+                              max_ops=max_ops, cleanup=cleanup,
+                              first_worker_id=index * threads,
+                              start_barrier=barrier, rate=rate)
+        queue.put((index, results.to_dict(), None))
+    except Exception as err:  # report it instead of hanging the parent
+        barrier.abort()
+        queue.put((index, None, repr(err)))
+
+
+def run_processes(workload, bucket_name, conn_kwargs, processes=1,
+                  threads=1, duration=None, max_ops=None, cleanup=False,
+                  rate=None):
+    """Run ``workload`` on ``processes`` x ``threads`` workers.
+
+    ``rate``, when given, is the total target ops/s, shared evenly by all
+    workers; otherwise workers run as fast as they can.
+
+    Returns the merged ``Results``; its ``elapsed`` is the longest
+    measured phase among the processes. Raises RuntimeError if any process
+    fails.
+    """
+    if processes == 1:
+        return run_threads(workload, bucket_name, conn_kwargs,
+                           threads=threads, duration=duration,
+                           max_ops=max_ops, cleanup=cleanup, rate=rate)
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    barrier = ctx.Barrier(processes)
+    # each process preloads its share of the keys
+    preloads = split_evenly(workload.keys, processes)
+    ops = (split_evenly(max_ops, processes) if max_ops is not None
+           else [None] * processes)
+    process_rate = rate / processes if rate else None
+    procs = []
+    for index in range(processes):
+        spec = dict(workload.to_dict(), keys=preloads[index])
+        procs.append(ctx.Process(
+            target=_process_main,
+            args=(queue, barrier, index, spec, bucket_name, conn_kwargs,
+                  threads, duration, ops[index], cleanup, process_rate)))
+    for proc in procs:
+        proc.start()
+    merged = Results()
+    failures = []
+    for _ in procs:
+        index, data, error = queue.get()
+        if error is not None:
+            failures.append('process {0}: {1}'.format(index, error))
+        else:
+            merged.merge(Results.from_dict(data))
+    for proc in procs:
+        proc.join()
+    if failures:
+        raise RuntimeError('; '.join(failures))
+    return merged
+
+
+def find_saturation(steps, min_gain=0.05):
+    """Find, per operation, where throughput stops growing with load.
+
+    ``steps`` is a list of ``(processes, results_dict)`` in increasing
+    order of load. For each operation, the saturation point is the first
+    step after which adding load increases ops/s by less than ``min_gain``
+    (a ratio); when throughput keeps growing, the last step is reported
+    and ``saturated`` is False.
+    """
+    saturation = {}
+    operations = sorted(set(
+        op for _, data in steps for op in data['operations']))
+    for op in operations:
+        series = [(procs, data['operations'][op]['ops_per_s'],
+                   data['operations'][op]['latency_s'].get('p99'))
+                  for procs, data in steps if op in data['operations']]
+        chosen, saturated = series[-1], False
+        for current, following in zip(series, series[1:]):
+            if following[1] < current[1] * (1 + min_gain):
+                chosen, saturated = current, True
+                break
+        saturation[op] = {
+            'processes': chosen[0],
+            'ops_per_s': chosen[1],
+            'p99_s': chosen[2],
+            'saturated': saturated,
+        }
+    return saturation
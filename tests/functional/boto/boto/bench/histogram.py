@@ -0,0 +1,106 @@
+"""Log-linear latency histogram in the style of HdrHistogram.
+
+Values are recorded as integer microseconds into buckets whose width grows
+with the magnitude of the value, so the relative error of any reported
+percentile is bounded (below 1% with the default ``precision_bits=8``)
+whatever the range of recorded values. Counts are kept in a sparse dict,
+which makes histograms cheap to serialize to JSON and to merge.
+"""
+
+
+class Histogram(object):
+
+    def __init__(self, precision_bits=8):
+        self.precision_bits = precision_bits
+        self._half = 1 << (precision_bits - 1)
+        self.counts = {}
+        self.total = 0
+        self.min = None
+        self.max = None
+        self.sum = 0
+
+    def _index(self, value):
+        shift = max(0, value.bit_length() - self.precision_bits)
+        return shift * self._half + (value >> shift)
+
+    def _value(self, index):
+        """Midpoint of the range of values counted in bucket ``index``."""
+        if index < 2 * self._half:
+            return index
+        shift = index // self._half - 1
+        mantissa = index - shift * self._half
+        low = mantissa << shift
+        return low + ((1 << shift) - 1) // 2
+
+    def record(self, seconds, count=1):
+        value = max(0, int(seconds * 1e6))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.total += count
+        self.sum += value * count
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        if other.precision_bits != self.precision_bits:
+            raise ValueError('cannot merge histograms of different precision')
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self.sum += other.sum
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min,
+                                                              other.min)
+        if other.max is not None:
+            self.max = other.max if self.max is None else max(self.max,
+                                                              other.max)
+        return self
+
+    def percentile(self, pct):
+        """Latency in seconds below which ``pct`` percent of values fall."""
+        if not self.total:
+            return None
+        rank = max(1, int(round(pct / 100.0 * self.total + 0.5 - 1e-9)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                value = min(max(self._value(index), self.min), self.max)
+                return value / 1e6
+        return self.max / 1e6
+
+    def summary(self):
+        if not self.total:
+            return {}
+        return {
+            'min': self.min / 1e6,
+            'mean': self.sum / self.total / 1e6,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'p999': self.percentile(99.9),
+            'max': self.max / 1e6,
+        }
+
+    def to_dict(self):
+        return {
+            'precision_bits': self.precision_bits,
+            'total': self.total,
+            'sum_us': self.sum,
+            'min_us': self.min,
+            'max_us': self.max,
+            # JSON object keys must be strings
+            'counts': {str(k): v for k, v in self.counts.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        hist = cls(data['precision_bits'])
+        hist.counts = {int(k): v for k, v in data['counts'].items()}
+        hist.total = data['total']
+        hist.sum = data['sum_us']
+        hist.min = data['min_us']
+        hist.max = data['max_us']
+        return hist
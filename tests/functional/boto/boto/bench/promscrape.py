@@ -0,0 +1,130 @@
+"""Scrape and diff cloudserver's Prometheus metrics.
+
+Only what the benchmark needs: parse the text exposition format and turn
+two scrapes of a histogram into per-label latency quantiles over the
+interval between them, the way ``histogram_quantile(rate(...))`` would.
+"""
+import math
+import re
+from urllib.request import urlopen
+
+_SAMPLE_RE = re.compile(
+    r'^(?P<name>[a-zA-Z_:][a-zA-Z0-9_:]*)'
+    r'(?:\{(?P<labels>.*)\})?\s+(?P<value>\S+)')
+_LABEL_RE = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def parse(text):
+    """Parse exposition text into ``{(name, labels): value}``, where
+    ``labels`` is a sorted tuple of ``(label, value)`` pairs."""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        match = _SAMPLE_RE.match(line)
+        if not match:
+            continue
+        labels = tuple(sorted(_LABEL_RE.findall(match.group('labels') or '')))
+        samples[(match.group('name'), labels)] = float(match.group('value'))
+    return samples
+
+
+def scrape(urls, timeout=10):
+    """Scrape and sum the samples of every URL (one per node worker or
+    instance)."""
+    merged = {}
+    for url in urls:
+        with urlopen(url, timeout=timeout) as resp:
+            samples = parse(resp.read().decode('utf-8'))
+        for key, value in samples.items():
+            merged[key] = merged.get(key, 0.0) + value
+    return merged
+
+
+def _le(value):
+    return math.inf if value == '+Inf' else float(value)
+
+
+def histogram_delta(before, after, metric, by='action'):
+    """Per-``by`` label bucket counts, sum and count of ``metric`` between
+    two scrapes, aggregated over all other labels."""
+    groups = {}
+    for (name, labels), value in after.items():
+        if not name.startswith(metric + '_'):
+            continue
+        suffix = name[len(metric) + 1:]
+        if suffix not in ('bucket', 'sum', 'count'):
+            continue
+        label_map = dict(labels)
+        group = groups.setdefault(label_map.get(by, ''),
+                                  {'buckets': {}, 'sum': 0.0, 'count': 0.0})
+        delta = value - before.get((name, labels), 0.0)
+        if suffix == 'bucket':
+            le = _le(label_map['le'])
+            group['buckets'][le] = group['buckets'].get(le, 0.0) + delta
+        else:
+            group[suffix] += delta
+    return groups
+
+
+def quantile(q, buckets):
+    """Estimate quantile ``q`` (0-1) from cumulative ``{le: count}`` with
+    linear interpolation inside the bucket, as Prometheus does. Returns
+    the largest finite bound when the quantile falls in +Inf."""
+    bounds = sorted(buckets)
+    if not bounds or buckets[bounds[-1]] <= 0:
+        return None
+    rank = q * buckets[bounds[-1]]
+    prev_bound, prev_count = 0.0, 0.0
+    for bound in bounds:
+        count = buckets[bound]
+        if count >= rank:
+            if math.isinf(bound):
+                return prev_bound
+            if count == prev_count:
+                return bound
+            return prev_bound + (bound - prev_bound) * (
+                (rank - prev_count) / (count - prev_count))
+        prev_bound, prev_count = bound, count
+    return prev_bound
+
+
+def latency_summary(before, after,
+                    metric='s3_cloudserver_http_request_duration_seconds'):
+    """Server-side mean and p99 latency per action between two scrapes.
+
+    ``p99_overflow`` is set when the p99 falls beyond the largest finite
+    bucket, in which case ``p99`` is only a lower bound.
+    """
+    summary = {}
+    for action, group in histogram_delta(before, after, metric).items():
+        if group['count'] <= 0:
+            continue
+        finite = [b for b in group['buckets'] if not math.isinf(b)]
+        below_last = group['buckets'][max(finite)] if finite else 0.0
+        summary[action] = {
+            'count': group['count'],
+            'mean': group['sum'] / group['count'],
+            'p99': quantile(0.99, group['buckets']),
+            'p99_overflow': below_last < 0.99 * group['count'],
+        }
+    return summary
+
+
+def cache_summary(before, after, metric='s3_cloudserver_cache_lookups_total'):
+    """Lookups, hits and hit ratio per cache between two scrapes."""
+    summary = {}
+    for (name, labels), value in after.items():
+        if name != metric:
+            continue
+        label_map = dict(labels)
+        cache = summary.setdefault(label_map.get('cache', ''),
+                                   {'lookups': 0.0, 'hits': 0.0})
+        delta = value - before.get((name, labels), 0.0)
+        cache['lookups'] += delta
+        if label_map.get('result') == 'hit':
+            cache['hits'] += delta
+    for cache in summary.values():
+        cache['hit_ratio'] = (cache['hits'] / cache['lookups']
+                              if cache['lookups'] else None)
+    return summary
@@ -0,0 +1,132 @@
+"""Benchmark results: per-operation latency, throughput and error counts."""
+import json
+
+from .histogram import Histogram
+
+
+class OperationStats(object):
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.count = 0
+        self.errors = 0
+        self.bytes = 0
+
+    def record(self, seconds, nbytes=0):
+        self.latency.record(seconds)
+        self.count += 1
+        self.bytes += nbytes
+
+    def record_error(self):
+        self.errors += 1
+
+    def merge(self, other):
+        self.latency.merge(other.latency)
+        self.count += other.count
+        self.errors += other.errors
+        self.bytes += other.bytes
+        return self
+
+    def to_dict(self, elapsed):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'ops_per_s': self.count / elapsed if elapsed else 0.0,
+            'bytes': self.bytes,
+            'bytes_per_s': self.bytes / elapsed if elapsed else 0.0,
+            'latency_s': self.latency.summary(),
+        }
+
+    def serialize(self):
+        return {'count': self.count, 'errors': self.errors,
+                'bytes': self.bytes, 'latency': self.latency.to_dict()}
+
+    @classmethod
+    def deserialize(cls, data):
+        stats = cls()
+        stats.count = data['count']
+        stats.errors = data['errors']
+        stats.bytes = data['bytes']
+        stats.latency = Histogram.from_dict(data['latency'])
+        return stats
+
+
+class Results(object):
+    """Statistics of one run, keyed by operation name."""
+
+    def __init__(self):
+        self.operations = {}
+        self.elapsed = 0.0
+
+    def op(self, name):
+        stats = self.operations.get(name)
+        if stats is None:
+            stats = self.operations[name] = OperationStats()
+        return stats
+
+    def merge(self, other):
+        for name, stats in other.operations.items():
+            self.op(name).merge(stats)
+        self.elapsed = max(self.elapsed, other.elapsed)
+        return self
+
+    def total(self):
+        total = OperationStats()
+        for stats in self.operations.values():
+            total.merge(stats)
+        return total
+
+    def to_dict(self):
+        return {
+            'elapsed_s': self.elapsed,
+            'operations': {name: stats.to_dict(self.elapsed)
+                           for name, stats in sorted(self.operations.items())},
+            'total': self.total().to_dict(self.elapsed),
+            # raw histograms, so that runs can be merged or re-analyzed
+            'histograms': {name: stats.serialize()
+                           for name, stats in self.operations.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        results = cls()
+        results.elapsed = data['elapsed_s']
+        for name, stats in data.get('histograms', {}).items():
+            results.operations[name] = OperationStats.deserialize(stats)
+        return results
+
+
+def compare(current, baseline, tolerance=0.1):
+    """Return the regressions of ``current`` against ``baseline``.
+
+    Both are result dicts as written by the benchmark. An operation
+    regresses when its p99 latency grows, or its throughput drops, by more
+    than ``tolerance`` (a ratio).
+    """
+    regressions = []
+    for name, base in baseline['operations'].items():
+        cur = current['operations'].get(name)
+        if cur is None or not base['count']:
+            continue
+        base_p99 = base['latency_s'].get('p99')
+        cur_p99 = cur['latency_s'].get('p99')
+        if base_p99 and cur_p99 and cur_p99 > base_p99 * (1 + tolerance):
+            regressions.append(
+                '{0}: p99 latency {1:.4f}s -> {2:.4f}s'.format(
+                    name, base_p99, cur_p99))
+        if cur['ops_per_s'] < base['ops_per_s'] * (1 - tolerance):
+            regressions.append(
+                '{0}: throughput {1:.1f} -> {2:.1f} ops/s'.format(
+                    name, base['ops_per_s'], cur['ops_per_s']))
+    return regressions
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def dump(data, path):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write('\n')
@@ -0,0 +1,228 @@
+"""Execute a workload against cloudserver and collect ``Results``."""
+import io
+import random
+import socket
+import threading
+import time
+
+from boto.exception import BotoClientError, BotoServerError
+from boto.s3.key import Key
+
+from .connection import connect
+from .results import Results
+
+ERRORS = (BotoClientError, BotoServerError, socket.error, IOError)
+
+
+def make_payload(size, seed):
+    """Deterministic pseudo-random bytes, generated once per run."""
+    if not size:
+        return b''
+    return random.Random(seed).getrandbits(8 * size).to_bytes(size, 'little')
+
+
+class Worker(object):
+    """Runs operations of a workload on its own connection.
+
+    Each worker owns a disjoint part of the key space, so workers never
+    read or delete each other's objects and runs stay reproducible for a
+    given seed and worker count.
+    """
+
+    def __init__(self, worker_id, workload, bucket_name, conn_kwargs,
+                 payload):
+        self.worker_id = worker_id
+        self.workload = workload
+        self.rng = random.Random(workload.seed * 1000003 + worker_id)
+        self.conn = connect(**conn_kwargs)
+        self.bucket = self.conn.get_bucket(bucket_name, validate=False)
+        self.payload = payload
+        self.prefix = '{0}w{1}/'.format(workload.prefix, worker_id)
+        self.live = []
+        self._counter = 0
+        self.put_headers = ({'x-amz-server-side-encryption': workload.sse}
+                            if workload.sse else None)
+        self.results = Results()
+
+    def _new_key(self):
+        self._counter += 1
+        return '{0}{1:010d}'.format(self.prefix, self._counter)
+
+    def _pop_live(self):
+        index = self.rng.randrange(len(self.live))
+        self.live[index], self.live[-1] = self.live[-1], self.live[index]
+        return self.live.pop()
+
+    def op_put(self):
+        name = self._new_key()
+        size = self.workload.size.sample(self.rng)
+        Key(self.bucket, name).set_contents_from_string(
+            self.payload[:size], headers=self.put_headers)
+        self.live.append(name)
+        return size
+
+    def op_get(self):
+        name = self.rng.choice(self.live)
+        return len(Key(self.bucket, name).get_contents_as_string())
+
+    def op_head(self):
+        self.bucket.get_key(self.rng.choice(self.live))
+        return 0
+
+    def op_delete(self):
+        self.bucket.delete_key(self._pop_live())
+        return 0
+
+    def op_mpu(self):
+        name = self._new_key()
+        part_size = self.workload.mpu_part_size
+        upload = self.bucket.initiate_multipart_upload(
+            name, headers=self.put_headers)
+        try:
+            for part in range(1, self.workload.mpu_parts + 1):
+                upload.upload_part_from_file(
+                    io.BytesIO(self.payload[:part_size]), part)
+            upload.complete_upload()
+        except ERRORS:
+            upload.cancel_upload()
+            raise
+        self.live.append(name)
+        return part_size * self.workload.mpu_parts
+
+    def op_multidelete(self):
+        count = min(len(self.live), self.workload.multidelete_batch)
+        names = [self._pop_live() for _ in range(count)]
+        result = self.bucket.delete_keys(names, quiet=True)
+        if result.errors:
+            raise BotoClientError('{0} keys failed to delete'.format(
+                len(result.errors)))
+        return 0
+
+    def op_list(self):
+        self.bucket.get_all_keys(prefix=self.prefix,
+                                 max_keys=self.workload.list_max_keys)
+        return 0
+
+    def _runnable(self, op):
+        # reads and deletes need existing keys: fall back to a put
+        if op in ('get', 'head', 'delete', 'multidelete') and not self.live:
+            return 'put'
+        return op
+
+    def run_one(self, op=None, scheduled=None):
+        """Run one operation, chosen from the mix unless ``op`` is given,
+        and record its latency. Return the operation actually run.
+
+        When ``scheduled`` is given, latency is measured from that intended
+        start time rather than from the actual one, so that time spent
+        queued behind slow requests is not hidden (coordinated omission).
+        """
+        op = self._runnable(op or self.workload.choose(self.rng))
+        stats = self.results.op(op)
+        start = scheduled if scheduled is not None else time.perf_counter()
+        try:
+            nbytes = getattr(self, 'op_' + op)()
+        except ERRORS:
+            stats.record_error()
+        else:
+            stats.record(time.perf_counter() - start, nbytes)
+        return op
+
+    def preload(self, count):
+        """Write ``count`` objects without recording them."""
+        for _ in range(count):
+            self.op_put()
+
+    def run(self, deadline=None, max_ops=None, stop=None, rate=None):
+        """Run operations until ``deadline``, ``max_ops`` or ``stop``.
+
+        Without ``rate`` the worker runs closed-loop, as fast as responses
+        come back. With ``rate`` (ops/s), operations are scheduled at fixed
+        intervals and latencies include any delay behind the schedule.
+        """
+        start = time.perf_counter()
+        interval = 1.0 / rate if rate else None
+        # spread the first operation of workers over one interval
+        scheduled = start + (self.rng.random() * interval if interval else 0)
+        done = 0
+        while True:
+            if stop is not None and stop.is_set():
+                break
+            if max_ops is not None and done >= max_ops:
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            if interval is None:
+                self.run_one()
+            else:
+                if deadline is not None and scheduled >= deadline:
+                    break
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                self.run_one(scheduled=scheduled)
+                scheduled += interval
+            done += 1
+        self.results.elapsed = time.perf_counter() - start
+        return self.results
+
+    def cleanup(self):
+        while self.live:
+            batch = [self._pop_live() for _ in range(min(1000,
+                                                         len(self.live)))]
+            self.bucket.delete_keys(batch, quiet=True)
+
+
+def payload_size(workload):
+    size = workload.size.max
+    if 'mpu' in workload.operations:
+        size = max(size, workload.mpu_part_size)
+    return size
+
+
+def split_evenly(total, parts):
+    return [total // parts + (1 if i < total % parts else 0)
+            for i in range(parts)]
+
+
+def run_threads(workload, bucket_name, conn_kwargs, threads=1,
+                duration=None, max_ops=None, cleanup=False,
+                first_worker_id=0, start_barrier=None, rate=None):
+    """Run ``workload`` on ``threads`` workers of this process.
+
+    Each worker gets its own S3Connection. Returns the merged ``Results``.
+    When ``start_barrier`` is given, the measured phase only starts once
+    every party of the barrier has finished its preload. ``rate`` is the
+    target ops/s of the whole process, shared evenly by its workers.
+    """
+    payload = make_payload(payload_size(workload), workload.seed)
+    workers = [Worker(first_worker_id + i, workload, bucket_name,
+                      conn_kwargs, payload) for i in range(threads)]
+    preload = split_evenly(workload.keys, threads)
+    ops = (split_evenly(max_ops, threads) if max_ops is not None
+           else [None] * threads)
+
+    def _run_phase(target, args_list):
+        pool = [threading.Thread(target=target, args=args)
+                for args in args_list]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+
+    _run_phase(lambda w, n: w.preload(n), zip(workers, preload))
+    if start_barrier is not None:
+        start_barrier.wait()
+    start = time.perf_counter()
+    deadline = start + duration if duration else None
+    worker_rate = rate / threads if rate else None
+    _run_phase(lambda w, n: w.run(deadline=deadline, max_ops=n,
+                                  rate=worker_rate),
+               zip(workers, ops))
+    results = Results()
+    for worker in workers:
+        results.merge(worker.results)
+    results.elapsed = time.perf_counter() - start
+    if cleanup:
+        _run_phase(lambda w: w.cleanup(), [(w,) for w in workers])
+    return results
@@ -0,0 +1,95 @@
+"""Measure the latency impact of Prometheus scrapes on S3 requests.
+
+Runs the same workload twice, first without and then with a scraper
+fetching the cloudserver /metrics endpoint at a fixed interval, as
+Prometheus would, and compares per-operation latencies. The scrape
+duration and exposition size are reported too: rendering the exposition
+runs on the node event loop, so a slow render shows up as latency on the
+S3 requests served by the same worker.
+"""
+import threading
+import time
+from urllib.request import urlopen
+
+from .driver import run_processes
+from .histogram import Histogram
+
+
+class Scraper(threading.Thread):
+
+    def __init__(self, url, interval=1.0, timeout=10):
+        super(Scraper, self).__init__(daemon=True)
+        self.url = url
+        self.interval = interval
+        self.timeout = timeout
+        self.latency = Histogram()
+        self.bytes = 0
+        self.errors = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        next_scrape = time.perf_counter()
+        while not self._stop_event.is_set():
+            start = time.perf_counter()
+            try:
+                with urlopen(self.url, timeout=self.timeout) as resp:
+                    self.bytes = len(resp.read())
+                self.latency.record(time.perf_counter() - start)
+            except (IOError, OSError):
+                self.errors += 1
+            next_scrape += self.interval
+            self._stop_event.wait(max(0.0, next_scrape - time.perf_counter()))
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def to_dict(self):
+        return {
+            'url': self.url,
+            'interval_s': self.interval,
+            'scrapes': self.latency.total,
+            'errors': self.errors,
+            'exposition_bytes': self.bytes,
+            'latency_s': self.latency.summary(),
+        }
+
+
+def _delta(base, other):
+    if base is None or other is None:
+        return None
+    return other - base
+
+
+def run_scrape_impact(workload, bucket_name, conn_kwargs, metrics_url,
+                      interval=1.0, processes=1, threads=1, duration=30.0,
+                      rate=None):
+    """Run the workload without, then with scraping, and compare."""
+    kwargs = dict(processes=processes, threads=threads, duration=duration,
+                  rate=rate)
+    baseline = run_processes(workload, bucket_name, conn_kwargs,
+                             **kwargs).to_dict()
+    scraper = Scraper(metrics_url, interval)
+    scraper.start()
+    try:
+        scraped = run_processes(workload, bucket_name, conn_kwargs,
+                                **kwargs).to_dict()
+    finally:
+        scraper.stop()
+    impact = {}
+    for op, base in baseline['operations'].items():
+        other = scraped['operations'].get(op)
+        if other is None:
+            continue
+        impact[op] = {
+            key: _delta(base['latency_s'].get(key),
+                        other['latency_s'].get(key))
+            for key in ('mean', 'p50', 'p99', 'p999')
+        }
+        impact[op]['ops_per_s'] = other['ops_per_s'] - base['ops_per_s']
+    return {
+        'baseline': baseline,
+        'with_scraping': scraped,
+        'scraper': scraper.to_dict(),
+        'latency_impact_s': impact,
+    }
@@ -0,0 +1,160 @@
+"""Latency-SLO ramp: find the highest request rate meeting a p99 target.
+
+The rate is raised step by step. At each step the workload runs at a fixed
+target rate, latencies are measured client-side from each operation's
+scheduled start time, and the server-side
+s3_cloudserver_http_request_duration_seconds histogram is scraped before
+and after the step. The ramp stops at the first step where an operation
+class misses its SLO, and reports for every class the highest throughput
+it sustained within its SLO.
+"""
+import time
+
+from . import promscrape
+from .driver import run_processes
+
+# Server-side action label(s) of each benchmark operation
+ACTIONS = {
+    'put': ('objectPut',),
+    'get': ('objectGet',),
+    'head': ('objectHead',),
+    'delete': ('objectDelete',),
+    'multidelete': ('multiObjectDelete',),
+    'list': ('bucketGet',),
+    'mpu': ('initiateMultipartUpload', 'objectPutPart',
+            'completeMultipartUpload'),
+}
+
+# alerts.yaml x-inputs used as default SLOs, and the operations they cover
+ALERT_THRESHOLDS = {
+    'listingLatencyWarningThreshold': ('list',),
+    'deleteLatencyWarningThreshold': ('delete', 'multidelete'),
+}
+
+
+def parse_rates(spec):
+    """``'100:100:2000'`` (start:step:max) or ``'100,200,500'``."""
+    if ',' in spec or ':' not in spec:
+        return [float(r) for r in spec.split(',')]
+    start, step, stop = (float(v) for v in spec.split(':'))
+    if start <= 0 or step <= 0:
+        raise ValueError('rates must be positive')
+    rates = []
+    rate = start
+    while rate <= stop + 1e-9:
+        rates.append(rate)
+        rate += step
+    return rates
+
+
+def parse_slos(items):
+    """``['get=0.1', 'list=0.3']`` into ``{'get': 0.1, 'list': 0.3}``;
+    ``*=<seconds>`` applies to every operation without its own SLO."""
+    slos = {}
+    for item in items:
+        op, _, seconds = item.partition('=')
+        slos[op.strip()] = float(seconds)
+    return slos
+
+
+def slos_from_alerts(path):
+    """Default SLOs from the warning thresholds of monitoring/alerts.yaml.
+
+    Note the alerts evaluate average latency; here they are used as p99
+    targets, which is stricter.
+    """
+    import yaml  # only needed for this option: pip install pyyaml
+    with open(path) as f:
+        inputs = {i['name']: i.get('value')
+                  for i in yaml.safe_load(f).get('x-inputs', [])}
+    slos = {}
+    for name, ops in ALERT_THRESHOLDS.items():
+        if inputs.get(name) is not None:
+            for op in ops:
+                slos[op] = float(inputs[name])
+    return slos
+
+
+def _slo_for(op, slos):
+    return slos.get(op, slos.get('*'))
+
+
+def _server_latency(summary, op):
+    """Merge the server-side latency of the actions behind ``op``.
+
+    The merged p99 is the worst p99 among those actions.
+    """
+    parts = [summary[a] for a in ACTIONS.get(op, ()) if a in summary]
+    if not parts:
+        return None
+    count = sum(p['count'] for p in parts)
+    p99s = [p['p99'] for p in parts if p['p99'] is not None]
+    return {
+        'count': count,
+        'mean': sum(p['mean'] * p['count'] for p in parts) / count,
+        'p99': max(p99s) if p99s else None,
+        'p99_overflow': any(p['p99_overflow'] for p in parts),
+    }
+
+
+def run_ramp(workload, bucket_name, conn_kwargs, rates, slos,
+             step_duration=30.0, processes=1, threads=4, metrics_urls=(),
+             percentile='p99', log=None):
+    """Run the ramp and return ``{'steps': [...], 'max_sustainable': {}}``.
+
+    ``slos`` maps operation names (or ``'*'``) to a latency in seconds for
+    ``percentile``. Operations without an SLO are measured but never stop
+    the ramp.
+    """
+    steps = []
+    sustainable = {}
+    for rate in rates:
+        before = promscrape.scrape(metrics_urls) if metrics_urls else None
+        start = time.time()
+        results = run_processes(workload, bucket_name, conn_kwargs,
+                                processes=processes, threads=threads,
+                                duration=step_duration, rate=rate)
+        server = {}
+        if metrics_urls:
+            server = promscrape.latency_summary(
+                before, promscrape.scrape(metrics_urls))
+        data = results.to_dict()
+        step = {'target_rate': rate, 'start': start,
+                'achieved_rate': data['total']['ops_per_s'],
+                'operations': {}, 'violations': []}
+        for op, stats in sorted(data['operations'].items()):
+            slo = _slo_for(op, slos)
+            client_latency = stats['latency_s'].get(percentile)
+            violated = (slo is not None and client_latency is not None and
+                        client_latency > slo)
+            step['operations'][op] = {
+                'ops_per_s': stats['ops_per_s'],
+                'errors': stats['errors'],
+                'client_latency_s': stats['latency_s'],
+                'server_latency_s': _server_latency(server, op),
+                'slo_s': slo,
+                'violated': violated,
+            }
+            if violated:
+                step['violations'].append(op)
+            elif slo is not None:
+                best = sustainable.get(op)
+                if best is None or stats['ops_per_s'] > best['ops_per_s']:
+                    sustainable[op] = {
+                        'ops_per_s': stats['ops_per_s'],
+                        'target_rate': rate,
+                        percentile: client_latency,
+                        'slo_s': slo,
+                    }
+        steps.append(step)
+        if log is not None:
+            log(step)
+        if step['violations']:
+            break
+    for op in workload.operations:
+        if _slo_for(op, slos) is not None and op not in sustainable:
+            sustainable[op] = None
+    return {'percentile': percentile, 'steps': steps,
+            'max_sustainable': sustainable,
+            'stopped_at': steps[-1]['target_rate']
+            if steps and steps[-1]['violations'] else None}
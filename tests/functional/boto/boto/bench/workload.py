@@ -0,0 +1,155 @@
+"""Workload definitions for the S3 benchmark.
+
+A workload is a plain dict (usually loaded from JSON) describing the mix of
+operations and the object-size distribution, e.g.::
+
+    {
+        "name": "mixed",
+        "mix": {"put": 30, "get": 50, "head": 10, "delete": 10},
+        "size": "lognormal:64KiB:1.5",
+        "keys": 1000,
+        "seed": 42
+    }
+
+``sse`` sets the server-side encryption algorithm (``AES256`` or
+``aws:kms``) requested on object writes.
+
+Sizes accept a fixed value (``4KiB``), ``uniform:<min>:<max>``,
+``lognormal:<median>:<sigma>`` or ``choice:<size>=<weight>,...``.
+"""
+import json
+import math
+import re
+
+OPERATIONS = ('put', 'get', 'head', 'delete', 'mpu', 'multidelete', 'list')
+
+DEFAULTS = {
+    'mix': {'put': 1},
+    'size': '4KiB',
+    # objects written before the measured phase, so that reads hit
+    'keys': 1000,
+    'prefix': 'bench/',
+    'seed': 42,
+    'mpu_part_size': '5MiB',
+    'mpu_parts': 3,
+    'multidelete_batch': 100,
+    'list_max_keys': 1000,
+    'sse': None,
+}
+
+SSE_ALGORITHMS = (None, 'AES256', 'aws:kms')
+
+PRESETS = {
+    'mixed': {'mix': {'put': 30, 'get': 50, 'head': 10, 'delete': 10},
+              'size': 'lognormal:64KiB:1.5'},
+    'put': {'mix': {'put': 1}, 'keys': 0},
+    'get': {'mix': {'get': 1}},
+    'small-objects': {'mix': {'put': 50, 'get': 50}, 'size': '4KiB'},
+    'large-objects': {'mix': {'put': 50, 'get': 50},
+                      'size': 'uniform:8MiB:64MiB', 'keys': 50},
+    'mpu': {'mix': {'mpu': 1}, 'keys': 0},
+    'multidelete': {'mix': {'put': 90, 'multidelete': 1},
+                    'size': '1KiB', 'keys': 10000},
+    'list': {'mix': {'list': 1}, 'size': '0B', 'keys': 10000},
+    'encrypted-small-objects': {'mix': {'put': 50, 'get': 50},
+                                'size': '4KiB', 'sse': 'AES256'},
+}
+
+_UNITS = {
+    '': 1, 'b': 1,
+    'k': 1000, 'kb': 1000, 'kib': 1024,
+    'm': 1000 ** 2, 'mb': 1000 ** 2, 'mib': 1024 ** 2,
+    'g': 1000 ** 3, 'gb': 1000 ** 3, 'gib': 1024 ** 3,
+}
+_SIZE_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([a-zA-Z]*)\s*$')
+
+
+def parse_size(text):
+    """Parse ``'64KiB'``, ``'5MB'`` or ``'1024'`` into a number of bytes."""
+    if isinstance(text, int):
+        return text
+    match = _SIZE_RE.match(str(text))
+    if not match or match.group(2).lower() not in _UNITS:
+        raise ValueError('invalid size: {0!r}'.format(text))
+    return int(float(match.group(1)) * _UNITS[match.group(2).lower()])
+
+
+class SizeDistribution(object):
+    """Object sizes drawn from a seeded ``random.Random``."""
+
+    def __init__(self, spec):
+        self.spec = spec
+        kind, _, args = str(spec).partition(':')
+        if not args:
+            size = parse_size(kind)
+            self.max = size
+            self._sample = lambda rng: size
+        elif kind == 'uniform':
+            low, high = (parse_size(v) for v in args.split(':'))
+            self.max = high
+            self._sample = lambda rng: rng.randint(low, high)
+        elif kind == 'lognormal':
+            median, sigma = args.split(':')
+            mu, sigma = math.log(parse_size(median)), float(sigma)
+            # clip the tail to keep the payload buffer reasonable
+            self.max = int(math.exp(mu + 4 * sigma))
+            self._sample = lambda rng: min(
+                self.max, int(rng.lognormvariate(mu, sigma)))
+        elif kind == 'choice':
+            sizes, weights = [], []
+            for item in args.split(','):
+                size, _, weight = item.partition('=')
+                sizes.append(parse_size(size))
+                weights.append(float(weight or 1))
+            self.max = max(sizes)
+            self._sample = lambda rng: rng.choices(sizes, weights)[0]
+        else:
+            raise ValueError('invalid size distribution: {0!r}'.format(spec))
+
+    def sample(self, rng):
+        return self._sample(rng)
+
+
+class Workload(object):
+
+    def __init__(self, spec):
+        unknown = set(spec) - set(DEFAULTS) - {'name'}
+        if unknown:
+            raise ValueError('unknown workload fields: {0}'.format(
+                ', '.join(sorted(unknown))))
+        self.spec = dict(DEFAULTS, **spec)
+        self.name = self.spec.get('name', 'custom')
+        mix = self.spec['mix']
+        bad_ops = set(mix) - set(OPERATIONS)
+        if bad_ops:
+            raise ValueError('unknown operations: {0}'.format(
+                ', '.join(sorted(bad_ops))))
+        self.operations = [op for op in OPERATIONS if mix.get(op)]
+        self.weights = [mix[op] for op in self.operations]
+        if not self.operations:
+            raise ValueError('workload mix is empty')
+        self.size = SizeDistribution(self.spec['size'])
+        self.keys = int(self.spec['keys'])
+        self.prefix = self.spec['prefix']
+        self.seed = self.spec['seed']
+        self.mpu_part_size = parse_size(self.spec['mpu_part_size'])
+        self.mpu_parts = int(self.spec['mpu_parts'])
+        self.multidelete_batch = int(self.spec['multidelete_batch'])
+        self.list_max_keys = int(self.spec['list_max_keys'])
+        self.sse = self.spec['sse']
+        if self.sse not in SSE_ALGORITHMS:
+            raise ValueError('invalid sse algorithm: {0!r}'.format(self.sse))
+
+    def choose(self, rng):
+        return rng.choices(self.operations, self.weights)[0]
+
+    def to_dict(self):
+        return dict(self.spec, name=self.name)
+
+
+def load_workload(name_or_path):
+    """Return the ``Workload`` for a preset name or a JSON file path."""
+    if name_or_path in PRESETS:
+        return Workload(dict(PRESETS[name_or_path], name=name_or_path))
+    with open(name_or_path) as f:
+        return Workload(json.load(f))
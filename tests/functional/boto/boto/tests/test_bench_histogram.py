@@ -0,0 +1,61 @@
+import random
+
+import pytest
+
+from bench.histogram import Histogram
+from bench.results import Results, compare
+
+
+def test_empty_histogram():
+    hist = Histogram()
+    assert hist.percentile(50) is None
+    assert hist.summary() == {}
+
+
+def test_small_values_are_exact():
+    hist = Histogram()
+    for us in range(1, 101):
+        hist.record(us / 1e6)
+    assert hist.percentile(50) == 50 / 1e6
+    assert hist.percentile(99) == 99 / 1e6
+    assert hist.percentile(100) == 100 / 1e6
+
+
+def test_percentiles_within_one_percent():
+    rng = random.Random(42)
+    values = [rng.lognormvariate(-4, 1.5) for _ in range(20000)]
+    hist = Histogram()
+    for value in values:
+        hist.record(value)
+    values.sort()
+    for pct in (50, 90, 99, 99.9):
+        exact = values[int(round(pct / 100.0 * len(values))) - 1]
+        assert hist.percentile(pct) == pytest.approx(exact, rel=0.01)
+    assert hist.summary()['max'] == pytest.approx(values[-1], abs=1e-6)
+
+
+def test_merge_and_serialization():
+    one, two, both = Histogram(), Histogram(), Histogram()
+    for i in range(1, 1000):
+        (one if i % 2 else two).record(i / 1000.0)
+        both.record(i / 1000.0)
+    merged = Histogram.from_dict(one.to_dict()).merge(two)
+    assert merged.summary() == both.summary()
+    with pytest.raises(ValueError):
+        merged.merge(Histogram(precision_bits=4))
+
+
+def test_results_compare():
+    base, cur = Results(), Results()
+    base.elapsed = cur.elapsed = 10.0
+    for _ in range(100):
+        base.op('get').record(0.010)
+        cur.op('get').record(0.012)
+        base.op('put').record(0.020)
+    for _ in range(50):
+        cur.op('put').record(0.020)
+    regressions = compare(cur.to_dict(), base.to_dict(), tolerance=0.1)
+    assert len(regressions) == 2
+    assert regressions[0].startswith('get: p99 latency')
+    assert regressions[1].startswith('put: throughput')
+    assert compare(base.to_dict(), base.to_dict()) == []
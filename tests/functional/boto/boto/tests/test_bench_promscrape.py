@@ -0,0 +1,82 @@
+import math
+
+import pytest
+
+from bench import promscrape
+
+# expected values computed by Prometheus' histogram_quantile on the same
+# buckets
+BUCKETS = {0.1: 10.0, 0.5: 20.0, 1.0: 30.0, math.inf: 40.0}
+
+
+@pytest.mark.parametrize('q,expected', [
+    (0.25, 0.1),
+    (0.5, 0.5),
+    (0.375, 0.3),
+    (0.625, 0.75),
+    (0.0, 0.0),
+    # in the +Inf bucket: the upper bound of the last finite bucket
+    (0.99, 1.0),
+])
+def test_quantile(q, expected):
+    assert promscrape.quantile(q, BUCKETS) == pytest.approx(expected)
+
+
+def test_quantile_without_observations():
+    assert promscrape.quantile(0.5, {}) is None
+    assert promscrape.quantile(0.5, {0.1: 0.0, math.inf: 0.0}) is None
+
+
+def test_parse():
+    samples = promscrape.parse('\n'.join([
+        '# HELP s3_requests_total Requests',
+        '# TYPE s3_requests_total counter',
+        's3_requests_total{method="GET",code="200"} 12',
+        's3_requests_total{method="PUT",path="a\\"b"} 3.5',
+        'up 1',
+        '',
+    ]))
+    assert samples == {
+        ('s3_requests_total', (('code', '200'), ('method', 'GET'))): 12.0,
+        ('s3_requests_total', (('method', 'PUT'), ('path', 'a\\"b'))): 3.5,
+        ('up', ()): 1.0,
+    }
+
+
+def _scrape(counts, total, sum_):
+    metric = 's3_cloudserver_http_request_duration_seconds'
+    text = []
+    for le, count in counts:
+        text.append('{0}_bucket{{action="objectGet",code="200",le="{1}"}} '
+                    '{2}'.format(metric, le, count))
+    text.append('{0}_sum{{action="objectGet",code="200"}} {1}'.format(
+        metric, sum_))
+    text.append('{0}_count{{action="objectGet",code="200"}} {1}'.format(
+        metric, total))
+    return promscrape.parse('\n'.join(text))
+
+
+def test_latency_summary():
+    before = _scrape([('0.1', 5), ('0.5', 5), ('+Inf', 5)], 5, 0.2)
+    after = _scrape([('0.1', 15), ('0.5', 25), ('+Inf', 25)], 25, 3.2)
+    summary = promscrape.latency_summary(before, after)
+    assert list(summary) == ['objectGet']
+    get = summary['objectGet']
+    assert get['count'] == 20
+    assert get['mean'] == pytest.approx(0.15)
+    # rank 19.8 of 20: 0.1 + 0.4 * (9.8 / 10)
+    assert get['p99'] == pytest.approx(0.492)
+    assert get['p99_overflow'] is False
+
+
+def test_cache_summary():
+    metric = 's3_cloudserver_cache_lookups_total'
+    before = promscrape.parse(
+        '{0}{{cache="kms",result="hit"}} 10\n'
+        '{0}{{cache="kms",result="miss"}} 10\n'.format(metric))
+    after = promscrape.parse(
+        '{0}{{cache="kms",result="hit"}} 40\n'
+        '{0}{{cache="kms",result="miss"}} 20\n'.format(metric))
+    assert promscrape.cache_summary(before, after) == {
+        'kms': {'lookups': 40.0, 'hits': 30.0, 'hit_ratio': 0.75},
+    }
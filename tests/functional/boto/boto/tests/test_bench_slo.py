@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+from bench.driver import find_saturation
+from bench.slo import (_server_latency, parse_rates, parse_slos,
+                       slos_from_alerts)
+from bench.workload import SizeDistribution, parse_size
+
+
+def test_parse_rates():
+    assert parse_rates('100:100:500') == [100, 200, 300, 400, 500]
+    assert parse_rates('0.5:0.5:1.5') == [0.5, 1.0, 1.5]
+    assert parse_rates('10,20,50') == [10, 20, 50]
+    assert parse_rates('25') == [25]
+    with pytest.raises(ValueError):
+        parse_rates('100:0:500')
+
+
+def test_parse_slos():
+    assert parse_slos(['get=0.1', ' list = 0.3', '*=1']) == {
+        'get': 0.1, 'list': 0.3, '*': 1.0}
+
+
+def test_slos_from_alerts(tmp_path):
+    alerts = tmp_path / 'alerts.yaml'
+    alerts.write_text('\n'.join([
+        'x-inputs:',
+        '  - name: listingLatencyWarningThreshold',
+        '    type: config',
+        '    value: 0.300',
+        '  - name: deleteLatencyWarningThreshold',
+        '    type: config',
+        '    value: 0.500',
+        '  - name: namespace',
+        '    type: constant',
+        'groups: []',
+    ]))
+    assert slos_from_alerts(str(alerts)) == {
+        'list': 0.3, 'delete': 0.5, 'multidelete': 0.5}
+
+
+def test_server_latency_merges_actions():
+    summary = {
+        'initiateMultipartUpload': {'count': 10, 'mean': 0.01, 'p99': 0.02,
+                                    'p99_overflow': False},
+        'objectPutPart': {'count': 30, 'mean': 0.05, 'p99': 0.2,
+                          'p99_overflow': True},
+    }
+    merged = _server_latency(summary, 'mpu')
+    assert merged['count'] == 40
+    assert merged['mean'] == pytest.approx(0.04)
+    assert merged['p99'] == 0.2
+    assert merged['p99_overflow'] is True
+    assert _server_latency(summary, 'get') is None
+
+
+def _step(ops_per_s):
+    return {'operations': {'get': {'ops_per_s': ops_per_s,
+                                   'latency_s': {'p99': 0.01}}}}
+
+
+def test_find_saturation():
+    steps = [(1, _step(100)), (2, _step(190)), (4, _step(195)),
+             (8, _step(300))]
+    assert find_saturation(steps)['get'] == {
+        'processes': 2, 'ops_per_s': 190, 'p99_s': 0.01, 'saturated': True}
+    growing = [(1, _step(100)), (2, _step(200))]
+    assert find_saturation(growing)['get']['saturated'] is False
+
+
+def test_sizes():
+    assert parse_size('64KiB') == 64 * 1024
+    assert parse_size('5MB') == 5 * 1000 ** 2
+    assert parse_size(1024) == 1024
+    with pytest.raises(ValueError):
+        parse_size('5 parsecs')
+    dist = SizeDistribution('choice:1KiB=1,2KiB=0')
+    assert dist.max == 2048
+    assert dist.sample(random.Random(1)) == 1024
@@ -622,3 +622,66 @@ describe('bucket policy authorization', () => {
         });
     });
 });
+
+describe('bucket policy evaluation of successive requests', () => {
+    const prefixPolicy = {
+        Version: '2012-10-17',
+        Statement: [{
+            Effect: 'Allow',
+            Principal: { CanonicalUser: [altAcctCanonicalId] },
+            Action: 's3:GetObject',
+            Resource: `arn:aws:s3:::${bucket.getName()}/public/*`,
+        }],
+    };
+
+    function getObject(objectKey, remoteAddress) {
+        const request = new DummyRequest({
+            headers: {},
+            socket: { remoteAddress: remoteAddress || '1.1.1.1' },
+            bucketName: bucket.getName(),
+            objectKey,
+        });
+        return isObjAuthorized(bucket, object, 'objectGet',
+            altAcctCanonicalId, altAcctAuthInfo, log, request);
+    }
+
+    it('should match the resource of each request', () => {
+        bucket.setBucketPolicy(prefixPolicy);
+        assert.strictEqual(getObject('public/a'), true);
+        assert.strictEqual(getObject('private/a'), false);
+        assert.strictEqual(getObject('public/b'), true);
+        assert.strictEqual(getObject('publi'), false);
+        assert.strictEqual(getObject('public/a/very/long/key'), true);
+    });
+
+    it('should evaluate the conditions of each request', () => {
+        bucket.setBucketPolicy({
+            Version: '2012-10-17',
+            Statement: [Object.assign({}, prefixPolicy.Statement[0], {
+                Condition: {
+                    IpAddress: { 'aws:SourceIp': '123.123.123.123' },
+                },
+            })],
+        });
+        assert.strictEqual(getObject('public/a', '123.123.123.123'), true);
+        assert.strictEqual(getObject('public/a', '124.124.124.124'), false);
+    });
+
+    it('should apply a changed policy', () => {
+        bucket.setBucketPolicy(JSON.parse(JSON.stringify(prefixPolicy)));
+        assert.strictEqual(getObject('public/a'), true);
+        // a new policy object, as read from bucketPutPolicy or metadata
+        const policy = JSON.parse(JSON.stringify(prefixPolicy));
+        policy.Statement[0].Effect = 'Deny';
+        bucket.setBucketPolicy(policy);
+        assert.strictEqual(getObject('public/a'), false);
+    });
+
+    it('should evaluate a copy of a policy like the policy', () => {
+        bucket.setBucketPolicy(JSON.parse(JSON.stringify(prefixPolicy)));
+        assert.strictEqual(getObject('public/a'), true);
+        bucket.setBucketPolicy(JSON.parse(JSON.stringify(prefixPolicy)));
+        assert.strictEqual(getObject('public/a'), true);
+        assert.strictEqual(getObject('private/a'), false);
+    });
+});
@@ -0,0 +1,23 @@
+const assert = require('assert');
+
+const { deleteQueue, batchDeleteQueue } = require('../../../lib/data/wrapper');
+
+describe('data delete queues', () => {
+    it('should use one queue per data backend', () => {
+        const queueA = deleteQueue([{ key: 'k1', dataStoreName: 'a' }]);
+        assert.strictEqual(deleteQueue([{ key: 'k2', dataStoreName: 'a' }]),
+            queueA);
+        assert.notStrictEqual(deleteQueue([{ key: 'k3', dataStoreName: 'b' }]),
+            queueA);
+        assert.notStrictEqual(batchDeleteQueue([{ key: 'k4', dataStoreName: 'a' }]),
+            queueA);
+    });
+
+    it('should keep running deletes after errors', () => {
+        const queue = deleteQueue([{ key: 'k1', dataStoreName: 'errors' }]);
+        for (let i = 0; i < 20; ++i) {
+            queue.push(done => done(new Error('unavailable')), () => {});
+        }
+        assert(queue.limit >= 4, `limit ${queue.limit}`);
+    });
+});
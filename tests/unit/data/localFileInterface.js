@@ -0,0 +1,62 @@
+const assert = require('assert');
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+
+const LocalDataFileInterface =
+    require('../../../lib/data/localFileInterface');
+
+function readAll(readable, cb) {
+    const chunks = [];
+    readable.on('data', chunk => chunks.push(chunk));
+    readable.on('end', () => cb(Buffer.concat(chunks)));
+}
+
+describe('LocalDataFileInterface', () => {
+    const content = Buffer.from('0123456789abcdefghij');
+    let dataPath;
+    let client;
+
+    before(() => {
+        dataPath = fs.mkdtempSync(path.join(os.tmpdir(), 'local-data-'));
+        client = new LocalDataFileInterface({
+            dataClient: { host: 'localhost', port: 9991 },
+            dataDaemon: { dataPath, noSync: true, noCache: false },
+            log: { logLevel: 'info', dumpLevel: 'error' },
+        }, 4);
+        const filePath = client.localStore.getFilePath('key1');
+        fs.mkdirSync(path.dirname(filePath), { recursive: true });
+        fs.writeFileSync(filePath, content);
+    });
+
+    after(() => {
+        fs.rmSync(dataPath, { recursive: true, force: true });
+    });
+
+    it('should read the whole data file', done => {
+        client.get({ key: 'key1' }, null, 'req1', (err, readable) => {
+            assert.ifError(err);
+            readAll(readable, data => {
+                assert.deepStrictEqual(data, content);
+                done();
+            });
+        });
+    });
+
+    it('should read a range of the data file', done => {
+        client.get({ key: 'key1' }, [3, 12], 'req1', (err, readable) => {
+            assert.ifError(err);
+            readAll(readable, data => {
+                assert.strictEqual(data.toString(), '3456789abc');
+                done();
+            });
+        });
+    });
+
+    it('should return ObjNSK for a missing data file', done => {
+        client.get({ key: 'missing' }, null, 'req1', err => {
+            assert(err && err.is.ObjNSK);
+            done();
+        });
+    });
+});
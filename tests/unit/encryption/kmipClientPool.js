@@ -0,0 +1,56 @@
+const assert = require('assert');
+
+const KMIPClientPool = require('../../../lib/kms/kmipClientPool');
+
+class FakeClient {
+    constructor(id) {
+        this.id = id;
+        this.pending = [];
+        this.supportsDefaultKeyPerAccount = false;
+    }
+
+    cipherDataKey(cryptoScheme, masterKeyId, plainTextDataKey, log, cb) {
+        this.pending.push(() => cb(null, `${this.id}:${masterKeyId}`));
+    }
+
+    decipherDataKey(cryptoScheme, masterKeyId, cipheredDataKey, log, cb) {
+        this.pending.push(() => cb(null, this.id));
+    }
+}
+
+function createPool(size) {
+    const clients = [];
+    const pool = new KMIPClientPool(size, () => {
+        const client = new FakeClient(clients.length);
+        clients.push(client);
+        return client;
+    });
+    return { pool, clients };
+}
+
+describe('KMIPClientPool', () => {
+    it('should only forward the methods of the clients', () => {
+        const { pool } = createPool(2);
+        assert.strictEqual(typeof pool.cipherDataKey, 'function');
+        assert.strictEqual(pool.generateDataKey, undefined);
+        assert.strictEqual(pool.supportsDefaultKeyPerAccount, false);
+        assert.strictEqual(pool.size, 2);
+    });
+
+    it('should send operations to the least busy client', () => {
+        const { pool, clients } = createPool(3);
+        const results = [];
+        for (let i = 0; i < 4; ++i) {
+            pool.decipherDataKey(1, 'key', 'ciphered', null,
+                (err, id) => results.push(id));
+        }
+        assert.deepStrictEqual(pool.inFlight(), [2, 1, 1]);
+        clients[1].pending.shift()();
+        assert.deepStrictEqual(pool.inFlight(), [2, 0, 1]);
+        pool.cipherDataKey(1, 'key', Buffer.alloc(32), null,
+            (err, res) => results.push(res));
+        assert.deepStrictEqual(pool.inFlight(), [2, 1, 1]);
+        clients[1].pending.shift()();
+        assert.deepStrictEqual(results, [1, '1:key']);
+    });
+});
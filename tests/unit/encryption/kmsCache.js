@@ -0,0 +1,62 @@
+const assert = require('assert');
+
+const KMSCache = require('../../../lib/kms/cache');
+
+const params = {
+    maxDataKeys: 2,
+    dataKeyTTL: 1,
+    maxMasterKeys: 2,
+    masterKeyTTL: 1,
+};
+
+describe('KMSCache', () => {
+    it('should return a copy of the cached data keys', () => {
+        const cache = new KMSCache(params);
+        const plainTextDataKey = Buffer.alloc(32, 1);
+        const cipheredDataKey = Buffer.alloc(32, 2);
+        cache.setDataKey(1, 'arn:aws:kms:us-east-1:1:key/k1', cipheredDataKey,
+            plainTextDataKey);
+        // callers zero their data keys once used
+        plainTextDataKey.fill(0);
+        const cached = cache.getDataKey(1, 'arn:aws:kms:us-east-1:1:key/k1',
+            cipheredDataKey.toString('base64'));
+        assert.deepStrictEqual(cached, Buffer.alloc(32, 1));
+        cached.fill(0);
+        assert.deepStrictEqual(
+            cache.getDataKey(1, 'arn:aws:kms:us-east-1:1:key/k1', cipheredDataKey),
+            Buffer.alloc(32, 1));
+        assert.strictEqual(cache.getDataKey(1, 'k2', cipheredDataKey), null);
+    });
+
+    it('should zero the evicted data keys', () => {
+        const cache = new KMSCache(params);
+        cache.setDataKey(1, 'k1', 'c1', Buffer.alloc(32, 1));
+        const [stored] = Array.from(cache._dataKeys._entries.values(),
+            entry => entry.value);
+        cache.setDataKey(1, 'k1', 'c2', Buffer.alloc(32, 1));
+        cache.setDataKey(1, 'k1', 'c3', Buffer.alloc(32, 1));
+        assert.deepStrictEqual(stored, Buffer.alloc(32, 0));
+        assert.strictEqual(cache.getDataKey(1, 'k1', 'c1'), null);
+    });
+
+    it('should forget the keys of a destroyed master key', () => {
+        const cache = new KMSCache(params);
+        cache.setDataKey(1, 'k1', 'c1', Buffer.alloc(32, 1));
+        cache.setDataKey(1, 'k10', 'c1', Buffer.alloc(32, 1));
+        cache.setAccountMasterKeyId('owner', 'k1');
+        cache.forgetMasterKey('k1');
+        assert.strictEqual(cache.getDataKey(1, 'k1', 'c1'), null);
+        assert.notStrictEqual(cache.getDataKey(1, 'k10', 'c1'), null);
+        assert.strictEqual(cache.getAccountMasterKeyId('owner'), undefined);
+    });
+
+    it('should expire the account master key ids', () => {
+        const now = () => now.time;
+        now.time = 0;
+        const cache = new KMSCache(params, null, now);
+        cache.setAccountMasterKeyId('owner', 'k1');
+        assert.strictEqual(cache.getAccountMasterKeyId('owner'), 'k1');
+        now.time = 1000;
+        assert.strictEqual(cache.getAccountMasterKeyId('owner'), undefined);
+    });
+});
@@ -0,0 +1,116 @@
+const assert = require('assert');
+
+const { BucketInfoCache } = require('../../../lib/metadata/bucketCache');
+const { config } = require('../../../lib/Config');
+const { bucketPut } = require('../../../lib/api/bucketPut');
+const { createDefaultBucketEncryptionMetadata } =
+    require('../../../lib/api/apiUtils/bucket/bucketEncryption');
+const { standardMetadataValidateBucket } =
+    require('../../../lib/metadata/metadataUtils');
+const metadata = require('../../../lib/metadata/wrapper');
+const { cleanup, DummyRequestLogger, makeAuthInfo } = require('../helpers');
+
+const log = new DummyRequestLogger();
+const authInfo = makeAuthInfo('accessKey1');
+const bucketName = 'bucketname';
+
+describe('BucketInfoCache', () => {
+    let now;
+    let observed;
+    let cache;
+
+    beforeEach(() => {
+        now = 1000000;
+        observed = { hitAges: [], invalidations: [] };
+        cache = new BucketInfoCache({ maxBuckets: 2, ttl: 2 }, {
+            hitAge: age => observed.hitAges.push(age),
+            invalidation: origin => observed.invalidations.push(origin),
+        }, () => now);
+    });
+
+    it('should return the cached buckets until they expire', () => {
+        assert(cache.set('bucket1', '{"name":"bucket1"}', cache.generation()));
+        now += 1500;
+        assert.strictEqual(cache.get('bucket1'), '{"name":"bucket1"}');
+        assert.deepStrictEqual(observed.hitAges, [1.5]);
+        now += 500;
+        assert.strictEqual(cache.get('bucket1'), undefined);
+    });
+
+    it('should keep at most maxBuckets buckets', () => {
+        ['bucket1', 'bucket2', 'bucket3'].forEach(name =>
+            cache.set(name, name, cache.generation()));
+        assert.strictEqual(cache.get('bucket1'), undefined);
+        assert.strictEqual(cache.get('bucket3'), 'bucket3');
+    });
+
+    it('should forget an invalidated bucket', () => {
+        cache.set('bucket1', 'v1', cache.generation());
+        cache.set('bucket2', 'v1', cache.generation());
+        cache.invalidate('bucket1', 'remote');
+        assert.strictEqual(cache.get('bucket1'), undefined);
+        assert.strictEqual(cache.get('bucket2'), 'v1');
+        assert.deepStrictEqual(observed.invalidations, ['remote']);
+    });
+
+    it('should not cache a bucket read before an invalidation', () => {
+        const generation = cache.generation();
+        // the bucket is changed while being read
+        cache.invalidate('bucket1');
+        assert.strictEqual(cache.set('bucket1', 'v1', generation), false);
+        assert.strictEqual(cache.get('bucket1'), undefined);
+        assert(cache.set('bucket1', 'v2', cache.generation()));
+        assert.strictEqual(cache.get('bucket1'), 'v2');
+    });
+});
+
+describe('bucket cache invalidation', () => {
+    const validationParams = {
+        authInfo,
+        bucketName,
+        requestType: 'objectPut',
+        request: null,
+    };
+    let enabled;
+
+    beforeEach(done => {
+        enabled = config.bucketCache.enabled;
+        config.bucketCache.enabled = true;
+        bucketPut(authInfo, {
+            bucketName,
+            headers: { host: `${bucketName}.s3.amazonaws.com` },
+            url: '/',
+            actionImplicitDenies: false,
+        }, log, done);
+    });
+
+    afterEach(done => {
+        // deleting the bucket forgets it in the cache, cleanup does not
+        metadata.deleteBucket(bucketName, log, () => {
+            config.bucketCache.enabled = enabled;
+            cleanup();
+            done();
+        });
+    });
+
+    it('should see the bucket changes of object writes', done => {
+        standardMetadataValidateBucket(validationParams, false, log,
+            (err, cached) => {
+                assert.ifError(err);
+                assert.strictEqual(cached.getServerSideEncryption(), null);
+                // objectPut, objectCopy, objectPutPart and
+                // initiateMultipartUpload set the default bucket encryption
+                createDefaultBucketEncryptionMetadata(cached, log, err => {
+                    assert.ifError(err);
+                    standardMetadataValidateBucket(validationParams, false,
+                        log, (err, bucket) => {
+                            assert.ifError(err);
+                            assert.strictEqual(bucket
+                                .getServerSideEncryption().algorithm,
+                                'AES256');
+                            done();
+                        });
+                });
+            });
+    });
+});
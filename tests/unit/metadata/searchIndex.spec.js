@@ -0,0 +1,342 @@
+const assert = require('assert');
+const async = require('async');
+const sinon = require('sinon');
+const { errors, models } = require('arsenal');
+
+const { BucketInfo } = models;
+const { cleanup, DummyRequestLogger } = require('../helpers');
+const { config } = require('../../../lib/Config');
+const metadata = require('../../../lib/metadata/wrapper');
+const parseWhere = require('../../../lib/api/apiUtils/bucket/parseWhere');
+const validateSearchParams =
+    require('../../../lib/api/apiUtils/bucket/validateSearch');
+const searchIndex = require('../../../lib/metadata/searchIndex');
+
+const log = new DummyRequestLogger();
+const bucketName = 'indexedbucket';
+const fields = ['x-amz-meta-color', 'tags.project'];
+
+function filterOf(search) {
+    return parseWhere(validateSearchParams(search).ast);
+}
+
+function putObject(key, color, project, cb) {
+    const objMD = {
+        'key': key,
+        'content-length': 1,
+        'content-md5': 'etag',
+        'last-modified': new Date().toJSON(),
+        'owner-id': 'owner',
+        'owner-display-name': 'ownerName',
+        'x-amz-storage-class': 'STANDARD',
+        'x-amz-meta-color': color,
+        'tags': project ? { project } : {},
+    };
+    // the write updates the index entries of the object
+    return metadata.putObjectMD(bucketName, key, objMD, {}, log,
+        err => cb(err));
+}
+
+function searchParams(where, params) {
+    return Object.assign({
+        listingType: 'DelimiterMaster',
+        maxKeys: 1000,
+        mongifiedSearch: filterOf(where),
+    }, params);
+}
+
+function search(bucket, where, params, cb) {
+    const listParams = searchParams(where, params);
+    return searchIndex.getSearchPlan(bucket, listParams, log, (err, plan) => {
+        if (err) {
+            return cb(err);
+        }
+        assert(plan, `no plan for ${where}`);
+        return searchIndex.searchObjects(bucketName, listParams, plan, log,
+            cb);
+    });
+}
+
+function indexEntries(cb) {
+    return metadata.listObject(searchIndex.indexBucketName(bucketName), {
+        listingType: 'Delimiter',
+        prefix: 'f/',
+    }, log, (err, list) => cb(err, list && list.Contents.map(
+        entry => entry.key)));
+}
+
+describe('searchIndex', () => {
+    describe('fieldValue', () => {
+        it('should read user metadata, tags and replication info', () => {
+            const objMD = {
+                'x-amz-meta-a.b': 'meta',
+                'tags': { project: 'p' },
+                'replicationInfo': { status: 'COMPLETED' },
+            };
+            assert.strictEqual(
+                searchIndex.fieldValue(objMD, 'x-amz-meta-a.b'), 'meta');
+            assert.strictEqual(
+                searchIndex.fieldValue(objMD, 'tags.project'), 'p');
+            assert.strictEqual(searchIndex.fieldValue(objMD,
+                'replicationInfo.status'), 'COMPLETED');
+            assert.strictEqual(
+                searchIndex.fieldValue({}, 'tags.project'), undefined);
+        });
+    });
+
+    describe('objectEntries', () => {
+        it('should return one entry per indexed field set', () => {
+            assert.deepStrictEqual(searchIndex.objectEntries(fields, 'a/b', {
+                'x-amz-meta-color': 'blue/green',
+                'tags': {},
+            }), ['f/x-amz-meta-color/blue%2Fgreen/a/b']);
+        });
+
+        it('should not index delete markers', () => {
+            assert.deepStrictEqual(searchIndex.objectEntries(fields, 'a', {
+                'x-amz-meta-color': 'blue',
+                'isDeleteMarker': true,
+            }), []);
+        });
+    });
+
+    describe('planSearch', () => {
+        [
+            ['`x-amz-meta-color`="blue"',
+                [{ field: 'x-amz-meta-color', value: 'blue' }]],
+            ['`x-amz-meta-color`="blue" AND `content-length`>1',
+                [{ field: 'x-amz-meta-color', value: 'blue' }]],
+            ['`x-amz-meta-color`="blue" OR `tags.project`="p"', [
+                { field: 'x-amz-meta-color', value: 'blue' },
+                { field: 'tags.project', value: 'p' },
+            ]],
+            ['`x-amz-meta-color`="blue" OR `content-length`>1', null],
+            ['`x-amz-meta-color` LIKE "bl.*"', null],
+            ['`x-amz-meta-size`="big"', null],
+        ].forEach(([where, plan]) => {
+            it(`should plan ${where}`, () => {
+                assert.deepStrictEqual(
+                    searchIndex.planSearch(fields, filterOf(where)), plan);
+            });
+        });
+    });
+
+    describe('matchesFilter', () => {
+        const objMD = {
+            'content-length': 10,
+            'x-amz-meta-color': 'blue',
+            'tags': { project: 'p' },
+        };
+        [
+            ['`x-amz-meta-color`="blue"', true],
+            ['`x-amz-meta-color`="red"', false],
+            ['`x-amz-meta-color`="blue" AND `content-length`>5', true],
+            ['`x-amz-meta-color`="blue" AND `content-length`>50', false],
+            ['`x-amz-meta-color`="red" OR `tags.project`="p"', true],
+            ['`x-amz-meta-color` LIKE "bl.*"', true],
+            ['`x-amz-meta-color` LIKE "BL.*"', false],
+        ].forEach(([where, expected]) => {
+            it(`should evaluate ${where}`, () => {
+                assert.strictEqual(
+                    searchIndex.matchesFilter(filterOf(where), objMD),
+                    expected);
+            });
+        });
+    });
+
+    describe('index maintenance and search', () => {
+        let savedIndexes;
+        let bucket;
+
+        before(() => {
+            savedIndexes = config.metadataSearchIndexes;
+            config.metadataSearchIndexes = { [bucketName]: fields };
+        });
+
+        after(() => {
+            config.metadataSearchIndexes = savedIndexes;
+        });
+
+        beforeEach(done => {
+            cleanup();
+            bucket = new BucketInfo(bucketName, 'owner', 'ownerName',
+                new Date().toJSON(), BucketInfo.currentModelVersion());
+            async.series([
+                next => metadata.createBucket(bucketName, bucket, log, next),
+                next => searchIndex.buildIndex(bucket, log, next),
+            ], done);
+        });
+
+        afterEach(done => {
+            sinon.restore();
+            searchIndex.deleteIndexBucket(bucketName, log, done);
+        });
+
+        it('should find the objects with an indexed value', done => {
+            async.series([
+                next => putObject('a', 'blue', 'p', next),
+                next => putObject('b', 'red', null, next),
+                next => putObject('c', 'blue', null, next),
+                next => search(bucket, '`x-amz-meta-color`="blue"', {}, next),
+            ], (err, results) => {
+                assert.ifError(err);
+                const list = results[3];
+                assert.deepStrictEqual(
+                    list.Contents.map(entry => entry.key), ['a', 'c']);
+                assert.strictEqual(list.IsTruncated, false);
+                assert.strictEqual(list.Contents[0].value.Size, 1);
+                assert.strictEqual(list.Contents[0].value.Owner.ID, 'owner');
+                done();
+            });
+        });
+
+        it('should follow updates and deletions', done => {
+            async.series([
+                next => putObject('a', 'blue', null, next),
+                next => putObject('b', 'blue', null, next),
+                next => putObject('a', 'red', null, next),
+                next => metadata.deleteObjectMD(bucketName, 'b', {}, log,
+                    next),
+                next => search(bucket, '`x-amz-meta-color`="blue"', {}, next),
+                next => search(bucket, '`x-amz-meta-color`="red"', {}, next),
+            ], (err, results) => {
+                assert.ifError(err);
+                assert.deepStrictEqual(results[4].Contents, []);
+                assert.deepStrictEqual(
+                    results[5].Contents.map(entry => entry.key), ['a']);
+                done();
+            });
+        });
+
+        it('should not return stale entries', done => {
+            async.series([
+                next => putObject('a', 'blue', null, next),
+                next => {
+                    // updated while the field was not indexed
+                    config.metadataSearchIndexes = {};
+                    putObject('a', 'red', null, err => {
+                        config.metadataSearchIndexes = { [bucketName]: fields };
+                        next(err);
+                    });
+                },
+                next => search(bucket, '`x-amz-meta-color`="blue"', {}, next),
+            ], (err, results) => {
+                assert.ifError(err);
+                assert.deepStrictEqual(results[2].Contents, []);
+                done();
+            });
+        });
+
+        it('should build the index before using it', done => {
+            const listParams = searchParams('`x-amz-meta-color`="blue"');
+            let plan = null;
+            async.series([
+                next => {
+                    // written before the fields were indexed
+                    config.metadataSearchIndexes = {};
+                    async.series([
+                        cb => putObject('a', 'blue', null, cb),
+                        cb => putObject('b', 'red', null, cb),
+                    ], err => {
+                        config.metadataSearchIndexes = { [bucketName]: fields };
+                        next(err);
+                    });
+                },
+                next => searchIndex.deleteIndexBucket(bucketName, log, next),
+                next => searchIndex.getSearchPlan(bucket, listParams, log,
+                    (err, firstPlan) => {
+                        // the index is being built in the background
+                        assert.strictEqual(firstPlan, null);
+                        next(err);
+                    }),
+                next => async.until(() => plan !== null, cb => setTimeout(
+                    () => searchIndex.getSearchPlan(bucket, listParams, log,
+                        (err, builtPlan) => {
+                            plan = builtPlan;
+                            cb(err);
+                        }), 10), next),
+                next => search(bucket, '`x-amz-meta-color`="blue"', {}, next),
+            ], (err, results) => {
+                assert.ifError(err);
+                assert.deepStrictEqual(
+                    results[4].Contents.map(entry => entry.key), ['a']);
+                done();
+            });
+        });
+
+        it('should return the errors of the index update', done => {
+            const getObjectMD = metadata.getObjectMD;
+            sinon.stub(metadata, 'getObjectMD').callsFake(
+                (name, key, params, reqLog, cb) => {
+                    if (name === searchIndex.indexBucketName(bucketName)) {
+                        return process.nextTick(cb, errors.InternalError);
+                    }
+                    return getObjectMD.call(metadata, name, key, params,
+                        reqLog, cb);
+                });
+            putObject('a', 'blue', null, err => {
+                assert(err && err.is.InternalError);
+                done();
+            });
+        });
+
+        it('should leave the entries of the last write of an object',
+            done => {
+                const colors = ['blue', 'red', 'green', 'white', 'black'];
+                async.series([
+                    next => async.each(colors, (color, cb) =>
+                        putObject('a', color, null, cb), next),
+                    next => metadata.getObjectMD(bucketName, 'a', {}, log,
+                        next),
+                    next => indexEntries(next),
+                ], (err, results) => {
+                    assert.ifError(err);
+                    const color = results[1]['x-amz-meta-color'];
+                    assert.deepStrictEqual(results[2],
+                        [`f/x-amz-meta-color/${color}/a`]);
+                    done();
+                });
+            });
+
+        it('should merge the lookups of OR and page the results', done => {
+            const keys = [];
+            for (let i = 0; i < 2500; ++i) {
+                keys.push(`key${String(i).padStart(5, '0')}`);
+            }
+            async.series([
+                next => async.eachLimit(keys, 10, (key, cb) => {
+                    const i = Number.parseInt(key.slice(3), 10);
+                    putObject(key, i % 2 ? 'blue' : 'red',
+                        i % 3 ? null : 'p', cb);
+                }, next),
+                next => search(bucket, '`x-amz-meta-color`="blue" OR ' +
+                    '`tags.project`="p"', { maxKeys: 1000 }, next),
+                next => search(bucket, '`x-amz-meta-color`="blue" OR ' +
+                    '`tags.project`="p"', { marker: 'key02000' }, next),
+            ], (err, results) => {
+                assert.ifError(err);
+                const expected = keys.filter((key, i) => i % 2 || !(i % 3));
+                const [, first, last] = results;
+                assert.strictEqual(first.IsTruncated, true);
+                assert.deepStrictEqual(first.Contents.map(entry => entry.key),
+                    expected.slice(0, 1000));
+                assert.strictEqual(first.NextMarker, expected[999]);
+                assert.strictEqual(last.IsTruncated, false);
+                assert.deepStrictEqual(last.Contents.map(entry => entry.key),
+                    expected.filter(key => key > 'key02000'));
+                done();
+            });
+        });
+
+        it('should not delete an index the bucket does not have', done => {
+            config.metadataSearchIndexes = {};
+            const deleteBucket = sinon.spy(metadata, 'deleteBucket');
+            searchIndex.deleteIndexBucket(bucketName, log, err => {
+                config.metadataSearchIndexes = { [bucketName]: fields };
+                assert.ifError(err);
+                sinon.assert.notCalled(deleteBucket);
+                done();
+            });
+        });
+    });
+});
@@ -0,0 +1,53 @@
+const assert = require('assert');
+const async = require('async');
+const sinon = require('sinon');
+const { models } = require('arsenal');
+
+const { BucketInfo } = models;
+const { cleanup, DummyRequestLogger } = require('../helpers');
+const metadata = require('../../../lib/metadata/wrapper');
+
+const log = new DummyRequestLogger();
+const bucketName = 'batchdeletebucket';
+
+describe('metadata.deleteObjectsMD', () => {
+    const keys = Array.from({ length: 30 }, (v, i) => `part${i}`);
+    let sandbox;
+
+    beforeEach(done => {
+        cleanup();
+        sandbox = sinon.createSandbox();
+        const bucket = new BucketInfo(bucketName, 'owner', 'ownerName',
+            new Date().toJSON(), BucketInfo.currentModelVersion());
+        async.series([
+            next => metadata.createBucket(bucketName, bucket, log, next),
+            next => async.eachSeries(keys, (key, putDone) =>
+                metadata.putObjectMD(bucketName, key, { key }, {}, log,
+                    err => putDone(err)), next),
+        ], done);
+    });
+
+    afterEach(() => {
+        sandbox.restore();
+    });
+
+    it('should delete every object', done => {
+        metadata.deleteObjectsMD(bucketName, keys, {}, log, err => {
+            assert.ifError(err);
+            async.each(keys, (key, next) =>
+                metadata.getObjectMD(bucketName, key, {}, log, err => {
+                    assert(err && err.is.NoSuchKey);
+                    next();
+                }), done);
+        });
+    });
+
+    it('should return the error of a failed delete', done => {
+        const error = new Error('unavailable');
+        sandbox.stub(metadata, 'deleteObjectMD').yields(error);
+        metadata.deleteObjectsMD(bucketName, keys, {}, log, err => {
+            assert.strictEqual(err, error);
+            done();
+        });
+    });
+});
@@ -0,0 +1,102 @@
+const assert = require('assert');
+const sinon = require('sinon');
+const UtilizationMetricsCache =
+    require('../../../../lib/quotas/scuba/metricsCache');
+
+describe('UtilizationMetricsCache', () => {
+    let clock;
+    let fetches;
+    let cache;
+
+    // fetch answering when told to, with the inflight bytes received so far
+    function fetch(metricsClass, resourceName, options, body, cb) {
+        fetches.push({ metricsClass, resourceName, body, cb });
+    }
+
+    function answer(index, bytesTotal, err) {
+        fetches[index].cb(err || null, err ? undefined : {
+            bytesTotal,
+            date: new Date(clock.now).toJSON(),
+        });
+    }
+
+    function get(resourceName, inflight) {
+        return new Promise((resolve, reject) =>
+            cache.getUtilizationMetrics('bucket', resourceName, null,
+                { action: 'objectPut', inflight },
+                (err, data) => (err ? reject(err) : resolve(data))));
+    }
+
+    beforeEach(() => {
+        clock = sinon.useFakeTimers({ now: 1000000, toFake: [
+            'Date', 'setTimeout', 'clearTimeout', 'setInterval',
+            'clearInterval'] });
+        fetches = [];
+        cache = new UtilizationMetricsCache({ fetch, freshness: 1000 });
+    });
+
+    afterEach(() => {
+        clock.restore();
+    });
+
+    it('should coalesce the concurrent fetches of a resource', async () => {
+        const results = [get('b1', 10), get('b1', 20), get('b2', 5)];
+        assert.strictEqual(fetches.length, 2);
+        assert.deepStrictEqual(fetches[0].body,
+            { action: 'objectPut', inflight: 10 });
+        answer(0, 110);
+        answer(1, 5);
+        const [first, second, other] = await Promise.all(results);
+        // the second inflight is not known by the quota service yet
+        assert.strictEqual(first.bytesTotal, 130);
+        assert.strictEqual(second.bytesTotal, 130);
+        assert.strictEqual(other.bytesTotal, 5);
+    });
+
+    it('should answer from the cache while the metrics are fresh', async () => {
+        const pending = get('b1', 10);
+        answer(0, 110);
+        await pending;
+        clock.tick(500);
+        assert.strictEqual((await get('b1', 30)).bytesTotal, 140);
+        assert.strictEqual((await get('b1', -30)).bytesTotal, 110);
+        assert.strictEqual((await get('b1', 5)).bytesTotal, 115);
+        assert.strictEqual(fetches.length, 1);
+    });
+
+    it('should send the local inflights at the end of the window', async () => {
+        const pending = get('b1', 10);
+        answer(0, 110);
+        await pending;
+        await get('b1', 30);
+        await get('b1', 5);
+        clock.tick(1000);
+        assert.strictEqual(fetches.length, 2);
+        assert.strictEqual(fetches[1].body.inflight, 35);
+        answer(1, 145);
+        assert.strictEqual((await get('b1', 0)).bytesTotal, 145);
+        assert.strictEqual(fetches.length, 2);
+    });
+
+    it('should fetch again once the metrics are stale', async () => {
+        let pending = get('b1', undefined);
+        answer(0, 100);
+        await pending;
+        clock.tick(1000);
+        pending = get('b1', undefined);
+        assert.strictEqual(fetches.length, 2);
+        assert.strictEqual(fetches[1].body.inflight, undefined);
+        answer(1, 200);
+        assert.strictEqual((await pending).bytesTotal, 200);
+    });
+
+    it('should keep the inflights of a failed fetch', async () => {
+        const pending = get('b1', 10);
+        answer(0, null, new Error('unavailable'));
+        await assert.rejects(pending);
+        const retry = get('b1', 5);
+        assert.strictEqual(fetches[1].body.inflight, 15);
+        answer(1, 115);
+        assert.strictEqual((await retry).bytesTotal, 115);
+    });
+});
@@ -0,0 +1,33 @@
+const assert = require('assert');
+const { parseBucketCacheConfig } = require('../../../lib/Config');
+
+describe('parseBucketCacheConfig', () => {
+    it('should be disabled by default', () => {
+        assert.strictEqual(parseBucketCacheConfig(undefined).enabled, false);
+        assert.strictEqual(parseBucketCacheConfig({}).enabled, false);
+    });
+
+    it('should accept the size and the time to live', () => {
+        assert.deepStrictEqual(parseBucketCacheConfig({
+            enabled: true,
+            maxBuckets: 500,
+            ttl: 0.5,
+        }), {
+            enabled: true,
+            maxBuckets: 500,
+            ttl: 0.5,
+        });
+    });
+
+    [
+        ['a non-object config', 'yes'],
+        ['a non-boolean enabled', { enabled: 1 }],
+        ['a zero size', { maxBuckets: 0 }],
+        ['a non-integer size', { maxBuckets: 1.5 }],
+        ['a zero time to live', { ttl: 0 }],
+    ].forEach(([desc, bucketCache]) => {
+        it(`should reject ${desc}`, () => {
+            assert.throws(() => parseBucketCacheConfig(bucketCache));
+        });
+    });
+});
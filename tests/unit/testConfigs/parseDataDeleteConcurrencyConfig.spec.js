@@ -0,0 +1,36 @@
+const assert = require('assert');
+const { parseDataDeleteConcurrencyConfig } = require('../../../lib/Config');
+
+describe('parseDataDeleteConcurrencyConfig', () => {
+    it('should return the defaults when not set', () => {
+        assert.deepStrictEqual(parseDataDeleteConcurrencyConfig(undefined), {
+            min: 4,
+            max: 64,
+            initial: 16,
+        });
+    });
+
+    it('should accept the bounds and the initial concurrency', () => {
+        assert.deepStrictEqual(parseDataDeleteConcurrencyConfig({
+            min: 4,
+            max: 8,
+            initial: 4,
+        }), {
+            min: 4,
+            max: 8,
+            initial: 4,
+        });
+    });
+
+    [
+        ['a non-object config', 16],
+        ['a zero minimum', { min: 0 }],
+        ['a non-integer maximum', { max: 10.5 }],
+        ['an initial concurrency above the maximum', { max: 8, initial: 16 }],
+        ['a minimum above the initial concurrency', { min: 32 }],
+    ].forEach(([desc, concurrency]) => {
+        it(`should reject ${desc}`, () => {
+            assert.throws(() => parseDataDeleteConcurrencyConfig(concurrency));
+        });
+    });
+});
@@ -0,0 +1,38 @@
+const assert = require('assert');
+const { parseKmsCacheConfig } = require('../../../lib/Config');
+
+describe('parseKmsCacheConfig', () => {
+    it('should be disabled by default', () => {
+        assert.strictEqual(parseKmsCacheConfig(undefined).enabled, false);
+        assert.strictEqual(parseKmsCacheConfig({}).enabled, false);
+    });
+
+    it('should accept the cache sizes and TTLs', () => {
+        assert.deepStrictEqual(parseKmsCacheConfig({
+            enabled: true,
+            maxDataKeys: 100,
+            dataKeyTTL: 60,
+            maxMasterKeys: 0,
+            masterKeyTTL: 0.5,
+        }), {
+            enabled: true,
+            maxDataKeys: 100,
+            dataKeyTTL: 60,
+            maxMasterKeys: 0,
+            masterKeyTTL: 0.5,
+        });
+    });
+
+    [
+        ['a non-object config', 'yes'],
+        ['a non-boolean enabled', { enabled: 'true' }],
+        ['a negative size', { maxDataKeys: -1 }],
+        ['a non-integer size', { maxMasterKeys: 1.5 }],
+        ['a zero TTL', { dataKeyTTL: 0 }],
+        ['a non-numeric TTL', { masterKeyTTL: '60' }],
+    ].forEach(([desc, kmsCache]) => {
+        it(`should reject ${desc}`, () => {
+            assert.throws(() => parseKmsCacheConfig(kmsCache));
+        });
+    });
+});
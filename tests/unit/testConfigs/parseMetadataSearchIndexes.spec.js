@@ -0,0 +1,29 @@
+const assert = require('assert');
+const { parseMetadataSearchIndexes } = require('../../../lib/Config');
+
+describe('parseMetadataSearchIndexes', () => {
+    it('should index nothing by default', () => {
+        assert.deepStrictEqual(parseMetadataSearchIndexes(undefined), {});
+    });
+
+    it('should accept user metadata and tag fields', () => {
+        assert.deepStrictEqual(parseMetadataSearchIndexes({
+            bucket1: ['x-amz-meta-color', 'tags.project', 'x-amz-meta-color'],
+            bucket2: [],
+        }), {
+            bucket1: ['x-amz-meta-color', 'tags.project'],
+            bucket2: [],
+        });
+    });
+
+    [
+        ['a non-object config', ['bucket1']],
+        ['a non-array field list', { bucket1: 'x-amz-meta-color' }],
+        ['a system metadata field', { bucket1: ['content-length'] }],
+        ['an empty tag field', { bucket1: ['tags.'] }],
+    ].forEach(([desc, indexes]) => {
+        it(`should reject ${desc}`, () => {
+            assert.throws(() => parseMetadataSearchIndexes(indexes));
+        });
+    });
+});
@@ -0,0 +1,74 @@
+const assert = require('assert');
+const { parseMonitoringConfig } = require('../../../lib/Config');
+const constants = require('../../../constants');
+
+describe('parseMonitoringConfig', () => {
+    it('should use the default duration buckets', () => {
+        assert.deepStrictEqual(parseMonitoringConfig(undefined).httpRequestDurationBuckets,
+            constants.httpRequestDurationBuckets);
+        assert.deepStrictEqual(parseMonitoringConfig({}).httpRequestDurationBuckets,
+            constants.httpRequestDurationBuckets);
+    });
+
+    it('should accept an explicit list of buckets', () => {
+        const buckets = [0.005, 0.05, 0.5, 1, 5, 30];
+        assert.deepStrictEqual(
+            parseMonitoringConfig({ httpRequestDurationBuckets: buckets }).httpRequestDurationBuckets,
+            buckets);
+    });
+
+    it('should generate exponential buckets', () => {
+        const { httpRequestDurationBuckets } = parseMonitoringConfig({
+            httpRequestDurationBuckets: {
+                type: 'exponential', start: 0.001, factor: 2, count: 4,
+            },
+        });
+        assert.deepStrictEqual(httpRequestDurationBuckets, [0.001, 0.002, 0.004, 0.008]);
+    });
+
+    it('should generate linear buckets', () => {
+        const { httpRequestDurationBuckets } = parseMonitoringConfig({
+            httpRequestDurationBuckets: {
+                type: 'linear', start: 0.1, width: 0.1, count: 3,
+            },
+        });
+        assert.deepStrictEqual(httpRequestDurationBuckets, [0.1, 0.2, 0.3]);
+    });
+
+    it('should cache rendered metrics by default', () => {
+        assert.strictEqual(parseMonitoringConfig({}).cacheRenderedMetrics, true);
+        assert.strictEqual(
+            parseMonitoringConfig({ cacheRenderedMetrics: false }).cacheRenderedMetrics, false);
+        assert.throws(() => parseMonitoringConfig({ cacheRenderedMetrics: 'no' }));
+    });
+
+    it('should enable request phase metrics by default', () => {
+        assert.strictEqual(parseMonitoringConfig({}).requestPhaseMetrics, true);
+        assert.strictEqual(
+            parseMonitoringConfig({ requestPhaseMetrics: false }).requestPhaseMetrics, false);
+        assert.throws(() => parseMonitoringConfig({ requestPhaseMetrics: 1 }));
+    });
+
+    it('should parse the number of buckets and accounts with their own metrics', () => {
+        const monitoring = parseMonitoringConfig({ bucketMetricsTopK: 100, accountMetricsTopK: 0 });
+        assert.strictEqual(monitoring.bucketMetricsTopK, 100);
+        assert.strictEqual(monitoring.accountMetricsTopK, 0);
+        assert.strictEqual(parseMonitoringConfig({}).bucketMetricsTopK, 20);
+        assert.throws(() => parseMonitoringConfig({ bucketMetricsTopK: -1 }));
+        assert.throws(() => parseMonitoringConfig({ accountMetricsTopK: 1.5 }));
+    });
+
+    [
+        { desc: 'an empty list', buckets: [] },
+        { desc: 'unsorted buckets', buckets: [0.1, 0.05] },
+        { desc: 'duplicate buckets', buckets: [0.1, 0.1] },
+        { desc: 'negative buckets', buckets: [-1, 0.1] },
+        { desc: 'non-numeric buckets', buckets: ['0.1'] },
+        { desc: 'an unknown layout type', buckets: { type: 'native', start: 1, count: 2 } },
+        { desc: 'an exponential factor <= 1', buckets: { type: 'exponential', start: 1, factor: 1, count: 2 } },
+        { desc: 'a missing count', buckets: { type: 'linear', start: 1, width: 1 } },
+        { desc: 'too many buckets', buckets: { type: 'linear', start: 1, width: 1, count: 1000 } },
+    ].forEach(({ desc, buckets }) => it(`should reject ${desc}`, () => {
+        assert.throws(() => parseMonitoringConfig({ httpRequestDurationBuckets: buckets }));
+    }));
+});
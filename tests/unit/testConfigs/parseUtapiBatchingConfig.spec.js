@@ -0,0 +1,36 @@
+const assert = require('assert');
+const { parseUtapiBatchingConfig } = require('../../../lib/Config');
+
+describe('parseUtapiBatchingConfig', () => {
+    it('should be disabled by default', () => {
+        assert.strictEqual(parseUtapiBatchingConfig(undefined).enabled, false);
+        assert.strictEqual(parseUtapiBatchingConfig({}).enabled, false);
+    });
+
+    it('should accept the batch size, interval and spill directory', () => {
+        assert.deepStrictEqual(parseUtapiBatchingConfig({
+            enabled: true,
+            maxEvents: 500,
+            flushInterval: 200,
+            spillDir: '/var/lib/cloudserver/utapi',
+        }), {
+            enabled: true,
+            maxEvents: 500,
+            flushInterval: 200,
+            spillDir: '/var/lib/cloudserver/utapi',
+        });
+    });
+
+    [
+        ['a non-object config', true],
+        ['a non-boolean enabled', { enabled: 'true' }],
+        ['a zero batch size', { maxEvents: 0 }],
+        ['a non-integer interval', { flushInterval: 0.5 }],
+        ['a non-string spill directory', { spillDir: 42 }],
+        ['an enabled batching without spill directory', { enabled: true }],
+    ].forEach(([desc, batching]) => {
+        it(`should reject ${desc}`, () => {
+            assert.throws(() => parseUtapiBatchingConfig(batching));
+        });
+    });
+});
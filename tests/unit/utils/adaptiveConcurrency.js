@@ -0,0 +1,141 @@
+const assert = require('assert');
+
+const AdaptiveConcurrency = require('../../../lib/utilities/adaptiveConcurrency');
+
+describe('AdaptiveConcurrency', () => {
+    let now;
+    let pending;
+
+    // task completing when told to, `now` being the completion time
+    function task(done) {
+        pending.push(done);
+    }
+
+    function complete(count, latency, err) {
+        now += latency;
+        pending.splice(0, count).forEach(done => done(err || null));
+    }
+
+    beforeEach(() => {
+        now = 0;
+        pending = [];
+    });
+
+    function newQueue(params) {
+        return new AdaptiveConcurrency(Object.assign({
+            min: 1,
+            max: 20,
+            initial: 4,
+            now: () => now,
+        }, params));
+    }
+
+    it('should not run more tasks than the limit', () => {
+        const queue = newQueue();
+        for (let i = 0; i < 10; ++i) {
+            queue.push(task, () => {});
+        }
+        assert.strictEqual(queue.inflight, 4);
+        assert.strictEqual(queue.queued, 6);
+        complete(1, 10);
+        assert.strictEqual(queue.inflight, 4);
+        assert.strictEqual(queue.queued, 5);
+    });
+
+    it('should increase the limit while the backend keeps up', () => {
+        const queue = newQueue();
+        for (let i = 0; i < 100; ++i) {
+            queue.push(task, () => {});
+        }
+        // every task in progress completes in 10ms
+        while (pending.length > 0) {
+            complete(pending.length, 10);
+        }
+        assert(queue.limit > 4, `limit ${queue.limit}`);
+        assert(queue.limit <= 20);
+    });
+
+    it('should halve the limit on errors, once per latency', () => {
+        const queue = newQueue({ initial: 16 });
+        for (let i = 0; i < 16; ++i) {
+            queue.push(task, () => {});
+        }
+        complete(4, 10, new Error('unavailable'));
+        assert.strictEqual(queue.limit, 8);
+        complete(4, 20, new Error('unavailable'));
+        assert.strictEqual(queue.limit, 4);
+    });
+
+    it('should not count missing locations as errors', () => {
+        const queue = newQueue();
+        const notFound = { is: { ObjNotFound: true } };
+        queue.push(task, () => {});
+        complete(1, 10, notFound);
+        assert.strictEqual(queue.limit, 4);
+    });
+
+    it('should decrease the limit when the latency increases', () => {
+        const queue = newQueue({ initial: 16 });
+        for (let i = 0; i < 200; ++i) {
+            queue.push(task, () => {});
+        }
+        for (let i = 0; i < 3; ++i) {
+            complete(pending.length, 10);
+        }
+        const limit = queue.limit;
+        for (let i = 0; i < 3; ++i) {
+            complete(pending.length, 100);
+        }
+        assert(queue.limit < limit, `limit ${queue.limit} from ${limit}`);
+    });
+
+    it('should stop at the first error, like async.eachLimit', done => {
+        const queue = newQueue({ initial: 2 });
+        const processed = [];
+        queue.eachLimit([1, 2, 3, 4], (item, next) => {
+            processed.push(item);
+            process.nextTick(next, item === 2 ? new Error(`failed ${item}`) : null);
+        }, err => {
+            assert.strictEqual(err.message, 'failed 2');
+            // 3 started when 1 completed, 4 was skipped
+            assert.deepStrictEqual(processed, [1, 2, 3]);
+            assert.strictEqual(queue.queued, 0);
+            done();
+        });
+    });
+
+    it('should run the items of concurrent calls in turn', () => {
+        const queue = newQueue({ min: 1, max: 1, initial: 1 });
+        const started = [];
+        const results = [];
+        const iterator = (item, next) => {
+            started.push(item);
+            pending.push(next);
+        };
+        queue.eachLimit(['a1', 'a2', 'a3'], iterator, err => results.push(['a', err]));
+        queue.eachLimit(['b1', 'b2'], iterator, err => results.push(['b', err]));
+        while (pending.length > 0) {
+            complete(1, 10);
+        }
+        assert.deepStrictEqual(started, ['a1', 'a2', 'b1', 'a3', 'b2']);
+        assert.deepStrictEqual(results, [['a', null], ['b', null]]);
+    });
+
+    it('should not nest tasks completing synchronously', done => {
+        const queue = newQueue({ min: 1, max: 1, initial: 1 });
+        const items = Array.from({ length: 100000 }, (v, i) => i);
+        let depth = 0;
+        let maxDepth = 0;
+        queue.eachLimit(items, (item, next) => {
+            depth += 1;
+            maxDepth = Math.max(maxDepth, depth);
+            next();
+            depth -= 1;
+        }, err => {
+            assert.ifError(err);
+            assert.strictEqual(maxDepth, 1);
+            assert.strictEqual(queue.inflight, 0);
+            done();
+        });
+    });
+});
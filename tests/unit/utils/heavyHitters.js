@@ -0,0 +1,66 @@
+const assert = require('assert');
+
+const { OTHER, SpaceSaving, TopKLabels } = require('../../../lib/utilities/heavyHitters');
+
+describe('SpaceSaving', () => {
+    it('should count exactly while under capacity', () => {
+        const sketch = new SpaceSaving(3);
+        ['a', 'b', 'a', 'c', 'a', 'b'].forEach(key => assert.strictEqual(sketch.offer(key), null));
+        assert.strictEqual(sketch.count('a'), 3);
+        assert.strictEqual(sketch.guaranteed('b'), 2);
+        assert.deepStrictEqual(sketch.top(2).map(e => e.key), ['a', 'b']);
+    });
+
+    it('should replace the least frequent key when full', () => {
+        const sketch = new SpaceSaving(2);
+        sketch.offer('a', 5);
+        sketch.offer('b', 2);
+        assert.strictEqual(sketch.offer('c'), 'b');
+        assert.strictEqual(sketch.count('b'), 0);
+        // c inherits the count of b as its error
+        assert.strictEqual(sketch.count('c'), 3);
+        assert.strictEqual(sketch.guaranteed('c'), 1);
+        assert.strictEqual(sketch.size, 2);
+    });
+
+    it('should keep the heavy hitters of a skewed stream', () => {
+        const sketch = new SpaceSaving(20);
+        for (let i = 0; i < 10000; ++i) {
+            sketch.offer(i % 2 === 0 ? `heavy${i % 6}` : `tail${i}`);
+        }
+        const top = sketch.top(3).map(e => e.key).sort();
+        assert.deepStrictEqual(top, ['heavy0', 'heavy2', 'heavy4']);
+    });
+});
+
+describe('TopKLabels', () => {
+    it('should export the first keys until full', () => {
+        const labels = new TopKLabels(2);
+        assert.strictEqual(labels.label('a'), 'a');
+        assert.strictEqual(labels.label('b'), 'b');
+        assert.strictEqual(labels.label('c'), OTHER);
+        assert.deepStrictEqual(labels.exported().sort(), ['a', 'b']);
+    });
+
+    it('should replace an exported key by a more frequent one', () => {
+        const evicted = [];
+        const labels = new TopKLabels(2, { onEvict: key => evicted.push(key) });
+        labels.label('a', 10);
+        labels.label('b');
+        assert.strictEqual(labels.label('c'), OTHER);
+        assert.strictEqual(labels.label('c'), 'c');
+        assert.deepStrictEqual(evicted, ['b']);
+        assert.deepStrictEqual(labels.exported().sort(), ['a', 'c']);
+    });
+
+    it('should bound the number of exported keys', () => {
+        const labels = new TopKLabels(5, { capacity: 20 });
+        const values = new Set();
+        for (let i = 0; i < 5000; ++i) {
+            values.add(labels.label(i % 4 === 0 ? `heavy${i % 12}` : `tail${i}`));
+        }
+        assert(labels.exported().length <= 5);
+        ['heavy0', 'heavy4', 'heavy8'].forEach(key => assert(labels.exported().includes(key)));
+        assert(values.has(OTHER));
+    });
+});
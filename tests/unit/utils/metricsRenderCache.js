@@ -0,0 +1,95 @@
+const assert = require('assert');
+const client = require('prom-client');
+const sinon = require('sinon');
+
+const MetricsRenderCache = require('../../../lib/utilities/metricsRenderCache');
+
+describe('MetricsRenderCache', () => {
+    let registry;
+    let counter;
+    let histogram;
+    let cache;
+
+    beforeEach(() => {
+        registry = new client.Registry();
+        counter = new client.Counter({
+            name: 'test_requests_total',
+            help: 'test counter',
+            labelNames: ['code'],
+            registers: [registry],
+        });
+        histogram = new client.Histogram({
+            name: 'test_duration_seconds',
+            help: 'test histogram',
+            labelNames: ['action'],
+            buckets: [0.1, 1],
+            registers: [registry],
+        });
+        counter.labels('200').inc();
+        histogram.labels('objectGet').observe(0.05);
+        cache = new MetricsRenderCache(registry);
+        sinon.spy(registry, 'getSingleMetricAsString');
+    });
+
+    it('should render the same exposition as the registry', async () => {
+        const expected = await registry.metrics();
+        assert.strictEqual(await cache.metrics(), expected);
+    });
+
+    it('should not re-render unchanged metrics', async () => {
+        await cache.metrics();
+        assert.strictEqual(registry.getSingleMetricAsString.callCount, 2);
+        await cache.metrics();
+        assert.strictEqual(registry.getSingleMetricAsString.callCount, 2);
+        assert.strictEqual(cache.lastReused, 2);
+    });
+
+    it('should only re-render changed metrics', async () => {
+        await cache.metrics();
+        histogram.labels('objectGet').observe(0.5);
+        const text = await cache.metrics();
+        assert.strictEqual(cache.lastRendered, 1);
+        assert.strictEqual(cache.lastReused, 1);
+        assert.strictEqual(text, await registry.metrics());
+        assert(text.includes('test_duration_seconds_count{action="objectGet"} 2'));
+    });
+
+    it('should render new series of a metric', async () => {
+        await cache.metrics();
+        counter.labels('500').inc();
+        assert((await cache.metrics()).includes('test_requests_total{code="500"} 1'));
+    });
+
+    it('should render a series replacing another one of same value', async () => {
+        await cache.metrics();
+        // e.g. a label evicted from the top-K labels for another one
+        counter.remove('200');
+        counter.labels('404').inc();
+        const text = await cache.metrics();
+        assert.strictEqual(text, await registry.metrics());
+        assert(text.includes('test_requests_total{code="404"} 1'));
+        assert(!text.includes('code="200"'));
+    });
+
+    it('should always render metrics with a collect callback', async () => {
+        let value = 0;
+        // eslint-disable-next-line no-new
+        new client.Gauge({
+            name: 'test_collected',
+            help: 'test gauge',
+            registers: [registry],
+            collect() {
+                value += 1;
+                this.set(value);
+            },
+        });
+        await cache.metrics();
+        assert((await cache.metrics()).includes('test_collected 2'));
+    });
+
+    it('should share one rendering between concurrent scrapes', async () => {
+        const [first, second] = await Promise.all([cache.metrics(), cache.metrics()]);
+        assert.strictEqual(first, second);
+        assert.strictEqual(registry.getSingleMetricAsString.callCount, 2);
+    });
+});
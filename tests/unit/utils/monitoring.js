@@ -118,4 +118,16 @@ describe('Monitoring: endpoint', () => {
         await fetchMetrics({ method: 'GET', url: '/metrics' }, res);
         assert(parseHttpResponseSize(res.end.args[1][0]) === responseSize + 7532);
     });
+
+    it('should count requests by bucket and by account', async () => {
+        monitoring.promBucketAndAccountMetrics('monitored-bucket', 'monitoredAccount', 404, 0.01, 10, 20);
+        await fetchMetrics({ method: 'GET', url: '/metrics' }, res);
+        const metrics = res.end.args[0][0];
+        assert.strictEqual(parseMetric(metrics, 's3_cloudserver_bucket_http_requests_total',
+            { bucket: 'monitored-bucket', code: '404' }), '1');
+        assert.strictEqual(parseMetric(metrics, 's3_cloudserver_account_http_requests_total',
+            { account: 'monitoredAccount', code: '404' }), '1');
+        assert.strictEqual(parseMetric(metrics, 's3_cloudserver_bucket_http_response_bytes_total',
+            { bucket: 'monitored-bucket' }), '20');
+    });
 });
@@ -0,0 +1,46 @@
+const assert = require('assert');
+const { parseSearch } =
+    require('../../../lib/api/apiUtils/bucket/parseSearch');
+const { compileFilter } = require('../../../lib/metadata/searchIndex');
+
+describe('parseSearch', () => {
+    it('should parse a search into a MongoDB filter', () => {
+        assert.deepStrictEqual(parseSearch('`x-amz-meta-color`="blue"'), {
+            mongifiedSearch: { 'value.x-amz-meta-color': { $eq: 'blue' } },
+        });
+    });
+
+    it('should return the same plan for the same search', () => {
+        const first = parseSearch('`x-amz-meta-color`="blue" AND ' +
+            '`x-amz-meta-size` LIKE "/^b.*/i"');
+        const second = parseSearch('`x-amz-meta-color`="blue" AND ' +
+            '`x-amz-meta-size` LIKE "/^b.*/i"');
+        assert.strictEqual(second, first);
+        // regular expressions and predicate are compiled once
+        assert.strictEqual(compileFilter(second.mongifiedSearch),
+            compileFilter(first.mongifiedSearch));
+    });
+
+    it('should not mix searches differing inside quotes', () => {
+        const first = parseSearch('`x-amz-meta-color`="light blue"');
+        const second = parseSearch('`x-amz-meta-color`="light  blue"');
+        assert.notStrictEqual(second, first);
+    });
+
+    it('should not mix searches differing after an escaped quote', () => {
+        const first = parseSearch('`x-amz-meta-color`="a\\" b"');
+        const second = parseSearch('`x-amz-meta-color`="a\\"  b"');
+        assert.notStrictEqual(second, first);
+    });
+
+    [
+        ['an unknown attribute', '`unknown`="blue"'],
+        ['an unsupported operator', 'x-amz-meta-dog BETWEEN "labrador"'],
+        ['invalid regular expression options', '`key` LIKE "/a/z"'],
+        ['a missing search', undefined],
+    ].forEach(([desc, search]) => {
+        it(`should reject ${desc}`, () => {
+            assert(parseSearch(search).error);
+        });
+    });
+});
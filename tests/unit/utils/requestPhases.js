@@ -0,0 +1,66 @@
+const assert = require('assert');
+
+const {
+    PhaseTimer,
+    runWithPhaseTimer,
+    instrument,
+    timed,
+} = require('../../../lib/utilities/requestPhases');
+
+function delayed(ms, cb) {
+    setTimeout(() => cb(null, ms), ms);
+}
+
+describe('requestPhases', () => {
+    it('should not time calls made outside of a request', done => {
+        const client = instrument({ get: delayed }, 'metadata');
+        client.get(1, (err, res) => {
+            assert.strictEqual(res, 1);
+            done();
+        });
+    });
+
+    it('should accumulate the time of calls in their phase', done => {
+        const timer = new PhaseTimer();
+        const metadata = instrument({ get: delayed }, 'metadata');
+        const data = instrument({ get: delayed }, 'data');
+        runWithPhaseTimer(timer, () => metadata.get(20, () => data.get(10, () => {
+            assert(timer.durations.metadata >= 0.015);
+            assert(timer.durations.data >= 0.005);
+            assert(timer.durations.data < timer.durations.metadata);
+            done();
+        })));
+    });
+
+    it('should not count concurrent calls of a phase twice', done => {
+        const timer = new PhaseTimer();
+        const metadata = instrument({ get: delayed }, 'metadata');
+        runWithPhaseTimer(timer, () => {
+            let pending = 3;
+            const end = () => {
+                pending -= 1;
+                if (pending === 0) {
+                    assert(timer.durations.metadata < 0.045);
+                    done();
+                }
+            };
+            metadata.get(20, end);
+            metadata.get(20, end);
+            metadata.get(20, end);
+        });
+    });
+
+    it('should time functions returning a promise', async () => {
+        const timer = new PhaseTimer();
+        const kms = timed('kms', ms => new Promise(resolve => setTimeout(resolve, ms)));
+        await runWithPhaseTimer(timer, () => kms(10));
+        assert(timer.durations.kms >= 0.005);
+    });
+
+    it('should not time synchronous calls', () => {
+        const timer = new PhaseTimer();
+        const client = instrument({ name: () => 'mem' }, 'data');
+        runWithPhaseTimer(timer, () => assert.strictEqual(client.name(), 'mem'));
+        assert.deepStrictEqual(timer.durations, {});
+    });
+});
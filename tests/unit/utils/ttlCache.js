@@ -0,0 +1,89 @@
+const assert = require('assert');
+
+const TTLCache = require('../../../lib/utilities/ttlCache');
+
+function testClock() {
+    const clock = () => clock.time;
+    clock.time = 1000;
+    return clock;
+}
+
+describe('TTLCache', () => {
+    it('should return the cached values', () => {
+        const cache = new TTLCache({ max: 2, ttl: 1000 });
+        cache.set('a', 1);
+        assert.strictEqual(cache.get('a'), 1);
+        assert.strictEqual(cache.get('b'), undefined);
+        assert.strictEqual(cache.size, 1);
+    });
+
+    it('should evict the least recently used entry when full', () => {
+        const evicted = [];
+        const cache = new TTLCache({
+            max: 2,
+            ttl: 1000,
+            onEvict: (key, value, reason) => evicted.push([key, reason]),
+        });
+        cache.set('a', 1);
+        cache.set('b', 2);
+        cache.get('a');
+        cache.set('c', 3);
+        assert.deepStrictEqual(evicted, [['b', 'capacity']]);
+        assert.strictEqual(cache.get('a'), 1);
+        assert.strictEqual(cache.get('b'), undefined);
+        assert.strictEqual(cache.size, 2);
+    });
+
+    it('should expire entries after their time to live', () => {
+        const now = testClock();
+        const evicted = [];
+        const cache = new TTLCache({
+            max: 10,
+            ttl: 100,
+            now,
+            onEvict: (key, value, reason) => evicted.push([key, reason]),
+        });
+        cache.set('a', 1);
+        now.time += 99;
+        assert.strictEqual(cache.get('a'), 1);
+        now.time += 1;
+        assert.strictEqual(cache.get('a'), undefined);
+        assert.deepStrictEqual(evicted, [['a', 'expired']]);
+        assert.strictEqual(cache.size, 0);
+    });
+
+    it('should not cache anything with a maximum of 0 entries', () => {
+        const cache = new TTLCache({ max: 0, ttl: 100 });
+        cache.set('a', 1);
+        assert.strictEqual(cache.get('a'), undefined);
+    });
+
+    it('should delete entries', () => {
+        const cache = new TTLCache({ max: 10, ttl: 100 });
+        ['a1', 'a2', 'b1'].forEach(key => cache.set(key, key));
+        assert.strictEqual(cache.delete('b1'), true);
+        assert.strictEqual(cache.delete('b1'), false);
+        assert.strictEqual(cache.deleteMatching(key => key.startsWith('a')), 2);
+        assert.strictEqual(cache.size, 0);
+    });
+
+    it('should report lookups, evictions and size', () => {
+        const observed = { hits: 0, misses: 0, evictions: [], size: null };
+        const cache = new TTLCache({
+            max: 1,
+            ttl: 100,
+            metrics: {
+                lookup: hit => (hit ? observed.hits++ : observed.misses++),
+                eviction: reason => observed.evictions.push(reason),
+                size: size => { observed.size = size; },
+            },
+        });
+        cache.get('a');
+        cache.set('a', 1);
+        cache.get('a');
+        cache.set('b', 2);
+        cache.delete('b');
+        assert.deepStrictEqual(observed,
+            { hits: 1, misses: 1, evictions: ['capacity'], size: 0 });
+    });
+});
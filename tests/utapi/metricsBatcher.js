@@ -0,0 +1,144 @@
+const assert = require('assert');
+const fs = require('fs');
+const http = require('http');
+const os = require('os');
+const path = require('path');
+
+const {
+    createIngestSender,
+    UtapiMetricsBatcher,
+} = require('../../lib/utapi/metricsBatcher');
+
+describe('UtapiMetricsBatcher', () => {
+    let spillDir;
+    let sent;
+    let failing;
+
+    function send(events, cb) {
+        if (failing) {
+            return process.nextTick(cb, new Error('unavailable'));
+        }
+        sent.push(events);
+        return process.nextTick(cb);
+    }
+
+    function newBatcher(params) {
+        return new UtapiMetricsBatcher(Object.assign({
+            send,
+            maxEvents: 3,
+            flushInterval: 60000,
+            spillDir,
+        }, params));
+    }
+
+    beforeEach(() => {
+        spillDir = fs.mkdtempSync(path.join(os.tmpdir(), 'utapi-batcher-'));
+        sent = [];
+        failing = false;
+    });
+
+    afterEach(() => {
+        fs.rmSync(spillDir, { recursive: true, force: true });
+    });
+
+    it('should send the events by batches of maxEvents', done => {
+        const batcher = newBatcher();
+        for (let i = 0; i < 7; ++i) {
+            batcher.add({ operationId: 'getObject', bucket: `bucket${i}` });
+        }
+        batcher.flush(() => {
+            assert.deepStrictEqual(sent.map(batch => batch.length), [3, 3, 1]);
+            const events = [].concat(...sent);
+            assert.deepStrictEqual(events.map(event => event.bucket),
+                ['bucket0', 'bucket1', 'bucket2', 'bucket3', 'bucket4',
+                    'bucket5', 'bucket6']);
+            events.forEach(event => {
+                assert.strictEqual(typeof event.timestamp, 'number');
+                assert.strictEqual(typeof event.uuid, 'string');
+            });
+            assert.strictEqual(new Set(events.map(e => e.uuid)).size, 7);
+            done();
+        });
+    });
+
+    it('should spill the batches that cannot be sent and replay them',
+    done => {
+        const batcher = newBatcher();
+        failing = true;
+        batcher.add({ operationId: 'putObject', uuid: 'a' });
+        batcher.add({ operationId: 'putObject', uuid: 'b' });
+        batcher.flush(() => {
+            assert.strictEqual(batcher.stats.spilledEvents, 2);
+            failing = false;
+            // another process replays the spill file
+            const other = newBatcher();
+            other.replaySpilled(() => {
+                assert.deepStrictEqual(
+                    [].concat(...sent).map(event => event.uuid), ['a', 'b']);
+                assert.deepStrictEqual(fs.readdirSync(spillDir), []);
+                done();
+            });
+        });
+    });
+
+    it('should spill the buffered events at exit', () => {
+        const batcher = newBatcher({ maxEvents: 10 });
+        batcher.add({ operationId: 'putObject', uuid: 'a' });
+        batcher._spillSync();
+        const files = fs.readdirSync(spillDir);
+        assert.strictEqual(files.length, 1);
+        const lines = fs.readFileSync(path.join(spillDir, files[0]), 'utf8')
+            .trim().split('\n');
+        assert.deepStrictEqual(lines.map(line => JSON.parse(line).uuid),
+            ['a']);
+    });
+
+    it('should skip the truncated lines of a spill file', done => {
+        fs.writeFileSync(path.join(spillDir, 'utapi-spill-1-1.jsonl'),
+            '{"uuid":"a"}\n{"uuid":"b"}\n{"uu');
+        newBatcher().replaySpilled(() => {
+            assert.deepStrictEqual(
+                [].concat(...sent).map(event => event.uuid), ['a', 'b']);
+            done();
+        });
+    });
+});
+
+describe('createIngestSender', () => {
+    let server;
+    let requests;
+
+    before(done => {
+        requests = [];
+        server = http.createServer((req, res) => {
+            const chunks = [];
+            req.on('data', chunk => chunks.push(chunk));
+            req.on('end', () => {
+                requests.push({
+                    path: req.url,
+                    events: JSON.parse(Buffer.concat(chunks).toString()),
+                });
+                res.statusCode = req.url === '/v2/ingest' ? 200 : 404;
+                res.end();
+            });
+        });
+        server.listen(0, done);
+    });
+
+    after(done => server.close(done));
+
+    it('should post the events to the ingestion route', done => {
+        const sendEvents = createIngestSender({
+            host: 'localhost',
+            port: server.address().port,
+        });
+        sendEvents([{ uuid: 'a' }, { uuid: 'b' }], err => {
+            assert.ifError(err);
+            assert.deepStrictEqual(requests, [{
+                path: '/v2/ingest',
+                events: [{ uuid: 'a' }, { uuid: 'b' }],
+            }]);
+            done();
+        });
+    });
+});